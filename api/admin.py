@@ -1,6 +1,24 @@
 from django.contrib import admin
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
 
-from .models import Author, Book, Order, OrderItem, Review, User
+from .models import (
+    Author,
+    Book,
+    CartItem,
+    Order,
+    OrderItem,
+    OrderTicket,
+    RequestProfile,
+    Review,
+    SlowQuery,
+    StockReservation,
+    StockShard,
+    User,
+)
+from .services import recalculate_totals
 
 
 # Настройка административной панели для пользователей
@@ -23,11 +41,19 @@ class AuthorAdmin(admin.ModelAdmin):
 # Настройка административной панели для книг
 @admin.register(Book)
 class BookAdmin(admin.ModelAdmin):
-    list_display = ["title", "author", "price", "stock", "cover_image", "created_at"]
-    list_filter = ["author", "created_at"]
+    list_display = [
+        "title",
+        "author",
+        "price",
+        "stock",
+        "stock_sharded",
+        "cover_image",
+        "created_at",
+    ]
+    list_filter = ["author", "stock_sharded", "created_at"]
     search_fields = ["title", "description", "author__name"]
     ordering = ["-created_at"]
-    readonly_fields = ["cover_image_preview"]
+    readonly_fields = ["cover_image_preview", "stock_sharded"]
 
     def cover_image_preview(self, obj):
         if obj.cover_image:
@@ -54,6 +80,12 @@ class OrderAdmin(admin.ModelAdmin):
     ordering = ["-created_at"]
     inlines = [OrderItemInline]
     readonly_fields = ["total_price", "created_at", "updated_at"]
+    actions = ["recalculate_totals"]
+
+    @admin.action(description="Пересчитать общую стоимость")
+    def recalculate_totals(self, request, queryset):
+        fixed = recalculate_totals(queryset)
+        self.message_user(request, f"Исправлено сумм заказов: {fixed}")
 
 
 # Настройка административной панели для элементов заказа
@@ -73,3 +105,182 @@ class ReviewAdmin(admin.ModelAdmin):
     search_fields = ["user__username", "book__title", "comment"]
     ordering = ["-created_at"]
     readonly_fields = ["created_at", "updated_at"]
+
+
+# Настройка административной панели для корзин
+@admin.register(CartItem)
+class CartItemAdmin(admin.ModelAdmin):
+    list_display = ["user", "book", "quantity", "updated_at"]
+    search_fields = ["user__username", "book__title"]
+    ordering = ["-updated_at"]
+    raw_id_fields = ["user", "book"]
+
+
+# Настройка административной панели для резервов товара
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ["user", "book", "quantity", "price", "expires_at"]
+    list_filter = ["expires_at"]
+    search_fields = ["user__username", "book__title"]
+    ordering = ["expires_at"]
+    raw_id_fields = ["user", "book"]
+
+
+# Настройка административной панели для шардов остатка
+@admin.register(StockShard)
+class StockShardAdmin(admin.ModelAdmin):
+    list_display = ["book", "index", "quantity"]
+    search_fields = ["book__title"]
+    ordering = ["book", "index"]
+    readonly_fields = ["book", "index", "quantity"]
+
+    def has_add_permission(self, request):
+        return False
+
+
+# Настройка административной панели для заявок на заказ
+@admin.register(OrderTicket)
+class OrderTicketAdmin(admin.ModelAdmin):
+    list_display = ["ticket", "user", "status", "order", "created_at", "updated_at"]
+    list_filter = ["status", "created_at"]
+    search_fields = ["ticket", "user__username"]
+    ordering = ["-created_at"]
+    raw_id_fields = ["user", "order"]
+
+
+# Настройка административной панели для профилей запросов
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = [
+        "created_at",
+        "kind",
+        "method",
+        "path",
+        "status_code",
+        "duration_ms",
+        "samples",
+        "user",
+        "download_link",
+    ]
+    list_filter = ["kind", "method", "created_at"]
+    search_fields = ["path", "view_name", "user__username"]
+    ordering = ["-created_at"]
+    exclude = ["data"]
+    readonly_fields = [
+        "kind",
+        "method",
+        "path",
+        "view_name",
+        "user",
+        "status_code",
+        "duration_ms",
+        "samples",
+        "download_link",
+        "summary_text",
+        "created_at",
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                "<int:profile_id>/download/",
+                self.admin_site.admin_view(self.download_view),
+                name="api_requestprofile_download",
+            ),
+        ] + super().get_urls()
+
+    @admin.display(description="Файл")
+    def download_link(self, obj):
+        url = reverse("admin:api_requestprofile_download", args=[obj.id])
+        return format_html('<a href="{}">{}</a>', url, self.filename(obj))
+
+    @admin.display(description="Сводка")
+    def summary_text(self, obj):
+        return format_html("<pre>{}</pre>", obj.summary)
+
+    def filename(self, obj):
+        extension = "prof" if obj.kind == "cprofile" else "txt"
+        return f"profile-{obj.id}.{extension}"
+
+    def download_view(self, request, profile_id):
+        if not self.has_view_permission(request):
+            return HttpResponse(status=403)
+        profile = get_object_or_404(RequestProfile, id=profile_id)
+        content_type = (
+            "application/octet-stream"
+            if profile.kind == "cprofile"
+            else "text/plain; charset=utf-8"
+        )
+        response = HttpResponse(bytes(profile.data), content_type=content_type)
+        response["Content-Disposition"] = (
+            f'attachment; filename="{self.filename(profile)}"'
+        )
+        return response
+
+
+# Настройка административной панели для отчёта о медленных запросах
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = [
+        "short_fingerprint",
+        "calls",
+        "total_ms",
+        "average",
+        "max_ms",
+        "view_name",
+        "updated_at",
+    ]
+    list_filter = ["view_name", "updated_at"]
+    search_fields = ["fingerprint", "view_name", "origin"]
+    ordering = ["-total_ms"]
+    fields = [
+        "fingerprint_text",
+        "calls",
+        "total_ms",
+        "average",
+        "max_ms",
+        "view_name",
+        "origin_text",
+        "plan_text",
+        "example_text",
+        "created_at",
+        "updated_at",
+    ]
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description="Шаблон SQL")
+    def short_fingerprint(self, obj):
+        text = obj.fingerprint
+        return text if len(text) <= 120 else text[:117] + "..."
+
+    @admin.display(description="Среднее время, мс")
+    def average(self, obj):
+        return round(obj.average_ms, 3)
+
+    @admin.display(description="Шаблон SQL")
+    def fingerprint_text(self, obj):
+        return format_html("<pre>{}</pre>", obj.fingerprint)
+
+    @admin.display(description="Место вызова")
+    def origin_text(self, obj):
+        return format_html("<pre>{}</pre>", obj.origin)
+
+    @admin.display(description="План (EXPLAIN)")
+    def plan_text(self, obj):
+        return format_html("<pre>{}</pre>", obj.plan)
+
+    @admin.display(description="Пример запроса")
+    def example_text(self, obj):
+        return format_html("<pre>{}</pre>", obj.example_sql)
@@ -3,3 +3,19 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        from django.conf import settings
+
+        from .authentication import check_denylist_cache, connect_signals
+        from .memory import install_query_log_guard
+        from .metrics import remove_dead_files
+        from .throttling import check_throttle_cache
+
+        install_query_log_guard()
+        check_denylist_cache()
+        check_throttle_cache()
+        connect_signals()
+        if settings.METRICS_ENABLED:
+            # Файлы метрик прошлого запуска сервера
+            remove_dead_files()
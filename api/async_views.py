@@ -0,0 +1,169 @@
+"""
+Асинхронные представления каталога для запуска под ASGI (ASYNC_CATALOG_VIEWS).
+
+async_list_view / async_detail_view оборачивают синхронные представления DRF
+из api/views.py. Анонимные GET-запросы за JSON обслуживаются асинхронно:
+queryset строится настройками представления DRF (фильтры, поиск, сортировка,
+?fields= / ?omit= / ?expand=), строки читаются асинхронным ORM (acount, aget,
+async for), сериализуются FastSerializer.aserialize и рендерятся
+FastJSONRenderer. Пока запрос ждёт базу, цикл событий обслуживает другие
+запросы, а медленный клиент не занимает поток.
+
+Остальные запросы передаются синхронному представлению через sync_to_async,
+поэтому ответы обоих путей совпадают:
+- изменяющие (POST, PUT, PATCH, DELETE);
+- с заголовком Authorization (нужна аутентификация DRF);
+- browsable API (Accept: text/html, ?format=);
+- с сериализатором, который не компилируется FastSerializer, или при
+  выключенном FAST_LIST_SERIALIZATION.
+"""
+
+from functools import update_wrapper
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.paginator import InvalidPage
+from django.http import HttpResponse
+from django.utils.cache import cc_delim_re, patch_vary_headers
+from rest_framework.exceptions import APIException, NotFound
+
+from .fast_serializers import FastSerializer
+from .renderers import FastJSONRenderer
+
+
+def serves_async(request):
+    """Запрос можно обслужить асинхронным путём."""
+    if request.method not in ("GET", "HEAD"):
+        return False
+    if "HTTP_AUTHORIZATION" in request.META or "format" in request.GET:
+        return False
+    if not getattr(settings, "FAST_LIST_SERIALIZATION", True):
+        return False
+    return "text/html" not in request.META.get("HTTP_ACCEPT", "")
+
+
+def json_response(view, data, status=200):
+    """Ответ с теми же телом и заголовками, что и у представления DRF."""
+    body = FastJSONRenderer().render(data, "application/json")
+    response = HttpResponse(body, status=status, content_type="application/json")
+    # Как у Response DRF: клиенты тестов и middleware читают response.data
+    response.data = data
+    headers = view.default_response_headers
+    vary = headers.pop("Vary", None)
+    if vary is not None:
+        patch_vary_headers(response, cc_delim_re.split(vary))
+    for name, value in headers.items():
+        response.headers[name] = value
+    return response
+
+
+def init_view(sync_view, request, kwargs):
+    """Экземпляр представления DRF для построения queryset и сериализатора."""
+    view = sync_view.cls(**sync_view.initkwargs)
+    view.setup(request, **kwargs)
+    view.request = view.initialize_request(request, **kwargs)
+    view.format_kwarg = None
+    view.headers = {}
+    return view
+
+
+async def paginate(paginator, queryset, request):
+    """
+    Асинхронный PageNumberPagination.paginate_queryset: число строк - acount(),
+    страница читается при сериализации. Возвращает queryset страницы или None
+    без пагинации; номер вне диапазона - NotFound, как у DRF.
+    """
+    paginator.request = request
+    page_size = paginator.get_page_size(request)
+    if not page_size:
+        return None
+    django_paginator = paginator.django_paginator_class(queryset, page_size)
+    django_paginator.count = await queryset.acount()
+    page_number = paginator.get_page_number(request, django_paginator)
+    try:
+        paginator.page = django_paginator.page(page_number)
+    except InvalidPage as exc:
+        raise NotFound(
+            paginator.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            )
+        )
+    return paginator.page.object_list
+
+
+async def list_response(view):
+    fast = FastSerializer.for_serializer(view.get_serializer())
+    if fast is None:
+        return None
+    # Фильтры django-filter проверяют значения (например, ?author=) запросом
+    queryset = await sync_to_async(view.filter_queryset)(view.get_queryset())
+    queryset = fast.values(queryset)
+
+    paginator = view.paginator
+    page = None
+    if paginator is not None:
+        page = await paginate(paginator, queryset, view.request)
+    if page is None:
+        return json_response(view, await fast.aserialize(queryset))
+    data = await fast.aserialize(page)
+    return json_response(view, paginator.get_paginated_response(data).data)
+
+
+async def detail_response(view):
+    fast = FastSerializer.for_serializer(view.get_serializer())
+    if fast is None:
+        return None
+    queryset = await sync_to_async(view.filter_queryset)(view.get_queryset())
+    lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+    try:
+        row = await fast.values(queryset).aget(
+            **{view.lookup_field: view.kwargs[lookup_url_kwarg]}
+        )
+    except ObjectDoesNotExist:
+        raise NotFound()
+    data = await fast.aserialize([row])
+    return json_response(view, data[0])
+
+
+def async_view(view_class, handler):
+    sync_view = view_class.as_view()
+
+    async def view(request, *args, **kwargs):
+        if serves_async(request):
+            try:
+                response = await handler(init_view(sync_view, request, kwargs))
+            except APIException:
+                # Ошибки (неверный фильтр, нет страницы или объекта) отдаёт
+                # синхронное представление с обработчиком исключений DRF
+                response = None
+            if response is not None:
+                return response
+        return await sync_to_async(sync_view)(request, *args, **kwargs)
+
+    # cls, view_class, query_budgets и csrf_exempt - как у синхронного
+    return update_wrapper(view, sync_view)
+
+
+def async_list_view(view_class):
+    """Асинхронное представление GET-списка поверх ListAPIView."""
+    return async_view(view_class, list_response)
+
+
+def async_detail_view(view_class):
+    """Асинхронное представление GET-объекта поверх RetrieveAPIView."""
+    return async_view(view_class, detail_response)
+
+
+def catalog_list_view(view_class):
+    """Представление списка для URLconf: асинхронное при ASYNC_CATALOG_VIEWS."""
+    if settings.ASYNC_CATALOG_VIEWS:
+        return async_list_view(view_class)
+    return view_class.as_view()
+
+
+def catalog_detail_view(view_class):
+    """Представление объекта для URLconf: асинхронное при ASYNC_CATALOG_VIEWS."""
+    if settings.ASYNC_CATALOG_VIEWS:
+        return async_detail_view(view_class)
+    return view_class.as_view()
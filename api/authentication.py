@@ -0,0 +1,189 @@
+"""
+Аутентификация по JWT без запроса пользователя к БД.
+
+JWTAuthentication на каждый запрос с токеном читает строку api_user, хотя
+представлениям нужны только id и роль. Токены, выданные RefreshToken
+этого модуля (вход и регистрация), несут подписанные данные пользователя:
+username, role, is_active и поколение токена gen - значение счётчика
+User.token_generation при выдаче. StatelessJWTAuthentication
+(JWT_STATELESS_AUTH=1) строит пользователя из этих claims через
+User.from_db: остальные поля отложены и загрузятся из БД только при
+обращении. Токены без этих claims проверяются по БД, как раньше.
+
+Отзыв: revoke_tokens(user_id) увеличивает счётчик в БД, и токены
+пользователя с меньшим поколением отклоняются. Часы не участвуют: токен,
+выданный сразу после отзыва, действителен, а расхождение времени между
+серверами ничего не меняет. Текущее поколение читается через кэш
+JWT_DENYLIST_CACHE_ALIAS: revoke_tokens записывает в него новое значение,
+промах читает счётчик из БД. Токены отзываются автоматически при
+изменении username, role, is_active или пароля через save() и при
+удалении пользователя; после QuerySet.update() нужно вызвать
+revoke_tokens самим. С несколькими воркерами нужен общий кэш: без DEBUG
+приложение не запускается, если JWT_DENYLIST_CACHE_ALIAS - кэш процесса
+(check_denylist_cache).
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+GENERATION_CLAIM = "gen"
+# Поля пользователя в claims токена
+USER_CLAIMS = ("username", "role", "is_active")
+# Кэши, отметки отзыва в которых не видны другим процессам
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+# Отличает промах кэша от сохранённого None (пользователь удалён)
+_MISSING = object()
+
+
+def _generations():
+    return caches[settings.JWT_DENYLIST_CACHE_ALIAS]
+
+
+def _generation_key(user_id):
+    return f"jwt-generation:{user_id}"
+
+
+def _generation_timeout():
+    leeway = jwt_settings.LEEWAY
+    if not isinstance(leeway, timedelta):
+        leeway = timedelta(seconds=leeway)
+    return int((jwt_settings.ACCESS_TOKEN_LIFETIME + leeway).total_seconds()) + 1
+
+
+def token_generation(user_id):
+    """Текущее поколение токенов пользователя; None - пользователь удалён."""
+    cache = _generations()
+    key = _generation_key(user_id)
+    generation = cache.get(key, _MISSING)
+    if generation is _MISSING:
+        generation = (
+            get_user_model()
+            .objects.filter(pk=user_id)
+            .values_list("token_generation", flat=True)
+            .first()
+        )
+        # add, а не set: значение, прочитанное до отзыва, не затирает
+        # записанное revoke_tokens
+        cache.add(key, generation, _generation_timeout())
+    return generation
+
+
+def revoke_tokens(user_id):
+    """Отзывает все токены пользователя user_id, выданные до этого момента."""
+    users = get_user_model().objects.filter(pk=user_id)
+    users.update(token_generation=F("token_generation") + 1)
+    generation = users.values_list("token_generation", flat=True).first()
+    _generations().set(_generation_key(user_id), generation, _generation_timeout())
+
+
+def is_revoked(user_id, generation):
+    current = token_generation(user_id)
+    return current is None or generation < current
+
+
+class RefreshToken(tokens.RefreshToken):
+    """
+    RefreshToken с данными пользователя и поколением токена; access_token
+    копирует их из refresh-токена.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        generation = _generations().get(_generation_key(user.pk), _MISSING)
+        if generation is _MISSING:
+            # Вход и регистрация только что прочитали пользователя: без
+            # лишнего запроса. В кэш значение экземпляра не пишется - если
+            # он устарел, токен просто будет отклонён
+            generation = user.token_generation
+        token[GENERATION_CLAIM] = generation
+        return token
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication, берущая пользователя из claims токена, а не из БД."""
+
+    def get_user(self, validated_token):
+        required = (jwt_settings.USER_ID_CLAIM, GENERATION_CLAIM, *USER_CLAIMS)
+        if any(claim not in validated_token for claim in required):
+            # Токен выдан без данных пользователя
+            return super().get_user(validated_token)
+
+        user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        if is_revoked(user_id, validated_token[GENERATION_CLAIM]):
+            raise AuthenticationFailed("Токен отозван", code="token_revoked")
+        if not validated_token["is_active"]:
+            raise AuthenticationFailed("Пользователь неактивен", code="user_inactive")
+
+        values = {claim: validated_token[claim] for claim in USER_CLAIMS}
+        values[jwt_settings.USER_ID_FIELD] = user_id
+        # from_db ждёт значения в порядке полей модели
+        fields = [
+            field.attname
+            for field in self.user_model._meta.concrete_fields
+            if field.attname in values
+        ]
+        return self.user_model.from_db(
+            DEFAULT_DB_ALIAS, fields, [values[name] for name in fields]
+        )
+
+
+def revoke_on_change(sender, instance, created, raw=False, **kwargs):
+    """post_save: изменение данных токена отзывает выданные токены."""
+    if raw:
+        return
+    changed = not created and instance.token_fields_changed()
+    # Экземпляр из create_user() или User(...) не загружался из БД: снимок
+    # полей появляется при первом сохранении
+    instance.remember_token_fields()
+    if not changed:
+        return
+    user_id = instance.pk
+    transaction.on_commit(lambda: revoke_tokens(user_id))
+
+
+def revoke_on_delete(sender, instance, **kwargs):
+    # После удаления pk экземпляра обнуляется; строки со счётчиком больше нет
+    key = _generation_key(instance.pk)
+    transaction.on_commit(lambda: _generations().set(key, None, _generation_timeout()))
+
+
+def check_denylist_cache():
+    """
+    ImproperlyConfigured, если отзыв токенов работает только в своём
+    процессе: воркеры gunicorn принимали бы отозванные токены. С DEBUG
+    (runserver, один процесс) кэш процесса допустим.
+    """
+    if not settings.JWT_STATELESS_AUTH or settings.DEBUG:
+        return
+    alias = settings.JWT_DENYLIST_CACHE_ALIAS
+    backend = settings.CACHES[alias]["BACKEND"]
+    if backend in PROCESS_LOCAL_CACHES:
+        raise ImproperlyConfigured(
+            f"JWT_STATELESS_AUTH требует общего для воркеров кэша "
+            f"JWT_DENYLIST_CACHE_ALIAS, а кэш {alias!r} - {backend}"
+        )
+
+
+def connect_signals():
+    User = get_user_model()
+    post_save.connect(revoke_on_change, sender=User, dispatch_uid="jwt-revoke")
+    post_delete.connect(revoke_on_delete, sender=User, dispatch_uid="jwt-revoke")
@@ -0,0 +1,120 @@
+"""
+Вспомогательные функции для бенчмарков (management-команды bench_*).
+"""
+
+import math
+import statistics
+import time
+from contextlib import nullcontext
+
+from django.test import override_settings
+
+# Метрики результатов bench_endpoints, которые сравниваются с базовой линией
+LATENCY_METRICS = ("p50_ms", "p90_ms", "p99_ms")
+COMPARED_METRICS = LATENCY_METRICS + ("queries", "peak_alloc_bytes")
+
+
+def measure(func, number=100, repeat=5):
+    """
+    Выполняет func() number раз в каждом из repeat прогонов.
+    Возвращает словарь со временем одного вызова в секундах (лучшее и медиана).
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    return {"best": min(timings), "median": statistics.median(timings)}
+
+
+def format_seconds(value):
+    """Человекочитаемое время: мкс, мс или с."""
+    if value < 1e-3:
+        return f"{value * 1e6:.1f} мкс"
+    if value < 1:
+        return f"{value * 1e3:.2f} мс"
+    return f"{value:.2f} с"
+
+
+def percentile(samples, fraction):
+    """Перцентиль методом ближайшего ранга (samples - любой порядок)."""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    rank = max(math.ceil(fraction * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+def latency_summary(samples):
+    """Сводка задержек в миллисекундах: p50, p90, p99, максимум и среднее."""
+    return {
+        "p50_ms": percentile(samples, 0.50) * 1e3,
+        "p90_ms": percentile(samples, 0.90) * 1e3,
+        "p99_ms": percentile(samples, 0.99) * 1e3,
+        "max_ms": max(samples, default=0.0) * 1e3,
+        "mean_ms": statistics.fmean(samples) * 1e3 if samples else 0.0,
+    }
+
+
+def compare_results(baseline, current, threshold=0.2, min_delta_ms=1.0):
+    """
+    Сравнивает результаты bench_endpoints с базовой линией. Регрессия -
+    рост задержки больше чем на threshold (и не меньше min_delta_ms, чтобы
+    не реагировать на шум быстрых запросов), рост памяти больше чем на
+    threshold или любое увеличение числа SQL-запросов.
+    Возвращает список словарей (scenario, metric, baseline, current).
+    """
+    regressions = []
+    for name, result in current["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if base is None:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = base[metric], result[metric]
+            if metric == "queries":
+                regressed = new > old
+            elif metric in LATENCY_METRICS:
+                regressed = new > old * (1 + threshold) and new - old >= min_delta_ms
+            else:
+                regressed = new > old * (1 + threshold)
+            if regressed:
+                regressions.append(
+                    {
+                        "scenario": name,
+                        "metric": metric,
+                        "baseline": old,
+                        "current": new,
+                    }
+                )
+    return regressions
+
+
+def histogram(samples, bounds_ms):
+    """
+    Гистограмма задержек: число замеров (в секундах) в каждой корзине с
+    верхней границей bounds_ms (мс, по возрастанию) и в корзине выше
+    последней границы (le_ms = None).
+    """
+    counts = [0] * (len(bounds_ms) + 1)
+    for sample in samples:
+        value = sample * 1e3
+        index = next(
+            (i for i, bound in enumerate(bounds_ms) if value <= bound), len(bounds_ms)
+        )
+        counts[index] += 1
+    return [
+        {"le_ms": bound, "count": count}
+        for bound, count in zip(list(bounds_ms) + [None], counts)
+    ]
+
+
+def login_throttle(enabled):
+    """
+    Ограничение частоты входа (api.throttling) на время бенчмарка. Все
+    запросы бенчмарков идут с одного адреса, часто под одним именем, и без
+    enabled получали бы 429 вместо измеряемых ответов.
+    """
+    if enabled:
+        return nullcontext()
+    return override_settings(LOGIN_THROTTLE_ENABLED=False)
@@ -0,0 +1,4 @@
+"""
+Бэкенд PostgreSQL с пулом подключений процесса: ENGINE "api.db_pool"
+(включается DB_POOL=1, см. bookstore/settings.py).
+"""
@@ -0,0 +1,93 @@
+"""
+DatabaseWrapper поверх django.db.backends.postgresql: connect() берёт
+подключение из ConnectionPool процесса, close() возвращает его в пул.
+
+Настройки пула - OPTIONS["pool"] (аргументы ConnectionPool: min_size,
+max_size, timeout, max_idle, max_lifetime, check_interval). CONN_MAX_AGE
+должен быть 0: Django «закрывает» подключение в конце каждого запроса, то
+есть отдаёт его следующему запросу без нового TCP-соединения, аутентификации
+и запуска процесса сервера. Подключение, закрытое внутри atomic(),
+закрывается по-настоящему: обёртка продолжает на него ссылаться.
+"""
+
+from functools import partial
+
+from django.db.backends.postgresql import base, creation
+
+from .pool import ConnectionPool, PoolTimeout, close_pools, get_pool
+
+# Состояния транзакции libpq (PQtransactionStatus), одинаковые в psycopg2 и 3
+TRANSACTION_IDLE = 0
+TRANSACTION_UNKNOWN = 4
+
+
+def check_connection(conn):
+    """Проверка простоявшего подключения перед выдачей."""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT 1")
+
+
+def reset_connection(conn):
+    """
+    Готовит возвращённое подключение к следующему запросу: откатывает
+    незавершённую транзакцию и включает autocommit, чтобы check_connection
+    не открывал транзакцию. False - подключение разорвано.
+    """
+    if conn.closed:
+        return False
+    status = conn.info.transaction_status
+    if status == TRANSACTION_UNKNOWN:
+        return False
+    if status != TRANSACTION_IDLE:
+        conn.rollback()
+    conn.autocommit = True
+    if conn.info.transaction_status != TRANSACTION_IDLE:
+        # BEGIN, выполненный вручную в режиме autocommit: rollback() драйвера
+        # его не откатывает
+        with conn.cursor() as cursor:
+            cursor.execute("ROLLBACK")
+    return True
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Свободные подключения пула к тестовой базе мешают DROP DATABASE
+        close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    @property
+    def pool(self):
+        # Тестовый прогон меняет NAME у той же обёртки: у базы свой пул
+        return get_pool((self.alias, self.settings_dict["NAME"]), self.create_pool)
+
+    def create_pool(self):
+        # Открывает подключения отдельная обёртка: пул не держит обёртку
+        # потока, а с ней и выданное ей подключение
+        opener = base.DatabaseWrapper(self.settings_dict, self.alias)
+        return ConnectionPool(
+            partial(opener.get_new_connection, self.get_connection_params()),
+            name=self.alias,
+            check=check_connection,
+            reset=reset_connection,
+            **self.settings_dict["OPTIONS"].get("pool", {}),
+        )
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop("pool", None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        try:
+            return self.pool.getconn()
+        except PoolTimeout as exc:
+            raise self.Database.OperationalError(str(exc)) from exc
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.putconn(self.connection, discard=self.in_atomic_block)
@@ -0,0 +1,275 @@
+"""
+Ограниченный пул подключений к БД одного процесса.
+
+ConnectionPool не зависит от драйвера: подключения открывает connect(),
+проверяет check(conn) (например, SELECT 1) и готовит к повторной выдаче
+reset(conn). Бэкенд api.db_pool.base выдаёт из пула подключения psycopg2
+вместо открытия нового на каждый запрос.
+
+- Не больше max_size подключений (свободных и выданных); когда все выданы,
+  getconn() ждёт возврата до timeout секунд и бросает PoolTimeout.
+- Свободные подключения выдаются в порядке LIFO: последнее вернувшееся
+  подключение «тёплое», а лишние дольше простаивают и закрываются по
+  max_idle (но не меньше min_size).
+- Подключение, простоявшее дольше check_interval, проверяется check() перед
+  выдачей; не прошедшее проверку закрывается, вместо него берётся другое.
+- Подключение старше max_lifetime при возврате закрывается: на сервере
+  БД не копится память долгоживущих процессов.
+- Выданные подключения пул хранит по слабым ссылкам: если подключение не
+  вернули, а удалили (поток завершился), его место освобождается.
+
+get_pool() хранит пулы по ключу и pid: после fork воркер создаёт свой пул,
+а унаследованный от мастера остаётся в памяти, не закрывая общих сокетов.
+"""
+
+import os
+import threading
+import time
+import weakref
+from collections import deque
+
+from .. import metrics
+
+# Ожидающие getconn() перепроверяют пул не реже этого интервала, с: место
+# удалённого без возврата подключения освобождается без notify()
+WAIT_INTERVAL = 1.0
+
+
+class PoolTimeout(Exception):
+    """Все подключения пула заняты дольше timeout."""
+
+
+class _Entry:
+    __slots__ = ("conn", "created", "returned")
+
+    def __init__(self, conn, created, returned):
+        self.conn = conn
+        self.created = created
+        self.returned = returned
+
+
+def _close(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        connect,
+        name="default",
+        min_size=0,
+        max_size=4,
+        timeout=10.0,
+        max_idle=300.0,
+        max_lifetime=3600.0,
+        check_interval=30.0,
+        check=None,
+        reset=None,
+    ):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError("Нужно 0 <= min_size <= max_size и max_size >= 1")
+        self.connect = connect
+        self.name = name
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check_interval = check_interval
+        self.check = check
+        self.reset = reset
+        self.pid = os.getpid()
+        self.opened = 0
+        self.closed = False
+        self._idle = deque()
+        self._busy = weakref.WeakKeyDictionary()
+        self._opening = 0
+        self._waiting = 0
+        self._reported = (0, 0)
+        self._condition = threading.Condition()
+
+    def stats(self):
+        """Состояние пула: свободные, выданные, ожидающие, всего открыто."""
+        with self._condition:
+            return {
+                "idle": len(self._idle),
+                "busy": len(self._busy) + self._opening,
+                "waiting": self._waiting,
+                "opened": self.opened,
+            }
+
+    def getconn(self):
+        """Подключение из пула; PoolTimeout, если место не освободилось."""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        while True:
+            entry = self._acquire(deadline)
+            if entry is None:
+                return self._open(start)
+            if self._healthy(entry):
+                with self._condition:
+                    self._busy[entry.conn] = entry.created
+                    self._report()
+                metrics.record_pool_checkout(
+                    self.name, "reused", time.monotonic() - start
+                )
+                return entry.conn
+            _close(entry.conn)
+            metrics.record_pool_discard(self.name, "health_check")
+
+    def putconn(self, conn, discard=False):
+        """
+        Возвращает подключение в пул. discard=True, непрошедший reset() или
+        слишком старый - закрывается.
+        """
+        now = time.monotonic()
+        with self._condition:
+            created = self._busy.pop(conn, None)
+        reason = None
+        if created is None or self.closed:
+            reason = "closed"
+        elif discard:
+            reason = "discarded"
+        elif now - created >= self.max_lifetime:
+            reason = "lifetime"
+        elif self.reset is not None and not self._call(self.reset, conn):
+            reason = "broken"
+        if reason is None:
+            with self._condition:
+                self._idle.append(_Entry(conn, created, now))
+                self._condition.notify()
+                self._report()
+            return
+        _close(conn)
+        metrics.record_pool_discard(self.name, reason)
+        with self._condition:
+            self._condition.notify()
+            self._report()
+
+    def close(self):
+        """Закрывает свободные подключения; выданные закроются при возврате."""
+        with self._condition:
+            self.closed = True
+            idle, self._idle = self._idle, deque()
+            self._condition.notify_all()
+            self._report()
+        for entry in idle:
+            _close(entry.conn)
+
+    def _acquire(self, deadline):
+        """
+        Свободное подключение или None, если под новое занято место;
+        PoolTimeout - если за время ожидания не нашлось ни того, ни другого.
+        """
+        with self._condition:
+            waiting = False
+            try:
+                while True:
+                    self._expire()
+                    if self._idle:
+                        return self._idle.pop()
+                    if len(self._busy) + self._opening < self.max_size:
+                        self._opening += 1
+                        return None
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        metrics.record_pool_checkout(self.name, "timeout", None)
+                        raise PoolTimeout(
+                            f"Пул {self.name}: все {self.max_size} подключений "
+                            f"заняты дольше {self.timeout} с"
+                        )
+                    if not waiting:
+                        waiting = True
+                        self._waiting += 1
+                    self._condition.wait(min(remaining, WAIT_INTERVAL))
+            finally:
+                if waiting:
+                    self._waiting -= 1
+
+    def _open(self, start):
+        try:
+            conn = self.connect()
+        except BaseException:
+            with self._condition:
+                self._opening -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._opening -= 1
+            self._busy[conn] = time.monotonic()
+            self.opened += 1
+            self._report()
+        metrics.record_pool_checkout(self.name, "new", time.monotonic() - start)
+        return conn
+
+    def _expire(self):
+        """Закрывает простаивающие дольше max_idle сверх min_size (под lock)."""
+        now = time.monotonic()
+        while len(self._idle) > self.min_size:
+            entry = self._idle[0]
+            if now - entry.returned < self.max_idle:
+                break
+            self._idle.popleft()
+            _close(entry.conn)
+            metrics.record_pool_discard(self.name, "idle")
+            self._report()
+
+    def _healthy(self, entry):
+        if self.check is None:
+            return True
+        if time.monotonic() - entry.returned < self.check_interval:
+            return True
+        return self._call(self.check, entry.conn)
+
+    @staticmethod
+    def _call(function, conn):
+        try:
+            return function(conn) is not False
+        except Exception:
+            return False
+
+    def _report(self):
+        """Переносит изменения числа свободных и выданных в gauge (под lock)."""
+        current = (len(self._idle), len(self._busy) + self._opening)
+        if current != self._reported:
+            metrics.record_pool_size(
+                self.name,
+                current[0] - self._reported[0],
+                current[1] - self._reported[1],
+            )
+            self._reported = current
+
+
+_pools = {}
+_inherited = []
+_pools_lock = threading.Lock()
+
+
+def get_pool(key, factory):
+    """Пул key текущего процесса; при первом обращении - factory()."""
+    pool = _pools.get(key)
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.pid != os.getpid():
+            if pool is not None:
+                # Сокеты мастера: удаление подключений послало бы серверу
+                # завершение сеанса, которым ещё пользуется другой процесс
+                _inherited.append(pool)
+            pool = _pools[key] = factory()
+        return pool
+
+
+def close_pools():
+    """Закрывает пулы процесса (перед fork воркеров, при остановке)."""
+    with _pools_lock:
+        pools = []
+        for key, pool in list(_pools.items()):
+            if pool.pid == os.getpid():
+                pools.append(_pools.pop(key))
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,185 @@
+"""
+Чтение с реплик БД (REPLICA_DATABASES).
+
+ReplicaMiddleware для GET-запросов маршрутов REPLICA_READ_ROUTES (каталог:
+книги, авторы, отзывы; экспорт) включает чтение с реплики на время запроса:
+ReplicaRouter отправляет запросы чтения ORM на реплику, запись - всегда в
+default. Реплика выбирается один раз на запрос (страница и число строк
+списка читаются из одной базы) по кругу среди тех, что отстают от default
+не больше REPLICA_MAX_LAG секунд; отставание каждой реплики проверяется
+не чаще раза в REPLICA_LAG_CHECK_INTERVAL секунд. Если подходящей реплики
+нет, запрос читает из default.
+
+Чтение своих записей: после изменяющего запроса пользователь
+REPLICA_STICKY_SECONDS секунд читает из default - по cookie REPLICA_PIN_COOKIE
+и по отметке в кэше REPLICA_PIN_CACHE_ALIAS для клиентов с JWT (с несколькими
+воркерами нужен общий кэш). Пользователи (AUTH_USER_MODEL) всегда читаются из
+default: отстающая реплика не должна вернуть старую роль или is_active.
+
+read_from_replica() включает чтение с реплики вне HTTP-запроса (выгрузки,
+отчёты в командах управления).
+"""
+
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from . import metrics
+
+logger = logging.getLogger("api.db_router")
+
+# Отставание реплики PostgreSQL, с: 0, если все полученные изменения применены
+LAG_SQL = (
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+_replica_reads = ContextVar("replica_reads", default=None)
+_lag_checks = {}
+_lag_lock = threading.Lock()
+_round_robin = itertools.count()
+
+
+def replica_lag(alias):
+    """
+    Отставание реплики alias в секундах; None, если она недоступна. Запрос
+    выполняется на курсоре драйвера, мимо execute_wrapper'ов запроса.
+    """
+    connection = connections[alias]
+    if connection.vendor != "postgresql":
+        return 0.0
+    try:
+        with connection.wrap_database_errors:
+            connection.ensure_connection()
+            with connection.connection.cursor() as cursor:
+                cursor.execute(LAG_SQL)
+                return float(cursor.fetchone()[0] or 0)
+    except DatabaseError:
+        logger.warning("Реплика %s недоступна", alias, exc_info=True)
+        return None
+
+
+def cached_lag(alias):
+    """replica_lag(alias), проверяемое не чаще REPLICA_LAG_CHECK_INTERVAL."""
+    now = time.monotonic()
+    checked = _lag_checks.get(alias)
+    interval = settings.REPLICA_LAG_CHECK_INTERVAL
+    if checked is not None and now - checked[0] < interval:
+        return checked[1]
+    lag = replica_lag(alias)
+    with _lag_lock:
+        _lag_checks[alias] = (now, lag)
+    return lag
+
+
+def clear_lag_checks():
+    with _lag_lock:
+        _lag_checks.clear()
+
+
+def choose_replica():
+    """Следующая по кругу реплика с допустимым отставанием или None."""
+    replicas = settings.REPLICA_DATABASES
+    start = next(_round_robin)
+    for offset in range(len(replicas)):
+        alias = replicas[(start + offset) % len(replicas)]
+        lag = cached_lag(alias)
+        if lag is not None and lag <= settings.REPLICA_MAX_LAG:
+            return alias
+    return None
+
+
+class ReplicaReads:
+    """Чтение с реплики в пределах запроса; база выбирается при первом чтении."""
+
+    __slots__ = ("database",)
+
+    def __init__(self):
+        self.database = None
+
+    def alias(self):
+        if self.database is None:
+            self.database = choose_replica()
+            if self.database is None:
+                self.database = DEFAULT_DB_ALIAS
+                metrics.record_read_routing(DEFAULT_DB_ALIAS, "lag")
+            else:
+                metrics.record_read_routing(self.database, "replica")
+        return self.database
+
+
+def enable_replica_reads():
+    """
+    Включает чтение с реплики в текущем контексте; возвращает токен для
+    restore_replica_reads.
+    """
+    reads = ReplicaReads() if settings.REPLICA_DATABASES else None
+    return _replica_reads.set(reads)
+
+
+def disable_replica_reads():
+    """Выключает чтение с реплики в текущем контексте; возвращает токен."""
+    return _replica_reads.set(None)
+
+
+def restore_replica_reads(token):
+    """Возвращает режим чтения, действовавший до получения token."""
+    _replica_reads.reset(token)
+
+
+@contextmanager
+def read_from_replica():
+    """Запросы чтения ORM внутри блока идут на реплику."""
+    token = enable_replica_reads()
+    try:
+        yield
+    finally:
+        restore_replica_reads(token)
+
+
+def _pin_key(user_id):
+    return f"replica-pin:{user_id}"
+
+
+def pin_user(user_id):
+    """Пользователь user_id читает из default REPLICA_STICKY_SECONDS секунд."""
+    caches[settings.REPLICA_PIN_CACHE_ALIAS].set(
+        _pin_key(user_id), True, settings.REPLICA_STICKY_SECONDS
+    )
+
+
+def is_pinned(user_id):
+    return bool(caches[settings.REPLICA_PIN_CACHE_ALIAS].get(_pin_key(user_id)))
+
+
+class ReplicaRouter:
+    """Маршрутизация ORM: чтение - на реплику запроса, запись - в default."""
+
+    def db_for_read(self, model, **hints):
+        reads = _replica_reads.get()
+        if reads is None:
+            return None
+        if model._meta.label == settings.AUTH_USER_MODEL:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Транзакция на default должна видеть собственные изменения
+            return DEFAULT_DB_ALIAS
+        return reads.alias()
+
+    def db_for_write(self, model, **hints):
+        # Без этого объект, прочитанный с реплики, сохранялся бы в неё
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
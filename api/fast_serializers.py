@@ -0,0 +1,268 @@
+"""
+Быстрый путь сериализации списков только для чтения.
+
+FastSerializer компилирует экземпляр DRF-сериализатора (с уже применёнными
+?fields= / ?omit= / ?expand=) в список аксессоров и строит словари прямо из
+строк values(), не создавая экземпляры моделей и не вызывая
+to_representation для каждого поля. Вывод совпадает с выводом исходного
+сериализатора; поля, для которых это нельзя гарантировать, не компилируются,
+и в этом случае используется обычный путь DRF.
+"""
+
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from .instrumentation import measure
+
+# Поля, у которых to_representation не меняет значение, прочитанное из БД
+IDENTITY_FIELDS = (
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.BooleanField,
+    serializers.ChoiceField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+# Поля, которые конвертируются своим to_representation
+CONVERTED_FIELDS = (
+    serializers.DateField,
+    serializers.FloatField,
+)
+
+# Виды операций плана
+VALUE, NESTED, MANY = range(3)
+
+
+class NotCompilable(Exception):
+    """Сериализатор содержит поле, которое нельзя вывести из values()."""
+
+
+def datetime_converter(field):
+    """
+    Конвертер DateTimeField с часовым поясом, вычисленным один раз при
+    компиляции. Нестандартные форматы и наивные значения отдаются
+    to_representation поля.
+    """
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+    tz = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+    if tz is None:
+        return field.to_representation
+
+    def convert(value):
+        if isinstance(value, str) or value.utcoffset() is None:
+            return field.to_representation(value)
+        value = value.astimezone(tz).isoformat()
+        if value.endswith("+00:00"):
+            value = value[:-6] + "Z"
+        return value
+
+    return convert
+
+
+def decimal_converter(field):
+    """
+    Конвертер DecimalField: значения из БД уже имеют нужное число знаков после
+    запятой, поэтому quantize пропускается; остальное отдаётся полю.
+    """
+    coerce_to_string = getattr(
+        field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING
+    )
+    if not coerce_to_string or field.localize or field.decimal_places is None:
+        return field.to_representation
+    exponent = -field.decimal_places
+    max_digits = field.max_digits
+
+    def convert(value):
+        if isinstance(value, Decimal):
+            sign, digits, value_exponent = value.as_tuple()
+            if value_exponent == exponent and (
+                max_digits is None or len(digits) <= max_digits
+            ):
+                return "{:f}".format(value)
+        return field.to_representation(value)
+
+    return convert
+
+
+class FastSerializer:
+    """
+    Скомпилированный сериализатор для списков.
+
+    ops - операции в порядке полей исходного сериализатора:
+    (VALUE, ключ, lookup, конвертер или None) - значение колонки,
+    (NESTED, ключ, lookup pk, FastSerializer) - вложенный объект по ForeignKey,
+    (MANY, ключ, связь, FastSerializer или None) - вложенный список по обратной
+    связи ForeignKey (None - список id).
+    """
+
+    def __init__(self, serializer, prefix=""):
+        self.model = serializer.Meta.model
+        self.pk_lookup = prefix + "pk"
+        self.ops = []
+        self.many = []
+        self.lookups = [self.pk_lookup]
+        opts = self.model._meta
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            source = field.source
+            if source == "*" or "." in source:
+                raise NotCompilable(name)
+            try:
+                model_field = opts.get_field(source)
+            except FieldDoesNotExist:
+                raise NotCompilable(name)
+            lookup = prefix + source
+
+            if model_field.many_to_many:
+                raise NotCompilable(name)
+            if model_field.one_to_many:
+                if isinstance(field, serializers.ListSerializer):
+                    child = FastSerializer(field.child)
+                elif isinstance(field, serializers.ManyRelatedField):
+                    child = None
+                else:
+                    raise NotCompilable(name)
+                self.ops.append((MANY, name, model_field, child))
+                self.many.append((name, model_field, child))
+            elif isinstance(field, serializers.BaseSerializer):
+                if not model_field.many_to_one:
+                    raise NotCompilable(name)
+                child = FastSerializer(field, prefix=lookup + "__")
+                if child.many:
+                    raise NotCompilable(name)
+                self.ops.append((NESTED, name, child.pk_lookup, child))
+                self.lookups.extend(child.lookups)
+            else:
+                if isinstance(field, IDENTITY_FIELDS):
+                    convert = None
+                elif isinstance(field, serializers.DateTimeField):
+                    convert = datetime_converter(field)
+                elif isinstance(field, serializers.DecimalField):
+                    convert = decimal_converter(field)
+                elif isinstance(field, CONVERTED_FIELDS):
+                    convert = field.to_representation
+                else:
+                    raise NotCompilable(name)
+                self.ops.append((VALUE, name, lookup, convert))
+                self.lookups.append(lookup)
+
+        self.lookups = list(dict.fromkeys(self.lookups))
+
+    @classmethod
+    def for_serializer(cls, serializer):
+        """Компилирует сериализатор или возвращает None, если это невозможно."""
+        try:
+            return cls(serializer)
+        except NotCompilable:
+            return None
+
+    def values(self, queryset):
+        """Queryset строк values() с колонками, нужными для сериализации."""
+        return queryset.prefetch_related(None).values(*self.lookups)
+
+    def serialize(self, rows):
+        """Строит список словарей из строк values()."""
+        return measure("serialize", self._serialize, rows)
+
+    def _serialize(self, rows):
+        rows = list(rows)
+        many = {
+            name: self._fetch_many(relation, child, rows)
+            for name, relation, child in self.many
+        }
+        return self._build_all(rows, many)
+
+    def _build(self, row, many=None):
+        data = {}
+        for kind, name, lookup, extra in self.ops:
+            if kind == VALUE:
+                value = row[lookup]
+                if extra is not None and value is not None:
+                    value = extra(value)
+                data[name] = value
+            elif kind == NESTED:
+                data[name] = None if row[lookup] is None else extra._build(row)
+            else:
+                data[name] = many[name].get(row[self.pk_lookup], [])
+        return data
+
+    async def aserialize(self, rows):
+        """
+        Асинхронный serialize: строки (queryset values() или список) и
+        вложенные списки читаются асинхронным ORM.
+        """
+        if not isinstance(rows, list):
+            rows = [row async for row in rows]
+        many = {
+            name: await self._afetch_many(relation, child, rows)
+            for name, relation, child in self.many
+        }
+        return measure("serialize", self._build_all, rows, many)
+
+    def _build_all(self, rows, many):
+        return [self._build(row, many) for row in rows]
+
+    def _many_queryset(self, relation, rows):
+        """(поле связи, queryset) вложенных объектов страницы или (None, None)."""
+        parent_ids = [row[self.pk_lookup] for row in rows]
+        if not parent_ids:
+            return None, None
+
+        related_model = relation.related_model
+        link = relation.field.name
+        queryset = related_model._default_manager.filter(**{f"{link}__in": parent_ids})
+        if not related_model._meta.ordering:
+            queryset = queryset.order_by("pk")
+        return link, queryset
+
+    def _fetch_many(self, relation, child, rows):
+        """Один запрос на все вложенные списки страницы, сгруппированные по pk родителя."""
+        link, queryset = self._many_queryset(relation, rows)
+        if queryset is None:
+            return {}
+        if child is None:
+            return group_ids(queryset.values_list(link, "pk"))
+
+        related_rows = list(queryset.values(link, *child.lookups))
+        nested = {
+            name: child._fetch_many(rel, grandchild, related_rows)
+            for name, rel, grandchild in child.many
+        }
+        return child._group(link, related_rows, nested)
+
+    async def _afetch_many(self, relation, child, rows):
+        """Асинхронный _fetch_many."""
+        link, queryset = self._many_queryset(relation, rows)
+        if queryset is None:
+            return {}
+        if child is None:
+            pairs = [pair async for pair in queryset.values_list(link, "pk")]
+            return group_ids(pairs)
+
+        related_rows = [row async for row in queryset.values(link, *child.lookups)]
+        nested = {
+            name: await child._afetch_many(rel, grandchild, related_rows)
+            for name, rel, grandchild in child.many
+        }
+        return child._group(link, related_rows, nested)
+
+    def _group(self, link, rows, nested):
+        grouped = {}
+        for row in rows:
+            grouped.setdefault(row[link], []).append(self._build(row, nested))
+        return grouped
+
+
+def group_ids(pairs):
+    """{id родителя: [id вложенных]} из пар (родитель, id)."""
+    grouped = {}
+    for parent_id, pk in pairs:
+        grouped.setdefault(parent_id, []).append(pk)
+    return grouped
@@ -0,0 +1,87 @@
+"""
+Хэширование паролей в ограниченном пуле потоков.
+
+PBKDF2 с сотнями тысяч итераций занимает ядро на сотни миллисекунд. Волна
+подбора паролей (credential stuffing) запускала его во всех потоках всех
+воркеров сразу, и на остальные запросы не оставалось процессора.
+PooledPBKDF2PasswordHasher (первый в PASSWORD_HASHERS) считает хэши в пуле
+процесса из PASSWORD_HASH_WORKERS потоков: проверка пароля при входе,
+create_user при регистрации, set_password. hashlib отпускает GIL на время
+PBKDF2, поэтому потоки пула занимают не больше PASSWORD_HASH_WORKERS ядер.
+
+Очередь к пулу ограничена PASSWORD_HASH_QUEUE задачами; хэширование, не
+дождавшееся места за PASSWORD_HASH_TIMEOUT секунд, завершается исключением
+PasswordHashingBusy вместо того, чтобы занимать поток воркера. Хэшер
+вызывают и вне DRF (вход в админку, authenticate() в командах), поэтому
+это обычное исключение; HashingBusyMiddleware (api.middleware) отвечает
+на него 503 с Retry-After. PASSWORD_HASH_WORKERS=0 считает
+хэши в потоке запроса, как стандартный хэшер Django. Формат хэша тот же
+(pbkdf2_sha256), сохранённые пароли проверяются без изменений.
+"""
+
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+from . import metrics
+
+_executor = None
+_executor_key = None
+_slots = None
+_lock = threading.Lock()
+
+
+class PasswordHashingBusy(Exception):
+    """Пул хэширования занят; wait - через сколько секунд повторить."""
+
+    def __init__(self, wait):
+        super().__init__("Сервер перегружен проверкой паролей, повторите позже")
+        self.wait = wait
+
+
+def get_executor():
+    """Пул хэширования процесса и семафор мест в его очереди."""
+    global _executor, _executor_key, _slots
+    workers = settings.PASSWORD_HASH_WORKERS
+    key = (os.getpid(), workers, settings.PASSWORD_HASH_QUEUE)
+    with _lock:
+        if _executor_key != key:
+            # Потоки пула не переживают fork: воркер создаёт свой пул
+            if _executor is not None and _executor_key[0] == key[0]:
+                _executor.shutdown(wait=False)
+            _executor = ThreadPoolExecutor(workers, "password-hash")
+            _slots = threading.BoundedSemaphore(workers + key[2])
+            _executor_key = key
+        return _executor, _slots
+
+
+def run_hashing(func, *args):
+    """func(*args) в пуле хэширования; PasswordHashingBusy, если пул занят."""
+    if settings.PASSWORD_HASH_WORKERS <= 0:
+        return func(*args)
+    executor, slots = get_executor()
+    queued = time.perf_counter()
+
+    def task():
+        metrics.record_password_hash_wait(time.perf_counter() - queued)
+        return func(*args)
+
+    if not slots.acquire(timeout=settings.PASSWORD_HASH_TIMEOUT):
+        metrics.record_auth_rejected("hash_busy")
+        raise PasswordHashingBusy(math.ceil(settings.PASSWORD_HASH_TIMEOUT) or 1)
+    try:
+        return executor.submit(task).result()
+    finally:
+        slots.release()
+
+
+class PooledPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2PasswordHasher, считающий хэш в пуле хэширования."""
+
+    def encode(self, password, salt, iterations=None):
+        return run_hashing(super().encode, password, salt, iterations)
@@ -0,0 +1,127 @@
+"""
+Измерение времени обработки запросов API по фазам.
+
+PerformanceMiddleware (api.middleware) для выбранных запросов (доля
+PERFORMANCE_SAMPLE_RATE) создаёт RequestTimings в contextvar и считает:
+- db: время и число SQL-запросов (execute_wrapper на всех подключениях);
+- serialize: время сериализаторов (TimedSerializerMixin, FastSerializer);
+- render: время рендерера ответа (FastJSONRenderer);
+- total: полное время запроса.
+
+Если запрос не измеряется, measure() сводится к чтению contextvar.
+"""
+
+import json
+import logging
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+
+_current = ContextVar("request_timings", default=None)
+
+PHASES = ("serialize", "render")
+
+
+class RequestTimings:
+    """Накопленное время фаз одного запроса, в секундах."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.total = 0.0
+        self.db = 0.0
+        self.queries = 0
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.running = set()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - start
+            self.queries += 1
+
+    def __enter__(self):
+        self.token = _current.set(self)
+        self.stack = ExitStack()
+        self._install()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stack.close()
+        _current.reset(self.token)
+        self.total = time.perf_counter() - self.start
+
+    async def __aenter__(self):
+        # contextvar ставится в контексте корутины: sync_to_async копирует его
+        # в поток запроса, а сброс токена в чужом контексте невозможен
+        self.token = _current.set(self)
+        self.stack = ExitStack()
+        await sync_to_async(self._install)()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await sync_to_async(self.stack.close)()
+        _current.reset(self.token)
+        self.total = time.perf_counter() - self.start
+
+    def _install(self):
+        """execute_wrapper на подключения текущего потока."""
+        for connection in connections.all():
+            self.stack.enter_context(connection.execute_wrapper(self))
+
+    def server_timing(self):
+        """Значение заголовка Server-Timing (длительности в мс)."""
+        metrics = [f'db;dur={self.db * 1e3:.2f};desc="{self.queries} queries"']
+        metrics += [
+            f"{phase};dur={duration * 1e3:.2f}"
+            for phase, duration in self.phases.items()
+        ]
+        metrics.append(f"total;dur={self.total * 1e3:.2f}")
+        return ", ".join(metrics)
+
+    def as_fields(self):
+        """Поля структурированного лога."""
+        fields = {
+            "total_ms": round(self.total * 1e3, 2),
+            "db_ms": round(self.db * 1e3, 2),
+            "db_queries": self.queries,
+        }
+        for phase, duration in self.phases.items():
+            fields[f"{phase}_ms"] = round(duration * 1e3, 2)
+        return fields
+
+
+def current_timings():
+    """RequestTimings текущего запроса или None, если он не измеряется."""
+    return _current.get()
+
+
+def measure(phase, func, *args, **kwargs):
+    """
+    Вызывает func и добавляет время вызова к фазе phase текущего запроса.
+    Вложенные вызовы той же фазы (вложенные сериализаторы) не считаются
+    повторно.
+    """
+    timings = _current.get()
+    if timings is None or phase in timings.running:
+        return func(*args, **kwargs)
+    timings.running.add(phase)
+    start = time.perf_counter()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        timings.phases[phase] += time.perf_counter() - start
+        timings.running.discard(phase)
+
+
+class StructuredFormatter(logging.Formatter):
+    """Одна JSON-строка на запись: сообщение и поля из extra={"fields": ...}."""
+
+    def format(self, record):
+        data = {"message": record.getMessage(), "logger": record.name}
+        data.update(getattr(record, "fields", {}))
+        return json.dumps(data, ensure_ascii=False)
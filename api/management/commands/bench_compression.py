@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк сжатия ответов: процессорное время на запрос против сэкономленных байт.
+Запуск: python manage.py bench_compression --limit 100
+"""
+
+import hashlib
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.bench import format_seconds, measure
+from api.middleware import ENCODERS
+from api.models import Book
+from api.renderers import FastJSONRenderer
+from api.serializers import BookSerializer
+
+
+class Command(BaseCommand):
+    help = "Сравнивает кодировки сжатия на странице каталога"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=100, help="Книг на странице")
+        parser.add_argument("--number", type=int, default=20, help="Вызовов в прогоне")
+
+    def handle(self, *args, **options):
+        books = Book.objects.select_related("author")[: options["limit"]]
+        data = BookSerializer(books, many=True).data
+        if not data:
+            raise CommandError("База пуста: сначала выполните populate_db")
+
+        body = FastJSONRenderer().render(data)
+        number = options["number"]
+        self.stdout.write(f"Страница каталога: {len(data)} книг, {len(body)} байт")
+
+        for name, encoder in ENCODERS:
+            compressed = encoder(body)
+            cpu = measure(lambda: encoder(body), number=number)["best"]
+            saved = len(body) - len(compressed)
+            self.stdout.write(
+                f"  {name:<5} {len(compressed):>8} байт  "
+                f"сжатие x{len(body) / len(compressed):4.1f}  "
+                f"CPU {format_seconds(cpu):>10}/запрос  "
+                f"{saved / 1024 / (cpu * 1e3):6.1f} КБ сэкономлено на мс CPU"
+            )
+
+        hit = measure(
+            lambda: hashlib.blake2b(body, digest_size=16).hexdigest(), number=number
+        )["best"]
+        self.stdout.write(f"  попадание в кэш сжатых байт (хэш тела): {format_seconds(hit)}")
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Стоимость подключения к PostgreSQL в задержке запроса: новое подключение на
+каждый запрос (CONN_MAX_AGE=0), постоянные подключения потоков (CONN_MAX_AGE
+и CONN_HEALTH_CHECKS из settings) и пул подключений процесса (api.db_pool).
+
+Запрос имитируется так, как его обслуживает Django: подключение при первом
+SQL, --queries запросов --query, затем close_if_unusable_or_obsolete() (по
+сигналу request_finished). --threads потоков, как потоки воркера gunicorn,
+одновременно делают по --requests запросов; у каждого потока своя обёртка
+подключения, как connections[alias] у потоков сервера.
+
+Запуск (нужен PostgreSQL из settings.DATABASES):
+    python manage.py bench_db_connections --requests 500 --threads 4
+    python manage.py bench_db_connections --modes new pool --queries 3
+"""
+
+import copy
+import json
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.utils import load_backend
+
+from api.bench import latency_summary
+from api.db_pool.pool import close_pools
+
+# Режим: (ENGINE, CONN_MAX_AGE или None - из settings)
+MODES = {
+    "new": ("django.db.backends.postgresql", 0),
+    "persistent": ("django.db.backends.postgresql", None),
+    "pool": ("api.db_pool", 0),
+}
+POSTGRES_ENGINES = {"django.db.backends.postgresql", "api.db_pool"}
+
+
+def mode_settings(settings_dict, mode, threads):
+    """Настройки подключения режима mode поверх настроек базы."""
+    engine, max_age = MODES[mode]
+    settings_dict = copy.deepcopy(settings_dict)
+    settings_dict["ENGINE"] = engine
+    if max_age is not None:
+        settings_dict["CONN_MAX_AGE"] = max_age
+    elif not settings_dict["CONN_MAX_AGE"]:
+        settings_dict["CONN_MAX_AGE"] = 60
+    options = settings_dict["OPTIONS"]
+    pool = options.pop("pool", {})
+    if engine == "api.db_pool":
+        options["pool"] = {**pool, "max_size": threads}
+    return settings_dict
+
+
+def simulate_requests(backend, settings_dict, alias, options, samples):
+    """Запросы одного потока; задержка каждого добавляется в samples."""
+    wrapper = backend.DatabaseWrapper(settings_dict, alias)
+    try:
+        for _ in range(options["requests"]):
+            start = time.perf_counter()
+            for _ in range(options["queries"]):
+                with wrapper.cursor() as cursor:
+                    cursor.execute(options["query"])
+                    cursor.fetchall()
+            wrapper.close_if_unusable_or_obsolete()
+            samples.append(time.perf_counter() - start)
+    finally:
+        wrapper.close()
+
+
+class Command(BaseCommand):
+    help = "Сравнивает новые, постоянные подключения к БД и пул подключений"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--modes",
+            nargs="+",
+            choices=list(MODES),
+            default=list(MODES),
+            help="Какие режимы подключения сравнивать",
+        )
+        parser.add_argument("--database", default="default")
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--threads", type=int, default=4)
+        parser.add_argument("--queries", type=int, default=2)
+        parser.add_argument("--query", default="SELECT 1")
+        parser.add_argument("--output", help="Сохранить отчёты в JSON")
+
+    def handle(self, *args, **options):
+        base_settings = connections.settings[options["database"]]
+        if base_settings["ENGINE"] not in POSTGRES_ENGINES:
+            raise CommandError(
+                f"Нужна база PostgreSQL, а не {base_settings['ENGINE']}"
+            )
+
+        reports = {}
+        for mode in options["modes"]:
+            reports[mode] = self.run_mode(mode, base_settings, options)
+            self.stdout.write(
+                f"{mode}: {reports[mode]['rps']:.0f} запросов/с, "
+                f"p50 {reports[mode]['latency']['p50_ms']:.2f} мс, "
+                f"подключений открыто {reports[mode]['connections']}"
+            )
+
+        self.print_comparison(reports)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as output:
+                json.dump(reports, output, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Отчёты сохранены в {options['output']}")
+
+    def run_mode(self, mode, base_settings, options):
+        settings_dict = mode_settings(base_settings, mode, options["threads"])
+        backend = load_backend(settings_dict["ENGINE"])
+        alias = f"bench_{mode}"
+        opened = []
+
+        def count_connection(sender, connection, **kwargs):
+            if connection.alias == alias:
+                opened.append(1)
+
+        samples = []
+        threads = [
+            threading.Thread(
+                target=simulate_requests,
+                args=(backend, settings_dict, alias, options, samples),
+            )
+            for _ in range(options["threads"])
+        ]
+        connection_created.connect(count_connection)
+        started = time.perf_counter()
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            connection_created.disconnect(count_connection)
+        elapsed = time.perf_counter() - started
+
+        connections_opened = len(opened)
+        if mode == "pool":
+            # connection_created приходит на каждую выдачу из пула
+            pool = backend.DatabaseWrapper(settings_dict, alias).pool
+            connections_opened = pool.stats()["opened"]
+            close_pools()
+        return {
+            "requests": len(samples),
+            "rps": len(samples) / elapsed if elapsed else 0.0,
+            "connections": connections_opened,
+            "latency": latency_summary(samples),
+        }
+
+    def print_comparison(self, reports):
+        names = list(reports)
+        rows = [
+            ("запросов в сек", "rps", None),
+            ("среднее мс", "latency", "mean_ms"),
+            ("p50 мс", "latency", "p50_ms"),
+            ("p90 мс", "latency", "p90_ms"),
+            ("p99 мс", "latency", "p99_ms"),
+            ("подключений", "connections", None),
+        ]
+        self.stdout.write("\n" + f"{'':<18}" + "".join(f"{n:>14}" for n in names))
+        for label, key, nested in rows:
+            cells = ""
+            for name in names:
+                value = reports[name][key]
+                if nested:
+                    value = value[nested]
+                cells += f"{value:>14.2f}"
+            self.stdout.write(f"{label:<18}{cells}")
+        if "new" in reports:
+            base = reports["new"]["latency"]["mean_ms"]
+            for name in names:
+                if name != "new":
+                    saved = base - reports[name]["latency"]["mean_ms"]
+                    self.stdout.write(
+                        f"{name}: экономия {saved:.2f} мс на запрос против new"
+                    )
@@ -0,0 +1,443 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк всех эндпоинтов api/urls.py на текущих данных: перцентили
+задержки, SQL-запросы и пиковая память (tracemalloc) на запрос.
+Результаты сохраняются в JSON и сравниваются с базовой линией.
+
+Запуск (на заполненной базе, например после populate_db --scale 0.1):
+    python manage.py bench_endpoints --output benchmarks/baseline.json
+    python manage.py bench_endpoints --baseline benchmarks/baseline.json
+
+Запросы проходят весь стек Django (middleware, JWT, рендеринг) через
+тестовый клиент без сети. Все изменения данных выполняются в транзакции,
+которая в конце откатывается.
+"""
+
+import json
+import os
+import platform
+import time
+import tracemalloc
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.authentication import RefreshToken
+from api.bench import compare_results, latency_summary, login_throttle
+from api.models import Author, Book, Order, OrderItem, Review, User
+from api.services import add_to_cart, enqueue_order, place_order, reserve_stock
+
+BENCH_PASSWORD = "bench-password-123"
+
+
+class Scenario:
+    """
+    Один запрос бенчмарка. path, data и prepare получают контекст с id
+    объектов; prepare выполняется перед каждым запросом вне замера.
+    """
+
+    def __init__(
+        self,
+        name,
+        url_name,
+        path,
+        method="get",
+        data=None,
+        user="user",
+        requests=None,
+        prepare=None,
+    ):
+        self.name = name
+        self.url_name = url_name
+        self.path = path
+        self.method = method
+        self.data = data
+        self.user = user
+        self.requests = requests
+        self.prepare = prepare
+
+    def send(self, client, context, headers):
+        data = self.data(context) if callable(self.data) else self.data
+        path = self.path(context)
+        if self.method == "get":
+            return client.get(path, data, **headers)
+        return getattr(client, self.method)(path, data, format="json", **headers)
+
+
+def next_username(context):
+    context.counter += 1
+    return {
+        "username": f"bench_register_{context.counter}",
+        "email": f"bench_register_{context.counter}@example.com",
+        "password": BENCH_PASSWORD,
+        "password_confirm": BENCH_PASSWORD,
+    }
+
+
+def fill_cart(context):
+    add_to_cart(context.user, context.book.id, 1)
+
+
+SCENARIOS = [
+    Scenario("books", "book-list", lambda c: reverse("book-list"), user=None),
+    Scenario(
+        "books-filter",
+        "book-list",
+        lambda c: reverse("book-list"),
+        data=lambda c: {"author": c.author.id, "price_min": 100, "price_max": 2000},
+        user=None,
+    ),
+    Scenario(
+        "books-search",
+        "book-list",
+        lambda c: reverse("book-list"),
+        data={"search": "Тайна"},
+        user=None,
+    ),
+    Scenario(
+        "books-ordering",
+        "book-list",
+        lambda c: reverse("book-list"),
+        data={"ordering": "-price"},
+        user=None,
+    ),
+    Scenario(
+        "book-detail",
+        "book-detail",
+        lambda c: reverse("book-detail", args=[c.book.id]),
+        user=None,
+    ),
+    Scenario("authors", "author-list", lambda c: reverse("author-list"), user=None),
+    Scenario(
+        "author-detail",
+        "author-detail",
+        lambda c: reverse("author-detail", args=[c.author.id]),
+    ),
+    Scenario("reviews", "review-list", lambda c: reverse("review-list"), user=None),
+    Scenario(
+        "reviews-by-book",
+        "review-list",
+        lambda c: reverse("review-list"),
+        data=lambda c: {"book": c.book.id},
+        user=None,
+    ),
+    Scenario(
+        "review-detail",
+        "review-detail",
+        lambda c: reverse("review-detail", args=[c.review.id]),
+        user=None,
+    ),
+    Scenario("users", "user-list", lambda c: reverse("user-list"), user="admin"),
+    Scenario(
+        "user-detail",
+        "user-detail",
+        lambda c: reverse("user-detail", args=[c.user.id]),
+    ),
+    Scenario("orders", "order-list", lambda c: reverse("order-list")),
+    Scenario(
+        "orders-admin", "order-list", lambda c: reverse("order-list"), user="admin"
+    ),
+    Scenario(
+        "order-detail",
+        "order-detail",
+        lambda c: reverse("order-detail", args=[c.order.id]),
+    ),
+    Scenario(
+        "create-order",
+        "create-order",
+        lambda c: reverse("create-order"),
+        method="post",
+        data=lambda c: {"items": [{"book_id": c.book.id, "quantity": 1}]},
+    ),
+    Scenario(
+        "order-ticket",
+        "order-ticket",
+        lambda c: reverse("order-ticket", args=[c.ticket.ticket]),
+    ),
+    Scenario("cart", "cart", lambda c: reverse("cart")),
+    Scenario(
+        "cart-add",
+        "cart-items",
+        lambda c: reverse("cart-items"),
+        method="post",
+        data=lambda c: {"book_id": c.book.id, "quantity": 1},
+    ),
+    Scenario(
+        "cart-item-update",
+        "cart-item-detail",
+        lambda c: reverse("cart-item-detail", args=[c.book.id]),
+        method="patch",
+        data={"quantity": 2},
+        prepare=fill_cart,
+    ),
+    Scenario(
+        "cart-checkout",
+        "cart-checkout",
+        lambda c: reverse("cart-checkout"),
+        method="post",
+        prepare=fill_cart,
+    ),
+    Scenario(
+        "cart-reserve",
+        "cart-reserve",
+        lambda c: reverse("cart-reserve"),
+        method="post",
+        prepare=fill_cart,
+    ),
+    Scenario("reservations", "reservation-list", lambda c: reverse("reservation-list")),
+    Scenario(
+        "reservation-create",
+        "reservation-list",
+        lambda c: reverse("reservation-list"),
+        method="post",
+        data=lambda c: {"book_id": c.book.id, "quantity": 1},
+    ),
+    Scenario(
+        "reservation-release",
+        "reservation-release",
+        lambda c: reverse("reservation-release", args=[c.book.id]),
+        method="delete",
+        prepare=lambda c: reserve_stock(c.user, c.book.id, 1),
+    ),
+    # Хэширование пароля (PBKDF2) - сотни миллисекунд, поэтому запросов меньше
+    Scenario(
+        "register",
+        "register",
+        lambda c: reverse("register"),
+        method="post",
+        data=next_username,
+        user=None,
+        requests=5,
+    ),
+    Scenario(
+        "login",
+        "login",
+        lambda c: reverse("login"),
+        method="post",
+        data=lambda c: {"username": c.user.username, "password": BENCH_PASSWORD},
+        user=None,
+        requests=5,
+    ),
+    Scenario(
+        "export",
+        "export",
+        lambda c: reverse("export"),
+        data={"model": "author", "fields": ["id", "name"]},
+        user="admin",
+        requests=3,
+    ),
+    Scenario(
+        "memory-report",
+        "memory-diagnostics",
+        lambda c: reverse("memory-diagnostics"),
+        user="admin",
+        requests=3,
+    ),
+    Scenario("schema", "schema", lambda c: reverse("schema"), user=None, requests=3),
+    Scenario(
+        "swagger-ui", "swagger-ui", lambda c: reverse("swagger-ui"), user=None
+    ),
+    Scenario("redoc", "redoc", lambda c: reverse("redoc"), user=None),
+]
+
+
+class Context:
+    """Объекты, на которые ссылаются сценарии."""
+
+    counter = 0
+
+
+class Command(BaseCommand):
+    help = "Бенчмарк эндпоинтов API с базовой линией и поиском регрессий"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests", type=int, default=30, help="Запросов на сценарий"
+        )
+        parser.add_argument(
+            "--warmup", type=int, default=2, help="Прогревочных запросов"
+        )
+        parser.add_argument("--only", nargs="+", help="Запустить только эти сценарии")
+        parser.add_argument("--output", help="Сохранить результаты в JSON")
+        parser.add_argument("--baseline", help="Сравнить с базовой линией (JSON)")
+        parser.add_argument(
+            "--throttle",
+            action="store_true",
+            help="Не отключать ограничение частоты входа (LOGIN_THROTTLE_ENABLED)",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.2,
+            help="Допустимый рост задержки и памяти (0.2 = 20%%)",
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["baseline"]:
+            try:
+                with open(options["baseline"], encoding="utf-8") as file:
+                    baseline = json.load(file)
+            except OSError as exc:
+                raise CommandError(f"Не удалось прочитать базовую линию: {exc}")
+
+        scenarios = SCENARIOS
+        if options["only"]:
+            scenarios = [s for s in SCENARIOS if s.name in options["only"]]
+            if not scenarios:
+                raise CommandError("Нет сценариев с такими именами")
+
+        results = {"meta": self.meta(), "scenarios": {}}
+        with login_throttle(options["throttle"]), transaction.atomic():
+            context = self.build_context()
+            client = APIClient(HTTP_HOST="localhost")
+            headers = {
+                role: {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+                for role, token in context.tokens.items()
+            }
+            headers[None] = {}
+            for scenario in scenarios:
+                result = self.run_scenario(
+                    client, scenario, context, headers[scenario.user], options
+                )
+                results["scenarios"][scenario.name] = result
+                self.report(scenario.name, result)
+            transaction.set_rollback(True)
+
+        if options["output"]:
+            directory = os.path.dirname(options["output"])
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(options["output"], "w", encoding="utf-8") as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Результаты сохранены в {options['output']}")
+
+        if baseline is not None:
+            self.compare(baseline, results, options["threshold"])
+
+    def meta(self):
+        return {
+            "created_at": timezone.now().isoformat(),
+            "vendor": connection.vendor,
+            "python": platform.python_version(),
+            "rows": {
+                model.__name__.lower(): model.objects.count()
+                for model in (Author, Book, User, Order, OrderItem, Review)
+            },
+        }
+
+    def build_context(self):
+        """Пользователи, токены и объекты для сценариев (в откатываемой транзакции)."""
+        context = Context()
+        context.book = Book.objects.filter(stock_sharded=False).order_by("id").first()
+        context.author = Author.objects.order_by("id").first()
+        if context.book is None or context.author is None:
+            raise CommandError("База пуста: сначала выполните populate_db --scale")
+        # Остатка должно хватить на все заказы и резервы бенчмарка
+        Book.objects.filter(id=context.book.id).update(stock=10**9)
+
+        password = make_password(BENCH_PASSWORD)
+        context.user = User.objects.create(
+            username="bench_user", password=password, role="user"
+        )
+        context.admin = User.objects.create(
+            username="bench_admin", password=password, role="admin"
+        )
+        context.tokens = {
+            "user": RefreshToken.for_user(context.user).access_token,
+            "admin": RefreshToken.for_user(context.admin).access_token,
+        }
+        # Несколько заказов пользователя, чтобы список заказов не был пустым
+        for _ in range(10):
+            context.order = place_order(context.user, {context.book.id: 1})
+        context.ticket = enqueue_order(context.user, {context.book.id: 1})
+        context.review = Review.objects.order_by("id").first() or Review.objects.create(
+            user=context.user, book=context.book, rating=5, comment="Бенчмарк"
+        )
+        return context
+
+    def run_scenario(self, client, scenario, context, headers, options):
+        def request():
+            if scenario.prepare is not None:
+                scenario.prepare(context)
+            start = time.perf_counter()
+            response = scenario.send(client, context, headers)
+            elapsed = time.perf_counter() - start
+            reset_queries()
+            return response, elapsed
+
+        for _ in range(options["warmup"]):
+            request()
+
+        samples = []
+        statuses = Counter()
+        for _ in range(scenario.requests or options["requests"]):
+            response, elapsed = request()
+            samples.append(elapsed)
+            statuses[response.status_code] += 1
+
+        # Отдельный запрос для подсчета SQL и памяти: tracemalloc замедляет
+        # выполнение и не должен влиять на замеры задержки
+        if scenario.prepare is not None:
+            scenario.prepare(context)
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                response = scenario.send(client, context, headers)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        result = latency_summary(samples)
+        result.update(
+            {
+                "requests": len(samples),
+                "status": {str(code): count for code, count in statuses.items()},
+                "errors": sum(
+                    count for code, count in statuses.items() if code >= 400
+                ),
+                "queries": len(queries),
+                "peak_alloc_bytes": peak,
+                "response_bytes": len(response.content),
+            }
+        )
+        return result
+
+    def report(self, name, result):
+        line = (
+            f"{name:<20} p50 {result['p50_ms']:8.2f} мс  "
+            f"p90 {result['p90_ms']:8.2f} мс  p99 {result['p99_ms']:8.2f} мс  "
+            f"SQL {result['queries']:>3}  "
+            f"память {result['peak_alloc_bytes'] / 1024:8.0f} КБ"
+        )
+        if result["errors"]:
+            line += f"  ошибок: {result['errors']} {result['status']}"
+            self.stdout.write(self.style.WARNING(line))
+        else:
+            self.stdout.write(line)
+
+    def compare(self, baseline, results, threshold):
+        if baseline.get("meta", {}).get("rows") != results["meta"]["rows"]:
+            self.stdout.write(
+                self.style.WARNING(
+                    "Объем данных отличается от базовой линии: сравнение неточно"
+                )
+            )
+        regressions = compare_results(baseline, results, threshold)
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS("Регрессий нет"))
+            return
+        for item in regressions:
+            self.stdout.write(
+                self.style.ERROR(
+                    f"РЕГРЕССИЯ {item['scenario']}: {item['metric']} "
+                    f"{item['baseline']:.2f} -> {item['current']:.2f}"
+                )
+            )
+        raise CommandError(f"Найдено регрессий: {len(regressions)}")
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк конкурентных заказов одной "горячей" книги: пропускная способность
+с обычным остатком и с шардированным (StockShard).
+Запуск: python manage.py bench_hot_book --threads 16 --duration 5 --shards 8
+
+Имеет смысл на PostgreSQL: SQLite сериализует все записи в базу, и
+SKIP LOCKED там не поддерживается.
+"""
+
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api.models import Author, Book, User
+from api.services import disable_stock_sharding, enable_stock_sharding, place_order
+
+
+class Command(BaseCommand):
+    help = "Сравнивает заказы/с для горячей книги без шардов и с шардами"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16, help="Потоков")
+        parser.add_argument("--duration", type=float, default=5, help="Секунд на режим")
+        parser.add_argument("--shards", type=int, default=8, help="Шардов остатка")
+        parser.add_argument("--stock", type=int, default=10**6, help="Остаток книги")
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite":
+            self.stdout.write(
+                self.style.WARNING("SQLite сериализует записи: результаты неточны")
+            )
+
+        author = Author.objects.create(name="bench_hot_book")
+        book = Book.objects.create(
+            title="bench_hot_book",
+            author=author,
+            price=Decimal("1.00"),
+            stock=options["stock"],
+        )
+        user, _ = User.objects.get_or_create(username="bench_hot_book")
+        try:
+            plain = self.run(book.id, user, options)
+            enable_stock_sharding(book.id, options["shards"])
+            sharded = self.run(book.id, user, options)
+            disable_stock_sharding(book.id)
+        finally:
+            user.delete()
+            book.delete()
+            author.delete()
+
+        self.report("без шардов", plain, options)
+        self.report(f"{options['shards']} шардов", sharded, options)
+        if plain["orders"]:
+            self.stdout.write(f"Ускорение: x{sharded['orders'] / plain['orders']:.2f}")
+
+    def run(self, book_id, user, options):
+        """Запускает потоки, каждый из которых заказывает по одной книге."""
+        deadline = time.monotonic() + options["duration"]
+        counters = {"orders": 0, "errors": 0}
+        lock = threading.Lock()
+
+        def worker():
+            orders = errors = 0
+            try:
+                while time.monotonic() < deadline:
+                    try:
+                        place_order(user, {book_id: 1})
+                        orders += 1
+                    except Exception:
+                        # Нехватка товара, блокировки и deadlock'и - неудачный заказ
+                        errors += 1
+            finally:
+                connection.close()
+            with lock:
+                counters["orders"] += orders
+                counters["errors"] += errors
+
+        threads = [threading.Thread(target=worker) for _ in range(options["threads"])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return counters
+
+    def report(self, label, counters, options):
+        rate = counters["orders"] / options["duration"]
+        self.stdout.write(
+            f"  {label:<12} {rate:10.1f} заказов/с  ошибок: {counters['errors']}"
+        )
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Микро-бенчмарк JSON-рендереров и парсеров на текущих сериализаторах.
+Запуск: python manage.py bench_json --limit 100
+"""
+
+import io
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.bench import format_seconds, measure
+from api.models import Book, Order
+from api.renderers import FastJSONParser, FastJSONRenderer, orjson
+from api.serializers import BookSerializer, OrderSerializer
+
+
+class Command(BaseCommand):
+    help = "Сравнивает скорость стандартного и быстрого JSON-рендерера/парсера"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit", type=int, default=100, help="Объектов на страницу (как PAGE_SIZE)"
+        )
+        parser.add_argument("--number", type=int, default=50, help="Вызовов в прогоне")
+
+    def handle(self, *args, **options):
+        limit = options["limit"]
+        number = options["number"]
+
+        pages = {
+            "books": BookSerializer(
+                Book.objects.select_related("author")[:limit], many=True
+            ).data,
+            "orders": OrderSerializer(
+                Order.objects.select_related("user").prefetch_related(
+                    "items__book__author"
+                )[:limit],
+                many=True,
+            ).data,
+        }
+        if not any(pages.values()):
+            raise CommandError("База пуста: сначала выполните populate_db")
+
+        if orjson is None:
+            self.stdout.write(self.style.WARNING("orjson не установлен: быстрый путь = стандартный"))
+
+        for name, data in pages.items():
+            if not data:
+                continue
+            payload = JSONRenderer().render(data)
+            self.stdout.write(f"\n{name}: {len(data)} объектов, {len(payload)} байт")
+            self._compare(
+                "render",
+                lambda: JSONRenderer().render(data),
+                lambda: FastJSONRenderer().render(data),
+                len(payload),
+                number,
+            )
+            self._compare(
+                "parse",
+                lambda: JSONParser().parse(io.BytesIO(payload)),
+                lambda: FastJSONParser().parse(io.BytesIO(payload)),
+                len(payload),
+                number,
+            )
+
+    def _compare(self, label, baseline, fast, size, number):
+        base = measure(baseline, number=number)["best"]
+        quick = measure(fast, number=number)["best"]
+        for title, value in (("json", base), ("fast", quick)):
+            self.stdout.write(
+                f"  {label:<6} {title:<4} {format_seconds(value):>12}  "
+                f"{size / value / 1e6:8.1f} МБ/с"
+            )
+        self.stdout.write(f"  {label:<6} ускорение x{base / quick:.1f}")
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+Пропускная способность входа (POST /api/login/) при обычной нагрузке и во
+время подбора паролей.
+
+Режимы:
+    inline     - хэш в потоке запроса, без ограничения частоты;
+    protected  - пул хэширования (api.hashing) и token bucket по IP и имени
+                 пользователя (api.throttling) с параметрами из settings.
+
+Сценарии: normal - --threads потоков делают по --requests входов с верным
+паролем, каждый вход - свой пользователь и свой IP; attack - то же, пока
+--attackers потоков перебирают пароли с --attack-ips адресов, всего
+--attack-rate попыток в секунду (одинаковая нагрузка атаки в обоих
+режимах; если сервер не успевает, атака замедляется вместе с ним). Для
+легитимных входов считаются запросы в секунду, задержка и ответы, для
+атаки - ответы: 400 - пароль проверен (посчитан хэш), 429 и 503 - отклонён
+до хэширования.
+
+Запуск (нужна база из settings.DATABASES; пользователи бенчмарка
+удаляются в конце):
+    python manage.py bench_login --threads 4 --requests 20 --attackers 8
+    python manage.py bench_login --modes protected --scenarios attack
+"""
+
+import itertools
+import json
+import threading
+import time
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from api.bench import latency_summary
+from api.models import User
+
+MODES = {
+    "inline": {"PASSWORD_HASH_WORKERS": 0, "LOGIN_THROTTLE_ENABLED": False},
+    "protected": {},
+}
+SCENARIOS = ("normal", "attack")
+BENCH_PASSWORD = "bench-login-12345"
+USER_PREFIX = "bench_login_"
+
+
+def login(client, username, password, address):
+    """Один вход; возвращает (статус, секунды)."""
+    start = time.perf_counter()
+    response = client.post(
+        reverse("login"),
+        {"username": username, "password": password},
+        content_type="application/json",
+        REMOTE_ADDR=address,
+    )
+    return response.status_code, time.perf_counter() - start
+
+
+def legit_logins(usernames, addresses, samples, statuses):
+    """Входы с верным паролем; ответы - в statuses (свой у каждого потока)."""
+    client = Client(HTTP_HOST="localhost")
+    try:
+        for username, address in zip(usernames, addresses):
+            status, elapsed = login(client, username, BENCH_PASSWORD, address)
+            samples.append(elapsed)
+            statuses[status] += 1
+    finally:
+        connections.close_all()
+
+
+def attack_logins(number, addresses, usernames, interval, stop, statuses):
+    """
+    Перебор паролей по попытке в interval секунд, пока не выставлен stop.
+    Не успевающий поток отправляет следующую попытку сразу.
+    """
+    client = Client(HTTP_HOST="localhost")
+    started = time.perf_counter()
+    try:
+        for attempt in itertools.count():
+            delay = started + attempt * interval - time.perf_counter()
+            if stop.wait(max(delay, 0)):
+                break
+            username = usernames[attempt % len(usernames)]
+            address = addresses[(number + attempt) % len(addresses)]
+            status, _ = login(client, username, f"guess-{attempt}", address)
+            statuses[status] += 1
+    finally:
+        connections.close_all()
+
+
+def merge_statuses(counters):
+    return {str(code): count for code, count in sum(counters, Counter()).items()}
+
+
+def failed_logins(report):
+    return sum(count for code, count in report["status"].items() if code != "200")
+
+
+def rejected_attacks(report):
+    return sum(report["attack"].get(code, 0) for code in ("429", "503"))
+
+
+class Command(BaseCommand):
+    help = "Пропускная способность входа при обычной нагрузке и подборе паролей"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--modes", nargs="+", choices=list(MODES), default=list(MODES)
+        )
+        parser.add_argument(
+            "--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS)
+        )
+        parser.add_argument("--threads", type=int, default=4)
+        parser.add_argument("--requests", type=int, default=20)
+        parser.add_argument("--attackers", type=int, default=8)
+        parser.add_argument("--attack-ips", type=int, default=2)
+        parser.add_argument(
+            "--attack-rate",
+            type=float,
+            default=50,
+            help="Попыток атаки в секунду на все потоки атаки",
+        )
+        parser.add_argument("--output", help="Сохранить отчёты в JSON")
+
+    def handle(self, *args, **options):
+        runs = list(itertools.product(options["modes"], options["scenarios"]))
+        per_run = options["threads"] * options["requests"]
+        # Один хэш на всех пользователей: создание не должно занимать минуты
+        password = make_password(BENCH_PASSWORD)
+        User.objects.bulk_create(
+            User(username=f"{USER_PREFIX}{number}", password=password)
+            for number in range(len(runs) * per_run)
+        )
+
+        reports = {}
+        try:
+            for run, (mode, scenario) in enumerate(runs):
+                name = f"{mode}/{scenario}"
+                with override_settings(**MODES[mode]):
+                    reports[name] = self.run(run, scenario, options)
+                self.stdout.write(
+                    f"{name}: {reports[name]['rps']:.1f} входов/с, "
+                    f"p50 {reports[name]['latency']['p50_ms']:.0f} мс, "
+                    f"атака {reports[name]['attack']}"
+                )
+        finally:
+            User.objects.filter(username__startswith=USER_PREFIX).delete()
+
+        self.print_comparison(reports)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as output:
+                json.dump(reports, output, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Отчёты сохранены в {options['output']}")
+
+    def run(self, run, scenario, options):
+        # Адреса и пользователи каждого прогона свои: вёдра token bucket
+        # прошлых прогонов на него не влияют
+        requests = options["requests"]
+        first = run * options["threads"] * requests
+        samples = []
+        statuses = [Counter() for _ in range(options["threads"])]
+        attack = [Counter() for _ in range(options["attackers"])]
+        legit = []
+        for thread in range(options["threads"]):
+            indexes = range(thread * requests, (thread + 1) * requests)
+            usernames = [f"{USER_PREFIX}{first + index}" for index in indexes]
+            addresses = [
+                f"10.{run}.{index // 250}.{index % 250 + 1}" for index in indexes
+            ]
+            legit.append(
+                threading.Thread(
+                    target=legit_logins,
+                    args=(usernames, addresses, samples, statuses[thread]),
+                )
+            )
+        stop = threading.Event()
+        attackers = []
+        if scenario == "attack":
+            addresses = [
+                f"192.0.{run}.{number + 1}" for number in range(options["attack_ips"])
+            ]
+            # Несуществующие имена: вёдра настоящих пользователей не тратятся
+            usernames = [f"{USER_PREFIX}missing_{number}" for number in range(4)]
+            attackers = [
+                threading.Thread(
+                    target=attack_logins,
+                    args=(
+                        number,
+                        addresses,
+                        usernames,
+                        options["attackers"] / options["attack_rate"],
+                        stop,
+                        attack[number],
+                    ),
+                )
+                for number in range(options["attackers"])
+            ]
+            for thread in attackers:
+                thread.start()
+            # Атака разгоняется до начала легитимных входов
+            time.sleep(0.2)
+
+        started = time.perf_counter()
+        try:
+            for thread in legit:
+                thread.start()
+            for thread in legit:
+                thread.join()
+        finally:
+            elapsed = time.perf_counter() - started
+            stop.set()
+            for thread in attackers:
+                thread.join()
+        return {
+            "requests": len(samples),
+            "rps": len(samples) / elapsed if elapsed else 0.0,
+            "status": merge_statuses(statuses),
+            "latency": latency_summary(samples),
+            "attack": merge_statuses(attack),
+        }
+
+    def print_comparison(self, reports):
+        names = list(reports)
+        rows = [
+            ("входов в сек", lambda r: r["rps"]),
+            ("p50 мс", lambda r: r["latency"]["p50_ms"]),
+            ("p99 мс", lambda r: r["latency"]["p99_ms"]),
+            ("ошибок входа", failed_logins),
+            ("атака: хэшей", lambda r: r["attack"].get("400", 0)),
+            ("атака: отказов", rejected_attacks),
+        ]
+        self.stdout.write("\n" + f"{'':<16}" + "".join(f"{n:>20}" for n in names))
+        for label, value in rows:
+            cells = "".join(f"{value(reports[name]):>20.1f}" for name in names)
+            self.stdout.write(f"{label:<16}{cells}")
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк быстрого пути сериализации списков против DRF-сериализаторов.
+Запуск: python manage.py bench_serializers --rows 1000
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.bench import format_seconds, measure
+from api.fast_serializers import FastSerializer
+from api.models import Author, Book, Order, Review
+from api.serializers import (
+    AuthorSerializer,
+    BookSerializer,
+    OrderSerializer,
+    ReviewSerializer,
+)
+
+CASES = [
+    ("authors", AuthorSerializer, Author),
+    ("books", BookSerializer, Book),
+    ("reviews", ReviewSerializer, Review),
+    ("orders", OrderSerializer, Order),
+]
+
+
+class Command(BaseCommand):
+    help = "Сравнивает DRF-сериализаторы и FastSerializer (время на 1000 строк)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000, help="Строк в выборке")
+        parser.add_argument("--number", type=int, default=3, help="Вызовов в прогоне")
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        number = options["number"]
+        ran = False
+
+        for name, serializer_class, model in CASES:
+            serializer = serializer_class()
+            queryset = serializer.optimize_queryset(model.objects.order_by("pk"))[:rows]
+            count = queryset.count()
+            if not count:
+                continue
+            ran = True
+            fast = FastSerializer.for_serializer(serializer)
+
+            drf = measure(
+                lambda: serializer_class(queryset, many=True).data, number=number
+            )["best"]
+            quick = measure(
+                lambda: fast.serialize(fast.values(queryset)), number=number
+            )["best"]
+            per_1000 = 1000 / count
+            self.stdout.write(
+                f"{name:<8} {count:>6} строк  "
+                f"drf {format_seconds(drf * per_1000):>10}/1000  "
+                f"fast {format_seconds(quick * per_1000):>10}/1000  "
+                f"x{drf / quick:.1f}"
+            )
+
+        if not ran:
+            raise CommandError("База пуста: сначала выполните populate_db")
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Сравнение серверов приложения под нагрузкой loadtest: manage.py runserver
+(однопроцессный сервер разработки) против gunicorn с gunicorn.conf.py
+(preload, воркеры gthread, прогрев).
+
+Каждый сервер запускается отдельным процессом на свободном порту с той же
+базой данных (settings), затем loadtest --url нагружает его одинаковым
+сценарием и тем же seed.
+
+Запуск (на базе для бенчмарков, например после snapshot restore):
+    python manage.py bench_serve --users 50 --duration 30
+    python manage.py bench_serve --servers gunicorn --workers 4 --threads 8
+"""
+
+import importlib.util
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from contextlib import contextmanager
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+SERVERS = ("runserver", "gunicorn")
+STARTUP_TIMEOUT = 60
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def server_command(server, port, workers=None, threads=None):
+    """Командная строка процесса сервера (runserver, gunicorn или uvicorn)."""
+    manage = os.path.join(str(settings.BASE_DIR), "manage.py")
+    if server == "runserver":
+        return [sys.executable, manage, "runserver", "--noreload", f"127.0.0.1:{port}"]
+    if server == "uvicorn":
+        command = [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--no-access-log",
+        ]
+        if workers:
+            command += ["--workers", str(workers)]
+        return command + ["bookstore.asgi:application"]
+    command = [
+        sys.executable,
+        "-m",
+        "gunicorn",
+        "-c",
+        os.path.join(str(settings.BASE_DIR), "gunicorn.conf.py"),
+        "--bind",
+        f"127.0.0.1:{port}",
+    ]
+    if workers:
+        command += ["--workers", str(workers)]
+    if threads:
+        command += ["--threads", str(threads)]
+    return command + ["bookstore.wsgi"]
+
+
+def wait_ready(process, port, path="/api/books/"):
+    """Ждёт ответа сервера на path; возвращает время запуска, с."""
+    started = time.monotonic()
+    url = f"http://127.0.0.1:{port}{path}"
+    while time.monotonic() - started < STARTUP_TIMEOUT:
+        if process.poll() is not None:
+            raise CommandError(f"Сервер завершился с кодом {process.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=5):
+                return time.monotonic() - started
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f"Сервер не ответил за {STARTUP_TIMEOUT} с")
+
+
+@contextmanager
+def running_server(command, environ=None):
+    """Процесс сервера на время блока with; при выходе он останавливается."""
+    process = subprocess.Popen(
+        command,
+        cwd=str(settings.BASE_DIR),
+        env={**os.environ, **(environ or {})},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        yield process
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def comparison_rows(reports):
+    """Строки сравнения: (показатель, {сервер: значение})."""
+    rows = [
+        ("запросов в сек", {name: r["rps"] for name, r in reports.items()}),
+        ("ошибки, %", {name: r["error_rate"] * 100 for name, r in reports.items()}),
+    ]
+    for metric in ("p50_ms", "p90_ms", "p99_ms"):
+        rows.append(
+            (
+                f"{metric[:3]} мс (все)",
+                {name: r["latency"][metric] for name, r in reports.items()},
+            )
+        )
+    steps = []
+    for report in reports.values():
+        steps += [step for step in report["steps"] if step not in steps]
+    for step in steps:
+        rows.append(
+            (
+                f"p99 мс {step}",
+                {
+                    name: r["steps"][step]["p99_ms"]
+                    for name, r in reports.items()
+                    if step in r["steps"]
+                },
+            )
+        )
+    return rows
+
+
+class Command(BaseCommand):
+    help = "Сравнивает runserver и gunicorn под нагрузкой loadtest"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--servers",
+            nargs="+",
+            choices=SERVERS,
+            default=list(SERVERS),
+            help="Какие серверы сравнивать",
+        )
+        parser.add_argument("--users", type=int, default=20)
+        parser.add_argument("--duration", type=float, default=30.0)
+        parser.add_argument("--think-time", type=float, default=0.0)
+        parser.add_argument("--register-ratio", type=float, default=0.2)
+        parser.add_argument("--workers", type=int, help="Воркеры gunicorn")
+        parser.add_argument("--threads", type=int, help="Потоки воркера gunicorn")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--output", help="Сохранить отчёты в JSON")
+
+    def handle(self, *args, **options):
+        gunicorn = importlib.util.find_spec("gunicorn")
+        if "gunicorn" in options["servers"] and gunicorn is None:
+            raise CommandError(
+                "gunicorn не установлен: pip install -r requirements.txt"
+            )
+
+        reports = {}
+        for server in options["servers"]:
+            port = free_port()
+            command = server_command(
+                server, port, options["workers"], options["threads"]
+            )
+            self.stdout.write(f"\n== {server}: {' '.join(command[1:])}")
+            # Все покупатели loadtest входят с 127.0.0.1
+            with running_server(command, {"LOGIN_THROTTLE_ENABLED": "0"}) as process:
+                startup = wait_ready(process, port)
+                self.stdout.write(f"Готов к приёму запросов за {startup:.1f} с")
+                reports[server] = self.run_loadtest(port, options)
+            self.stdout.write(
+                f"{reports[server]['rps']:.1f} запросов/с, "
+                f"ошибок {reports[server]['error_rate']:.1%}"
+            )
+
+        self.print_comparison(reports)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as output:
+                json.dump(reports, output, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Отчёты сохранены в {options['output']}")
+
+    def run_loadtest(self, port, options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "report.json")
+            call_command(
+                "loadtest",
+                url=f"http://127.0.0.1:{port}",
+                users=options["users"],
+                duration=options["duration"],
+                think_time=options["think_time"],
+                register_ratio=options["register_ratio"],
+                seed=options["seed"],
+                output=path,
+                stdout=StringIO(),
+            )
+            with open(path, encoding="utf-8") as report:
+                return json.load(report)
+
+    def print_comparison(self, reports):
+        names = list(reports)
+        self.stdout.write("\n" + f"{'':<26}" + "".join(f"{n:>12}" for n in names))
+        for label, values in comparison_rows(reports):
+            cells = "".join(
+                f"{values[name]:>12.1f}" if name in values else f"{'-':>12}"
+                for name in names
+            )
+            self.stdout.write(f"{label:<26}{cells}")
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+Медленные клиенты: WSGI (gunicorn, синхронные представления) против ASGI
+(uvicorn с асинхронными представлениями каталога, ASYNC_CATALOG_VIEWS=1, и
+uvicorn-sync - ASGI с синхронными представлениями).
+
+--slow-clients соединений ведут себя как клиенты на плохой сети: заголовки
+запроса отправляются по одному с паузой --header-delay, ответ читается
+порциями по --read-size байт с паузой --read-delay. Одновременно
+--fast-clients обычных клиентов непрерывно запрашивают --path; их задержки
+и число запросов в секунду - результат сравнения. Под WSGI медленный клиент
+занимает поток воркера на всё время запроса, под ASGI ожидание сети
+обслуживает цикл событий.
+
+Все клиенты - корутины asyncio одного процесса, серверы запускаются по
+очереди на свободных портах с той же базой данных (settings).
+
+Запуск (на базе для бенчмарков, например после snapshot restore):
+    python manage.py bench_slow_clients --slow-clients 100 --duration 20
+    python manage.py bench_slow_clients --servers gunicorn uvicorn --workers 3
+"""
+
+import asyncio
+import importlib.util
+import json
+import socket
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.bench import latency_summary
+
+from .bench_serve import free_port, running_server, server_command, wait_ready
+
+# Сервер: (пакет, команда server_command, ASYNC_CATALOG_VIEWS)
+SERVERS = {
+    "gunicorn": ("gunicorn", "gunicorn", "0"),
+    "uvicorn": ("uvicorn", "uvicorn", "1"),
+    "uvicorn-sync": ("uvicorn", "uvicorn", "0"),
+}
+SLOW_HEADERS = (
+    "User-Agent: bench-slow-client",
+    "Accept: application/json",
+    "Accept-Language: ru",
+    "Cache-Control: no-cache",
+)
+REQUEST_TIMEOUT = 30.0
+
+
+def request_bytes(path, headers=()):
+    lines = [f"GET {path} HTTP/1.1", "Host: 127.0.0.1", "Connection: close"]
+    return "\r\n".join([*lines, *headers, "", ""]).encode()
+
+
+def response_status(data):
+    """Код ответа из начала ответа HTTP/1.1 или None."""
+    try:
+        return int(data.split(b" ", 2)[1])
+    except (IndexError, ValueError):
+        return None
+
+
+async def open_slow_connection(port, read_size):
+    """
+    Соединение с маленьким буфером приёма: сервер не может отдать ответ
+    целиком в буфер ядра и ждёт, пока клиент прочитает очередную порцию.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, read_size)
+    sock.setblocking(False)
+    try:
+        await asyncio.get_running_loop().sock_connect(sock, ("127.0.0.1", port))
+    except OSError:
+        sock.close()
+        raise
+    return await asyncio.open_connection(sock=sock, limit=read_size)
+
+
+async def slow_client(port, options, deadline, stats):
+    """Повторяет медленные запросы до deadline."""
+    # Строка запроса, заголовки и пустая строка, завершающая заголовки
+    lines = request_bytes(options["path"], SLOW_HEADERS).split(b"\r\n")[:-1]
+    while time.monotonic() < deadline:
+        writer = None
+        try:
+            reader, writer = await open_slow_connection(port, options["read_size"])
+            writer.write(lines[0] + b"\r\n")
+            for line in lines[1:]:
+                await writer.drain()
+                await asyncio.sleep(options["header_delay"])
+                writer.write(line + b"\r\n")
+            await writer.drain()
+            received = b""
+            while True:
+                chunk = await asyncio.wait_for(
+                    reader.read(options["read_size"]), REQUEST_TIMEOUT
+                )
+                if not chunk:
+                    break
+                received = received or chunk
+                await asyncio.sleep(options["read_delay"])
+            if response_status(received) == 200:
+                stats["slow_ok"] += 1
+            else:
+                stats["slow_errors"] += 1
+        except (OSError, asyncio.TimeoutError):
+            stats["slow_errors"] += 1
+        finally:
+            if writer is not None:
+                writer.close()
+
+
+async def fast_client(port, path, deadline, samples, stats):
+    """Обычные запросы подряд до deadline; задержки - в samples."""
+    request = request_bytes(path, ("Accept: application/json",))
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        writer = None
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection("127.0.0.1", port), REQUEST_TIMEOUT
+            )
+            writer.write(request)
+            data = await asyncio.wait_for(reader.read(), REQUEST_TIMEOUT)
+        except (OSError, asyncio.TimeoutError):
+            stats["fast_errors"] += 1
+            continue
+        finally:
+            if writer is not None:
+                writer.close()
+        if response_status(data) == 200:
+            samples.append(time.perf_counter() - start)
+        else:
+            stats["fast_errors"] += 1
+
+
+async def run_clients(port, options):
+    """Медленные и быстрые клиенты на время --duration; отчёт по серверу."""
+    deadline = time.monotonic() + options["duration"]
+    samples = []
+    stats = {"slow_ok": 0, "slow_errors": 0, "fast_errors": 0}
+    tasks = [
+        slow_client(port, options, deadline, stats)
+        for _ in range(options["slow_clients"])
+    ]
+    # Медленные клиенты успевают занять соединения до начала замера
+    await asyncio.sleep(min(1.0, options["duration"] / 10))
+    tasks += [
+        fast_client(port, options["path"], deadline, samples, stats)
+        for _ in range(options["fast_clients"])
+    ]
+    started = time.monotonic()
+    await asyncio.gather(*tasks)
+    elapsed = time.monotonic() - started
+    return {
+        "fast_requests": len(samples),
+        "rps": len(samples) / elapsed if elapsed else 0.0,
+        "latency": latency_summary(samples),
+        **stats,
+    }
+
+
+class Command(BaseCommand):
+    help = "Сравнивает WSGI и ASGI под нагрузкой медленных клиентов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--servers",
+            nargs="+",
+            choices=list(SERVERS),
+            default=list(SERVERS),
+            help="Какие серверы сравнивать",
+        )
+        parser.add_argument("--slow-clients", type=int, default=50)
+        parser.add_argument("--fast-clients", type=int, default=5)
+        parser.add_argument("--duration", type=float, default=20.0)
+        parser.add_argument(
+            "--header-delay",
+            type=float,
+            default=0.5,
+            help="Пауза между заголовками медленного клиента, с",
+        )
+        parser.add_argument(
+            "--read-delay",
+            type=float,
+            default=0.2,
+            help="Пауза между порциями ответа медленного клиента, с",
+        )
+        parser.add_argument("--read-size", type=int, default=4096)
+        parser.add_argument("--path", default="/api/books/?page_size=50")
+        parser.add_argument("--workers", type=int, help="Процессы сервера")
+        parser.add_argument("--threads", type=int, help="Потоки воркера gunicorn")
+        parser.add_argument("--output", help="Сохранить отчёты в JSON")
+
+    def handle(self, *args, **options):
+        for server in options["servers"]:
+            package = SERVERS[server][0]
+            if importlib.util.find_spec(package) is None:
+                raise CommandError(
+                    f"{package} не установлен: pip install -r requirements.txt"
+                )
+
+        reports = {}
+        for server in options["servers"]:
+            _, kind, async_views = SERVERS[server]
+            port = free_port()
+            command = server_command(
+                kind, port, options["workers"], options["threads"]
+            )
+            environ = {
+                "ASYNC_CATALOG_VIEWS": async_views,
+                # Как в промышленном запуске: без записи SQL каждого запроса
+                "QUERY_BUDGET_CHECK": "0",
+                # Все клиенты подключаются с 127.0.0.1
+                "LOGIN_THROTTLE_ENABLED": "0",
+            }
+            self.stdout.write(
+                f"\n== {server}: ASYNC_CATALOG_VIEWS={async_views} "
+                f"{' '.join(command[1:])}"
+            )
+            with running_server(command, environ) as process:
+                wait_ready(process, port)
+                report = asyncio.run(run_clients(port, options))
+            reports[server] = report
+            self.stdout.write(
+                f"{report['rps']:.1f} запросов/с у быстрых клиентов, "
+                f"p99 {report['latency']['p99_ms']:.0f} мс, "
+                f"медленных запросов {report['slow_ok']}, "
+                f"ошибок {report['fast_errors'] + report['slow_errors']}"
+            )
+
+        self.print_comparison(reports)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as output:
+                json.dump(reports, output, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Отчёты сохранены в {options['output']}")
+
+    def print_comparison(self, reports):
+        names = list(reports)
+        rows = [
+            ("запросов в сек", "rps", None),
+            ("p50 мс", "latency", "p50_ms"),
+            ("p90 мс", "latency", "p90_ms"),
+            ("p99 мс", "latency", "p99_ms"),
+            ("медленных запросов", "slow_ok", None),
+            ("ошибок быстрых", "fast_errors", None),
+            ("ошибок медленных", "slow_errors", None),
+        ]
+        self.stdout.write("\n" + f"{'':<22}" + "".join(f"{n:>14}" for n in names))
+        for label, key, nested in rows:
+            cells = ""
+            for name in names:
+                value = reports[name][key]
+                if nested:
+                    value = value[nested]
+                cells += f"{value:>14.1f}"
+            self.stdout.write(f"{label:<22}{cells}")
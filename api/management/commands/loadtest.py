@@ -0,0 +1,409 @@
+# -*- coding: utf-8 -*-
+"""
+Нагрузочный тест без внешних сервисов: команда поднимает приложение на
+локальном порту (многопоточный WSGI-сервер Django) и запускает N
+виртуальных покупателей. Каждый покупатель повторяет сценарий
+frontend/app.js: авторы для фильтра, каталог с фильтрами, карточка книги
+и её отзывы, регистрация или вход, корзина, добавление книг, оформление
+заказа и список заказов.
+
+Запуск (на базе для бенчмарков, например после snapshot restore):
+    python manage.py loadtest --users 50 --duration 60
+    python manage.py loadtest --url http://127.0.0.1:8000 --users 200
+
+Команда создаёт пользователей и заказы - после прогона базу стоит
+восстановить из снимка. Все покупатели входят с одного адреса, поэтому
+встроенный сервер работает без ограничения частоты входа (--throttle
+оставляет его); сервер по --url нужно запускать с LOGIN_THROTTLE_ENABLED=0.
+"""
+
+import gzip
+import http.client
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from urllib.parse import urlencode, urlsplit
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import (
+    ThreadedWSGIServer,
+    WSGIRequestHandler,
+    get_internal_wsgi_application,
+)
+
+from api.bench import histogram, latency_summary, login_throttle
+from api.models import Book, User
+
+LOADTEST_PASSWORD = "loadtest-password-123"
+ORDERINGS = ["", "price", "-price", "title", "-created_at"]
+SEARCH_TERMS = ["Тайна", "Война", "Мир", "Путь", "Дом"]
+
+# Шаги сценария в порядке отчёта
+STEPS = [
+    "authors-filter",
+    "browse",
+    "book-detail",
+    "book-reviews",
+    "register",
+    "login",
+    "user-data",
+    "cart",
+    "add-to-cart",
+    "checkout",
+    "orders",
+]
+
+# Верхние границы корзин гистограммы задержек, мс
+HISTOGRAM_BOUNDS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """Обработчик без строки лога на каждый запрос."""
+
+    def log_message(self, format, *args):
+        pass
+
+
+class VirtualUser(threading.Thread):
+    """Покупатель: повторяет сценарий магазина до истечения deadline."""
+
+    def __init__(self, index, command, deadline):
+        super().__init__(name=f"loadtest-user-{index}", daemon=True)
+        self.index = index
+        self.command = command
+        self.deadline = deadline
+        self.rng = random.Random(command.seed * 100003 + index)
+        self.connection = None
+        self.token = None
+        self.samples = {step: [] for step in STEPS}
+        self.errors = {step: Counter() for step in STEPS}
+        self.sessions = 0
+
+    def run(self):
+        try:
+            while time.monotonic() < self.deadline:
+                self.session()
+                self.sessions += 1
+        finally:
+            if self.connection is not None:
+                self.connection.close()
+
+    def think(self):
+        if self.command.think_time:
+            time.sleep(self.rng.uniform(0, 2 * self.command.think_time))
+
+    def request(self, step, method, path, data=None, expected=(200, 201, 202)):
+        """Выполняет запрос и учитывает его в статистике шага."""
+        headers = {"Accept": "application/json", "Accept-Encoding": "gzip"}
+        body = None
+        if data is not None:
+            body = json.dumps(data).encode()
+            headers["Content-Type"] = "application/json"
+        if self.token and step not in ("register", "login"):
+            headers["Authorization"] = f"Bearer {self.token}"
+
+        start = time.perf_counter()
+        try:
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(
+                    self.command.host, self.command.port, timeout=30
+                )
+            self.connection.request(method, self.command.prefix + path, body, headers)
+            response = self.connection.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException) as error:
+            self.samples[step].append(time.perf_counter() - start)
+            self.errors[step][type(error).__name__] += 1
+            self.connection.close()
+            self.connection = None
+            return None
+        self.samples[step].append(time.perf_counter() - start)
+        if response.getheader("Connection", "").lower() == "close":
+            self.connection.close()
+            self.connection = None
+
+        if response.status not in expected:
+            self.errors[step][str(response.status)] += 1
+            return None
+        if response.getheader("Content-Encoding") == "gzip":
+            payload = gzip.decompress(payload)
+        return json.loads(payload) if payload else {}
+
+    def session(self):
+        # Главная страница: список авторов для фильтра и каталог
+        self.request("authors-filter", "GET", "/authors/?page=1&page_size=100")
+        query = {"page_size": 100}
+        if self.rng.random() < 0.3:
+            query["search"] = self.rng.choice(SEARCH_TERMS)
+        ordering = self.rng.choice(ORDERINGS)
+        if ordering:
+            query["ordering"] = ordering
+        page = self.request("browse", "GET", f"/books/?{urlencode(query)}")
+        self.think()
+
+        book_ids = [book["id"] for book in (page or {}).get("results", [])]
+        book_ids = book_ids or self.command.book_ids
+        viewed = self.rng.sample(book_ids, min(len(book_ids), self.rng.randint(1, 3)))
+        for book_id in viewed:
+            self.request("book-detail", "GET", f"/books/{book_id}/")
+            self.request("book-reviews", "GET", f"/reviews/?book={book_id}")
+            self.think()
+
+        if self.token is None and not self.authenticate():
+            return
+        self.request("user-data", "GET", "/users/")
+        self.request("cart", "GET", "/cart/")
+
+        for book_id in viewed[: self.rng.randint(1, len(viewed))]:
+            item = {"book_id": book_id, "quantity": 1}
+            self.request("add-to-cart", "POST", "/cart/items/", item)
+        self.think()
+        self.request("checkout", "POST", "/cart/checkout/", {})
+        self.request("orders", "GET", "/orders/?page_size=100")
+        self.think()
+
+        # Следующая сессия - с новым входом, как у вернувшегося покупателя
+        self.token = None
+
+    def authenticate(self):
+        if self.rng.random() < self.command.register_ratio:
+            username = f"lt_{self.command.run_id}_{self.index}_{self.sessions}"
+            result = self.request(
+                "register",
+                "POST",
+                "/register/",
+                {
+                    "username": username,
+                    "email": f"{username}@example.com",
+                    "first_name": "Load",
+                    "last_name": "Test",
+                    "password": LOADTEST_PASSWORD,
+                    "password_confirm": LOADTEST_PASSWORD,
+                },
+            )
+        else:
+            result = self.request(
+                "login",
+                "POST",
+                "/login/",
+                {
+                    "username": self.rng.choice(self.command.usernames),
+                    "password": LOADTEST_PASSWORD,
+                },
+            )
+        self.token = result and result.get("access")
+        return bool(self.token)
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест: виртуальные покупатели повторяют сценарии "
+        "фронтенда против локально запущенного приложения"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users", type=int, default=10, help="Число виртуальных покупателей"
+        )
+        parser.add_argument(
+            "--duration", type=float, default=30.0, help="Длительность теста, с"
+        )
+        parser.add_argument(
+            "--ramp-up",
+            type=float,
+            default=0.0,
+            help="За сколько секунд запускаются все покупатели",
+        )
+        parser.add_argument(
+            "--think-time",
+            type=float,
+            default=0.0,
+            help="Средняя пауза покупателя между страницами, с",
+        )
+        parser.add_argument(
+            "--register-ratio",
+            type=float,
+            default=0.2,
+            help="Доля сессий с регистрацией (остальные входят в готовый аккаунт)",
+        )
+        parser.add_argument(
+            "--accounts",
+            type=int,
+            help=(
+                "Сколько готовых аккаунтов loadtest_N подготовить для входа "
+                "(по умолчанию - по одному на покупателя)"
+            ),
+        )
+        parser.add_argument(
+            "--host", default="127.0.0.1", help="Адрес встроенного сервера"
+        )
+        parser.add_argument(
+            "--port", type=int, default=0, help="Порт встроенного сервера (0 - любой)"
+        )
+        parser.add_argument(
+            "--url",
+            help="Нагружать уже запущенный сервер (например, http://127.0.0.1:8000)",
+        )
+        parser.add_argument(
+            "--throttle",
+            action="store_true",
+            help="Не отключать ограничение частоты входа встроенного сервера",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--output", help="Сохранить отчёт в JSON")
+
+    def handle(self, *args, **options):
+        if options["users"] < 1 or options["duration"] <= 0:
+            raise CommandError("--users и --duration должны быть положительными")
+        self.seed = options["seed"]
+        self.think_time = options["think_time"]
+        self.register_ratio = options["register_ratio"]
+        self.run_id = uuid.uuid4().hex[:8]
+        self.book_ids = list(
+            Book.objects.filter(stock__gt=0).values_list("id", flat=True)[:1000]
+        )
+        if not self.book_ids:
+            raise CommandError("Нет книг в наличии: заполните базу (populate_db)")
+        self.usernames = self.prepare_accounts(options["accounts"] or options["users"])
+
+        server = None
+        if options["url"]:
+            target = urlsplit(options["url"])
+            self.host, self.port = target.hostname, target.port or 80
+            self.prefix = target.path.rstrip("/") + "/api"
+        else:
+            server = self.start_server(options["host"], options["port"])
+            self.host, self.port = server.server_address[:2]
+            self.prefix = "/api"
+        self.stdout.write(
+            f"Цель: http://{self.host}:{self.port}{self.prefix}/, "
+            f"покупателей: {options['users']}, длительность: {options['duration']} с"
+        )
+
+        try:
+            with login_throttle(options["throttle"]):
+                report = self.run_users(
+                    options["users"], options["duration"], options["ramp_up"]
+                )
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+
+        self.print_report(report)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Отчёт сохранён в {options['output']}")
+
+    def prepare_accounts(self, count):
+        """Аккаунты для входа: создаются один раз, пароль хешируется один раз."""
+        usernames = [f"loadtest_{number}" for number in range(count)]
+        password = make_password(LOADTEST_PASSWORD)
+        User.objects.bulk_create(
+            [
+                User(username=name, email=f"{name}@example.com", password=password)
+                for name in usernames
+            ],
+            ignore_conflicts=True,
+        )
+        User.objects.filter(username__in=usernames).update(password=password)
+        return usernames
+
+    def start_server(self, host, port):
+        server = ThreadedWSGIServer((host, port), QuietRequestHandler)
+        server.set_app(get_internal_wsgi_application())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def run_users(self, count, duration, ramp_up):
+        started = time.monotonic()
+        deadline = started + ramp_up + duration
+        users = []
+        for index in range(count):
+            user = VirtualUser(index, self, deadline)
+            user.start()
+            users.append(user)
+            if ramp_up:
+                time.sleep(ramp_up / count)
+        for user in users:
+            user.join()
+        elapsed = time.monotonic() - started
+
+        steps = {}
+        total_requests = total_errors = 0
+        for step in STEPS:
+            samples = [sample for user in users for sample in user.samples[step]]
+            errors = Counter()
+            for user in users:
+                errors.update(user.errors[step])
+            if not samples:
+                continue
+            failed = sum(errors.values())
+            total_requests += len(samples)
+            total_errors += failed
+            steps[step] = {
+                "requests": len(samples),
+                "rps": len(samples) / elapsed,
+                "errors": failed,
+                "error_rate": failed / len(samples),
+                "error_kinds": dict(errors),
+                **latency_summary(samples),
+                "histogram": histogram(samples, HISTOGRAM_BOUNDS_MS),
+            }
+        all_samples = [
+            sample for user in users for step in STEPS for sample in user.samples[step]
+        ]
+        return {
+            "users": count,
+            "duration_s": elapsed,
+            "sessions": sum(user.sessions for user in users),
+            "requests": total_requests,
+            "rps": total_requests / elapsed,
+            "errors": total_errors,
+            "error_rate": total_errors / total_requests if total_requests else 0.0,
+            "latency": latency_summary(all_samples),
+            "steps": steps,
+        }
+
+    def print_report(self, report):
+        self.stdout.write(
+            f"\nСессий: {report['sessions']}, запросов: {report['requests']} "
+            f"({report['rps']:.1f}/с), ошибок: {report['errors']} "
+            f"({report['error_rate']:.1%}) за {report['duration_s']:.1f} с\n"
+        )
+        self.stdout.write(
+            f"{'шаг':<16}{'запросов':>9}{'в сек':>8}{'ошибки':>8}"
+            f"{'p50 мс':>9}{'p90 мс':>9}{'p99 мс':>9}{'max мс':>9}"
+        )
+        for step, result in report["steps"].items():
+            line = (
+                f"{step:<16}{result['requests']:>9}{result['rps']:>8.1f}"
+                f"{result['error_rate']:>8.1%}{result['p50_ms']:>9.1f}"
+                f"{result['p90_ms']:>9.1f}{result['p99_ms']:>9.1f}"
+                f"{result['max_ms']:>9.1f}"
+            )
+            style = self.style.ERROR if result["errors"] else self.style.SUCCESS
+            self.stdout.write(style(line))
+            if result["error_kinds"]:
+                kinds = ", ".join(
+                    f"{kind}: {number}"
+                    for kind, number in result["error_kinds"].items()
+                )
+                self.stdout.write(f"    ошибки: {kinds}")
+
+        self.stdout.write("\nГистограммы задержек (мс):")
+        for step, result in report["steps"].items():
+            self.stdout.write(f"  {step}")
+            peak = max(bucket["count"] for bucket in result["histogram"]) or 1
+            for bucket in result["histogram"]:
+                if bucket["le_ms"] is None:
+                    label = f"> {HISTOGRAM_BOUNDS_MS[-1]}"
+                else:
+                    label = f"<= {bucket['le_ms']}"
+                bar = "#" * round(40 * bucket["count"] / peak)
+                self.stdout.write(f"    {label:>9} {bucket['count']:>7} {bar}")
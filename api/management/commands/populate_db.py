@@ -2,17 +2,61 @@
 """
 Django management команда для заполнения базы данных
 Запуск: docker-compose exec web python manage.py populate_db
+
+Синтетические данные объёма продакшена для бенчмарков (см. api.synthetic):
+    python manage.py populate_db --scale 1          # 1M книг, 5M заказов, ...
+    python manage.py populate_db --scale 0.01 --seed 7 --reviews 0
 """
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 from api.models import Author, Book, Order, OrderItem, Review, User
+from api.services import recalculate_totals
+from api.synthetic import (
+    PRODUCTION_SCALE,
+    SYNTHETIC_PASSWORD,
+    generate,
+    scaled_counts,
+    validate_counts,
+)
+
+# Подписи таблиц в отчёте о синтетических данных
+TABLE_LABELS = {
+    "authors": "Авторы",
+    "books": "Книги",
+    "users": "Пользователи",
+    "orders": "Заказы",
+    "items": "Позиции заказов",
+    "reviews": "Отзывы",
+}
 
 
 class Command(BaseCommand):
     help = "Заполняет базу данных тестовыми данными"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale",
+            type=float,
+            help="Сгенерировать синтетические данные: доля объёмов продакшена "
+            "(1 = 1M книг, 100k авторов, 1M пользователей, 5M заказов, 10M отзывов)",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=42, help="Seed генератора (--scale)"
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=50_000, help="Строк в одной пачке"
+        )
+        for table in PRODUCTION_SCALE:
+            parser.add_argument(
+                f"--{table}", type=int, help=f"Переопределить число строк {table}"
+            )
+
     def handle(self, *args, **options):
+        if options["scale"] is not None:
+            self.populate_synthetic(options)
+            return
+
         self.stdout.write("=" * 70)
         self.stdout.write("ПОЛНОЕ ЗАПОЛНЕНИЕ БАЗЫ ДАННЫХ КНИЖНОГО МАГАЗИНА")
         self.stdout.write("=" * 70)
@@ -318,6 +362,7 @@ class Command(BaseCommand):
             },
         ]
 
+        created_orders = []
         for order_data in orders_data:
             user = users[order_data["user"]]
             items = order_data["items"]
@@ -334,11 +379,14 @@ class Command(BaseCommand):
                     price=book.price,
                 )
 
-            order.calculate_total()
+            created_orders.append(order.id)
             self.stdout.write(
                 f"  + Создан заказ #{order.id} для пользователя {user.username}"
             )
 
+        # Суммы всех заказов одним UPDATE
+        recalculate_totals(Order.objects.filter(id__in=created_orders))
+
         # ===== ШАГ 5: СОЗДАНИЕ ОТЗЫВОВ =====
         self.stdout.write("\n[5/5] Создание отзывов...")
 
@@ -462,3 +510,44 @@ class Command(BaseCommand):
         self.stdout.write("  Админ-панель: http://localhost:8000/admin/")
         self.stdout.write("  Swagger API: http://localhost:8000/api/schema/swagger-ui/")
         self.stdout.write("=" * 70)
+
+    def populate_synthetic(self, options):
+        """Генерация детерминированных синтетических данных (--scale)."""
+        counts = scaled_counts(
+            options["scale"], {table: options[table] for table in PRODUCTION_SCALE}
+        )
+        try:
+            validate_counts(counts)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(
+            "Синтетические данные (seed {}): {}".format(
+                options["seed"],
+                ", ".join(f"{table}={count}" for table, count in counts.items()),
+            )
+        )
+
+        def report(table, rows, seconds):
+            rate = f"{rows / seconds if seconds else 0:,.0f}".replace(",", " ")
+            self.stdout.write(
+                f"  {TABLE_LABELS[table]:<16} {rows:>10} строк "
+                f"за {seconds:7.2f} с  ({rate} строк/с)"
+            )
+
+        stats = generate(
+            counts,
+            seed=options["seed"],
+            chunk_size=options["chunk_size"],
+            report=report,
+        )
+        rows = sum(rows for rows, _ in stats.values())
+        seconds = sum(
+            seconds for table, (_, seconds) in stats.items() if table != "items"
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Готово: {rows} строк за {seconds:.1f} с. "
+                f"Пароль пользователей: {SYNTHETIC_PASSWORD}"
+            )
+        )
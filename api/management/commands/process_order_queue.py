@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Воркеры очереди приёма заказов (ORDER_INTAKE_ASYNC): оформляют заявки пачками.
+Запуск: python manage.py process_order_queue --workers 4 --loop
+"""
+
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api.services import drain_order_queue, requeue_stale_order_tickets
+
+
+class Command(BaseCommand):
+    help = "Оформляет заявки на заказ из очереди приёма"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=1, help="Потоков-воркеров")
+        parser.add_argument(
+            "--batch-size", type=int, default=100, help="Заявок в одной пачке"
+        )
+        parser.add_argument(
+            "--loop", action="store_true", help="Работать постоянно в фоне"
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0.2,
+            help="Пауза при пустой очереди, с",
+        )
+        parser.add_argument(
+            "--stale-after",
+            type=float,
+            default=300,
+            help="Через сколько секунд вернуть в очередь зависшие заявки",
+        )
+
+    def handle(self, *args, **options):
+        self.requeue_stale(options)
+
+        if options["workers"] == 1:
+            # Один воркер работает в основном потоке и его соединении с БД
+            processed = [self.drain(options)]
+        else:
+            processed = []
+            lock = threading.Lock()
+
+            def worker():
+                try:
+                    total = self.drain(options)
+                finally:
+                    connection.close()
+                with lock:
+                    processed.append(total)
+
+            threads = [
+                threading.Thread(target=worker) for _ in range(options["workers"])
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.stdout.write(f"Обработано заявок: {sum(processed)}")
+
+    def requeue_stale(self, options):
+        requeued = requeue_stale_order_tickets(
+            timedelta(seconds=options["stale_after"])
+        )
+        if requeued:
+            self.stdout.write(f"Возвращено в очередь зависших заявок: {requeued}")
+
+    def drain(self, options):
+        """Обрабатывает пачки, пока очередь не опустеет (с --loop - бесконечно)."""
+        total = 0
+        requeued_at = time.monotonic()
+        while True:
+            count = drain_order_queue(options["batch_size"])
+            total += count
+            if not count:
+                if not options["loop"]:
+                    return total
+                # Заявки упавших воркеров возвращаются в очередь и без перезапуска
+                if time.monotonic() - requeued_at >= options["stale_after"]:
+                    self.requeue_stale(options)
+                    requeued_at = time.monotonic()
+                time.sleep(options["interval"])
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+Пересчёт общих сумм заказов одним UPDATE (например, после переоценки).
+Запуск: python manage.py recalculate_order_totals [--status pending]
+"""
+
+from django.core.management.base import BaseCommand
+
+from api.models import Order
+from api.services import recalculate_totals
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает total_price заказов по их позициям"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--status",
+            choices=[choice for choice, _ in Order._meta.get_field("status").choices],
+            help="Только заказы с этим статусом",
+        )
+
+    def handle(self, *args, **options):
+        orders = Order.objects.all()
+        if options["status"]:
+            orders = orders.filter(status=options["status"])
+        fixed = recalculate_totals(orders)
+        self.stdout.write(f"Исправлено сумм заказов: {fixed}")
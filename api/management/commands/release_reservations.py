@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+Сборщик истёкших резервов: возвращает товар на склад пачками.
+Запуск: python manage.py release_reservations [--loop --interval 30]
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.services import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = "Снимает истёкшие резервы товара и возвращает остатки на склад"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="Резервов в одной пачке"
+        )
+        parser.add_argument(
+            "--loop", action="store_true", help="Работать постоянно в фоне"
+        )
+        parser.add_argument(
+            "--interval", type=float, default=30, help="Пауза между проходами, с"
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            released = release_expired_reservations(batch_size=options["batch_size"])
+            if released or not options["loop"]:
+                self.stdout.write(f"Снято резервов: {released}")
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
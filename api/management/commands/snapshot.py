@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Снимок таблиц api для быстрого сброса базы перед бенчмарками и нагрузочными
+тестами (см. api.snapshots).
+Запуск:
+    python manage.py snapshot save snapshots/large.zip
+    python manage.py snapshot restore snapshots/large.zip
+"""
+
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.snapshots import SnapshotError, restore_snapshot, save_snapshot
+
+
+class Command(BaseCommand):
+    help = "Сохраняет и восстанавливает снимок таблиц api"
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=["save", "restore"])
+        parser.add_argument("path", help="Файл снимка")
+        parser.add_argument(
+            "--compress-level",
+            type=int,
+            default=1,
+            choices=range(10),
+            help="Уровень сжатия (0 - без сжатия)",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Восстановить, даже если миграции api различаются",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        start = time.perf_counter()
+        try:
+            if options["action"] == "save":
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                manifest = save_snapshot(path, options["compress_level"])
+            else:
+                if not os.path.exists(path):
+                    raise CommandError(f"Файл снимка {path} не найден")
+                manifest = restore_snapshot(path, force=options["force"])
+        except SnapshotError as exc:
+            raise CommandError(str(exc))
+        elapsed = time.perf_counter() - start
+
+        rows = sum(entry["rows"] for entry in manifest["tables"])
+        size = os.path.getsize(path) / 1024 / 1024
+        action = "Сохранено" if options["action"] == "save" else "Восстановлено"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{action}: {len(manifest['tables'])} таблиц, {rows} строк, "
+                f"{size:.1f} МБ за {elapsed:.2f} с ({manifest['vendor']})"
+            )
+        )
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Управление шардированными остатками "горячих" книг.
+Запуск:
+    python manage.py stock_shards enable <book_id> --shards 8
+    python manage.py stock_shards disable <book_id>
+    python manage.py stock_shards rebalance [--loop --interval 5]
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import Book
+from api.services import (
+    disable_stock_sharding,
+    enable_stock_sharding,
+    rebalance_stock_shards,
+)
+
+
+class Command(BaseCommand):
+    help = "Включает, выключает и ребалансирует шарды остатков книг"
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=["enable", "disable", "rebalance"])
+        parser.add_argument("book_ids", nargs="*", type=int, help="id книг")
+        parser.add_argument("--shards", type=int, default=8, help="Шардов на книгу")
+        parser.add_argument(
+            "--loop", action="store_true", help="Ребалансировать постоянно в фоне"
+        )
+        parser.add_argument(
+            "--interval", type=float, default=5, help="Пауза между проходами, с"
+        )
+
+    def handle(self, *args, **options):
+        action = options["action"]
+        book_ids = options["book_ids"]
+        if action == "rebalance":
+            self.rebalance(book_ids or None, options)
+            return
+        if not book_ids:
+            raise CommandError("Укажите id книг")
+
+        for book_id in book_ids:
+            try:
+                if action == "enable":
+                    book = enable_stock_sharding(book_id, options["shards"])
+                else:
+                    book = disable_stock_sharding(book_id)
+            except Book.DoesNotExist:
+                raise CommandError(f"Книга с id {book_id} не найдена")
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            state = "шардирована" if book.stock_sharded else "без шардов"
+            self.stdout.write(f"{book.title}: {state}, остаток {book.stock}")
+
+    def rebalance(self, book_ids, options):
+        while True:
+            totals = rebalance_stock_shards(book_ids)
+            if not options["loop"]:
+                self.stdout.write(f"Ребалансировано книг: {len(totals)}")
+                return
+            time.sleep(options["interval"])
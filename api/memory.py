@@ -0,0 +1,241 @@
+"""
+Диагностика памяти долгоживущих воркеров.
+
+- tracemalloc: снимок памяти процесса, крупнейшие места выделения и разница
+  с предыдущим снимком (эндпоинт /api/debug/memory/ только для
+  администраторов): рост между двумя вызовами показывает, что накапливают
+  запросы, выполненные в промежутке;
+- RSS: MemoryMiddleware (MEMORY_DIAGNOSTICS) замеряет RSS процесса до и
+  после каждого запроса и рост пикового RSS, сводка - по маршрутам;
+- журнал SQL: при DEBUG Django хранит до 9000 запросов на подключение в
+  connection.queries. install_query_log_guard() отключает этот журнал,
+  если DEBUG включён вне отладочного контекста (runserver, shell).
+
+Все данные относятся к одному процессу: в ответе указан его pid.
+"""
+
+import logging
+import os
+import sys
+import threading
+import tracemalloc
+from collections import deque
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from .profiling import short_filename
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+logger = logging.getLogger("api.memory")
+
+GROUP_BY = ("lineno", "filename", "traceback")
+DEBUG_COMMANDS = ("runserver", "shell", "shell_plus", "dbshell", "test")
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def peak_rss():
+    """Пиковый RSS процесса в байтах (0, если недоступен)."""
+    if resource is None:
+        return 0
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт килобайты, macOS - байты
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+def current_rss():
+    """Текущий RSS процесса в байтах; без /proc - пиковый RSS."""
+    try:
+        with open("/proc/self/statm", "rb") as file:
+            return int(file.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        return peak_rss()
+
+
+class RequestMemoryStats:
+    """Рост RSS при обработке запросов, по маршрутам."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}
+
+    def record(self, route, rss_before, rss_after, peak_before, peak_after, traced):
+        growth = rss_after - rss_before
+        with self.lock:
+            stats = self.routes.get(route)
+            if stats is None:
+                stats = self.routes[route] = {
+                    "route": route,
+                    "requests": 0,
+                    "rss_growth_total": 0,
+                    "rss_growth_max": 0,
+                    "peak_raised": 0,
+                    "peak_raised_bytes": 0,
+                    "traced_peak_max": 0,
+                }
+            stats["requests"] += 1
+            stats["rss_growth_total"] += growth
+            stats["rss_growth_max"] = max(stats["rss_growth_max"], growth)
+            if peak_after > peak_before:
+                stats["peak_raised"] += 1
+                stats["peak_raised_bytes"] += peak_after - peak_before
+            if traced is not None:
+                stats["traced_peak_max"] = max(stats["traced_peak_max"], traced)
+
+    def report(self):
+        """Маршруты по убыванию суммарного роста RSS."""
+        with self.lock:
+            rows = [dict(stats) for stats in self.routes.values()]
+        return sorted(rows, key=lambda row: row["rss_growth_total"], reverse=True)
+
+    def clear(self):
+        with self.lock:
+            self.routes.clear()
+
+
+REQUEST_STATS = RequestMemoryStats()
+
+_baseline = None
+_snapshot_lock = threading.Lock()
+
+
+def start_tracing(frames=None):
+    """Запускает tracemalloc (если ещё не запущен) и сбрасывает базовый снимок."""
+    global _baseline
+    with _snapshot_lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames or settings.MEMORY_TRACEMALLOC_FRAMES)
+        _baseline = None
+
+
+def stop_tracing():
+    global _baseline
+    with _snapshot_lock:
+        tracemalloc.stop()
+        _baseline = None
+
+
+def take_snapshot():
+    """Снимок tracemalloc без выделений самого tracemalloc и импорта."""
+    return tracemalloc.take_snapshot().filter_traces(
+        (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        )
+    )
+
+
+def _traceback(statistic):
+    return [
+        f"{short_filename(frame.filename)}:{frame.lineno}"
+        for frame in statistic.traceback
+    ]
+
+
+def allocation_report(limit=20, group_by="lineno"):
+    """
+    Крупнейшие места выделения в новом снимке и разница с предыдущим
+    снимком; новый снимок становится базовым для следующего вызова.
+    """
+    global _baseline
+    with _snapshot_lock:
+        if not tracemalloc.is_tracing():
+            return None
+        snapshot = take_snapshot()
+        baseline, _baseline = _baseline, snapshot
+    current, peak = tracemalloc.get_traced_memory()
+    report = {
+        "frames": tracemalloc.get_traceback_limit(),
+        "current_bytes": current,
+        "peak_bytes": peak,
+        "top": [
+            {
+                "size": statistic.size,
+                "count": statistic.count,
+                "traceback": _traceback(statistic),
+            }
+            for statistic in snapshot.statistics(group_by)[:limit]
+        ],
+        "diff": None,
+    }
+    if baseline is not None:
+        report["diff"] = [
+            {
+                "size": statistic.size,
+                "size_diff": statistic.size_diff,
+                "count": statistic.count,
+                "count_diff": statistic.count_diff,
+                "traceback": _traceback(statistic),
+            }
+            for statistic in snapshot.compare_to(baseline, group_by)[:limit]
+        ]
+    return report
+
+
+def memory_report(limit=20, group_by="lineno"):
+    """Сводка по памяти процесса для эндпоинта диагностики."""
+    return {
+        "pid": os.getpid(),
+        "rss_bytes": current_rss(),
+        "peak_rss_bytes": peak_rss(),
+        "query_log": {
+            "debug": settings.DEBUG,
+            "guarded": _guard_installed,
+            "logged_queries": sum(
+                len(connection.queries_log) for connection in connections.all()
+            ),
+        },
+        "tracemalloc": allocation_report(limit, group_by),
+        "requests": REQUEST_STATS.report()[:limit],
+    }
+
+
+def is_debug_context(argv=None):
+    """Процесс - отладочный: manage.py runserver / shell / test."""
+    argv = sys.argv if argv is None else argv
+    return (
+        len(argv) > 1
+        and os.path.basename(argv[0]) in ("manage.py", "django-admin")
+        and argv[1] in DEBUG_COMMANDS
+    )
+
+
+def _disable_query_log(sender, connection, **kwargs):
+    connection.queries_log = deque(maxlen=0)
+
+
+_guard_installed = False
+
+
+def install_query_log_guard():
+    """
+    Отключает журнал connection.queries, если DEBUG включён в процессе, не
+    являющемся отладочным (воркер gunicorn, команды обработки очередей).
+    QUERY_LOG_ALLOWED=1 разрешает журнал явно.
+    """
+    global _guard_installed
+    if (
+        not settings.DEBUG
+        or settings.QUERY_LOG_ALLOWED
+        or is_debug_context()
+        or _guard_installed
+    ):
+        return False
+    connection_created.connect(_disable_query_log, dispatch_uid="query_log_guard")
+    for connection in connections.all(initialized_only=True):
+        _disable_query_log(None, connection)
+    _guard_installed = True
+    logger.info(
+        "DEBUG включён вне отладочного контекста (%s): журнал SQL "
+        "connection.queries отключён",
+        " ".join(sys.argv[:2]),
+    )
+    return True
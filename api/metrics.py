@@ -0,0 +1,475 @@
+"""
+Метрики в формате Prometheus с агрегацией по процессам gunicorn.
+
+Каждый процесс пишет свои значения в собственный mmap-файл
+METRICS_DIR/metrics_<pid>.db: запись - это поиск смещения в словаре
+процесса и изменение 8-байтового double под неконкурентной (в пределах
+процесса) блокировкой, без обращений к другим процессам. Эндпоинт /metrics
+читает файлы всех процессов и суммирует значения; для gauge учитываются
+только живые процессы.
+
+Файл завершившегося процесса (перезапуск воркера после max_requests)
+переносится в архив METRICS_DIR/archive_<pid>.db процесса-мастера
+(mark_process_dead из хука child_exit gunicorn): счётчики и гистограммы
+прибавляются к архиву, gauge отбрасываются, файл удаляется. При запуске
+приложения удаляются файлы и архивы процессов, которых уже нет, - они
+остались от прошлого запуска сервера.
+
+Формат файла: 8 байт заголовка (uint32 - занятая длина), затем записи
+(uint32 длина ключа, ключ UTF-8 с выравниванием до 8 байт, double значение).
+Новая запись сначала дописывается целиком, и только потом обновляется
+длина в заголовке, поэтому читатель всегда видит целые записи.
+"""
+
+import bisect
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+
+from django.conf import settings
+
+COUNTER, GAUGE, HISTOGRAM = "counter", "gauge", "histogram"
+STORE_PREFIX, ARCHIVE_PREFIX = "metrics_", "archive_"
+INITIAL_FILE_SIZE = 64 * 1024
+_HEADER = struct.Struct("I4x")
+_LENGTH = struct.Struct("I")
+_VALUE = struct.Struct("d")
+
+# Все объявленные метрики в порядке вывода
+REGISTRY = []
+
+
+def _padded(length):
+    """Длина ключа с выравниванием конца записи (4 + ключ) до 8 байт."""
+    return length + (8 - (_LENGTH.size + length) % 8) % 8
+
+
+def read_entries(data):
+    """Записи файла метрик: [(ключ, значение, смещение значения)]."""
+    if len(data) < _HEADER.size:
+        return []
+    used = _HEADER.unpack_from(data, 0)[0]
+    entries = []
+    position = _HEADER.size
+    while position < used:
+        length = _LENGTH.unpack_from(data, position)[0]
+        key_start = position + _LENGTH.size
+        key = bytes(data[key_start : key_start + length]).decode()
+        value_position = key_start + _padded(length)
+        value = _VALUE.unpack_from(data, value_position)[0]
+        entries.append((key, value, value_position))
+        position = value_position + _VALUE.size
+    return entries
+
+
+class MmapStore:
+    """Значения метрик одного процесса в mmap-файле: {ключ: float}."""
+
+    def __init__(self, path):
+        self.path = path
+        self.directory = os.path.dirname(path)
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.file = open(path, "a+b")
+        size = os.fstat(self.file.fileno()).st_size
+        if size == 0:
+            self.file.truncate(INITIAL_FILE_SIZE)
+            size = INITIAL_FILE_SIZE
+        self.mmap = mmap.mmap(self.file.fileno(), size)
+        self.used = _HEADER.unpack_from(self.mmap, 0)[0]
+        if not self.used:
+            self.used = _HEADER.size
+            _HEADER.pack_into(self.mmap, 0, self.used)
+        self.positions = {
+            key: position for key, _, position in read_entries(self.mmap)
+        }
+
+    def add(self, key, amount):
+        with self.lock:
+            position = self.positions.get(key)
+            if position is None:
+                position = self._append(key)
+            value = _VALUE.unpack_from(self.mmap, position)[0]
+            _VALUE.pack_into(self.mmap, position, value + amount)
+
+    def _append(self, key):
+        encoded = key.encode()
+        padded = _padded(len(encoded))
+        entry_size = _LENGTH.size + padded + _VALUE.size
+        while self.used + entry_size > len(self.mmap):
+            self._grow()
+        position = self.used
+        _LENGTH.pack_into(self.mmap, position, len(encoded))
+        start = position + _LENGTH.size
+        self.mmap[start : start + len(encoded)] = encoded
+        value_position = start + padded
+        _VALUE.pack_into(self.mmap, value_position, 0.0)
+        self.used += entry_size
+        _HEADER.pack_into(self.mmap, 0, self.used)
+        self.positions[key] = value_position
+        return value_position
+
+    def _grow(self):
+        size = len(self.mmap) * 2
+        self.mmap.close()
+        self.file.truncate(size)
+        self.mmap = mmap.mmap(self.file.fileno(), size)
+
+    def close(self):
+        self.mmap.close()
+        self.file.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+_archive_lock = threading.Lock()
+
+
+def get_store():
+    """mmap-хранилище текущего процесса (после fork создаётся заново)."""
+    store = _store
+    if (
+        store is None
+        or store.pid != os.getpid()
+        or store.directory != settings.METRICS_DIR
+    ):
+        store = _open_store()
+    return store
+
+
+def _open_store():
+    global _store
+    with _store_lock:
+        directory = settings.METRICS_DIR
+        if _store is None or _store.pid != os.getpid() or (
+            _store.directory != directory
+        ):
+            os.makedirs(directory, exist_ok=True)
+            _store = MmapStore(
+                os.path.join(directory, f"{STORE_PREFIX}{os.getpid()}.db")
+            )
+        return _store
+
+
+def _metric_files(directory=None):
+    """Файлы метрик каталога: [(путь, префикс, pid)]."""
+    files = []
+    for path in glob.glob(os.path.join(directory or settings.METRICS_DIR, "*.db")):
+        name = os.path.basename(path)[: -len(".db")]
+        for prefix in (STORE_PREFIX, ARCHIVE_PREFIX):
+            if name.startswith(prefix) and name[len(prefix) :].isdigit():
+                files.append((path, prefix, int(name[len(prefix) :])))
+    return files
+
+
+def mark_process_dead(pid, directory=None):
+    """
+    Переносит счётчики и гистограммы завершившегося процесса pid в архив
+    текущего процесса и удаляет его файл метрик.
+    """
+    directory = directory or settings.METRICS_DIR
+    path = os.path.join(directory, f"{STORE_PREFIX}{pid}.db")
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+    except FileNotFoundError:
+        return
+    gauges = {metric.name for metric in REGISTRY if metric.kind == GAUGE}
+    archive_path = os.path.join(directory, f"{ARCHIVE_PREFIX}{os.getpid()}.db")
+    with _archive_lock:
+        archive = MmapStore(archive_path)
+        try:
+            for key, value, _ in read_entries(data):
+                if json.loads(key)[0] not in gauges:
+                    archive.add(key, value)
+        finally:
+            archive.close()
+        os.remove(path)
+
+
+def remove_dead_files(directory=None):
+    """Удаляет файлы и архивы метрик процессов, которых уже нет."""
+    for path, _, pid in _metric_files(directory):
+        if not _pid_alive(pid):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def clear_metrics_dir(directory=None):
+    """Удаляет файлы метрик (при старте сервера, до запуска воркеров)."""
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+            _store = None
+    for path in glob.glob(os.path.join(directory or settings.METRICS_DIR, "*.db")):
+        os.remove(path)
+
+
+class Metric:
+    """Метрика с фиксированным набором меток; значения пишутся в get_store()."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._keys = {}
+        REGISTRY.append(self)
+
+    def key(self, suffix, labels, extra=()):
+        """Ключ записи в хранилище; строится один раз на набор меток."""
+        cache_key = (suffix, labels, extra)
+        key = self._keys.get(cache_key)
+        if key is None:
+            pairs = list(zip(self.labelnames, labels)) + list(extra)
+            key = json.dumps([self.name + suffix, pairs], ensure_ascii=False)
+            self._keys[cache_key] = key
+        return key
+
+
+class Counter(Metric):
+    kind = COUNTER
+
+    def inc(self, labels=(), amount=1.0):
+        get_store().add(self.key("", labels), amount)
+
+
+class Gauge(Metric):
+    """Gauge, суммируемый по живым процессам."""
+
+    kind = GAUGE
+
+    def inc(self, labels=(), amount=1.0):
+        get_store().add(self.key("", labels), amount)
+
+    def dec(self, labels=(), amount=1.0):
+        get_store().add(self.key("", labels), -amount)
+
+
+class Histogram(Metric):
+    kind = HISTOGRAM
+
+    def __init__(self, name, documentation, labelnames=(), buckets=()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self.bucket_labels = [format_value(bound) for bound in self.buckets]
+
+    def observe(self, value, labels=()):
+        store = get_store()
+        index = bisect.bisect_left(self.buckets, value)
+        bucket = (("le", self.bucket_labels[index]),)
+        store.add(self.key("_bucket", labels, bucket), 1.0)
+        store.add(self.key("_sum", labels), value)
+        store.add(self.key("_count", labels), 1.0)
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def collect(directory=None):
+    """Суммирует значения всех процессов: {(имя, метки): значение}."""
+    gauges = {metric.name for metric in REGISTRY if metric.kind == GAUGE}
+    samples = {}
+    for path, prefix, pid in _metric_files(directory):
+        # В архиве только счётчики и гистограммы завершившихся процессов
+        alive = prefix == STORE_PREFIX and _pid_alive(pid)
+        with open(path, "rb") as file:
+            data = file.read()
+        for key, value, _ in read_entries(data):
+            name, pairs = json.loads(key)
+            if name in gauges and not alive:
+                continue
+            sample = (name, tuple(tuple(pair) for pair in pairs))
+            samples[sample] = samples.get(sample, 0.0) + value
+    return samples
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def render_metrics(directory=None):
+    """Текстовый формат Prometheus 0.0.4 для всех метрик REGISTRY."""
+    samples = collect(directory)
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        if metric.kind == HISTOGRAM:
+            lines.extend(_render_histogram(metric, samples))
+            continue
+        for (name, pairs), value in sorted(samples.items()):
+            if name == metric.name:
+                lines.append(f"{name}{_format_labels(pairs)} {format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _render_histogram(metric, samples):
+    # Корзины хранятся некумулятивно, в выводе - накопленные суммы
+    series = {}
+    for (name, pairs), value in samples.items():
+        if name == metric.name + "_bucket":
+            labels, le = pairs[:-1], pairs[-1][1]
+            series.setdefault(labels, {})[le] = value
+    lines = []
+    for labels in sorted(series):
+        total = 0.0
+        for le in metric.bucket_labels:
+            total += series[labels].get(le, 0.0)
+            pairs = labels + (("le", le),)
+            lines.append(
+                f"{metric.name}_bucket{_format_labels(pairs)} {format_value(total)}"
+            )
+        for suffix in ("_sum", "_count"):
+            value = samples.get((metric.name + suffix, labels), 0.0)
+            lines.append(
+                f"{metric.name}{suffix}{_format_labels(labels)} {format_value(value)}"
+            )
+    return lines
+
+
+# Метрики приложения
+REQUESTS = Counter(
+    "bookstore_http_requests_total",
+    "Число HTTP-запросов",
+    ("route", "method", "status"),
+)
+REQUEST_DURATION = Histogram(
+    "bookstore_http_request_duration_seconds",
+    "Время обработки HTTP-запроса",
+    ("route", "method"),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+DB_QUERIES = Counter(
+    "bookstore_db_queries_total",
+    "Число SQL-запросов, выполненных при обработке HTTP-запросов",
+    ("route", "method"),
+)
+DB_DURATION = Counter(
+    "bookstore_db_query_seconds_total",
+    "Суммарное время SQL-запросов при обработке HTTP-запросов",
+    ("route", "method"),
+)
+CACHE_REQUESTS = Counter(
+    "bookstore_cache_requests_total",
+    "Обращения к кэшу: result=hit или miss",
+    ("cache", "result"),
+)
+IN_FLIGHT = Gauge(
+    "bookstore_http_requests_in_flight",
+    "Запросы, обрабатываемые в данный момент",
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "bookstore_db_pool_connections",
+    "Подключения пулов БД: state=idle (свободные) или busy (выданные)",
+    ("alias", "state"),
+)
+DB_POOL_CHECKOUTS = Counter(
+    "bookstore_db_pool_checkouts_total",
+    "Выдачи подключений из пула: result=reused, new или timeout",
+    ("alias", "result"),
+)
+DB_POOL_WAIT = Histogram(
+    "bookstore_db_pool_wait_seconds",
+    "Время получения подключения из пула, включая открытие нового",
+    ("alias",),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5),
+)
+DB_POOL_DISCARDED = Counter(
+    "bookstore_db_pool_discarded_total",
+    "Закрытые пулом подключения: reason=health_check, broken, idle, lifetime, "
+    "discarded или closed",
+    ("alias", "reason"),
+)
+DB_READ_ROUTING = Counter(
+    "bookstore_db_read_routing_total",
+    "Базы чтения запросов каталога и экспорта: reason=replica, lag (все реплики "
+    "отстают или недоступны) или pinned (клиент недавно писал)",
+    ("database", "reason"),
+)
+AUTH_REJECTED = Counter(
+    "bookstore_auth_rejected_total",
+    "Отклонённые попытки входа и регистрации: reason=throttle_ip, "
+    "throttle_username (token bucket) или hash_busy (пул хэширования занят)",
+    ("reason",),
+)
+PASSWORD_HASH_WAIT = Histogram(
+    "bookstore_password_hash_wait_seconds",
+    "Ожидание места в пуле хэширования паролей",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+
+def record_cache(cache, hit):
+    """Учитывает обращение к кэшу cache (для доли попаданий)."""
+    if settings.METRICS_ENABLED:
+        CACHE_REQUESTS.inc((cache, "hit" if hit else "miss"))
+
+
+def record_pool_checkout(alias, result, wait):
+    """Учитывает выдачу подключения пулом alias (wait=None при таймауте)."""
+    if settings.METRICS_ENABLED:
+        DB_POOL_CHECKOUTS.inc((alias, result))
+        if wait is not None:
+            DB_POOL_WAIT.observe(wait, (alias,))
+
+
+def record_pool_discard(alias, reason):
+    """Учитывает подключение, закрытое пулом alias."""
+    if settings.METRICS_ENABLED:
+        DB_POOL_DISCARDED.inc((alias, reason))
+
+
+def record_pool_size(alias, idle, busy):
+    """Изменяет число свободных и выданных подключений пула alias."""
+    if settings.METRICS_ENABLED:
+        if idle:
+            DB_POOL_CONNECTIONS.inc((alias, "idle"), idle)
+        if busy:
+            DB_POOL_CONNECTIONS.inc((alias, "busy"), busy)
+
+
+def record_read_routing(database, reason):
+    """Учитывает выбор базы чтения для запроса каталога или экспорта."""
+    if settings.METRICS_ENABLED:
+        DB_READ_ROUTING.inc((database, reason))
+
+
+def record_auth_rejected(reason):
+    """Учитывает попытку входа или регистрации, отклонённую до хэширования."""
+    if settings.METRICS_ENABLED:
+        AUTH_REJECTED.inc((reason,))
+
+
+def record_password_hash_wait(wait):
+    """Учитывает ожидание задачи в пуле хэширования паролей."""
+    if settings.METRICS_ENABLED:
+        PASSWORD_HASH_WAIT.observe(wait)
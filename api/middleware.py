@@ -0,0 +1,640 @@
+"""
+Middleware приложения api.
+"""
+
+import gzip
+import hashlib
+import logging
+import random
+import time
+import tracemalloc
+from contextlib import ExitStack
+
+from asgiref.sync import (
+    async_to_sync,
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import has_vary_header, patch_vary_headers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from . import db_router, memory, metrics, profiling
+from .hashing import PasswordHashingBusy
+from .instrumentation import RequestTimings
+from .query_budget import QueryRecorder, get_query_budget, report_over_budget
+from .slow_queries import SlowQueryLog, report_slow_queries
+
+performance_logger = logging.getLogger("api.performance")
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - зависит от окружения
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - зависит от окружения
+    zstandard = None
+
+
+def _gzip(data):
+    return gzip.compress(data, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def _brotli(data):
+    return brotli.compress(data, quality=settings.COMPRESSION_BROTLI_QUALITY)
+
+
+def _zstd(data):
+    return zstandard.ZstdCompressor(level=settings.COMPRESSION_ZSTD_LEVEL).compress(data)
+
+
+def available_encoders():
+    """Доступные кодировки в порядке предпочтения сервера."""
+    encoders = []
+    if brotli is not None:
+        encoders.append(("br", _brotli))
+    if zstandard is not None:
+        encoders.append(("zstd", _zstd))
+    encoders.append(("gzip", _gzip))
+    return encoders
+
+
+ENCODERS = available_encoders()
+
+
+def parse_accept_encoding(header):
+    """Разбирает Accept-Encoding в словарь {кодировка: q}."""
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def negotiate_encoding(header):
+    """
+    Выбирает кодировку из Accept-Encoding: максимальный q, при равенстве -
+    порядок предпочтения сервера (br, zstd, gzip). Возвращает (имя, функция)
+    или None.
+    """
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get("*", 0.0)
+    best = None
+    best_quality = 0.0
+    for name, encoder in ENCODERS:
+        quality = accepted.get(name, wildcard)
+        if quality > best_quality:
+            best, best_quality = (name, encoder), quality
+    return best
+
+
+class HybridMiddleware:
+    """
+    Основа middleware, работающих и в синхронной (WSGI), и в асинхронной
+    (ASGI) цепочке, как django.utils.deprecation.MiddlewareMixin. В
+    асинхронной цепочке __call__ возвращает корутину __acall__: Django не
+    переводит запрос в поток между middleware, и асинхронные представления
+    (api.async_views) не теряют смысла.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+
+def install_execute_wrapper(stack, wrapper):
+    """Ставит wrapper на подключения текущего потока до закрытия stack."""
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(wrapper))
+
+
+async def ainstall_execute_wrapper(stack, wrapper):
+    """
+    install_execute_wrapper для асинхронной цепочки. Подключения Django
+    принадлежат потоку, а асинхронный ORM выполняет запросы в потоке запроса
+    (sync_to_async с thread_sensitive): wrapper ставится там же. Закрывать
+    stack нужно так же - await sync_to_async(stack.close)().
+    """
+    await sync_to_async(install_execute_wrapper)(stack, wrapper)
+
+
+class CompressionMiddleware(HybridMiddleware):
+    """
+    Сжимает JSON-ответы API (gzip, а также brotli / zstd, если установлены
+    пакеты brotli / zstandard) по заголовку Accept-Encoding.
+
+    Сжатые байты GET-ответов кэшируются по хэшу тела: повторные одинаковые
+    страницы каталога отдаются из кэша без повторного сжатия. Кэшируются
+    только общие для всех ответы: запрос без Authorization и cookie
+    сессии, ответ без Set-Cookie, Vary: Authorization / Cookie и
+    Cache-Control: private / no-store. Ответы с данными пользователя
+    сжимаются заново каждый раз (BREACH).
+    """
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if not self.should_compress(request, response):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        chosen = negotiate_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if chosen is None:
+            return response
+
+        name, encoder = chosen
+        body = response.content
+        if self.is_shared(request, response):
+            compressed = self.compress_cached(name, encoder, body)
+        else:
+            compressed = encoder(body)
+        if len(compressed) >= len(body):
+            return response
+
+        response.content = compressed
+        response.headers["Content-Length"] = str(len(compressed))
+        response.headers["Content-Encoding"] = name
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        return response
+
+    def should_compress(self, request, response):
+        if not request.path.startswith(settings.COMPRESSION_PATH_PREFIX):
+            return False
+        if response.streaming or response.status_code != 200:
+            return False
+        if response.has_header("Content-Encoding"):
+            return False
+        if not response.get("Content-Type", "").startswith("application/json"):
+            return False
+        return len(response.content) >= settings.COMPRESSION_MIN_SIZE
+
+    def is_shared(self, request, response):
+        """Ответ одинаков для всех клиентов, и его сжатые байты можно кэшировать."""
+        if request.method != "GET" or response.cookies:
+            return False
+        if "HTTP_AUTHORIZATION" in request.META:
+            return False
+        if settings.SESSION_COOKIE_NAME in request.COOKIES:
+            return False
+        if has_vary_header(response, "Authorization") or has_vary_header(
+            response, "Cookie"
+        ):
+            return False
+        cache_control = response.get("Cache-Control", "").lower()
+        return "private" not in cache_control and "no-store" not in cache_control
+
+    def compress_cached(self, name, encoder, body):
+        cache = caches[settings.COMPRESSION_CACHE_ALIAS]
+        digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        key = f"compressed:{name}:{digest}"
+        compressed = cache.get(key)
+        metrics.record_cache("compression", compressed is not None)
+        if compressed is None:
+            compressed = encoder(body)
+            cache.set(key, compressed, settings.COMPRESSION_CACHE_TIMEOUT)
+        return compressed
+
+
+class HashingBusyMiddleware(HybridMiddleware):
+    """
+    Ответ 503 с Retry-After, когда пул хэширования паролей занят
+    (api.hashing.PasswordHashingBusy): в представлениях API, во входе в
+    админку и в любом другом месте, где проверяется пароль. API получает
+    JSON как от исключений DRF.
+    """
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, PasswordHashingBusy):
+            return None
+        if request.path.startswith("/api/"):
+            response = JsonResponse(
+                {"detail": str(exception)},
+                status=503,
+                json_dumps_params={"ensure_ascii": False},
+            )
+        else:
+            response = HttpResponse(str(exception), status=503)
+        response.headers["Retry-After"] = str(exception.wait)
+        return response
+
+
+class QueryBudgetMiddleware(HybridMiddleware):
+    """
+    Режим разработки (QUERY_BUDGET_CHECK): считает SQL-запросы каждого
+    запроса и пишет в лог api.query_budget те, что превысили бюджет
+    представления (api.query_budget), вместе с повторявшимся SQL.
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERY_BUDGET_CHECK:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        self.check_budget(request, recorder)
+        return response
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        await sync_to_async(recorder.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(recorder.__exit__)(None, None, None)
+        self.check_budget(request, recorder)
+        return response
+
+    def check_budget(self, request, recorder):
+        # Представление берётся из resolver_match, а не из process_view:
+        # синхронный process_view в асинхронной цепочке переводит запрос в поток
+        match = getattr(request, "resolver_match", None)
+        budget = get_query_budget(match.func, request.method) if match else None
+        if budget is not None and len(recorder.queries) > budget:
+            report_over_budget(request, budget, recorder)
+
+
+class PerformanceMiddleware(HybridMiddleware):
+    """
+    Для доли запросов PERFORMANCE_SAMPLE_RATE измеряет время БД и число
+    SQL-запросов, сериализацию, рендеринг и полное время (api.instrumentation).
+    Результат отдаётся в заголовке Server-Timing (PERFORMANCE_SERVER_TIMING)
+    и пишется в лог api.performance структурированными полями.
+    """
+
+    def __init__(self, get_response):
+        self.sample_rate = settings.PERFORMANCE_SAMPLE_RATE
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        with RequestTimings() as timings:
+            response = self.get_response(request)
+        return self.report(request, response, timings)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        async with RequestTimings() as timings:
+            response = await self.get_response(request)
+        return self.report(request, response, timings)
+
+    def sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def report(self, request, response, timings):
+        if settings.PERFORMANCE_SERVER_TIMING:
+            response.headers["Server-Timing"] = timings.server_timing()
+
+        match = getattr(request, "resolver_match", None)
+        fields = {
+            "method": request.method,
+            "path": request.path,
+            "view": match.view_name if match else None,
+            "status": response.status_code,
+            **timings.as_fields(),
+        }
+        performance_logger.info("request", extra={"fields": fields})
+        return response
+
+
+class ProfilingMiddleware(HybridMiddleware):
+    """
+    Профилирование запросов администраторами (?_profile=1 или stacks,
+    заголовок X-Profile) и непрерывное сэмплирование стеков при
+    PROFILING_SAMPLING, см. api.profiling.
+    """
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        mode = profiling.requested_mode(request)
+        if mode is not None:
+            user = profiling.profiling_user(request)
+            if user is not None:
+                return profiling.profile_request(
+                    self.get_response, request, mode, user
+                )
+
+        sampler = profiling.get_continuous_sampler()
+        if sampler is None:
+            return self.get_response(request)
+        sampler.enter()
+        try:
+            return self.get_response(request)
+        finally:
+            sampler.exit()
+
+    async def __acall__(self, request):
+        """
+        В асинхронной цепочке профилируется синхронная часть запроса (ORM,
+        сериализация), выполняемая в потоке запроса. Непрерывное
+        сэмплирование не применяется: поток цикла событий не принадлежит
+        одному запросу.
+        """
+        mode = profiling.requested_mode(request)
+        if mode is not None:
+            user = await sync_to_async(profiling.profiling_user)(request)
+            if user is not None:
+                return await sync_to_async(profiling.profile_request)(
+                    async_to_sync(self.get_response), request, mode, user
+                )
+        return await self.get_response(request)
+
+
+class SlowQueryMiddleware(HybridMiddleware):
+    """
+    Журнал медленных SQL-запросов (api.slow_queries): запросы дольше
+    SLOW_QUERY_THRESHOLD_MS пишутся в лог api.slow_queries с местом вызова
+    и планом и суммируются по шаблону в SlowQuery. Порог 0 отключает журнал.
+    """
+
+    def __init__(self, get_response):
+        self.threshold = settings.SLOW_QUERY_THRESHOLD_MS
+        if not self.threshold:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with SlowQueryLog(self.threshold, settings.SLOW_QUERY_EXPLAIN) as log:
+            response = self.get_response(request)
+        if log.queries:
+            report_slow_queries(log.queries, self.view_name(request))
+        return response
+
+    async def __acall__(self, request):
+        log = SlowQueryLog(self.threshold, settings.SLOW_QUERY_EXPLAIN)
+        await sync_to_async(log.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(log.__exit__)(None, None, None)
+        if log.queries:
+            await sync_to_async(report_slow_queries)(
+                log.queries, self.view_name(request)
+            )
+        return response
+
+    def view_name(self, request):
+        match = getattr(request, "resolver_match", None)
+        return match.view_name if match else ""
+
+
+class ReplicaMiddleware(HybridMiddleware):
+    """
+    Чтение с реплик БД (api.db_router): GET-запросы маршрутов
+    REPLICA_READ_ROUTES читают с реплики, если клиент недавно не писал.
+    Изменяющий запрос закрепляет клиента за default на
+    REPLICA_STICKY_SECONDS: cookie REPLICA_PIN_COOKIE и отметка в кэше для
+    пользователя. Без REPLICA_DATABASES middleware отключён.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REPLICA_DATABASES:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.routes = frozenset(settings.REPLICA_READ_ROUTES)
+        self.jwt = JWTAuthentication()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        # process_view включает чтение с реплики, здесь оно выключается
+        token = db_router.disable_replica_reads()
+        try:
+            response = self.get_response(request)
+        finally:
+            db_router.restore_replica_reads(token)
+        if request.method not in SAFE_METHODS:
+            self.pin(request, response)
+        return response
+
+    async def __acall__(self, request):
+        token = db_router.disable_replica_reads()
+        try:
+            response = await self.get_response(request)
+        finally:
+            db_router.restore_replica_reads(token)
+        if request.method not in SAFE_METHODS:
+            await sync_to_async(self.pin)(request, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return None
+        if request.resolver_match.url_name not in self.routes:
+            return None
+        if self.pinned(request):
+            metrics.record_read_routing("default", "pinned")
+        else:
+            db_router.enable_replica_reads()
+        return None
+
+    def pinned(self, request):
+        """Клиент писал за последние REPLICA_STICKY_SECONDS секунд."""
+        if settings.REPLICA_PIN_COOKIE in request.COOKIES:
+            return True
+        user_id = self.user_id(request)
+        return user_id is not None and db_router.is_pinned(user_id)
+
+    def user_id(self, request):
+        """Пользователь запроса по токену JWT или сессии, если они есть."""
+        header = self.jwt.get_header(request)
+        if header is not None:
+            raw_token = self.jwt.get_raw_token(header)
+            if raw_token is None:
+                return None
+            try:
+                token = self.jwt.get_validated_token(raw_token)
+            except InvalidToken:
+                return None
+            return token.get(jwt_settings.USER_ID_CLAIM)
+        if settings.SESSION_COOKIE_NAME in request.COOKIES:
+            user = getattr(request, "user", None)
+            if user is not None and user.is_authenticated:
+                return user.pk
+        return None
+
+    def pin(self, request, response):
+        response.set_cookie(
+            settings.REPLICA_PIN_COOKIE,
+            "1",
+            max_age=settings.REPLICA_STICKY_SECONDS,
+            httponly=True,
+            samesite="Lax",
+        )
+        # Пользователь, аутентифицированный DRF (JWT) или сессией
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            db_router.pin_user(user.pk)
+
+
+class MemoryMiddleware(HybridMiddleware):
+    """
+    Диагностика памяти (MEMORY_DIAGNOSTICS): RSS процесса до и после каждого
+    запроса, рост пикового RSS и, если запущен tracemalloc, пик выделенной
+    Python-памяти за запрос (при нескольких потоках или параллельных
+    запросах ASGI - приблизительно). Сводка по маршрутам - в
+    /api/debug/memory/ (api.memory).
+    """
+
+    def __init__(self, get_response):
+        if not settings.MEMORY_DIAGNOSTICS:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        before = self.start()
+        response = self.get_response(request)
+        self.record(request, *before)
+        return response
+
+    async def __acall__(self, request):
+        before = self.start()
+        response = await self.get_response(request)
+        self.record(request, *before)
+        return response
+
+    def start(self):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+        return tracing, memory.current_rss(), memory.peak_rss()
+
+    def record(self, request, tracing, rss_before, peak_before):
+        traced = tracemalloc.get_traced_memory()[1] if tracing else None
+        match = getattr(request, "resolver_match", None)
+        route = "/" + match.route if match else "<unmatched>"
+        memory.REQUEST_STATS.record(
+            route,
+            rss_before,
+            memory.current_rss(),
+            peak_before,
+            memory.peak_rss(),
+            traced,
+        )
+
+
+class QueryCounter:
+    """execute_wrapper: число и суммарное время SQL-запросов."""
+
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.queries += 1
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """
+    Метрики Prometheus (api.metrics) для каждого запроса: число запросов и
+    гистограмма задержки по маршруту, SQL-запросы и их время, запросы в
+    обработке. Включается настройкой METRICS_ENABLED.
+    """
+
+    # Прочие методы - "OTHER": метод приходит от клиента, и произвольные
+    # значения создавали бы неограниченное число рядов метрик
+    METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"))
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        counter = QueryCounter()
+        metrics.IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                install_execute_wrapper(stack, counter)
+                response = self.get_response(request)
+        finally:
+            metrics.IN_FLIGHT.dec()
+        self.record(request, response, counter, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        metrics.IN_FLIGHT.inc()
+        start = time.perf_counter()
+        stack = ExitStack()
+        try:
+            await ainstall_execute_wrapper(stack, counter)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            metrics.IN_FLIGHT.dec()
+        self.record(request, response, counter, time.perf_counter() - start)
+        return response
+
+    def record(self, request, response, counter, duration):
+        match = getattr(request, "resolver_match", None)
+        # Маршрут-шаблон, а не путь: число рядов метрик не растёт с id
+        route = "/" + match.route if match else "<unmatched>"
+        method = request.method if request.method in self.METHODS else "OTHER"
+        labels = (route, method)
+        metrics.REQUESTS.inc((route, method, str(response.status_code)))
+        metrics.REQUEST_DURATION.observe(duration, labels)
+        metrics.DB_QUERIES.inc(labels, counter.queries)
+        metrics.DB_DURATION.inc(labels, counter.duration)
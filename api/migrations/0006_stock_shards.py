@@ -0,0 +1,33 @@
+# Generated by Django 4.2.15 on 2026-10-19 08:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_stockreservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='stock_sharded',
+            field=models.BooleanField(default=False, verbose_name='Шардированный остаток'),
+        ),
+        migrations.CreateModel(
+            name='StockShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField(verbose_name='Номер шарда')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='Количество')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_shards', to='api.book', verbose_name='Книга')),
+            ],
+            options={
+                'verbose_name': 'Шард остатка',
+                'verbose_name_plural': 'Шарды остатков',
+                'unique_together': {('book', 'index')},
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.15 on 2026-10-19 09:01
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_stock_shards'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderTicket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('ticket', models.UUIDField(default=uuid.uuid4, editable=False, unique=True, verbose_name='Номер заявки')),
+                ('items', models.JSONField(verbose_name='Товары')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('processing', 'Обрабатывается'), ('done', 'Оформлен'), ('failed', 'Отклонён')], default='queued', max_length=20, verbose_name='Статус')),
+                ('error', models.CharField(blank=True, max_length=255, verbose_name='Ошибка')),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.order', verbose_name='Заказ')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_tickets', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Заявка на заказ',
+                'verbose_name_plural': 'Заявки на заказ',
+                'indexes': [models.Index(fields=['status', 'created_at'], name='api_orderti_status_709794_idx')],
+            },
+        ),
+    ]
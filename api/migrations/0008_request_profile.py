@@ -0,0 +1,38 @@
+# Generated by Django 4.2.15 on 2026-10-19 09:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_orderticket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('kind', models.CharField(choices=[('cprofile', 'cProfile (pstats)'), ('stacks', 'Стеки запроса (collapsed)'), ('sampling', 'Непрерывное сэмплирование (collapsed)')], max_length=20, verbose_name='Вид')),
+                ('method', models.CharField(blank=True, max_length=10, verbose_name='Метод')),
+                ('path', models.CharField(blank=True, max_length=500, verbose_name='Путь')),
+                ('view_name', models.CharField(blank=True, max_length=200, verbose_name='Маршрут')),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Код ответа')),
+                ('duration_ms', models.FloatField(verbose_name='Длительность, мс')),
+                ('samples', models.PositiveIntegerField(default=0, verbose_name='Сэмплов')),
+                ('summary', models.TextField(blank=True, verbose_name='Сводка')),
+                ('data', models.BinaryField(verbose_name='Данные профиля')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Профиль запроса',
+                'verbose_name_plural': 'Профили запросов',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.15 on 2026-10-19 09:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_request_profile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('digest', models.CharField(max_length=32, unique=True, verbose_name='Хэш шаблона')),
+                ('fingerprint', models.TextField(verbose_name='Шаблон SQL')),
+                ('example_sql', models.TextField(verbose_name='Пример запроса')),
+                ('calls', models.PositiveIntegerField(default=0, verbose_name='Число запросов')),
+                ('total_ms', models.FloatField(default=0, verbose_name='Суммарное время, мс')),
+                ('max_ms', models.FloatField(default=0, verbose_name='Максимальное время, мс')),
+                ('view_name', models.CharField(blank=True, max_length=200, verbose_name='Маршрут')),
+                ('origin', models.TextField(blank=True, verbose_name='Место вызова')),
+                ('plan', models.TextField(blank=True, verbose_name='План (EXPLAIN)')),
+            ],
+            options={
+                'verbose_name': 'Медленный запрос',
+                'verbose_name_plural': 'Медленные запросы',
+                'ordering': ['-total_ms'],
+            },
+        ),
+    ]
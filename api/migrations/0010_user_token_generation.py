@@ -0,0 +1,18 @@
+# Generated by Django 4.2.15 on 2026-10-19 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_slow_query'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='token_generation',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Поколение токенов'),
+        ),
+    ]
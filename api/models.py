@@ -1,5 +1,11 @@
+import uuid
+from decimal import Decimal
+
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 
 class BaseModel(models.Model):
@@ -19,6 +25,56 @@ class User(AbstractUser, BaseModel):
     role = models.CharField(
         max_length=10, choices=ROLE_CHOICES, default="user", verbose_name="Роль"
     )
+    # Поколение JWT: токены с меньшим gen отозваны (api.authentication)
+    token_generation = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Поколение токенов"
+    )
+
+    # Изменение этих полей отзывает выданные JWT (api.authentication)
+    TOKEN_FIELDS = ("username", "role", "is_active", "password")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_token_fields()
+        return instance
+
+    def remember_token_fields(self, names=TOKEN_FIELDS):
+        loaded = self.__dict__.setdefault("_token_fields", {})
+        for name in self.TOKEN_FIELDS:
+            if name in names and name in self.__dict__:
+                loaded[name] = self.__dict__[name]
+
+    def token_fields_changed(self):
+        """Изменились ли загруженные из БД поля TOKEN_FIELDS."""
+        loaded = getattr(self, "_token_fields", {})
+        return any(
+            self.__dict__.get(name, value) != value for name, value in loaded.items()
+        )
+
+    def refresh_from_db(self, using=None, fields=None):
+        # Пользователь из claims JWT загружен без остальных полей: первое
+        # обращение к отложенному полю загружает их все одним запросом
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred.issuperset(fields):
+            fields = deferred
+        super().refresh_from_db(using, fields)
+        self.remember_token_fields(self.TOKEN_FIELDS if fields is None else fields)
+
+    def save(self, *args, **kwargs):
+        # token_generation увеличивает только revoke_tokens (UPDATE с F()):
+        # save() экземпляра, загруженного до отзыва, не возвращает старое
+        # поколение и не делает отозванные токены снова действительными
+        if not self._state.adding and not args and kwargs.keys() <= {"using"}:
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred
+                and field.name != "token_generation"
+            ]
+        super().save(*args, **kwargs)
 
     class Meta:
         verbose_name = "Пользователь"
@@ -48,6 +104,10 @@ class Book(BaseModel):
     cover_image = models.URLField(
         max_length=500, blank=True, null=True, verbose_name="Ссылка на обложку"
     )
+    # Остаток хранится в StockShard, stock - кэшированная сумма шардов
+    stock_sharded = models.BooleanField(
+        default=False, verbose_name="Шардированный остаток"
+    )
 
     def __str__(self):
         return self.title
@@ -82,9 +142,23 @@ class Order(BaseModel):
         return f"Заказ {self.id} от {self.user.username}"
 
     def calculate_total(self):
-        total = sum(item.price * item.quantity for item in self.items.all())
+        """
+        Пересчитывает общую стоимость агрегатом SUM(price * quantity) в БД и
+        записывает только total_price (и updated_at), без полного save().
+        """
+        total_field = self._meta.get_field("total_price")
+        total = self.items.aggregate(
+            total=Coalesce(
+                Sum(F("price") * F("quantity"), output_field=total_field),
+                Value(Decimal("0.00")),
+                output_field=total_field,
+            )
+        )["total"].quantize(Decimal(1).scaleb(-total_field.decimal_places))
+        self.updated_at = timezone.now()
+        Order.objects.filter(pk=self.pk).update(
+            total_price=total, updated_at=self.updated_at
+        )
         self.total_price = total
-        self.save()
         return total
 
     class Meta:
@@ -132,3 +206,180 @@ class Review(BaseModel):
         verbose_name = "Отзыв"
         verbose_name_plural = "Отзывы"
         unique_together = ("user", "book")  # Один отзыв на книгу от пользователя
+
+
+class CartItem(BaseModel):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="cart_items",
+        verbose_name="Пользователь",
+    )
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, verbose_name="Книга")
+    quantity = models.PositiveIntegerField(default=1, verbose_name="Количество")
+
+    def __str__(self):
+        return f"{self.book.title} x {self.quantity}"
+
+    class Meta:
+        verbose_name = "Элемент корзины"
+        verbose_name_plural = "Элементы корзины"
+        unique_together = ("user", "book")  # Одна строка корзины на книгу
+
+
+class StockReservation(BaseModel):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="reservations",
+        verbose_name="Пользователь",
+    )
+    book = models.ForeignKey(
+        Book,
+        on_delete=models.CASCADE,
+        related_name="reservations",
+        verbose_name="Книга",
+    )
+    quantity = models.PositiveIntegerField(verbose_name="Количество")
+    price = models.DecimalField(
+        max_digits=10, decimal_places=2, verbose_name="Цена за единицу"
+    )
+    expires_at = models.DateTimeField(db_index=True, verbose_name="Действует до")
+
+    def __str__(self):
+        return f"Резерв {self.book.title} x {self.quantity} для {self.user.username}"
+
+    class Meta:
+        verbose_name = "Резерв товара"
+        verbose_name_plural = "Резервы товаров"
+        unique_together = ("user", "book")  # Один резерв книги на пользователя
+
+
+class StockShard(models.Model):
+    book = models.ForeignKey(
+        Book,
+        on_delete=models.CASCADE,
+        related_name="stock_shards",
+        verbose_name="Книга",
+    )
+    index = models.PositiveSmallIntegerField(verbose_name="Номер шарда")
+    quantity = models.PositiveIntegerField(default=0, verbose_name="Количество")
+
+    def __str__(self):
+        return f"{self.book.title} #{self.index}: {self.quantity}"
+
+    class Meta:
+        verbose_name = "Шард остатка"
+        verbose_name_plural = "Шарды остатков"
+        unique_together = ("book", "index")
+
+
+class OrderTicket(BaseModel):
+    """Заявка на заказ в очереди приёма (асинхронный режим create-order)."""
+
+    STATUS_CHOICES = [
+        ("queued", "В очереди"),
+        ("processing", "Обрабатывается"),
+        ("done", "Оформлен"),
+        ("failed", "Отклонён"),
+    ]
+    ticket = models.UUIDField(
+        default=uuid.uuid4, unique=True, editable=False, verbose_name="Номер заявки"
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="order_tickets",
+        verbose_name="Пользователь",
+    )
+    items = models.JSONField(verbose_name="Товары")
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default="queued", verbose_name="Статус"
+    )
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Заказ",
+    )
+    error = models.CharField(max_length=255, blank=True, verbose_name="Ошибка")
+
+    def __str__(self):
+        return f"Заявка {self.ticket} ({self.status})"
+
+    class Meta:
+        verbose_name = "Заявка на заказ"
+        verbose_name_plural = "Заявки на заказ"
+        # Выборка очереди воркерами: WHERE status = ... ORDER BY created_at
+        indexes = [models.Index(fields=["status", "created_at"])]
+
+
+class RequestProfile(BaseModel):
+    """
+    Профиль запроса (cProfile, данные pstats) или окно сэмплирующего
+    профилировщика (collapsed stacks), см. api.profiling.
+    """
+
+    KIND_CHOICES = [
+        ("cprofile", "cProfile (pstats)"),
+        ("stacks", "Стеки запроса (collapsed)"),
+        ("sampling", "Непрерывное сэмплирование (collapsed)"),
+    ]
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name="Вид")
+    method = models.CharField(max_length=10, blank=True, verbose_name="Метод")
+    path = models.CharField(max_length=500, blank=True, verbose_name="Путь")
+    view_name = models.CharField(max_length=200, blank=True, verbose_name="Маршрут")
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Пользователь",
+    )
+    status_code = models.PositiveSmallIntegerField(
+        null=True, blank=True, verbose_name="Код ответа"
+    )
+    duration_ms = models.FloatField(verbose_name="Длительность, мс")
+    samples = models.PositiveIntegerField(default=0, verbose_name="Сэмплов")
+    summary = models.TextField(blank=True, verbose_name="Сводка")
+    data = models.BinaryField(verbose_name="Данные профиля")
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.method} {self.path}".strip()
+
+    class Meta:
+        verbose_name = "Профиль запроса"
+        verbose_name_plural = "Профили запросов"
+        ordering = ["-created_at"]
+
+
+class SlowQuery(BaseModel):
+    """
+    Медленные SQL-запросы, сгруппированные по нормализованному шаблону
+    (api.slow_queries): created_at - первое появление, updated_at - последнее.
+    """
+
+    digest = models.CharField(max_length=32, unique=True, verbose_name="Хэш шаблона")
+    fingerprint = models.TextField(verbose_name="Шаблон SQL")
+    example_sql = models.TextField(verbose_name="Пример запроса")
+    calls = models.PositiveIntegerField(default=0, verbose_name="Число запросов")
+    total_ms = models.FloatField(default=0, verbose_name="Суммарное время, мс")
+    max_ms = models.FloatField(default=0, verbose_name="Максимальное время, мс")
+    view_name = models.CharField(max_length=200, blank=True, verbose_name="Маршрут")
+    origin = models.TextField(blank=True, verbose_name="Место вызова")
+    plan = models.TextField(blank=True, verbose_name="План (EXPLAIN)")
+
+    def __str__(self):
+        return self.fingerprint[:100]
+
+    @property
+    def average_ms(self):
+        return self.total_ms / self.calls if self.calls else 0.0
+
+    class Meta:
+        verbose_name = "Медленный запрос"
+        verbose_name_plural = "Медленные запросы"
+        ordering = ["-total_ms"]
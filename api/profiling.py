@@ -0,0 +1,315 @@
+"""
+Профилирование запросов API по требованию администратора.
+
+ProfilingMiddleware (api.middleware) профилирует запрос, если в нём есть
+?_profile=<режим> или заголовок X-Profile: <режим> и пользователь
+(JWT или сессия админки) имеет роль admin:
+- 1 / cprofile: запрос выполняется под cProfile, сохраняются данные pstats
+  (файл .prof для pstats, snakeviz и т.п.);
+- stacks: стеки потока запроса снимаются StackSampler с интервалом
+  PROFILING_STACK_INTERVAL, сохраняются collapsed stacks (flamegraph.pl,
+  speedscope).
+
+Результат сохраняется в RequestProfile, его id возвращается в заголовке
+X-Profile-Id, скачать профиль можно со страницы админки.
+
+Непрерывный режим (PROFILING_SAMPLING): один поток на процесс снимает стеки
+всех потоков, обрабатывающих запросы, и каждые PROFILING_SAMPLING_WINDOW
+секунд сохраняет накопленные стеки одним RequestProfile. Накладные расходы
+не зависят от кода представлений: раз в интервал - обход стеков.
+"""
+
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections
+from rest_framework import exceptions
+from rest_framework.settings import api_settings
+
+from .models import RequestProfile
+
+PROFILE_PARAMETER = "_profile"
+PROFILE_HEADER = "HTTP_X_PROFILE"
+MODES = {"1": "cprofile", "cprofile": "cprofile", "stacks": "stacks"}
+SUMMARY_LINES = 40
+
+# С Python 3.12 профилировщик cProfile общий для всех потоков процесса,
+# поэтому одновременно профилируется не больше одного запроса
+_cprofile_lock = threading.Lock()
+
+
+def requested_mode(request):
+    """Режим профилирования, запрошенный параметром или заголовком, или None."""
+    value = request.META.get(PROFILE_HEADER)
+    if value is None:
+        # Быстрая проверка строки запроса без разбора request.GET
+        if PROFILE_PARAMETER not in request.META.get("QUERY_STRING", ""):
+            return None
+        value = request.GET.get(PROFILE_PARAMETER)
+    return MODES.get((value or "").strip().lower())
+
+
+def profiling_user(request):
+    """
+    Администратор, запросивший профилирование, или None. Пользователь
+    определяется аутентификацией DRF (JWT), а для админки - по сессии.
+    """
+    user = None
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        try:
+            result = authentication_class().authenticate(request)
+        except exceptions.AuthenticationFailed:
+            return None
+        if result is not None:
+            user = result[0]
+            break
+    if user is None:
+        user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        return None
+    return user if getattr(user, "role", None) == "admin" else None
+
+
+def profile_request(get_response, request, mode, user):
+    """Выполняет запрос под профилировщиком и сохраняет RequestProfile."""
+    if mode == "cprofile":
+        if not _cprofile_lock.acquire(blocking=False):
+            return get_response(request)
+        try:
+            profiler = cProfile.Profile()
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                response = get_response(request)
+            finally:
+                profiler.disable()
+            duration = time.perf_counter() - start
+        finally:
+            _cprofile_lock.release()
+        stats = pstats.Stats(profiler)
+        fields = {
+            # Формат Stats.dump_stats: файл открывается pstats.Stats(path)
+            "data": marshal.dumps(stats.stats),
+            "summary": pstats_summary(stats),
+            "samples": stats.total_calls,
+        }
+    else:
+        sampler = StackSampler(
+            settings.PROFILING_STACK_INTERVAL, {threading.get_ident()}
+        )
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            response = get_response(request)
+        finally:
+            sampler.stop()
+        duration = time.perf_counter() - start
+        fields = {
+            "data": collapsed_text(sampler.stacks).encode(),
+            "summary": stacks_summary(sampler.stacks),
+            "samples": sampler.samples,
+        }
+
+    match = getattr(request, "resolver_match", None)
+    profile = RequestProfile.objects.create(
+        kind=mode,
+        method=request.method,
+        path=request.get_full_path()[:500],
+        view_name=match.view_name if match else "",
+        user=user,
+        status_code=response.status_code,
+        duration_ms=round(duration * 1e3, 3),
+        **fields,
+    )
+    response.headers["X-Profile-Id"] = str(profile.id)
+    return response
+
+
+def pstats_summary(stats):
+    """Первые SUMMARY_LINES функций по суммарному времени, текстом pstats."""
+    stream = io.StringIO()
+    stats.stream = stream
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(SUMMARY_LINES)
+    return stream.getvalue()
+
+
+def short_filename(filename):
+    """Путь к файлу относительно ближайшего каталога из sys.path."""
+    for path in sorted(sys.path, key=len, reverse=True):
+        if path and filename.startswith(path + os.sep):
+            return filename[len(path) + 1 :]
+    return filename
+
+
+_labels = {}
+
+
+def _frame_label(code):
+    """Подпись функции в стеке: 'имя (модуль:строка)', кэшируется по code."""
+    label = _labels.get(code)
+    if label is None:
+        filename = short_filename(code.co_filename)
+        label = f"{code.co_name} ({filename}:{code.co_firstlineno})"
+        # ';' разделяет кадры в формате collapsed stacks
+        label = label.replace(";", ":")
+        _labels[code] = label
+    return label
+
+
+def collapse(frame):
+    """Стек кадра одной строкой 'внешний;...;внутренний'."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+
+def collapsed_text(stacks):
+    """Формат collapsed stacks: строка 'стек число' на каждый стек."""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def stacks_summary(stacks):
+    """Функции, чаще всего встречавшиеся на вершине стека и в стеке."""
+    total = sum(stacks.values())
+    if not total:
+        return "Нет сэмплов"
+    own = Counter()
+    inclusive = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        own[frames[-1]] += count
+        for frame in set(frames):
+            inclusive[frame] += count
+    lines = [f"Сэмплов: {total}", "", "На вершине стека:"]
+    for frame, count in own.most_common(SUMMARY_LINES // 2):
+        lines.append(f"{count / total:7.1%}  {frame}")
+    lines += ["", "В стеке:"]
+    for frame, count in inclusive.most_common(SUMMARY_LINES // 2):
+        lines.append(f"{count / total:7.1%}  {frame}")
+    return "\n".join(lines)
+
+
+class StackSampler(threading.Thread):
+    """Поток, раз в interval секунд снимающий стеки потоков из threads."""
+
+    def __init__(self, interval, threads=None):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.interval = interval
+        self.threads = set() if threads is None else threads
+        self.stacks = Counter()
+        self.samples = 0
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        frames = sys._current_frames()
+        with self.lock:
+            for ident in tuple(self.threads):
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.stacks[collapse(frame)] += 1
+                    self.samples += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class ContinuousSampler(StackSampler):
+    """
+    Сэмплирование всех запросов процесса: ProfilingMiddleware добавляет поток
+    в threads на время запроса, накопленные стеки сохраняются раз в window
+    секунд.
+    """
+
+    def __init__(self, interval, window):
+        super().__init__(interval)
+        self.name = "continuous-stack-sampler"
+        self.window = window
+        self.pid = os.getpid()
+        self.window_start = time.monotonic()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+            if time.monotonic() - self.window_start >= self.window:
+                self.flush()
+
+    def enter(self):
+        self.threads.add(threading.get_ident())
+
+    def exit(self):
+        self.threads.discard(threading.get_ident())
+
+    def flush(self):
+        """Сохраняет накопленное окно (если были сэмплы) и начинает новое."""
+        with self.lock:
+            stacks, samples = self.stacks, self.samples
+            self.stacks, self.samples = Counter(), 0
+            duration = time.monotonic() - self.window_start
+            self.window_start = time.monotonic()
+        if not samples:
+            return None
+        try:
+            return RequestProfile.objects.create(
+                kind="sampling",
+                path=f"pid {self.pid}",
+                duration_ms=round(duration * 1e3, 3),
+                samples=samples,
+                summary=stacks_summary(stacks),
+                data=collapsed_text(stacks).encode(),
+            )
+        finally:
+            # Подключение потока сэмплера не должно висеть между окнами
+            if threading.current_thread() is self:
+                connections.close_all()
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_continuous_sampler():
+    """Сэмплер текущего процесса (после fork запускается заново) или None."""
+    if not settings.PROFILING_SAMPLING:
+        return None
+    sampler = _sampler
+    if sampler is None or sampler.pid != os.getpid():
+        sampler = _start_sampler()
+    return sampler
+
+
+def _start_sampler():
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None or _sampler.pid != os.getpid():
+            _sampler = ContinuousSampler(
+                settings.PROFILING_SAMPLING_INTERVAL, settings.PROFILING_SAMPLING_WINDOW
+            )
+            _sampler.start()
+        return _sampler
+
+
+def stop_continuous_sampler():
+    """Останавливает сэмплер процесса, сохраняя неполное окно."""
+    global _sampler
+    with _sampler_lock:
+        sampler, _sampler = _sampler, None
+    if sampler is not None and sampler.pid == os.getpid():
+        sampler.stop()
+        sampler.flush()
@@ -0,0 +1,81 @@
+"""
+Бюджеты SQL-запросов представлений API.
+
+Каждое представление api/views.py объявляет максимальное число запросов
+на HTTP-метод, не зависящее от размера страницы:
+- класс: атрибут query_budgets = {"GET": 3, "POST": 5};
+- функция: декоратор @query_budget(GET=2) поверх @api_view.
+
+Бюджеты проверяют тесты (api/tests/test_query_budgets.py) на страницах
+из 1 и 100 строк, а в режиме разработки - QueryBudgetMiddleware.
+"""
+
+import logging
+from collections import Counter
+from contextlib import ExitStack
+
+from django.db import connections
+
+logger = logging.getLogger("api.query_budget")
+
+
+def query_budget(**budgets):
+    """Объявляет бюджеты функции-представления: @query_budget(GET=2, POST=4)."""
+
+    def decorator(view):
+        view.query_budgets = budgets
+        return view
+
+    return decorator
+
+
+def get_query_budget(view, method):
+    """Бюджет представления (функции из URLconf) для метода или None."""
+    budgets = getattr(view, "query_budgets", None)
+    if budgets is None:
+        budgets = getattr(getattr(view, "view_class", None), "query_budgets", None)
+    if budgets is None:
+        return None
+    if method == "HEAD":
+        method = "GET"
+    return budgets.get(method)
+
+
+class QueryRecorder:
+    """
+    execute_wrapper, запоминающий SQL (без параметров) всех запросов на всех
+    подключениях: одинаковый шаблон, выполненный много раз, - признак N+1.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self.stack = ExitStack()
+        for connection in connections.all():
+            self.stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stack.close()
+
+    def duplicates(self):
+        """Повторявшиеся шаблоны SQL: [(число, sql)] по убыванию числа."""
+        counts = Counter(self.queries)
+        return [(count, sql) for sql, count in counts.most_common() if count > 1]
+
+
+def report_over_budget(request, budget, recorder):
+    """Пишет в лог запрос, превысивший бюджет, и повторявшийся SQL."""
+    match = getattr(request, "resolver_match", None)
+    lines = [
+        f"{request.method} {request.path} ({match.view_name if match else '?'}): "
+        f"{len(recorder.queries)} SQL-запросов при бюджете {budget}"
+    ]
+    for count, sql in recorder.duplicates():
+        lines.append(f"  x{count}: {sql}")
+    logger.warning("\n".join(lines))
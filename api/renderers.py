@@ -0,0 +1,80 @@
+"""
+Быстрые JSON-рендерер и парсер для REST API.
+
+Если установлен orjson, кодирование и разбор JSON выполняются им, иначе
+используются стандартные JSONRenderer / JSONParser из DRF. Decimal
+кодируется так же, как в DRF; datetime, date, time и UUID orjson кодирует
+нативно (UTC выводится с суффиксом Z, как у DRF).
+"""
+
+from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from .instrumentation import measure
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - зависит от окружения
+    orjson = None
+
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+    _LINE_SEPARATOR = "\u2028".encode()
+    _PARAGRAPH_SEPARATOR = "\u2029".encode()
+
+# Типы, которые orjson не знает (Decimal, lazy-строки и т.д.), кодируем как DRF
+_drf_default = JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON-рендерер на orjson с откатом на стандартный JSONRenderer.
+    Форматированный вывод (indent), ensure_ascii и данные, которые orjson
+    не может закодировать, обрабатываются стандартной реализацией.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return measure(
+            "render", self._render, data, accepted_media_type, renderer_context
+        )
+
+    def _render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if orjson is None or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=_drf_default, option=ORJSON_OPTIONS)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Как и DRF, экранируем U+2028 и U+2029 для совместимости с JavaScript
+        if _LINE_SEPARATOR in ret:
+            ret = ret.replace(_LINE_SEPARATOR, b"\\u2028")
+        if _PARAGRAPH_SEPARATOR in ret:
+            ret = ret.replace(_PARAGRAPH_SEPARATOR, b"\\u2029")
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    """JSON-парсер на orjson с откатом на стандартный JSONParser."""
+
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace("_", "-") not in ("utf-8", "utf8"):
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError("JSON parse error - %s" % str(exc))
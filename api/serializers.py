@@ -1,11 +1,144 @@
+from django.core.exceptions import FieldDoesNotExist
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from rest_framework_simplejwt.tokens import RefreshToken
-from .models import User, Author, Book, Order, OrderItem, Review
+from .instrumentation import measure
+from .models import (
+    User,
+    Author,
+    Book,
+    CartItem,
+    Order,
+    OrderItem,
+    OrderTicket,
+    Review,
+    StockReservation,
+)
+
+
+def parse_fieldset_param(request, name):
+    """
+    Разбирает параметр запроса со списком полей (?fields=a,b&fields=c).
+    Возвращает None, если параметр не передан или пуст (?fields=).
+    """
+    query_params = getattr(request, "query_params", None)
+    if query_params is None or name not in query_params:
+        return None
+    values = set()
+    for raw in query_params.getlist(name):
+        values.update(part.strip() for part in raw.split(",") if part.strip())
+    return values or None
+
+
+# Миксин для учёта времени сериализации (api.instrumentation)
+class TimedSerializerMixin:
+    """Добавляет время to_representation к фазе serialize измеряемого запроса."""
+
+    def to_representation(self, instance):
+        return measure("serialize", super().to_representation, instance)
+
+
+# Миксин для разреженных наборов полей: ?fields=, ?omit= и ?expand=
+class SparseFieldsetMixin:
+    """
+    Позволяет клиенту выбирать поля ответа через параметры запроса:
+    - fields: белый список полей верхнего уровня
+    - omit: поля, которые нужно исключить
+    - expand: вложенные объекты, которые нужно развернуть; остальные
+      вложенные поля из expandable_fields отдаются как id.
+      Без параметра expand все вложенные объекты разворачиваются, как раньше.
+
+    expandable_fields сопоставляет имя поля с путём для select_related /
+    prefetch_related, который нужен для его развёрнутой формы.
+    Параметры применяются только к GET-запросам. Пустой параметр не
+    учитывается, неизвестные имена полей - ValidationError (400 с их списком).
+    """
+
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        if getattr(request, "method", None) != "GET":
+            return
+
+        only = parse_fieldset_param(request, "fields")
+        omit = parse_fieldset_param(request, "omit") or set()
+        expand = parse_fieldset_param(request, "expand")
+        self.validate_fieldsets(fields=only, omit=omit, expand=expand)
+
+        for name in list(self.fields):
+            if (only is not None and name not in only) or name in omit:
+                self.fields.pop(name)
+
+        if expand is None:
+            return
+        for name in self.expandable_fields:
+            if name in self.fields and name not in expand:
+                many = isinstance(self.fields[name], serializers.ListSerializer)
+                self.fields[name] = serializers.PrimaryKeyRelatedField(
+                    read_only=True, many=many
+                )
+
+    def validate_fieldsets(self, **params):
+        """ValidationError с неизвестными именами полей каждого параметра."""
+        errors = {}
+        for param, names in params.items():
+            known = self.expandable_fields if param == "expand" else self.fields
+            unknown = sorted(set(names or ()) - set(known))
+            if unknown:
+                errors[param] = [f"Неизвестные поля: {', '.join(unknown)}"]
+        if errors:
+            raise serializers.ValidationError(errors)
+
+    def optimize_queryset(self, queryset):
+        """
+        Сужает queryset под выбранные поля: only() для колонок модели,
+        select_related / prefetch_related для вложенных объектов.
+        """
+        opts = self.Meta.model._meta
+        columns = []
+        select_related = []
+        prefetch_related = []
+        narrow = True
+
+        for name, field in self.fields.items():
+            if field.write_only:
+                continue
+            source = field.source
+            if source == "*" or "." in source:
+                narrow = False
+                continue
+            try:
+                model_field = opts.get_field(source)
+            except FieldDoesNotExist:
+                narrow = False
+                continue
+
+            if model_field.many_to_one or model_field.one_to_one:
+                if model_field.concrete:
+                    columns.append(source)
+                if isinstance(field, serializers.BaseSerializer):
+                    select_related.append(self.expandable_fields.get(name, source))
+            elif model_field.one_to_many or model_field.many_to_many:
+                if isinstance(field, serializers.ListSerializer):
+                    prefetch_related.append(self.expandable_fields.get(name, source))
+                else:
+                    prefetch_related.append(source)
+            elif model_field.concrete:
+                columns.append(source)
+
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        if narrow and columns:
+            queryset = queryset.only(*columns)
+        return queryset
 
 
 # Сериализатор для пользователя
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'role', 'created_at', 'updated_at']
@@ -48,20 +181,27 @@ class LoginSerializer(serializers.Serializer):
 
 
 # Сериализатор для автора
-class AuthorSerializer(serializers.ModelSerializer):
+class AuthorSerializer(
+    TimedSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer
+):
     class Meta:
         model = Author
         fields = '__all__'
 
 
 # Сериализатор для книги
-class BookSerializer(serializers.ModelSerializer):
+class BookSerializer(
+    TimedSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer
+):
     author = AuthorSerializer(read_only=True)
     author_id = serializers.IntegerField(write_only=True)
 
+    expandable_fields = {"author": "author"}
+
     class Meta:
         model = Book
-        fields = '__all__'
+        # stock_sharded - внутренний флаг хранения остатка, виден только в админке
+        exclude = ['stock_sharded']
 
     def validate_price(self, value):
         if value <= 0:
@@ -75,7 +215,7 @@ class BookSerializer(serializers.ModelSerializer):
 
 
 # Сериализатор для элемента заказа
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     book = BookSerializer(read_only=True)
     book_id = serializers.IntegerField(write_only=True)
 
@@ -90,10 +230,14 @@ class OrderItemSerializer(serializers.ModelSerializer):
 
 
 # Сериализатор для заказа
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(
+    TimedSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer
+):
     items = OrderItemSerializer(many=True, read_only=True)
     user = UserSerializer(read_only=True)
 
+    expandable_fields = {"items": "items__book__author", "user": "user"}
+
     class Meta:
         model = Order
         fields = '__all__'
@@ -101,11 +245,15 @@ class OrderSerializer(serializers.ModelSerializer):
 
 
 # Сериализатор для отзыва
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(
+    TimedSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer
+):
     user = UserSerializer(read_only=True)
     book = BookSerializer(read_only=True)
     book_id = serializers.IntegerField(write_only=True)
 
+    expandable_fields = {"user": "user", "book": "book__author"}
+
     class Meta:
         model = Review
         fields = '__all__'
@@ -121,4 +269,75 @@ class ReviewSerializer(serializers.ModelSerializer):
         book_id = data.get('book_id')
         if Review.objects.filter(user=user, book_id=book_id).exists():
             raise serializers.ValidationError("Вы уже оставили отзыв на эту книгу")
-        return data
\ No newline at end of file
+        return data
+
+
+# Компактное представление книги в корзине
+class CartBookSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    author_name = serializers.CharField(source="author.name", read_only=True)
+
+    class Meta:
+        model = Book
+        fields = ["id", "title", "price", "stock", "cover_image", "author_name"]
+
+
+# Сериализатор для элемента корзины
+class CartItemSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    book = CartBookSerializer(read_only=True)
+    book_id = serializers.IntegerField()
+    available = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CartItem
+        fields = ["book_id", "quantity", "book", "available"]
+
+    def get_available(self, obj):
+        return obj.book.stock >= obj.quantity
+
+    def validate_quantity(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Количество должно быть положительным")
+        return value
+
+    def validate_book_id(self, value):
+        if not Book.objects.filter(id=value).exists():
+            raise serializers.ValidationError("Книга не найдена")
+        return value
+
+
+# Сериализатор для корзины целиком
+class CartSerializer(TimedSerializerMixin, serializers.Serializer):
+    items = CartItemSerializer(many=True, read_only=True)
+    total_quantity = serializers.IntegerField(read_only=True)
+    total_price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, read_only=True
+    )
+    errors = serializers.ListField(child=serializers.CharField(), read_only=True)
+
+
+# Сериализатор для резерва товара
+class StockReservationSerializer(
+    TimedSerializerMixin, serializers.ModelSerializer
+):
+    book_id = serializers.IntegerField()
+    title = serializers.CharField(source="book.title", read_only=True)
+
+    class Meta:
+        model = StockReservation
+        fields = ["book_id", "title", "quantity", "price", "expires_at"]
+        read_only_fields = ["price", "expires_at"]
+
+    def validate_quantity(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Количество должно быть положительным")
+        return value
+
+
+# Сериализатор для заявки на заказ (асинхронный приём заказов)
+class OrderTicketSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    order = OrderSerializer(read_only=True)
+
+    class Meta:
+        model = OrderTicket
+        fields = ['ticket', 'status', 'order', 'error', 'created_at']
+        read_only_fields = fields
@@ -0,0 +1,751 @@
+"""
+Сервисный слой заказов, корзины и резервов.
+
+Проверка цены и наличия выполняется одним запросом на все строки,
+оформление заказа - одной транзакцией с пакетными запросами:
+блокировка книг, вставка элементов заказа и одно UPDATE остатков.
+
+Резерв сразу списывает товар со склада условным UPDATE и хранит цену;
+при оформлении заказа резервы пользователя потребляются без повторной
+проверки наличия зарезервированных книг.
+
+Для книг с шардированным остатком (Book.stock_sharded) товар хранится в
+нескольких строках StockShard: списание берёт случайный свободный шард
+через SELECT ... FOR UPDATE SKIP LOCKED и не блокирует строку книги,
+а Book.stock обновляется ребалансировщиком как кэшированная сумма.
+
+В асинхронном режиме приёма заказов create-order только ставит заявку
+(OrderTicket) в очередь; воркеры оформляют заявки пачками, меняя остатки
+одним UPDATE на всю пачку.
+"""
+
+import logging
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import (
+    Case,
+    DecimalField,
+    F,
+    OuterRef,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (
+    Book,
+    CartItem,
+    Order,
+    OrderItem,
+    OrderTicket,
+    StockReservation,
+    StockShard,
+)
+
+logger = logging.getLogger("api.services")
+
+
+class OrderError(Exception):
+    """Ошибка оформления заказа; текст сообщения возвращается клиенту."""
+
+
+def normalize_lines(items):
+    """
+    Приводит список товаров [{"book_id": ..., "quantity": ...}] к словарю
+    {book_id: quantity}. Повторяющиеся книги суммируются.
+    """
+    if not items:
+        raise OrderError("Не указаны товары")
+    if not isinstance(items, list):
+        raise OrderError("Некорректный формат товаров")
+
+    lines = {}
+    for item in items:
+        if not isinstance(item, dict):
+            raise OrderError("Некорректный формат товаров")
+        book_id = item.get("book_id")
+        try:
+            book_id = int(book_id)
+        except (TypeError, ValueError):
+            raise OrderError(f"Книга с id {book_id} не найдена")
+        try:
+            quantity = int(item.get("quantity", 1))
+        except (TypeError, ValueError):
+            raise OrderError("Количество должно быть положительным")
+        if quantity <= 0:
+            raise OrderError("Количество должно быть положительным")
+        lines[book_id] = lines.get(book_id, 0) + quantity
+    return lines
+
+
+def check_lines(lines, books):
+    """Проверяет, что все книги существуют и их хватает на складе."""
+    for book_id, quantity in lines.items():
+        book = books.get(book_id)
+        if book is None:
+            raise OrderError(f"Книга с id {book_id} не найдена")
+        if book.stock < quantity:
+            raise OrderError(f"Недостаточно товара {book.title}")
+
+
+def adjust_stock(deltas):
+    """
+    Изменяет остатки нескольких книг одним UPDATE: {book_id: +/-количество}.
+    Шардированные книги не трогаются; возвраты на склад (положительные
+    значения) для них зачисляются в шард 0 отдельным UPDATE.
+    """
+    deltas = {book_id: delta for book_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    Book.objects.filter(id__in=deltas, stock_sharded=False).update(
+        stock=Case(
+            *[
+                When(id=book_id, then=F("stock") + delta)
+                for book_id, delta in deltas.items()
+            ]
+        ),
+        updated_at=timezone.now(),
+    )
+    returns = {book_id: delta for book_id, delta in deltas.items() if delta > 0}
+    if returns:
+        StockShard.objects.filter(book_id__in=returns, index=0).update(
+            quantity=Case(
+                *[
+                    When(book_id=book_id, then=F("quantity") + delta)
+                    for book_id, delta in returns.items()
+                ]
+            )
+        )
+
+
+def take_from_shards(book_id, quantity):
+    """
+    Списывает quantity с шардов книги. Обычно хватает одного случайного
+    шарда, незаблокированного другими транзакциями (SKIP LOCKED); если
+    единицы разбросаны по шардам, они собираются с нескольких шардов.
+    Возвращает False, если в сумме товара не хватает.
+    """
+    shard_id = (
+        StockShard.objects.select_for_update(skip_locked=True)
+        .filter(book_id=book_id, quantity__gte=quantity)
+        .order_by("?")
+        .values_list("id", flat=True)
+        .first()
+    )
+    if shard_id is not None:
+        StockShard.objects.filter(id=shard_id).update(
+            quantity=F("quantity") - quantity
+        )
+        return True
+
+    shards = list(
+        StockShard.objects.select_for_update()
+        .filter(book_id=book_id, quantity__gt=0)
+        .order_by("-quantity")
+        .values_list("id", "quantity")
+    )
+    if sum(available for _, available in shards) < quantity:
+        return False
+    taken = {}
+    remaining = quantity
+    for shard_id, available in shards:
+        taken[shard_id] = min(available, remaining)
+        remaining -= taken[shard_id]
+        if not remaining:
+            break
+    StockShard.objects.filter(id__in=taken).update(
+        quantity=Case(
+            *[
+                When(id=shard_id, then=F("quantity") - amount)
+                for shard_id, amount in taken.items()
+            ]
+        )
+    )
+    return True
+
+
+def consume_reservations(user, book_ids):
+    """
+    Забирает действующие резервы пользователя на книги заказа.
+    Возвращает {book_id: (количество, цена)}; истёкшие резервы не
+    учитываются и остаются сборщику.
+    """
+    reservations = list(
+        StockReservation.objects.select_for_update()
+        .filter(user=user, book_id__in=book_ids, expires_at__gt=timezone.now())
+        .values_list("id", "book_id", "quantity", "price")
+    )
+    if not reservations:
+        return {}
+    StockReservation.objects.filter(id__in=[row[0] for row in reservations]).delete()
+    return {book_id: (quantity, price) for _, book_id, quantity, price in reservations}
+
+
+def place_order(user, lines):
+    """
+    Оформляет заказ по словарю {book_id: quantity}.
+    Действующие резервы пользователя потребляются: книги, полностью
+    покрытые резервом, не блокируются и не проверяются повторно. Остальные
+    книги блокируются одним SELECT ... FOR UPDATE (шардированные - не
+    блокируются, товар берётся с шардов), элементы заказа вставляются через
+    bulk_create, остатки меняются одним UPDATE.
+    """
+    with transaction.atomic():
+        reserved = consume_reservations(user, list(lines))
+        held = {book_id: quantity for book_id, (quantity, _) in reserved.items()}
+        missing = {
+            book_id: quantity - held.get(book_id, 0)
+            for book_id, quantity in lines.items()
+            if quantity > held.get(book_id, 0)
+        }
+        books = (
+            Book.objects.select_for_update()
+            .filter(stock_sharded=False)
+            .only("id", "title", "price", "stock")
+            .in_bulk(list(missing))
+            if missing
+            else {}
+        )
+        absent = [book_id for book_id in missing if book_id not in books]
+        sharded = (
+            Book.objects.filter(stock_sharded=True)
+            .only("id", "title", "price")
+            .in_bulk(absent)
+            if absent
+            else {}
+        )
+        check_lines(
+            {b: q for b, q in missing.items() if b not in sharded}, books
+        )
+        for book_id, book in sharded.items():
+            if not take_from_shards(book_id, missing[book_id]):
+                raise OrderError(f"Недостаточно товара {book.title}")
+        books.update(sharded)
+
+        prices = {book_id: price for book_id, (_, price) in reserved.items()}
+        prices.update({book_id: book.price for book_id, book in books.items()})
+        total_price = sum(
+            prices[book_id] * quantity for book_id, quantity in lines.items()
+        )
+        order = Order.objects.create(user=user, total_price=total_price)
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(
+                    order=order,
+                    book_id=book_id,
+                    quantity=quantity,
+                    price=prices[book_id],
+                )
+                for book_id, quantity in lines.items()
+            ]
+        )
+        # Излишек резерва возвращается на склад, недостаток списывается
+        # (с шардированных книг он уже списан take_from_shards)
+        adjust_stock(
+            {
+                book_id: held.get(book_id, 0) - quantity
+                for book_id, quantity in lines.items()
+                if book_id not in sharded
+            }
+        )
+    return order
+
+
+def get_cart(user):
+    """
+    Корзина пользователя с актуальными ценами и остатками одним запросом.
+    Возвращает словарь с элементами, итогами и списком проблем с наличием.
+    """
+    items = list(
+        CartItem.objects.filter(user=user)
+        .select_related("book__author")
+        .order_by("created_at", "id")
+    )
+    errors = [
+        f"Недостаточно товара {item.book.title}"
+        for item in items
+        if item.book.stock < item.quantity
+    ]
+    return {
+        "items": items,
+        "total_quantity": sum(item.quantity for item in items),
+        "total_price": sum((item.book.price * item.quantity for item in items), 0),
+        "errors": errors,
+    }
+
+
+def add_to_cart(user, book_id, quantity):
+    """Добавляет книгу в корзину или увеличивает количество."""
+    cart_items = CartItem.objects.filter(user=user, book_id=book_id)
+    update = {"quantity": F("quantity") + quantity, "updated_at": timezone.now()}
+    if cart_items.update(**update):
+        return
+    try:
+        with transaction.atomic():
+            CartItem.objects.create(user=user, book_id=book_id, quantity=quantity)
+    except IntegrityError:
+        # Параллельный запрос добавил ту же книгу первым
+        cart_items.update(**update)
+
+
+def set_cart_quantity(user, book_id, quantity):
+    """Устанавливает количество; 0 удаляет строку. Возвращает False, если строки нет."""
+    cart_items = CartItem.objects.filter(user=user, book_id=book_id)
+    if quantity == 0:
+        return cart_items.delete()[0] > 0
+    return cart_items.update(quantity=quantity, updated_at=timezone.now()) > 0
+
+
+def checkout_cart(user):
+    """Превращает корзину в заказ одной атомарной операцией и очищает её."""
+    with transaction.atomic():
+        cart_items = CartItem.objects.filter(user=user)
+        lines = dict(cart_items.values_list("book_id", "quantity"))
+        if not lines:
+            raise OrderError("Корзина пуста")
+        order = place_order(user, lines)
+        cart_items.delete()
+    return order
+
+
+def reserve_stock(user, book_id, quantity, ttl=None):
+    """
+    Резервирует quantity экземпляров книги за пользователем на ttl
+    (по умолчанию RESERVATION_TTL). Повторный вызов заменяет количество
+    и продлевает резерв. Разница списывается со склада условным UPDATE,
+    поэтому резерв и снятие стоят O(1) на строку.
+    """
+    if quantity <= 0:
+        raise OrderError("Количество должно быть положительным")
+    expires_at = timezone.now() + (ttl or settings.RESERVATION_TTL)
+
+    with transaction.atomic():
+        reservation = (
+            StockReservation.objects.select_for_update()
+            .filter(user=user, book_id=book_id)
+            .first()
+        )
+        delta = quantity - (reservation.quantity if reservation else 0)
+        if delta > 0:
+            taken = Book.objects.filter(
+                id=book_id, stock_sharded=False, stock__gte=delta
+            ).update(stock=F("stock") - delta, updated_at=timezone.now())
+            if not taken:
+                book = (
+                    Book.objects.filter(id=book_id)
+                    .values("title", "stock_sharded")
+                    .first()
+                )
+                if book is None:
+                    raise OrderError(f"Книга с id {book_id} не найдена")
+                if not (book["stock_sharded"] and take_from_shards(book_id, delta)):
+                    raise OrderError(f"Недостаточно товара {book['title']}")
+        elif delta < 0:
+            adjust_stock({book_id: -delta})
+
+        price = Book.objects.filter(id=book_id).values_list("price", flat=True).get()
+        if reservation is None:
+            reservation = StockReservation.objects.create(
+                user=user,
+                book_id=book_id,
+                quantity=quantity,
+                price=price,
+                expires_at=expires_at,
+            )
+        else:
+            reservation.quantity = quantity
+            reservation.price = price
+            reservation.expires_at = expires_at
+            reservation.save(
+                update_fields=["quantity", "price", "expires_at", "updated_at"]
+            )
+    return reservation
+
+
+def release_reservation(user, book_id):
+    """Снимает резерв пользователя и возвращает товар на склад. False - резерва нет."""
+    with transaction.atomic():
+        reservation = (
+            StockReservation.objects.select_for_update()
+            .filter(user=user, book_id=book_id)
+            .first()
+        )
+        if reservation is None:
+            return False
+        adjust_stock({book_id: reservation.quantity})
+        reservation.delete()
+    return True
+
+
+def reserve_cart(user):
+    """
+    Резервирует все строки корзины одной транзакцией. Действующие резервы
+    и книги блокируются пачкой (шардированные книги - не блокируются, товар
+    берётся с шардов), остатки меняются одним UPDATE, резервы создаются и
+    обновляются bulk-операциями: число запросов не зависит от размера корзины.
+    """
+    now = timezone.now()
+    expires_at = now + settings.RESERVATION_TTL
+    with transaction.atomic():
+        lines = dict(
+            CartItem.objects.filter(user=user).values_list("book_id", "quantity")
+        )
+        if not lines:
+            raise OrderError("Корзина пуста")
+        existing = {
+            reservation.book_id: reservation
+            for reservation in StockReservation.objects.select_for_update().filter(
+                user=user, book_id__in=list(lines)
+            )
+        }
+        deltas = {
+            book_id: quantity
+            - (existing[book_id].quantity if book_id in existing else 0)
+            for book_id, quantity in lines.items()
+        }
+        books = (
+            Book.objects.select_for_update()
+            .filter(stock_sharded=False)
+            .only("id", "title", "price", "stock")
+            .in_bulk(list(lines))
+        )
+        absent = [book_id for book_id in lines if book_id not in books]
+        sharded = (
+            Book.objects.filter(stock_sharded=True)
+            .only("id", "title", "price")
+            .in_bulk(absent)
+            if absent
+            else {}
+        )
+        check_lines(
+            {b: d for b, d in deltas.items() if d > 0 and b not in sharded}, books
+        )
+        for book_id, book in sharded.items():
+            if deltas[book_id] > 0 and not take_from_shards(book_id, deltas[book_id]):
+                raise OrderError(f"Недостаточно товара {book.title}")
+        books.update(sharded)
+        adjust_stock({book_id: -delta for book_id, delta in deltas.items()})
+
+        reservations = []
+        for book_id, quantity in lines.items():
+            reservation = existing.get(book_id) or StockReservation(user=user)
+            reservation.book = books[book_id]
+            reservation.quantity = quantity
+            reservation.price = books[book_id].price
+            reservation.expires_at = expires_at
+            reservation.updated_at = now
+            reservations.append(reservation)
+        StockReservation.objects.bulk_create(
+            [reservation for reservation in reservations if reservation.pk is None]
+        )
+        StockReservation.objects.bulk_update(
+            list(existing.values()), ["quantity", "price", "expires_at", "updated_at"]
+        )
+    return reservations
+
+
+def release_expired_reservations(batch_size=1000, now=None):
+    """
+    Возвращает на склад товар истёкших резервов пачками по batch_size:
+    одна выборка с SKIP LOCKED, одно UPDATE остатков и одно DELETE на пачку.
+    Возвращает количество снятых резервов.
+    """
+    now = now or timezone.now()
+    released = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                StockReservation.objects.select_for_update(skip_locked=True)
+                .filter(expires_at__lte=now)
+                .order_by("expires_at")
+                .values_list("id", "book_id", "quantity")[:batch_size]
+            )
+            if not batch:
+                return released
+            totals = {}
+            for _, book_id, quantity in batch:
+                totals[book_id] = totals.get(book_id, 0) + quantity
+            adjust_stock(totals)
+            StockReservation.objects.filter(id__in=[row[0] for row in batch]).delete()
+        released += len(batch)
+
+
+def split_evenly(total, parts):
+    """Делит total на parts почти равных целых частей."""
+    base, extra = divmod(total, parts)
+    return [base + (1 if index < extra else 0) for index in range(parts)]
+
+
+def enable_stock_sharding(book_id, shards):
+    """Переводит остаток книги в shards шардов (Book.stock остаётся суммой)."""
+    if shards < 1:
+        raise ValueError("Количество шардов должно быть положительным")
+    with transaction.atomic():
+        book = Book.objects.select_for_update().get(id=book_id)
+        if book.stock_sharded:
+            return book
+        StockShard.objects.bulk_create(
+            [
+                StockShard(book=book, index=index, quantity=quantity)
+                for index, quantity in enumerate(split_evenly(book.stock, shards))
+            ]
+        )
+        book.stock_sharded = True
+        book.save(update_fields=["stock_sharded", "updated_at"])
+    return book
+
+
+def disable_stock_sharding(book_id):
+    """Собирает шарды обратно в Book.stock и удаляет их."""
+    with transaction.atomic():
+        book = Book.objects.select_for_update().get(id=book_id)
+        if not book.stock_sharded:
+            return book
+        shards = StockShard.objects.select_for_update().filter(book=book)
+        book.stock = sum(shards.values_list("quantity", flat=True))
+        book.stock_sharded = False
+        shards.delete()
+        book.save(update_fields=["stock", "stock_sharded", "updated_at"])
+    return book
+
+
+def rebalance_stock_shards(book_ids=None):
+    """
+    Выравнивает единицы между шардами каждой шардированной книги и
+    обновляет Book.stock кэшированной суммой. Каждая книга обрабатывается
+    в отдельной короткой транзакции. Возвращает {book_id: сумма}.
+    """
+    books = Book.objects.filter(stock_sharded=True)
+    if book_ids is not None:
+        books = books.filter(id__in=book_ids)
+
+    totals = {}
+    for book_id in books.values_list("id", flat=True):
+        with transaction.atomic():
+            shards = list(
+                StockShard.objects.select_for_update()
+                .filter(book_id=book_id)
+                .order_by("index")
+            )
+            total = sum(shard.quantity for shard in shards)
+            changed = []
+            for shard, quantity in zip(shards, split_evenly(total, len(shards))):
+                if shard.quantity != quantity:
+                    shard.quantity = quantity
+                    changed.append(shard)
+            StockShard.objects.bulk_update(changed, ["quantity"])
+            Book.objects.filter(id=book_id).update(
+                stock=total, updated_at=timezone.now()
+            )
+        totals[book_id] = total
+    return totals
+
+
+def enqueue_order(user, lines):
+    """Ставит уже проверенные строки заказа {book_id: quantity} в очередь."""
+    items = [
+        {"book_id": book_id, "quantity": quantity}
+        for book_id, quantity in lines.items()
+    ]
+    return OrderTicket.objects.create(user=user, items=items)
+
+
+def claim_order_tickets(batch_size=100):
+    """
+    Забирает из очереди до batch_size самых старых заявок и помечает их
+    как обрабатываемые. Заявки, заблокированные другими воркерами,
+    пропускаются (SKIP LOCKED).
+    """
+    with transaction.atomic():
+        ids = list(
+            OrderTicket.objects.select_for_update(skip_locked=True)
+            .filter(status="queued")
+            .order_by("created_at")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        OrderTicket.objects.filter(id__in=ids).update(
+            status="processing", updated_at=timezone.now()
+        )
+    return list(
+        OrderTicket.objects.filter(id__in=ids)
+        .select_related("user")
+        .order_by("created_at")
+    )
+
+
+def requeue_stale_order_tickets(older_than):
+    """Возвращает в очередь заявки, зависшие в обработке (упавший воркер)."""
+    return OrderTicket.objects.filter(
+        status="processing", updated_at__lt=timezone.now() - older_than
+    ).update(status="queued", updated_at=timezone.now())
+
+
+def process_order_tickets(tickets):
+    """
+    Оформляет пачку заявок одной транзакцией.
+
+    Обычные заявки оформляются вместе: книги блокируются одним запросом,
+    наличие проверяется в памяти в порядке поступления заявок, заказы и
+    их элементы вставляются через bulk_create, остатки меняются одним
+    UPDATE на всю пачку. Заявки пользователей с резервами и заявки на
+    шардированные книги проходят через place_order по одной.
+    """
+    if not tickets:
+        return tickets
+    now = timezone.now()
+    lines = {
+        ticket.id: {item["book_id"]: item["quantity"] for item in ticket.items}
+        for ticket in tickets
+    }
+    book_ids = {book_id for ticket_lines in lines.values() for book_id in ticket_lines}
+
+    with transaction.atomic():
+        with_reservations = set(
+            StockReservation.objects.filter(
+                user_id__in={ticket.user_id for ticket in tickets},
+                book_id__in=book_ids,
+                expires_at__gt=now,
+            ).values_list("user_id", flat=True)
+        )
+        sharded = set(
+            Book.objects.filter(id__in=book_ids, stock_sharded=True).values_list(
+                "id", flat=True
+            )
+        )
+
+        grouped = []
+        for ticket in tickets:
+            ticket.updated_at = now
+            if ticket.user_id in with_reservations or sharded & lines[ticket.id].keys():
+                try:
+                    ticket.order = place_order(ticket.user, lines[ticket.id])
+                    ticket.status = "done"
+                except OrderError as exc:
+                    ticket.status, ticket.error = "failed", str(exc)
+            else:
+                grouped.append(ticket)
+
+        books = (
+            Book.objects.select_for_update()
+            .filter(stock_sharded=False)
+            .only("id", "title", "price", "stock")
+            .in_bulk({book_id for t in grouped for book_id in lines[t.id]})
+            if grouped
+            else {}
+        )
+        accepted = []
+        deltas = {}
+        for ticket in grouped:
+            try:
+                check_lines(lines[ticket.id], books)
+            except OrderError as exc:
+                ticket.status, ticket.error = "failed", str(exc)
+                continue
+            for book_id, quantity in lines[ticket.id].items():
+                books[book_id].stock -= quantity
+                deltas[book_id] = deltas.get(book_id, 0) - quantity
+            accepted.append(ticket)
+
+        orders = [
+            Order(
+                user_id=ticket.user_id,
+                total_price=sum(
+                    books[book_id].price * quantity
+                    for book_id, quantity in lines[ticket.id].items()
+                ),
+            )
+            for ticket in accepted
+        ]
+        if connection.features.can_return_rows_from_bulk_insert:
+            Order.objects.bulk_create(orders)
+        else:
+            for order in orders:
+                order.save()
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(
+                    order=order,
+                    book_id=book_id,
+                    quantity=quantity,
+                    price=books[book_id].price,
+                )
+                for ticket, order in zip(accepted, orders)
+                for book_id, quantity in lines[ticket.id].items()
+            ]
+        )
+        adjust_stock(deltas)
+        for ticket, order in zip(accepted, orders):
+            ticket.order, ticket.status = order, "done"
+
+        OrderTicket.objects.bulk_update(
+            tickets, ["status", "order", "error", "updated_at"]
+        )
+    return tickets
+
+
+def drain_order_queue(batch_size=100):
+    """
+    Обрабатывает одну пачку заявок; возвращает число обработанных. Если
+    пачка падает с неожиданной ошибкой, заявки оформляются по одной:
+    заявка, на которой ошибка повторяется, отклоняется, остальные не
+    остаются в статусе processing до перезапуска воркера.
+    """
+    tickets = claim_order_tickets(batch_size)
+    try:
+        return len(process_order_tickets(tickets))
+    except Exception:
+        logger.exception("Ошибка обработки пачки из %d заявок", len(tickets))
+    for ticket in tickets:
+        # Изменения упавшей пачки откатились вместе с транзакцией
+        ticket.status, ticket.order, ticket.error = "processing", None, ""
+        try:
+            process_order_tickets([ticket])
+        except Exception:
+            logger.exception("Ошибка обработки заявки %s", ticket.ticket)
+            OrderTicket.objects.filter(id=ticket.id).update(
+                status="failed",
+                error="Внутренняя ошибка обработки заявки",
+                updated_at=timezone.now(),
+            )
+    return len(tickets)
+
+
+def order_items_total():
+    """
+    Коррелированный подзапрос с суммой позиций заказа SUM(price * quantity);
+    для заказа без позиций - 0.
+    """
+    output_field = DecimalField(max_digits=10, decimal_places=2)
+    items = (
+        OrderItem.objects.filter(order=OuterRef("pk"))
+        .order_by()
+        .values("order")
+        .annotate(total=Sum(F("price") * F("quantity"), output_field=output_field))
+        .values("total")
+    )
+    return Coalesce(
+        Subquery(items, output_field=output_field),
+        Value(Decimal("0.00")),
+        output_field=output_field,
+    )
+
+
+def recalculate_totals(queryset=None):
+    """
+    Пересчитывает total_price заказов queryset (по умолчанию - всех) одним
+    коррелированным UPDATE. Затрагиваются только заказы с неверной суммой;
+    возвращает их количество.
+    """
+    if queryset is None:
+        queryset = Order.objects.all()
+    total = order_items_total()
+    return queryset.exclude(total_price=total).update(
+        total_price=total, updated_at=timezone.now()
+    )
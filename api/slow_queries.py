@@ -0,0 +1,261 @@
+"""
+Журнал медленных SQL-запросов.
+
+SlowQueryMiddleware (api.middleware) на время запроса ставит SlowQueryLog
+execute_wrapper на все подключения. Запрос дольше SLOW_QUERY_THRESHOLD_MS
+запоминается вместе с:
+- местом вызова: ближайшие к запросу кадры кода проекта (представление,
+  метод сериализатора, сервис) и маршрутом;
+- нормализованным шаблоном SQL (литералы, параметры и списки IN заменены),
+  по хэшу которого запросы группируются;
+- планом EXPLAIN без выполнения (ANALYZE off), если SLOW_QUERY_EXPLAIN;
+  план снимается один раз на шаблон в процессе.
+
+Текст запроса с параметрами сохраняется только для SELECT, не читающих
+таблицы SLOW_QUERY_MASKED_TABLES (пользователи, сессии). Для изменяющих
+запросов и запросов к этим таблицам в лог и SlowQuery попадает только
+шаблон, без параметров и плана: в них пароли, email и токены.
+
+После ответа запросы пишутся в лог api.slow_queries и суммируются в модели
+SlowQuery (отчёт в админке).
+"""
+
+import hashlib
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import ExitStack, nullcontext
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connections, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import SlowQuery
+
+logger = logging.getLogger("api.slow_queries")
+
+ORIGIN_FRAMES = 3
+EXPLAIN_CACHE_SIZE = 512
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w\"])-?\d+(?:\.\d+)?(?![\w\"])")
+_PLACEHOLDER = re.compile(r"%s|\?")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_ROWS = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+_SPACES = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """Шаблон SQL: литералы и параметры - '?', списки (?, ?, ...) - '(...)'."""
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _LIST.sub("(...)", sql)
+    sql = _ROWS.sub("(...)", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+def is_masked(sql):
+    """Параметры и план запроса не сохраняются (запись или таблица с ПДн)."""
+    words = sql.split(None, 1)
+    if not words or words[0].upper() != "SELECT":
+        return True
+    return any(
+        f'"{table}"' in sql or f" {table} " in f" {sql} "
+        for table in settings.SLOW_QUERY_MASKED_TABLES
+    )
+
+
+def digest(fingerprint_sql):
+    return hashlib.blake2b(fingerprint_sql.encode(), digest_size=16).hexdigest()
+
+
+_project_dir = os.path.join(str(settings.BASE_DIR), "")
+# Кадры инструментирования (middleware, execute_wrapper'ы) есть в стеке
+# каждого запроса и вытесняли бы из origin представления и сериализаторы
+_instrumentation_files = {
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    for name in (
+        "db_router.py",
+        "instrumentation.py",
+        "memory.py",
+        "metrics.py",
+        "middleware.py",
+        "profiling.py",
+        "query_budget.py",
+        "slow_queries.py",
+    )
+}
+
+
+def _is_project_file(filename):
+    return (
+        filename.startswith(_project_dir)
+        and "site-packages" not in filename
+        and filename not in _instrumentation_files
+    )
+
+
+def query_origin(limit=ORIGIN_FRAMES):
+    """Ближайшие кадры кода проекта: 'api/serializers.py:120 in get_rating'."""
+    frames = []
+    frame = sys._getframe(1)
+    while frame is not None and len(frames) < limit:
+        filename = frame.f_code.co_filename
+        if _is_project_file(filename):
+            path = os.path.relpath(filename, _project_dir)
+            frames.append(f"{path}:{frame.f_lineno} in {frame.f_code.co_name}")
+        frame = frame.f_back
+    return "\n".join(frames)
+
+
+_plans = OrderedDict()
+_plans_lock = threading.Lock()
+
+
+def explain(connection, sql, params):
+    """
+    План запроса без выполнения или "" (только SELECT). Выполняется на
+    курсоре драйвера, мимо execute_wrapper'ов; внутри транзакции - в точке
+    сохранения, чтобы ошибка EXPLAIN не прервала транзакцию запроса.
+    """
+    words = sql.split(None, 1)
+    if not words or words[0].upper() not in ("SELECT", "WITH"):
+        return ""
+    options = {"analyze": False} if connection.vendor == "postgresql" else {}
+    prefix = connection.ops.explain_query_prefix(**options)
+    # Вне транзакции ошибка EXPLAIN ничего не прерывает
+    savepoint = (
+        transaction.atomic(using=connection.alias)
+        if connection.in_atomic_block
+        else nullcontext()
+    )
+    try:
+        with savepoint, connection.wrap_database_errors:
+            with connection.cursor() as cursor:
+                cursor.cursor.execute(f"{prefix} {sql}", params)
+                rows = cursor.cursor.fetchall()
+    except DatabaseError as error:
+        return f"EXPLAIN недоступен: {error}"
+    return "\n".join(str(row[-1]) for row in rows)
+
+
+def cached_explain(connection, sql, params, key):
+    """EXPLAIN один раз на шаблон в процессе (не больше EXPLAIN_CACHE_SIZE)."""
+    with _plans_lock:
+        if key in _plans:
+            _plans.move_to_end(key)
+            return None
+    plan = explain(connection, sql, params)
+    with _plans_lock:
+        _plans[key] = True
+        while len(_plans) > EXPLAIN_CACHE_SIZE:
+            _plans.popitem(last=False)
+    return plan
+
+
+class SlowQueryLog:
+    """execute_wrapper: запоминает запросы дольше threshold_ms."""
+
+    def __init__(self, threshold_ms, explain=True):
+        self.threshold = threshold_ms / 1e3
+        self.explain = explain
+        self.queries = []
+        self.recording = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.recording:
+            # Точки сохранения вокруг EXPLAIN не относятся к запросу
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = time.perf_counter() - start
+        if duration >= self.threshold:
+            self.recording = True
+            try:
+                self.record(sql, params, many, context, duration)
+            finally:
+                self.recording = False
+        return result
+
+    def record(self, sql, params, many, context, duration):
+        pattern = fingerprint(sql)
+        key = digest(pattern)
+        masked = is_masked(sql)
+        plan = None
+        if self.explain and not many and not masked:
+            plan = cached_explain(context["connection"], sql, params, key)
+        self.queries.append(
+            {
+                "digest": key,
+                "fingerprint": pattern,
+                "sql": pattern if masked else sql,
+                "params": None if masked else repr(params)[:1000],
+                "duration_ms": round(duration * 1e3, 3),
+                "origin": query_origin(),
+                "plan": plan,
+            }
+        )
+
+    def __enter__(self):
+        self.stack = ExitStack()
+        for connection in connections.all():
+            self.stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stack.close()
+
+
+def report_slow_queries(queries, view_name=""):
+    """Пишет медленные запросы в лог и добавляет их к статистике SlowQuery."""
+    for query in queries:
+        fields = {key: value for key, value in query.items() if value is not None}
+        logger.warning("slow query", extra={"fields": {"view": view_name, **fields}})
+        try:
+            save_slow_query(query, view_name)
+        except DatabaseError:
+            logger.exception("Не удалось сохранить медленный запрос")
+
+
+def save_slow_query(query, view_name):
+    duration = query["duration_ms"]
+    example = query["sql"]
+    if query["params"] is not None:
+        example += f"\n-- params: {query['params']}"
+    values = {
+        "example_sql": example,
+        "view_name": view_name[:200],
+        "origin": query["origin"],
+        "updated_at": timezone.now(),
+    }
+    if query["plan"]:
+        values["plan"] = query["plan"]
+    queryset = SlowQuery.objects.filter(digest=query["digest"])
+    update = {
+        "calls": F("calls") + 1,
+        "total_ms": F("total_ms") + duration,
+        "max_ms": Greatest("max_ms", Value(duration)),
+        **values,
+    }
+    if queryset.update(**update):
+        return
+    try:
+        with transaction.atomic():
+            SlowQuery.objects.create(
+                digest=query["digest"],
+                fingerprint=query["fingerprint"],
+                calls=1,
+                total_ms=duration,
+                max_ms=duration,
+                **values,
+            )
+    except IntegrityError:
+        # Шаблон только что добавил другой процесс
+        queryset.update(**update)
@@ -0,0 +1,287 @@
+"""
+Снимки таблиц приложения api для быстрого сброса базы перед бенчмарками.
+
+Снимок - zip-файл с manifest.json и данными:
+- PostgreSQL: поток COPY ... (FORMAT BINARY) на каждую таблицу api. При
+  восстановлении таблицы очищаются TRUNCATE (без CASCADE), вторичные
+  индексы удаляются на время загрузки и строятся заново,
+  последовательности сдвигаются за максимальный id, затем выполняется
+  ANALYZE;
+- SQLite: копия базы, снятая backup API. Восстанавливаются только таблицы
+  api и их счётчики id: копия подключается через ATTACH, строки
+  переносятся INSERT ... SELECT с отключённой проверкой внешних ключей,
+  которая выполняется после загрузки.
+
+Остальные таблицы базы не меняются. Если в таблице вне api есть строки со
+ссылками на таблицы api (например, журнал действий админки), снимок не
+восстанавливается: после замены строк api ссылки указывали бы в пустоту.
+Пустые ссылающиеся таблицы PostgreSQL очищает вместе с таблицами api.
+
+В manifest.json записаны применённые миграции api: снимок другой схемы
+не восстанавливается без force.
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import zipfile
+
+from django.apps import apps
+from django.core.management.color import no_style
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.recorder import MigrationRecorder
+from django.utils import timezone
+
+MANIFEST_NAME = "manifest.json"
+SNAPSHOT_ALIAS = "snapshot"
+SQLITE_NAME = "database.sqlite3"
+SNAPSHOT_VERSION = 1
+
+
+class SnapshotError(Exception):
+    """Снимок нельзя создать или восстановить в текущей базе."""
+
+
+def snapshot_models():
+    """Модели api, включая автоматические промежуточные таблицы M2M."""
+    return list(apps.get_app_config("api").get_models(include_auto_created=True))
+
+
+def applied_migrations():
+    recorder = MigrationRecorder(connection)
+    return sorted(name for app, name in recorder.applied_migrations() if app == "api")
+
+
+def model_columns(model):
+    return [field.column for field in model._meta.concrete_fields]
+
+
+def check_referencing_tables(cursor, references):
+    """
+    Проверяет, что таблицы вне снимка, ссылающиеся на его таблицы, пусты;
+    references - {таблица: [таблицы снимка, на которые она ссылается]}.
+    """
+    quote = connection.ops.quote_name
+    for table, targets in sorted(references.items()):
+        cursor.execute(f"SELECT 1 FROM {quote(table)} LIMIT 1")
+        if cursor.fetchone():
+            raise SnapshotError(
+                f"Таблица {table} вне снимка ссылается на {', '.join(targets)}; "
+                "очистите её перед восстановлением"
+            )
+
+
+def save_snapshot(path, compresslevel=1):
+    """Сохраняет снимок в path; возвращает manifest."""
+    if connection.vendor not in ("postgresql", "sqlite"):
+        raise SnapshotError(f"Снимки не поддерживаются для {connection.vendor}")
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "vendor": connection.vendor,
+        "created_at": timezone.now().isoformat(),
+        "migrations": applied_migrations(),
+        "tables": [],
+    }
+    compression = zipfile.ZIP_DEFLATED if compresslevel else zipfile.ZIP_STORED
+    with zipfile.ZipFile(
+        path, "w", compression=compression, compresslevel=compresslevel or None
+    ) as archive:
+        if connection.vendor == "postgresql":
+            _save_postgresql(archive, manifest)
+        else:
+            _save_sqlite(archive, manifest)
+        archive.writestr(MANIFEST_NAME, json.dumps(manifest, indent=2))
+    return manifest
+
+
+def restore_snapshot(path, force=False):
+    """Восстанавливает снимок из path; возвращает его manifest."""
+    with zipfile.ZipFile(path) as archive:
+        manifest = json.loads(archive.read(MANIFEST_NAME))
+        if manifest.get("version") != SNAPSHOT_VERSION:
+            raise SnapshotError("Неподдерживаемая версия снимка")
+        if manifest["vendor"] != connection.vendor:
+            raise SnapshotError(
+                f"Снимок создан для {manifest['vendor']}, а база - {connection.vendor}"
+            )
+        if not force and manifest["migrations"] != applied_migrations():
+            raise SnapshotError(
+                "Миграции api в снимке и в базе различаются (используйте --force)"
+            )
+        if connection.vendor == "postgresql":
+            _restore_postgresql(archive, manifest)
+        else:
+            _restore_sqlite(archive, manifest)
+    return manifest
+
+
+def _save_postgresql(archive, manifest):
+    quote = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Согласованный снимок всех таблиц на один момент времени
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        for model in snapshot_models():
+            table = model._meta.db_table
+            columns = model_columns(model)
+            names = ", ".join(quote(column) for column in columns)
+            with archive.open(f"{table}.bin", "w", force_zip64=True) as stream:
+                cursor.cursor.copy_expert(
+                    f"COPY {quote(table)} ({names}) TO STDOUT (FORMAT BINARY)",
+                    stream,
+                )
+            manifest["tables"].append(
+                {"table": table, "columns": columns, "rows": cursor.cursor.rowcount}
+            )
+
+
+def _restore_postgresql(archive, manifest):
+    quote = connection.ops.quote_name
+    tables = [entry["table"] for entry in manifest["tables"]]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT src.relname, dst.relname FROM pg_constraint c
+            JOIN pg_class src ON src.oid = c.conrelid
+            JOIN pg_class dst ON dst.oid = c.confrelid
+            WHERE c.contype = 'f'
+              AND dst.relnamespace = current_schema()::regnamespace
+              AND dst.relname = ANY(%s) AND NOT src.relname = ANY(%s)
+            """,
+            [tables, tables],
+        )
+        references = {}
+        for table, target in cursor.fetchall():
+            references.setdefault(table, []).append(target)
+        # Блокировка до проверки: строки не появятся до конца восстановления
+        for table in sorted(references):
+            cursor.execute(f"LOCK TABLE {quote(table)} IN ACCESS EXCLUSIVE MODE")
+        check_referencing_tables(cursor, references)
+        cursor.execute("SET CONSTRAINTS ALL DEFERRED")
+        cursor.execute(
+            "TRUNCATE {}".format(
+                ", ".join(quote(table) for table in tables + sorted(references))
+            )
+        )
+        # Вторичные индексы (не PK и не UNIQUE) строятся заново после загрузки:
+        # один проход построения быстрее обновления индекса на каждую строку
+        cursor.execute(
+            """
+            SELECT i.indexname, i.indexdef FROM pg_indexes i
+            WHERE i.schemaname = current_schema() AND i.tablename = ANY(%s)
+              AND NOT EXISTS (
+                SELECT 1 FROM pg_constraint c WHERE c.conname = i.indexname
+              )
+            """,
+            [tables],
+        )
+        indexes = cursor.fetchall()
+        for name, _ in indexes:
+            cursor.execute(f"DROP INDEX {quote(name)}")
+
+        # Внешние ключи отложены до конца транзакции (Django и так создаёт их
+        # DEFERRABLE INITIALLY DEFERRED), порядок загрузки таблиц не важен
+        for entry in manifest["tables"]:
+            names = ", ".join(quote(column) for column in entry["columns"])
+            with archive.open(f"{entry['table']}.bin") as stream:
+                cursor.cursor.copy_expert(
+                    f"COPY {quote(entry['table'])} ({names}) FROM STDIN "
+                    "(FORMAT BINARY)",
+                    stream,
+                )
+
+        # Отложенные проверки внешних ключей выполняются здесь: CREATE INDEX
+        # не работает на таблице с ожидающими триггерами
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        for _, definition in indexes:
+            cursor.execute(definition)
+        for sql in connection.ops.sequence_reset_sql(no_style(), snapshot_models()):
+            cursor.execute(sql)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "ANALYZE {}".format(", ".join(quote(table) for table in tables))
+        )
+
+
+def _save_sqlite(archive, manifest):
+    connection.ensure_connection()
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, SQLITE_NAME)
+        target = sqlite3.connect(filename)
+        try:
+            connection.connection.backup(target)
+        finally:
+            target.close()
+        archive.write(filename, SQLITE_NAME)
+
+    with connection.cursor() as cursor:
+        quote = connection.ops.quote_name
+        for model in snapshot_models():
+            table = model._meta.db_table
+            cursor.execute(f"SELECT COUNT(*) FROM {quote(table)}")
+            manifest["tables"].append(
+                {
+                    "table": table,
+                    "columns": model_columns(model),
+                    "rows": cursor.fetchone()[0],
+                }
+            )
+
+
+def _restore_sqlite(archive, manifest):
+    quote = connection.ops.quote_name
+    tables = [entry["table"] for entry in manifest["tables"]]
+    connection.ensure_connection()
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, SQLITE_NAME)
+        with archive.open(SQLITE_NAME) as source, open(filename, "wb") as target:
+            shutil.copyfileobj(source, target, 1024 * 1024)
+        with connection.cursor() as cursor:
+            # ATTACH и PRAGMA foreign_keys не работают внутри транзакции
+            cursor.execute(f"ATTACH DATABASE %s AS {SNAPSHOT_ALIAS}", [filename])
+            try:
+                with connection.constraint_checks_disabled():
+                    _copy_sqlite_tables(cursor, manifest, tables)
+            finally:
+                cursor.execute(f"DETACH DATABASE {SNAPSHOT_ALIAS}")
+            for table in tables:
+                cursor.execute(f"ANALYZE {quote(table)}")
+
+
+def _copy_sqlite_tables(cursor, manifest, tables):
+    quote = connection.ops.quote_name
+    references = {}
+    for table in connection.introspection.table_names(cursor):
+        if table in tables:
+            continue
+        cursor.execute(f"PRAGMA foreign_key_list({quote(table)})")
+        for row in cursor.fetchall():
+            if row[2] in tables:
+                references.setdefault(table, []).append(row[2])
+
+    with transaction.atomic():
+        check_referencing_tables(cursor, references)
+        for entry in manifest["tables"]:
+            table = quote(entry["table"])
+            names = ", ".join(quote(column) for column in entry["columns"])
+            cursor.execute(f"DELETE FROM main.{table}")
+            cursor.execute(
+                f"INSERT INTO main.{table} ({names}) "
+                f"SELECT {names} FROM {SNAPSHOT_ALIAS}.{table}"
+            )
+        # Счётчики AUTOINCREMENT: новые id продолжаются после строк снимка
+        placeholders = ", ".join(["%s"] * len(tables))
+        cursor.execute(
+            f"DELETE FROM main.sqlite_sequence WHERE name IN ({placeholders})",
+            tables,
+        )
+        cursor.execute(
+            "INSERT INTO main.sqlite_sequence (name, seq) SELECT name, seq "
+            f"FROM {SNAPSHOT_ALIAS}.sqlite_sequence WHERE name IN ({placeholders})",
+            tables,
+        )
+        try:
+            connection.check_constraints(table_names=tables)
+        except IntegrityError as error:
+            raise SnapshotError(f"Снимок нарушает внешние ключи: {error}") from error
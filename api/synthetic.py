@@ -0,0 +1,440 @@
+"""
+Генератор синтетических данных для бенчмарков (populate_db --scale).
+
+Данные детерминированы: для каждой таблицы используется свой генератор
+случайных чисел, инициализированный из --seed и имени таблицы, поэтому
+одинаковые параметры дают одинаковые строки. Строки пишутся пачками:
+в PostgreSQL - через COPY, в остальных СУБД - через executemany.
+"""
+
+import io
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Author, Book, Order, OrderItem, Review, User
+
+# Объёмы продакшена при --scale 1
+PRODUCTION_SCALE = {
+    "authors": 100_000,
+    "books": 1_000_000,
+    "users": 1_000_000,
+    "orders": 5_000_000,
+    "reviews": 10_000_000,
+}
+
+# Пароль всех сгенерированных пользователей
+SYNTHETIC_PASSWORD = "password123"
+
+MALE_FIRST_NAMES = [
+    "Александр", "Алексей", "Андрей", "Борис", "Василий", "Виктор", "Владимир",
+    "Геннадий", "Григорий", "Дмитрий", "Евгений", "Иван", "Игорь", "Константин",
+    "Леонид", "Михаил", "Николай", "Олег", "Павел", "Пётр", "Сергей", "Юрий",
+]  # fmt: skip
+FEMALE_FIRST_NAMES = [
+    "Алина", "Анастасия", "Анна", "Валентина", "Вера", "Галина", "Дарья",
+    "Евгения", "Екатерина", "Елена", "Ирина", "Ксения", "Людмила", "Марина",
+    "Мария", "Надежда", "Наталья", "Ольга", "Светлана", "Татьяна", "Юлия",
+]  # fmt: skip
+# Мужская форма фамилии; женская получается добавлением "а"
+LAST_NAMES = [
+    "Иванов", "Смирнов", "Кузнецов", "Попов", "Васильев", "Петров", "Соколов",
+    "Михайлов", "Новиков", "Фёдоров", "Морозов", "Волков", "Алексеев", "Лебедев",
+    "Семёнов", "Егоров", "Павлов", "Козлов", "Степанов", "Николаев", "Орлов",
+    "Андреев", "Макаров", "Никитин", "Захаров", "Зайцев", "Соловьёв", "Борисов",
+]  # fmt: skip
+CITIES = [
+    "Москве", "Санкт-Петербурге", "Казани", "Нижнем Новгороде", "Самаре",
+    "Екатеринбурге", "Новосибирске", "Твери", "Туле", "Орле", "Воронеже",
+    "Ярославле", "Иркутске", "Владивостоке", "Калуге", "Рязани",
+]  # fmt: skip
+GENRES = [
+    "романов", "повестей", "рассказов", "детективов", "стихов",
+    "исторических романов", "фантастических повестей", "пьес", "эссе",
+]  # fmt: skip
+TITLE_HEADS = [
+    "Тайна", "История", "Тень", "Песнь", "Хроники", "Дорога", "Сад", "Легенда",
+    "Повесть", "Письма", "Зима", "Память", "Возвращение", "Последний день",
+    "Дневник", "Свет", "Голос", "Сны", "Осень", "Пленник", "Наследник",
+]  # fmt: skip
+TITLE_TAILS = [
+    "старого дома", "северного ветра", "забытого города", "тихой реки",
+    "белых ночей", "одного лета", "далёкой звезды", "последнего поезда",
+    "морского берега", "тёмного леса", "весенней грозы", "вечного сна",
+    "уездного доктора", "маленькой станции", "горного перевала",
+    "петербургской зимы", "пустой усадьбы", "чужого сада", "ночного сторожа",
+]  # fmt: skip
+DESCRIPTION_SENTENCES = [
+    "Роман о выборе, который каждый делает в одиночку.",
+    "Действие разворачивается в провинциальном городе начала века.",
+    "Герой возвращается в родные места спустя двадцать лет.",
+    "Книга сочетает семейную сагу и психологический детектив.",
+    "Автор бережно восстанавливает быт и язык эпохи.",
+    "История дружбы, которая пережила войну и разлуку.",
+    "Небольшая повесть о любви, памяти и прощении.",
+    "Сюжет построен на письмах, найденных в старом сундуке.",
+    "Читатель до последней страницы не знает, кому верить.",
+    "Тонкий юмор соседствует здесь с настоящей трагедией.",
+    "Экспедиция на север оборачивается испытанием для всех её участников.",
+    "Книга открывает цикл, удостоенный литературных премий.",
+]  # fmt: skip
+REVIEW_COMMENTS = {
+    1: ["Не дочитал, очень скучно.", "Разочарование, не рекомендую."],
+    2: ["Слабый сюжет, хотя язык неплохой.", "Ожидал большего."],
+    3: ["Неплохо, но на один раз.", "Середина затянута, финал хороший."],
+    4: ["Хорошая книга, прочитал за два вечера.", "Интересно и живо написано."],
+    5: ["Отличная книга!", "Одна из лучших книг, что я читал.", "Классика!"],
+}
+# Распределение оценок: отзывы чаще положительные
+RATING_WEIGHTS = [5, 7, 18, 35, 35]
+
+
+def scaled_counts(scale, overrides=None):
+    """Количество строк каждой таблицы для --scale с явными переопределениями."""
+    counts = {
+        table: max(int(round(count * scale)), 0)
+        for table, count in PRODUCTION_SCALE.items()
+    }
+    for table, count in (overrides or {}).items():
+        if count is not None:
+            counts[table] = count
+    return counts
+
+
+def validate_counts(counts):
+    """Проверяет, что зависимые таблицы есть на что ссылаться."""
+    if counts["books"] and not counts["authors"]:
+        raise ValueError("Для книг нужен хотя бы один автор")
+    if (counts["orders"] or counts["reviews"]) and not (
+        counts["users"] and counts["books"]
+    ):
+        raise ValueError("Для заказов и отзывов нужны пользователи и книги")
+    if counts["reviews"] > counts["users"] * counts["books"]:
+        raise ValueError("Отзывов больше, чем пар пользователь-книга")
+
+
+def table_rng(seed, table):
+    """Независимый детерминированный генератор для таблицы."""
+    return random.Random(f"{seed}:{table}")
+
+
+def book_price(seed, index):
+    """Цена книги по её номеру (без хранения цен миллиона книг в памяти)."""
+    digest = (index * 2654435761 + seed * 40503) % 2**32
+    return Decimal(150 + digest % 2850)
+
+
+def person_name(rng):
+    """Случайные имя и фамилия с согласованным родом."""
+    if rng.random() < 0.5:
+        return rng.choice(MALE_FIRST_NAMES), rng.choice(LAST_NAMES)
+    return rng.choice(FEMALE_FIRST_NAMES), rng.choice(LAST_NAMES) + "а"
+
+
+def author_rows(seed, first_id, count):
+    rng = table_rng(seed, "authors")
+    for author_id in range(first_id, first_id + count):
+        first_name, last_name = person_name(rng)
+        bio = (
+            f"Родился(ась) в {rng.randint(1880, 1995)} году в {rng.choice(CITIES)}. "
+            f"Автор {rng.randint(2, 40)} {rng.choice(GENRES)}."
+        )
+        yield (author_id, f"{first_name} {last_name}", bio)
+
+
+def book_rows(seed, first_id, count, first_author_id, authors):
+    rng = table_rng(seed, "books")
+    for index in range(count):
+        title = f"{rng.choice(TITLE_HEADS)} {rng.choice(TITLE_TAILS)}"
+        if rng.random() < 0.2:
+            title += f". Книга {rng.randint(2, 7)}"
+        description = " ".join(rng.sample(DESCRIPTION_SENTENCES, rng.randint(2, 4)))
+        yield (
+            first_id + index,
+            title,
+            first_author_id + rng.randrange(authors),
+            book_price(seed, index),
+            description,
+            rng.randint(0, 200),
+        )
+
+
+def user_rows(seed, first_id, count, password):
+    rng = table_rng(seed, "users")
+    for user_id in range(first_id, first_id + count):
+        first_name, last_name = person_name(rng)
+        yield (
+            user_id,
+            f"user{user_id}",
+            f"user{user_id}@example.ru",
+            first_name,
+            last_name,
+            password,
+            "user",
+        )
+
+
+def order_rows(seed, first_id, first_item_id, count, users, books, first_ids):
+    """
+    Заказы с позициями (1-4 разные книги): выдаёт пары (строка заказа,
+    строки позиций). Сумма заказа считается сразу по ценам позиций.
+    """
+    rng = table_rng(seed, "orders")
+    statuses = ["completed"] * 7 + ["pending"] * 2 + ["cancelled"]
+    # Шаг между книгами заказа: offset * step < books, поэтому книги разные
+    max_step = max((books - 1) // 3, 1)
+    item_id = first_item_id
+    for order_id in range(first_id, first_id + count):
+        first_book = rng.randrange(books)
+        step = rng.randint(1, max_step)
+        size = min(rng.choices([1, 2, 3, 4], weights=[50, 30, 15, 5])[0], books)
+        total = Decimal(0)
+        items = []
+        for offset in range(size):
+            book_index = (first_book + offset * step) % books
+            price = book_price(seed, book_index)
+            quantity = rng.choices([1, 2, 3], weights=[85, 12, 3])[0]
+            total += price * quantity
+            book_id = first_ids["books"] + book_index
+            items.append((item_id, order_id, book_id, quantity, price))
+            item_id += 1
+        user_id = first_ids["users"] + rng.randrange(users)
+        yield (order_id, user_id, total, rng.choice(statuses)), items
+
+
+def review_rows(seed, first_id, count, first_user_id, users, first_book_id, books):
+    """
+    Отзывы с уникальными парами (пользователь, книга): i-й отзыв пишет
+    пользователь i % users о книге (i // users + пользователь * шаг) % books.
+    """
+    rng = table_rng(seed, "reviews")
+    step = max(books // max(users, 1), 1) + 1
+    ratings = list(range(1, 6))
+    for index in range(count):
+        user = index % users
+        book = (index // users + user * step) % books
+        rating = rng.choices(ratings, weights=RATING_WEIGHTS)[0]
+        yield (
+            first_id + index,
+            first_user_id + user,
+            first_book_id + book,
+            rating,
+            rng.choice(REVIEW_COMMENTS[rating]),
+        )
+
+
+def copy_value(value):
+    """Значение в текстовом формате COPY."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, str):
+        return (
+            value.replace("\\", "\\\\")
+            .replace("\t", "\\t")
+            .replace("\n", "\\n")
+            .replace("\r", "\\r")
+        )
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+class RowWriter:
+    """
+    Пишет строки модели пачками. Генераторы выдают только часть колонок;
+    остальные (created_at, updated_at, значения по умолчанию) одинаковы для
+    всех строк и подготавливаются один раз.
+
+    В PostgreSQL используется COPY; в остальных СУБД - executemany одного
+    INSERT: значения генераторов уже готовы для драйвера, поэтому
+    построчная подготовка полей, которую делает bulk_create, не нужна.
+    """
+
+    def __init__(self, model, columns, chunk_size, now):
+        self.model = model
+        self.chunk_size = chunk_size
+        self.use_copy = connection.vendor == "postgresql"
+        self.rows = 0
+
+        fields = {field.attname: field for field in model._meta.concrete_fields}
+        defaults = []
+        for attname, field in fields.items():
+            if attname in columns:
+                continue
+            if getattr(field, "auto_now", False) or getattr(
+                field, "auto_now_add", False
+            ):
+                value = now
+            elif field.has_default():
+                value = field.get_default()
+            else:
+                value = None
+            defaults.append((attname, field.get_db_prep_save(value, connection)))
+
+        quote = connection.ops.quote_name
+        table = quote(model._meta.db_table)
+        names = ", ".join(
+            quote(fields[attname].column)
+            for attname in list(columns) + [attname for attname, _ in defaults]
+        )
+        self.copy_sql = f"COPY {table} ({names}) FROM STDIN"
+        self.copy_suffix = (
+            "".join("\t" + copy_value(value) for _, value in defaults) + "\n"
+        )
+        placeholders = ", ".join(["%s"] * (len(columns) + len(defaults)))
+        self.insert_sql = f"INSERT INTO {table} ({names}) VALUES ({placeholders})"
+        self.default_values = tuple(value for _, value in defaults)
+
+    def write(self, rows):
+        """Пишет пачку строк (кортежей в порядке columns)."""
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            if self.use_copy:
+                buffer = io.StringIO()
+                suffix = self.copy_suffix
+                for row in rows:
+                    buffer.write("\t".join(map(copy_value, row)))
+                    buffer.write(suffix)
+                buffer.seek(0)
+                cursor.cursor.copy_expert(self.copy_sql, buffer)
+            else:
+                defaults = self.default_values
+                cursor.executemany(self.insert_sql, [row + defaults for row in rows])
+        self.rows += len(rows)
+
+    def write_all(self, rows):
+        """Пишет все строки генератора пачками по chunk_size."""
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                self.write(chunk)
+                chunk = []
+        self.write(chunk)
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max("id"))["last"] or 0) + 1
+
+
+def generate(counts, seed=42, chunk_size=50_000, report=None):
+    """
+    Генерирует и записывает данные в количестве counts. report(таблица,
+    строк, секунд) вызывается после каждой таблицы. Возвращает
+    {таблица: (строк, секунд)}; время включает генерацию строк.
+    """
+    validate_counts(counts)
+    now = timezone.now()
+    ids = {
+        "authors": next_id(Author),
+        "books": next_id(Book),
+        "users": next_id(User),
+        "orders": next_id(Order),
+        "items": next_id(OrderItem),
+        "reviews": next_id(Review),
+    }
+    stats = {}
+
+    def run(table, writer, rows):
+        start = time.perf_counter()
+        writer.write_all(rows)
+        stats[table] = (writer.rows, time.perf_counter() - start)
+        if report is not None:
+            report(table, *stats[table])
+
+    run(
+        "authors",
+        RowWriter(Author, ["id", "name", "bio"], chunk_size, now),
+        author_rows(seed, ids["authors"], counts["authors"]),
+    )
+    run(
+        "books",
+        RowWriter(
+            Book,
+            ["id", "title", "author_id", "price", "description", "stock"],
+            chunk_size,
+            now,
+        ),
+        book_rows(
+            seed, ids["books"], counts["books"], ids["authors"], counts["authors"]
+        ),
+    )
+    # Один хэш пароля на всех: make_password стоит десятки миллисекунд
+    password = make_password(SYNTHETIC_PASSWORD)
+    run(
+        "users",
+        RowWriter(
+            User,
+            ["id", "username", "email", "first_name", "last_name", "password", "role"],
+            chunk_size,
+            now,
+        ),
+        user_rows(seed, ids["users"], counts["users"], password),
+    )
+
+    orders = RowWriter(
+        Order, ["id", "user_id", "total_price", "status"], chunk_size, now
+    )
+    items = RowWriter(
+        OrderItem, ["id", "order_id", "book_id", "quantity", "price"], chunk_size, now
+    )
+    start = time.perf_counter()
+    order_chunk, item_chunk = [], []
+    for order, order_items in order_rows(
+        seed,
+        ids["orders"],
+        ids["items"],
+        counts["orders"],
+        counts["users"],
+        counts["books"],
+        ids,
+    ):
+        order_chunk.append(order)
+        item_chunk.extend(order_items)
+        if len(order_chunk) >= chunk_size:
+            orders.write(order_chunk)
+            items.write(item_chunk)
+            order_chunk, item_chunk = [], []
+    orders.write(order_chunk)
+    items.write(item_chunk)
+    elapsed = time.perf_counter() - start
+    # Заказы и позиции генерируются вместе, время у них общее
+    stats["orders"] = (orders.rows, elapsed)
+    stats["items"] = (items.rows, elapsed)
+    if report is not None:
+        report("orders", *stats["orders"])
+        report("items", *stats["items"])
+
+    run(
+        "reviews",
+        RowWriter(
+            Review, ["id", "user_id", "book_id", "rating", "comment"], chunk_size, now
+        ),
+        review_rows(
+            seed,
+            ids["reviews"],
+            counts["reviews"],
+            ids["users"],
+            counts["users"],
+            ids["books"],
+            counts["books"],
+        ),
+    )
+
+    # Явные id: сдвигаем последовательности за вставленные строки
+    statements = connection.ops.sequence_reset_sql(
+        no_style(), [Author, Book, User, Order, OrderItem, Review]
+    )
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+    return stats
@@ -333,6 +333,26 @@ class AdminCRUDTestCase(TestCase):
         self.assertEqual(response.status_code, 302)
         self.assertEqual(Book.objects.count(), initial_count - 1)
 
+    def test_admin_recalculate_totals_action(self):
+        """Проверка действия пересчета сумм заказов"""
+        author = Author.objects.create(name="Test Author")
+        book = Book.objects.create(
+            title="Test Book", author=author, price=Decimal("500.00"), stock=10
+        )
+        order = Order.objects.create(user=self.admin_user)
+        OrderItem.objects.create(
+            order=order, book=book, quantity=2, price=Decimal("500.00")
+        )
+
+        response = self.client.post(
+            "/admin/api/order/",
+            {"action": "recalculate_totals", "_selected_action": [order.id]},
+        )
+
+        self.assertEqual(response.status_code, 302)
+        order.refresh_from_db()
+        self.assertEqual(order.total_price, Decimal("1000.00"))
+
 
 class AdminSearchFilterTestCase(TestCase):
     """Тесты поиска и фильтрации в админ-панели"""
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты для асинхронных представлений каталога (api.async_views)
+Ответы асинхронного пути совпадают с ответами синхронных представлений DRF,
+остальные запросы передаются синхронному представлению; middleware api
+работают в асинхронной цепочке
+"""
+
+import logging
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api import views
+from api.async_views import (
+    async_detail_view,
+    async_list_view,
+    catalog_detail_view,
+    catalog_list_view,
+)
+from api.fast_serializers import FastSerializer
+from api.metrics import clear_metrics_dir
+from api.middleware import (
+    CompressionMiddleware,
+    HashingBusyMiddleware,
+    MemoryMiddleware,
+    MetricsMiddleware,
+    PerformanceMiddleware,
+    ProfilingMiddleware,
+    QueryBudgetMiddleware,
+    SlowQueryMiddleware,
+)
+from api.models import (
+    Author,
+    Book,
+    Order,
+    OrderItem,
+    RequestProfile,
+    Review,
+    SlowQuery,
+)
+from api.serializers import OrderSerializer
+
+User = get_user_model()
+
+book_list = async_list_view(views.BookListCreateView)
+book_detail = async_detail_view(views.BookDetailView)
+author_list = async_list_view(views.AuthorListCreateView)
+review_list = async_list_view(views.ReviewListCreateView)
+
+
+def sync_response(view, request, kwargs):
+    response = view(request, **kwargs)
+    response.render()
+    return response
+
+
+class AsyncCatalogViewsTestCase(TestCase):
+    """Сравнение асинхронных и синхронных представлений каталога"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="reader", password="pass12345")
+        cls.authors = [
+            Author.objects.create(name=f"Автор {number}", bio="Биография")
+            for number in range(3)
+        ]
+        cls.books = [
+            Book.objects.create(
+                title=f"Книга {number}",
+                author=cls.authors[number % 3],
+                price=Decimal(number * 7 % 50 + 1) + Decimal("0.99"),
+                description="Описание про море" if number % 4 else "Про горы",
+                stock=number,
+            )
+            for number in range(12)
+        ]
+        for book in cls.books[:5]:
+            Review.objects.create(
+                user=cls.user, book=book, rating=book.stock % 5 + 1, comment="Да"
+            )
+        cls.token = str(RefreshToken.for_user(cls.user).access_token)
+
+    def setUp(self):
+        self.factory = AsyncRequestFactory()
+
+    async def compare(self, view, path, **kwargs):
+        """Ответы асинхронного view и обёрнутого им синхронного на GET path."""
+        response = await view(self.factory.get(path), **kwargs)
+        if hasattr(response, "render"):
+            # Ошибки отдаёт синхронное представление
+            await sync_to_async(response.render)()
+        expected = await sync_to_async(sync_response)(
+            view.__wrapped__, self.factory.get(path), kwargs
+        )
+        self.assertEqual(response.status_code, expected.status_code, path)
+        self.assertEqual(response.content, expected.content, path)
+        self.assertEqual(response["Content-Type"], expected["Content-Type"])
+        self.assertEqual(response["Allow"], expected["Allow"])
+        self.assertEqual(response["Vary"], expected["Vary"])
+        return response
+
+    async def test_book_list(self):
+        """Тест: фильтры, поиск, сортировка, поля и страницы списка книг"""
+        author = self.authors[1].pk
+        for query in (
+            "",
+            "?search=море&ordering=-price",
+            f"?author={author}&ordering=title",
+            "?price_min=10&price_max=30&ordering=created_at",
+            "?fields=id,title,author&expand=",
+            "?omit=description&page_size=5&page=2",
+            "?author=999",
+            "?page=9",
+        ):
+            await self.compare(book_list, "/api/books/" + query)
+
+    async def test_author_and_review_lists(self):
+        """Тест: списки авторов и отзывов"""
+        await self.compare(author_list, "/api/authors/?fields=id,name")
+        await self.compare(review_list, "/api/reviews/?ordering=-rating")
+        await self.compare(review_list, f"/api/reviews/?book={self.books[0].pk}")
+        await self.compare(review_list, "/api/reviews/?expand=book&omit=user")
+
+    async def test_book_detail(self):
+        """Тест: книга и отсутствующая книга"""
+        pk = self.books[3].pk
+        await self.compare(book_detail, f"/api/books/{pk}/", pk=pk)
+        await self.compare(book_detail, f"/api/books/{pk}/?fields=title", pk=pk)
+        response = await self.compare(book_detail, "/api/books/999/", pk=999)
+        self.assertEqual(response.status_code, 404)
+
+    def test_queries(self):
+        """Тест: страница списка - два запроса, книга - один"""
+        with self.assertNumQueries(2):
+            async_to_sync(book_list)(self.factory.get("/api/books/?ordering=price"))
+        with self.assertNumQueries(1):
+            async_to_sync(book_detail)(self.factory.get("/"), pk=self.books[0].pk)
+
+    async def test_other_requests_use_sync_view(self):
+        """Тест: создание и запросы с токеном обслуживает синхронное представление"""
+        request = self.factory.get(
+            "/api/books/", headers={"Authorization": "Bearer invalid"}
+        )
+        self.assertEqual((await book_list(request)).status_code, 401)
+
+        request = self.factory.post(
+            "/api/books/",
+            {"title": "Новая", "author_id": self.authors[0].pk, "price": "5.00"},
+            content_type="application/json",
+            headers={"Authorization": f"Bearer {self.token}"},
+        )
+        self.assertEqual((await book_list(request)).status_code, 201)
+
+        request = self.factory.get("/api/books/", headers={"Accept": "text/html"})
+        response = await book_list(request)
+        await sync_to_async(response.render)()
+        self.assertIn("Новая", response.content.decode())
+
+    def test_setting_selects_views(self):
+        """Тест: ASYNC_CATALOG_VIEWS выбирает асинхронные представления"""
+        with override_settings(ASYNC_CATALOG_VIEWS=False):
+            view = catalog_list_view(views.BookListCreateView)
+        self.assertFalse(iscoroutinefunction(view))
+        with override_settings(ASYNC_CATALOG_VIEWS=True):
+            view = catalog_detail_view(views.BookDetailView)
+        self.assertTrue(iscoroutinefunction(view))
+        self.assertIs(view.view_class, views.BookDetailView)
+        self.assertEqual(view.__module__, views.__name__)
+
+
+class AsyncSerializeTestCase(TestCase):
+    """Тесты FastSerializer.aserialize"""
+
+    async def test_nested_lists(self):
+        """Тест: вложенные списки читаются асинхронно и совпадают с serialize"""
+        user = await User.objects.acreate(username="buyer", password="x")
+        author = await Author.objects.acreate(name="Автор")
+        book = await Book.objects.acreate(title="Книга", author=author, price=1)
+        for _ in range(2):
+            order = await Order.objects.acreate(user=user, total_price=2)
+            await OrderItem.objects.acreate(
+                order=order, book=book, quantity=2, price=1
+            )
+        await Order.objects.acreate(user=user, total_price=0)
+
+        fast = FastSerializer.for_serializer(OrderSerializer())
+        queryset = fast.values(Order.objects.order_by("pk"))
+        data = await fast.aserialize(queryset)
+        self.assertEqual(await fast.aserialize([]), [])
+        self.assertEqual(len(data[0]["items"]), 1)
+        self.assertEqual(data[2]["items"], [])
+        expected = await sync_to_async(fast.serialize)(queryset)
+        self.assertEqual(data, expected)
+
+
+class AsyncMiddlewareTestCase(TestCase):
+    """Тесты middleware api в асинхронной цепочке (ASGI)"""
+
+    def setUp(self):
+        author = Author.objects.create(name="Тестовый Автор")
+        for number in range(30):
+            Book.objects.create(
+                title=f"Книга {number}", author=author, price=Decimal("10.00")
+            )
+        self.directory = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            METRICS_ENABLED=True,
+            METRICS_DIR=self.directory,
+            METRICS_TOKEN="secret",
+        )
+        self.settings_override.enable()
+        caches[settings.COMPRESSION_CACHE_ALIAS].clear()
+
+    def tearDown(self):
+        clear_metrics_dir()
+        self.settings_override.disable()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    @override_settings(
+        SLOW_QUERY_THRESHOLD_MS=500,
+        QUERY_BUDGET_CHECK=True,
+        PERFORMANCE_SAMPLE_RATE=1,
+        MEMORY_DIAGNOSTICS=True,
+    )
+    def test_async_mode(self):
+        """Тест: с асинхронным get_response middleware возвращает корутину"""
+
+        async def get_response(request):
+            return HttpResponse()
+
+        for middleware_class in (
+            MetricsMiddleware,
+            CompressionMiddleware,
+            ProfilingMiddleware,
+            SlowQueryMiddleware,
+            QueryBudgetMiddleware,
+            PerformanceMiddleware,
+            MemoryMiddleware,
+            HashingBusyMiddleware,
+        ):
+            middleware = middleware_class(get_response)
+            self.assertTrue(iscoroutinefunction(middleware), middleware_class)
+            self.assertFalse(
+                iscoroutinefunction(middleware_class(lambda request: None))
+            )
+
+    async def test_metrics_and_compression(self):
+        """Тест: метрики считают SQL потока запроса, ответ сжимается"""
+        response = await self.async_client.get(
+            "/api/books/", headers={"Accept-Encoding": "gzip"}
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+        response = await self.async_client.get(
+            "/metrics", headers={"Authorization": "Bearer secret"}
+        )
+        self.assertIn(
+            'bookstore_db_queries_total{route="/api/books/",method="GET"} 2',
+            response.content.decode(),
+        )
+
+    @override_settings(PERFORMANCE_SAMPLE_RATE=1, QUERY_BUDGET_CHECK=True)
+    async def test_performance_and_query_budget(self):
+        """Тест: Server-Timing и бюджет SQL считают запросы асинхронной цепочки"""
+        with mock.patch.object(views.BookListCreateView, "query_budgets", {"GET": 1}):
+            with self.assertLogs("api.query_budget", logging.WARNING) as logs:
+                with self.assertLogs("api.performance", logging.INFO) as timings:
+                    response = await self.async_client.get("/api/books/")
+        self.assertIn("db;dur=", response["Server-Timing"])
+        self.assertIn('desc="2 queries"', response["Server-Timing"])
+        self.assertEqual(timings.records[0].fields["db_queries"], 2)
+        self.assertIn("2 SQL-запросов при бюджете 1", logs.output[0])
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=1e-6, SLOW_QUERY_EXPLAIN=False)
+    async def test_slow_queries(self):
+        """Тест: медленные запросы записываются и в асинхронной цепочке"""
+        with self.assertLogs("api.slow_queries", logging.WARNING):
+            await self.async_client.get("/api/books/")
+        self.assertEqual(
+            await SlowQuery.objects.filter(view_name="book-list").acount(), 2
+        )
+
+    async def test_profiling(self):
+        """Тест: профилирование запроса администратором под ASGI"""
+        admin = await User.objects.acreate(username="admin", role="admin")
+        await sync_to_async(self.async_client.force_login)(admin)
+        response = await self.async_client.get("/api/books/?_profile=1")
+        self.assertEqual(response.status_code, 200)
+        profile = await RequestProfile.objects.aget(pk=response["X-Profile-Id"])
+        self.assertEqual(profile.view_name, "book-list")
+        self.assertIn("list", profile.summary)
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты для аутентификации по JWT без запроса пользователя (api.authentication)
+Пользователь из claims токена, отложенная загрузка остальных полей, отзыв
+токенов при изменении пользователя и старые токены без claims
+"""
+
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import RefreshToken as PlainRefreshToken
+
+from api import views
+from api.authentication import (
+    RefreshToken,
+    StatelessJWTAuthentication,
+    check_denylist_cache,
+    revoke_tokens,
+)
+from api.models import Order
+
+User = get_user_model()
+
+
+class StatelessAuthTestCase(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        # Отметки отзыва не должны достаться пользователям других тестов
+        self.addCleanup(caches["default"].clear)
+        self.user = User.objects.create_user(
+            username="reader", email="reader@example.com", password="pass12345"
+        )
+
+    def header(self, token):
+        return {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+
+    def token(self, user=None):
+        return RefreshToken.for_user(user or self.user).access_token
+
+    def authenticate(self, token):
+        request = RequestFactory().get("/api/orders/", **self.header(token))
+        return StatelessJWTAuthentication().authenticate(request)[0]
+
+
+class StatelessJWTAuthenticationTestCase(StatelessAuthTestCase):
+    """Тесты StatelessJWTAuthentication"""
+
+    def test_user_from_claims(self):
+        """Тест: пользователь строится из claims без запросов к БД"""
+        token = self.token()
+        self.assertEqual(token["role"], "user")
+        # Первая проверка читает поколение из БД в кэш
+        with self.assertNumQueries(1):
+            self.authenticate(token)
+        with self.assertNumQueries(0):
+            user = self.authenticate(token)
+        self.assertEqual(
+            (user.pk, user.username, user.role), (self.user.pk, "reader", "user")
+        )
+        self.assertTrue(user.is_authenticated)
+
+        # Отложенные поля загружаются одним запросом
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, "reader@example.com")
+            self.assertEqual(user.last_name, "")
+
+    def test_plain_token(self):
+        """Тест: токен без данных пользователя проверяется по БД"""
+        with self.assertNumQueries(1):
+            user = self.authenticate(PlainRefreshToken.for_user(self.user).access_token)
+        self.assertEqual(user, self.user)
+
+    def test_login_token(self):
+        """Тест: вход выдаёт токены с данными пользователя"""
+        response = self.client.post(
+            "/api/login/",
+            {"username": "reader", "password": "pass12345"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.authenticate(response.json()["access"]), self.user)
+
+    def test_inactive_claim(self):
+        """Тест: токен неактивного пользователя отклоняется"""
+        self.user.is_active = False
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(self.token())
+
+
+class TokenRevocationTestCase(StatelessAuthTestCase):
+    """Тесты отзыва токенов"""
+
+    def assertRevoked(self, token):
+        with self.assertRaises(AuthenticationFailed) as error:
+            self.authenticate(token)
+        self.assertEqual(error.exception.detail["code"], "token_revoked")
+
+    def test_revoke_tokens(self):
+        """Тест: отзыв отклоняет выданные раньше токены, не новые"""
+        token = self.token()
+        revoke_tokens(self.user.pk)
+        self.assertRevoked(token)
+        # Выданный сразу после отзыва токен действителен
+        fresh = self.token()
+        self.assertEqual(self.authenticate(fresh), self.user)
+
+        # Без кэша поколение читается из БД
+        caches["default"].clear()
+        with self.assertNumQueries(1):
+            self.assertRevoked(token)
+        self.assertEqual(self.authenticate(fresh), self.user)
+
+    def test_stale_save_keeps_generation(self):
+        """Тест: save() экземпляра, загруженного до отзыва, не возвращает поколение"""
+        token = self.token()
+        user = User.objects.get(pk=self.user.pk)
+        revoke_tokens(self.user.pk)
+        user.email = "new@example.com"
+        user.save()
+        caches["default"].clear()
+        self.assertRevoked(token)
+        self.assertEqual(User.objects.get(pk=self.user.pk).email, "new@example.com")
+
+    def test_revoke_on_change(self):
+        """Тест: смена роли, блокировка и пароль отзывают токены"""
+        for change in (
+            lambda user: setattr(user, "role", "admin"),
+            lambda user: setattr(user, "is_active", False),
+            lambda user: user.set_password("new-pass12345"),
+        ):
+            token = self.token()
+            user = User.objects.get(pk=self.user.pk)
+            change(user)
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                user.save()
+            self.assertEqual(len(callbacks), 1)
+            self.assertRevoked(token)
+            caches["default"].clear()
+
+    def test_revoke_on_change_after_create(self):
+        """Тест: экземпляр из create_user() отзывает токены при изменении"""
+        token = self.token()
+        self.user.role = "admin"
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.user.save()
+        self.assertEqual(len(callbacks), 1)
+        self.assertRevoked(token)
+
+    def test_other_changes_keep_tokens(self):
+        """Тест: изменение других полей токены не отзывает"""
+        token = self.token()
+        user = self.authenticate(token)
+        user.email = "new@example.com"
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            user.save()
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.authenticate(token), self.user)
+
+    def test_revoke_on_delete(self):
+        """Тест: удаление пользователя отзывает его токены"""
+        token = self.token()
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).delete()
+        self.assertRevoked(token)
+
+
+class StatelessViewsTestCase(StatelessAuthTestCase):
+    """Тесты представлений с StatelessJWTAuthentication"""
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(
+            views.OrderListCreateView,
+            "authentication_classes",
+            [StatelessJWTAuthentication],
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_orders(self):
+        """Тест: заказы пользователя без запроса пользователя"""
+        Order.objects.create(user=self.user, total_price=Decimal("10.00"))
+        admin = User.objects.create_user(username="boss", password="x", role="admin")
+        Order.objects.create(user=admin, total_price=Decimal("20.00"))
+
+        response = self.client.get("/api/orders/", **self.header(self.token()))
+        self.assertEqual(response.json()["count"], 1)
+        response = self.client.get("/api/orders/", **self.header(self.token(admin)))
+        self.assertEqual(response.json()["count"], 2)
+
+
+@override_settings(JWT_STATELESS_AUTH=True, DEBUG=False)
+class DenylistCacheCheckTestCase(SimpleTestCase):
+    """Тесты проверки кэша отзыва при запуске"""
+
+    def test_process_cache_rejected(self):
+        """Тест: кэш процесса без DEBUG не запускается"""
+        with self.assertRaises(ImproperlyConfigured):
+            check_denylist_cache()
+        with override_settings(DEBUG=True):
+            check_denylist_cache()
+
+    def test_shared_cache(self):
+        """Тест: общий кэш и выключенная настройка проходят проверку"""
+        shared = {
+            "default": {
+                "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+                "LOCATION": "jwt_denylist",
+            }
+        }
+        with override_settings(CACHES=shared):
+            check_denylist_cache()
+        with override_settings(JWT_STATELESS_AUTH=False):
+            check_denylist_cache()
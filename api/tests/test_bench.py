@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты для набора бенчмарков эндпоинтов (bench_endpoints)
+Проверка перцентилей, сравнения с базовой линией и покрытия URL
+"""
+
+import json
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from api.bench import compare_results, latency_summary, percentile
+from api.management.commands.bench_endpoints import SCENARIOS
+from api.models import Author, Book
+from api.urls import urlpatterns
+
+
+def result(p50=10.0, queries=2, peak=1000):
+    return {
+        "p50_ms": p50,
+        "p90_ms": p50,
+        "p99_ms": p50,
+        "queries": queries,
+        "peak_alloc_bytes": peak,
+    }
+
+
+class BenchHelpersTestCase(SimpleTestCase):
+    """Тесты вспомогательных функций бенчмарков"""
+
+    def test_percentile(self):
+        """Тест: перцентиль методом ближайшего ранга"""
+        samples = list(range(1, 101))
+        self.assertEqual(percentile(samples, 0.5), 50)
+        self.assertEqual(percentile(samples, 0.99), 99)
+        self.assertEqual(percentile([3, 1, 2], 1.0), 3)
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+    def test_latency_summary_in_ms(self):
+        """Тест: сводка задержек переводится в миллисекунды"""
+        summary = latency_summary([0.001, 0.002, 0.003])
+        self.assertAlmostEqual(summary["p50_ms"], 2.0)
+        self.assertAlmostEqual(summary["max_ms"], 3.0)
+
+    def test_compare_results(self):
+        """Тест: регрессии по задержке, SQL-запросам и памяти"""
+        baseline = {"scenarios": {"a": result(), "b": result(), "c": result()}}
+        current = {
+            "scenarios": {
+                "a": result(p50=20.0),
+                "b": result(queries=3),
+                "c": result(peak=5000),
+                "new": result(p50=999.0),
+            }
+        }
+
+        regressions = compare_results(baseline, current, threshold=0.2)
+
+        found = {(item["scenario"], item["metric"]) for item in regressions}
+        self.assertIn(("a", "p50_ms"), found)
+        self.assertIn(("b", "queries"), found)
+        self.assertIn(("c", "peak_alloc_bytes"), found)
+        self.assertFalse(any(scenario == "new" for scenario, _ in found))
+
+    def test_compare_ignores_noise(self):
+        """Тест: рост в пределах порога и малые абсолютные изменения не регрессия"""
+        baseline = {"scenarios": {"fast": result(p50=0.5), "slow": result(p50=100.0)}}
+        current = {"scenarios": {"fast": result(p50=0.9), "slow": result(p50=115.0)}}
+
+        self.assertEqual(compare_results(baseline, current, threshold=0.2), [])
+
+    def test_every_url_has_scenario(self):
+        """Тест: для каждого URL из api/urls.py есть сценарий"""
+        covered = {scenario.url_name for scenario in SCENARIOS}
+        names = {pattern.name for pattern in urlpatterns}
+        self.assertEqual(names - covered, set())
+
+
+class BenchEndpointsCommandTestCase(TestCase):
+    """Тесты команды bench_endpoints"""
+
+    def setUp(self):
+        """Подготовка данных"""
+        author = Author.objects.create(name="Test Author")
+        Book.objects.create(
+            title="Test Book", author=author, price=Decimal("100.00"), stock=1
+        )
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.output = os.path.join(directory.name, "baseline.json")
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command(
+            "bench_endpoints",
+            "--requests",
+            "2",
+            "--warmup",
+            "0",
+            "--only",
+            "books",
+            "book-detail",
+            "create-order",
+            *args,
+            stdout=out,
+        )
+        return out.getvalue()
+
+    def test_output_and_rollback(self):
+        """Тест: результаты сохраняются, данные откатываются"""
+        self.run_command("--output", self.output)
+
+        with open(self.output, encoding="utf-8") as file:
+            results = json.load(file)
+        self.assertEqual(
+            set(results["scenarios"]), {"books", "book-detail", "create-order"}
+        )
+        self.assertEqual(results["scenarios"]["create-order"]["errors"], 0)
+        self.assertGreater(results["scenarios"]["create-order"]["queries"], 0)
+        self.assertEqual(Book.objects.get().stock, 1)
+
+    def test_regression_fails(self):
+        """Тест: регрессия относительно базовой линии завершает команду ошибкой"""
+        self.run_command("--output", self.output)
+        with open(self.output, encoding="utf-8") as file:
+            baseline = json.load(file)
+        baseline["scenarios"]["books"]["queries"] = 0
+        with open(self.output, "w", encoding="utf-8") as file:
+            json.dump(baseline, file)
+
+        with self.assertRaises(CommandError):
+            self.run_command("--baseline", self.output)
+
+    @override_settings(
+        LOGIN_THROTTLE_ENABLED=True,
+        LOGIN_THROTTLE_BUCKETS={
+            "ip": {"capacity": 1, "per_minute": 1},
+            "username": {"capacity": 1, "per_minute": 1},
+        },
+    )
+    def test_login_without_throttle(self):
+        """Тест: входы одного пользователя не упираются в ограничение частоты"""
+        self.addCleanup(caches["default"].clear)
+        out = StringIO()
+        call_command(
+            "bench_endpoints",
+            "--requests=3",
+            "--warmup=0",
+            "--only=login",
+            f"--output={self.output}",
+            stdout=out,
+        )
+        with open(self.output, encoding="utf-8") as file:
+            results = json.load(file)
+        self.assertEqual(results["scenarios"]["login"]["errors"], 0)
+
+    def test_empty_database(self):
+        """Тест: без данных команда сообщает об ошибке"""
+        Book.objects.all().delete()
+        with self.assertRaises(CommandError):
+            self.run_command()
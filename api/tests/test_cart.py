@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты для серверной корзины
+Проверка добавления, изменения, удаления, проверки наличия и оформления заказа
+"""
+
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from api.models import Author, Book, CartItem, Order
+from api.services import add_to_cart
+
+User = get_user_model()
+
+
+class CartAPITestCase(APITestCase):
+    """Тесты API корзины"""
+
+    def setUp(self):
+        """Подготовка данных"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.author = Author.objects.create(name="Test Author")
+        self.book1 = Book.objects.create(
+            title="Book 1", author=self.author, price=Decimal("100.00"), stock=10
+        )
+        self.book2 = Book.objects.create(
+            title="Book 2", author=self.author, price=Decimal("250.50"), stock=2
+        )
+
+    def add(self, book, quantity=1):
+        return self.client.post(
+            "/api/cart/items/",
+            {"book_id": book.id, "quantity": quantity},
+            format="json",
+        )
+
+    def test_guest_cannot_use_cart(self):
+        """Тест: гость не имеет доступа к корзине"""
+        self.client.force_authenticate(user=None)
+        response = self.client.get("/api/cart/")
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_add_to_cart(self):
+        """Тест добавления книги и итогов корзины"""
+        self.add(self.book1, 2)
+        response = self.add(self.book2)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["total_quantity"], 3)
+        self.assertEqual(response.data["total_price"], "450.50")
+        self.assertEqual(response.data["items"][0]["book"]["title"], "Book 1")
+
+    def test_add_same_book_increments_quantity(self):
+        """Тест: повторное добавление увеличивает количество"""
+        self.add(self.book1)
+        self.add(self.book1, 2)
+
+        self.assertEqual(CartItem.objects.get(user=self.user).quantity, 3)
+
+    def test_add_same_book_concurrently(self):
+        """Тест: строку добавил параллельный запрос между UPDATE и INSERT"""
+        CartItem.objects.create(user=self.user, book=self.book1, quantity=1)
+        update = QuerySet.update
+        calls = []
+
+        def first_update_misses(queryset, **kwargs):
+            calls.append(kwargs)
+            return 0 if len(calls) == 1 else update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, "update", first_update_misses):
+            add_to_cart(self.user, self.book1.id, 2)
+
+        self.assertEqual(CartItem.objects.get(user=self.user).quantity, 3)
+
+    def test_add_nonexistent_book(self):
+        """Тест добавления несуществующей книги"""
+        response = self.client.post(
+            "/api/cart/items/", {"book_id": 99999}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_update_and_remove(self):
+        """Тест изменения количества и удаления строки"""
+        self.add(self.book1)
+        url = f"/api/cart/items/{self.book1.id}/"
+
+        response = self.client.patch(url, {"quantity": 5}, format="json")
+        self.assertEqual(response.data["total_quantity"], 5)
+
+        response = self.client.delete(url)
+        self.assertEqual(response.data["items"], [])
+
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cart_read_is_single_query(self):
+        """Тест: цены и наличие всей корзины проверяются одним запросом"""
+        self.add(self.book1)
+        self.add(self.book2)
+
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/cart/")
+        self.assertEqual(len(response.data["items"]), 2)
+
+    def test_stock_problems_reported(self):
+        """Тест: нехватка товара видна в корзине до оформления"""
+        self.add(self.book2, 5)
+        response = self.client.get("/api/cart/")
+
+        self.assertFalse(response.data["items"][0]["available"])
+        self.assertEqual(response.data["errors"], ["Недостаточно товара Book 2"])
+
+    def test_checkout(self):
+        """Тест оформления заказа из корзины"""
+        self.add(self.book1, 3)
+        self.add(self.book2, 2)
+        response = self.client.post("/api/cart/checkout/")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["total_price"], "801.00")
+        self.assertEqual(len(response.data["items"]), 2)
+        self.assertFalse(CartItem.objects.filter(user=self.user).exists())
+        self.book1.refresh_from_db()
+        self.book2.refresh_from_db()
+        self.assertEqual(self.book1.stock, 7)
+        self.assertEqual(self.book2.stock, 0)
+
+    def test_checkout_insufficient_stock_is_atomic(self):
+        """Тест: при нехватке товара ничего не меняется"""
+        self.add(self.book1, 1)
+        self.add(self.book2, 3)
+        response = self.client.post("/api/cart/checkout/")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(CartItem.objects.filter(user=self.user).count(), 2)
+        self.book1.refresh_from_db()
+        self.assertEqual(self.book1.stock, 10)
+
+    def test_checkout_empty_cart(self):
+        """Тест оформления пустой корзины"""
+        response = self.client.post("/api/cart/checkout/")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("error", response.data)
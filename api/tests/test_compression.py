@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты для сжатия ответов API
+Проверка выбора кодировки, Vary, кэширования сжатых байтов
+"""
+
+import gzip
+import json
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api import middleware
+from api.authentication import RefreshToken
+from api.middleware import negotiate_encoding, parse_accept_encoding
+from api.models import Author, Book, User
+
+
+class AcceptEncodingTestCase(TestCase):
+    """Тесты разбора заголовка Accept-Encoding"""
+
+    def test_parse_quality_values(self):
+        """Тест разбора q-значений"""
+        self.assertEqual(
+            parse_accept_encoding("gzip;q=0.5, br, identity;q=0"),
+            {"gzip": 0.5, "br": 1.0, "identity": 0.0},
+        )
+
+    def test_gzip_rejected_with_zero_quality(self):
+        """Тест: кодировка с q=0 не выбирается"""
+        self.assertIsNone(negotiate_encoding("gzip;q=0"))
+
+    def test_wildcard_selects_gzip(self):
+        """Тест: * разрешает gzip"""
+        self.assertEqual(negotiate_encoding("*")[0], "gzip")
+
+    def test_no_header(self):
+        """Тест: без заголовка ответ не сжимается"""
+        self.assertIsNone(negotiate_encoding(""))
+
+
+@override_settings(COMPRESSION_MIN_SIZE=200)
+class CompressionMiddlewareTestCase(TestCase):
+    """Тесты CompressionMiddleware на списке книг"""
+
+    def setUp(self):
+        """Подготовка данных"""
+        cache.clear()
+        self.client = APIClient()
+        author = Author.objects.create(name="Лев Толстой", bio="Русский писатель")
+        for i in range(10):
+            Book.objects.create(
+                title=f"Книга {i}",
+                author=author,
+                price=Decimal("500.00"),
+                description="Длинное описание книги " * 10,
+                stock=10,
+            )
+
+    def test_gzip_response(self):
+        """Тест сжатия gzip и корректности распакованного тела"""
+        plain = self.client.get("/api/books/")
+        response = self.client.get("/api/books/", HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertLess(len(response.content), len(plain.content))
+        self.assertEqual(
+            json.loads(gzip.decompress(response.content)), json.loads(plain.content)
+        )
+
+    def test_no_compression_without_accept_encoding(self):
+        """Тест: без Accept-Encoding тело не сжимается"""
+        response = self.client.get("/api/books/")
+
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+    @override_settings(COMPRESSION_MIN_SIZE=10**6)
+    def test_small_response_not_compressed(self):
+        """Тест: ответы меньше COMPRESSION_MIN_SIZE не сжимаются"""
+        response = self.client.get("/api/books/", HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_compressed_bytes_cached(self):
+        """Тест: повторный одинаковый ответ берется из кэша без сжатия"""
+        first = self.client.get("/api/books/", HTTP_ACCEPT_ENCODING="gzip")
+        compress = mock.Mock(side_effect=gzip.compress)
+        with mock.patch.object(middleware, "ENCODERS", [("gzip", compress)]):
+            second = self.client.get("/api/books/", HTTP_ACCEPT_ENCODING="gzip")
+
+        compress.assert_not_called()
+        self.assertEqual(first.content, second.content)
+
+    def test_private_responses_not_cached(self):
+        """Тест: ответы на запросы с токеном или cookie сессии не кэшируются"""
+        self.client.get("/api/books/", HTTP_ACCEPT_ENCODING="gzip")
+        compress = mock.Mock(side_effect=gzip.compress)
+        with mock.patch.object(middleware, "ENCODERS", [("gzip", compress)]):
+            user = User.objects.create_user(username="reader", password="x")
+            token = RefreshToken.for_user(user).access_token
+            self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+            self.client.get("/api/books/", HTTP_ACCEPT_ENCODING="gzip")
+            self.client.credentials()
+            self.client.cookies["sessionid"] = "abc"
+            self.client.get("/api/books/", HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertEqual(compress.call_count, 2)
+
+    def test_vary_authorization_not_cached(self):
+        """Тест: ответ с Vary: Authorization или Set-Cookie сжимается заново"""
+        compression = middleware.CompressionMiddleware(lambda request: None)
+        request = RequestFactory().get("/api/books/")
+        for header, value in (("Vary", "Authorization"), ("Set-Cookie", None)):
+            response = HttpResponse(b"{}", content_type="application/json")
+            if value is None:
+                response.set_cookie("token", "secret")
+            else:
+                response[header] = value
+            self.assertFalse(compression.is_shared(request, response))
+        response = HttpResponse(b"{}", content_type="application/json")
+        self.assertTrue(compression.is_shared(request, response))
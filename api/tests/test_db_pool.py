@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты для пула подключений к БД (api.db_pool)
+Пул проверяется на подключениях-заглушках: выдача и возврат, ограничение
+размера, проверка простоявших подключений, закрытие старых и сломанных,
+пулы после fork и метрики
+"""
+
+import gc
+import shutil
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from api.db_pool import pool as pool_module
+from api.db_pool.base import reset_connection
+from api.db_pool.pool import ConnectionPool, PoolTimeout, close_pools, get_pool
+from api.management.commands.bench_db_connections import mode_settings
+from api.metrics import clear_metrics_dir, render_metrics
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeDatabase:
+    """connect() для пула: нумерует открытые подключения."""
+
+    def __init__(self):
+        self.connections = []
+
+    def connect(self):
+        conn = FakeConnection(len(self.connections))
+        self.connections.append(conn)
+        return conn
+
+
+class ConnectionPoolTestCase(SimpleTestCase):
+    """Тесты ConnectionPool"""
+
+    def setUp(self):
+        self.database = FakeDatabase()
+
+    def make_pool(self, **kwargs):
+        return ConnectionPool(self.database.connect, **kwargs)
+
+    def test_reuse(self):
+        """Тест: возвращённое подключение выдаётся снова, последнее - первым"""
+        pool = self.make_pool(max_size=3)
+        first, second = pool.getconn(), pool.getconn()
+        pool.putconn(first)
+        pool.putconn(second)
+        self.assertIs(pool.getconn(), second)
+        self.assertIs(pool.getconn(), first)
+        self.assertEqual(len(self.database.connections), 2)
+        self.assertEqual(
+            pool.stats(), {"idle": 0, "busy": 2, "waiting": 0, "opened": 2}
+        )
+
+    def test_max_size(self):
+        """Тест: сверх max_size подключение ждёт возврата или таймаута"""
+        pool = self.make_pool(max_size=1, timeout=0.05)
+        conn = pool.getconn()
+        with self.assertRaises(PoolTimeout):
+            pool.getconn()
+
+        pool.timeout = 5
+        timer = threading.Timer(0.05, pool.putconn, (conn,))
+        timer.start()
+        self.assertIs(pool.getconn(), conn)
+        timer.join()
+        self.assertEqual(len(self.database.connections), 1)
+
+    def test_health_check(self):
+        """Тест: простоявшее подключение проверяется, сломанное заменяется"""
+        checked = []
+
+        def check(conn):
+            checked.append(conn.number)
+            return conn.number != 0
+
+        pool = self.make_pool(check=check, check_interval=60)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        self.assertIs(pool.getconn(), conn)
+        self.assertEqual(checked, [])
+
+        pool.putconn(conn)
+        pool.check_interval = 0
+        replacement = pool.getconn()
+        self.assertEqual(checked, [0])
+        self.assertTrue(conn.closed)
+        self.assertEqual(replacement.number, 1)
+
+    def test_closed_on_return(self):
+        """Тест: сломанное, старое или отброшенное подключение не возвращается"""
+        pool = self.make_pool(reset=lambda conn: conn.number != 0)
+        broken, discarded = pool.getconn(), pool.getconn()
+        pool.putconn(broken)
+        pool.putconn(discarded, discard=True)
+        self.assertTrue(broken.closed and discarded.closed)
+
+        pool.max_lifetime = 0
+        old = pool.getconn()
+        pool.putconn(old)
+        self.assertTrue(old.closed)
+        self.assertEqual(pool.stats()["idle"], 0)
+
+    def test_max_idle(self):
+        """Тест: простаивающие дольше max_idle закрываются сверх min_size"""
+        pool = self.make_pool(min_size=1, max_size=3, max_idle=0.01)
+        connections = [pool.getconn() for _ in range(3)]
+        for conn in connections:
+            pool.putconn(conn)
+        time.sleep(0.02)
+        self.assertIs(pool.getconn(), connections[2])
+        self.assertEqual([conn.closed for conn in connections], [True, True, False])
+
+    def test_dropped_connection(self):
+        """Тест: место невозвращённого и удалённого подключения освобождается"""
+        pool = self.make_pool(max_size=1, timeout=0.05)
+        pool.getconn()
+        self.database.connections.clear()
+        gc.collect()
+        self.assertEqual(pool.getconn().number, 0)
+
+    def test_close(self):
+        """Тест: close() закрывает свободные, выданные закрываются при возврате"""
+        pool = self.make_pool()
+        idle, busy = pool.getconn(), pool.getconn()
+        pool.putconn(idle)
+        pool.close()
+        self.assertTrue(idle.closed)
+        self.assertFalse(busy.closed)
+        pool.putconn(busy)
+        self.assertTrue(busy.closed)
+
+
+class PoolRegistryTestCase(SimpleTestCase):
+    """Тесты пулов процесса (get_pool, close_pools)"""
+
+    def tearDown(self):
+        close_pools()
+
+    def test_pool_per_process(self):
+        """Тест: после fork создаётся новый пул, пул мастера не закрывается"""
+        database = FakeDatabase()
+        parent = get_pool("test", lambda: ConnectionPool(database.connect))
+        self.assertIs(get_pool("test", None), parent)
+        conn = parent.getconn()
+        parent.putconn(conn)
+
+        with mock.patch.object(pool_module.os, "getpid", return_value=-1):
+            child = get_pool("test", lambda: ConnectionPool(database.connect))
+            self.assertIsNot(child, parent)
+            self.assertIn(parent, pool_module._inherited)
+            self.assertIsNot(child.getconn(), conn)
+            close_pools()
+        self.assertFalse(conn.closed)
+        pool_module._inherited.remove(parent)
+        parent.close()
+
+    def test_close_pools(self):
+        """Тест: close_pools закрывает пулы процесса, следующий создаётся заново"""
+        database = FakeDatabase()
+        pool = get_pool("test", lambda: ConnectionPool(database.connect))
+        pool.putconn(pool.getconn())
+        close_pools()
+        self.assertTrue(database.connections[0].closed)
+        self.assertIsNot(
+            get_pool("test", lambda: ConnectionPool(database.connect)), pool
+        )
+
+
+class PoolMetricsTestCase(SimpleTestCase):
+    """Тесты метрик пула"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            METRICS_ENABLED=True, METRICS_DIR=self.directory
+        )
+        self.settings_override.enable()
+
+    def tearDown(self):
+        clear_metrics_dir()
+        self.settings_override.disable()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_metrics(self):
+        """Тест: выдачи, ожидание, закрытия и число подключений пула"""
+        pool = ConnectionPool(
+            FakeDatabase().connect, name="metrics", max_size=2, timeout=0
+        )
+        first, second = pool.getconn(), pool.getconn()
+        pool.putconn(first)
+        pool.getconn()
+        with self.assertRaises(PoolTimeout):
+            pool.getconn()
+        pool.putconn(second, discard=True)
+
+        text = render_metrics()
+        for line in (
+            'bookstore_db_pool_connections{alias="metrics",state="busy"} 1',
+            'bookstore_db_pool_connections{alias="metrics",state="idle"} 0',
+            'bookstore_db_pool_checkouts_total{alias="metrics",result="new"} 2',
+            'bookstore_db_pool_checkouts_total{alias="metrics",result="reused"} 1',
+            'bookstore_db_pool_checkouts_total{alias="metrics",result="timeout"} 1',
+            'bookstore_db_pool_wait_seconds_count{alias="metrics"} 3',
+            'bookstore_db_pool_discarded_total{alias="metrics",reason="discarded"} 1',
+        ):
+            self.assertIn(line, text)
+
+
+class PoolBackendTestCase(SimpleTestCase):
+    """Тесты бэкенда api.db_pool без сервера PostgreSQL"""
+
+    def test_reset_connection(self):
+        """Тест: незавершённая транзакция откатывается, разорванное - отброшено"""
+        conn = mock.Mock(closed=False, autocommit=False)
+        conn.info = SimpleNamespace(transaction_status=2)
+        conn.rollback.side_effect = lambda: setattr(conn.info, "transaction_status", 0)
+        self.assertTrue(reset_connection(conn))
+        conn.rollback.assert_called_once()
+        self.assertTrue(conn.autocommit)
+
+        conn.info.transaction_status = 4
+        self.assertFalse(reset_connection(conn))
+        conn.closed = True
+        self.assertFalse(reset_connection(conn))
+
+    def test_bench_mode_settings(self):
+        """Тест: настройки режимов bench_db_connections"""
+        settings_dict = {
+            "ENGINE": "django.db.backends.postgresql",
+            "CONN_MAX_AGE": 0,
+            "OPTIONS": {"connect_timeout": 5},
+        }
+        new = mode_settings(settings_dict, "new", 4)
+        self.assertEqual(new["CONN_MAX_AGE"], 0)
+        persistent = mode_settings(settings_dict, "persistent", 4)
+        self.assertGreater(persistent["CONN_MAX_AGE"], 0)
+        pooled = mode_settings(settings_dict, "pool", 4)
+        self.assertEqual(pooled["ENGINE"], "api.db_pool")
+        self.assertEqual(
+            pooled["OPTIONS"], {"connect_timeout": 5, "pool": {"max_size": 4}}
+        )
+        self.assertNotIn("pool", settings_dict["OPTIONS"])
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты для быстрого пути сериализации списков
+Свойство: для случайных данных и случайных ?fields= / ?omit= / ?expand=
+вывод FastSerializer совпадает с выводом DRF-сериализатора байт в байт
+"""
+
+import random
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.fast_serializers import FastSerializer
+from api.models import Author, Book, Order, OrderItem, Review
+from api.serializers import (
+    AuthorSerializer,
+    BookSerializer,
+    OrderSerializer,
+    ReviewSerializer,
+)
+
+User = get_user_model()
+
+ALPHABET = "абвгдеёжзийклмнопрстуфхцчшщъыьэюяABCxyz 0123456789\"'\\\n\t <>&"
+
+
+class FastSerializerPropertyTestCase(TestCase):
+    """Сравнение FastSerializer с DRF-сериализаторами на случайных данных"""
+
+    SEEDS = range(5)
+
+    def setUp(self):
+        """Подготовка фабрики запросов"""
+        self.factory = APIRequestFactory()
+
+    def random_text(self, rng, max_length):
+        return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, max_length)))
+
+    def populate(self, rng):
+        """Создает случайный набор авторов, книг, пользователей, заказов и отзывов"""
+        authors = [
+            Author.objects.create(
+                name=self.random_text(rng, 30) or "A", bio=self.random_text(rng, 200)
+            )
+            for _ in range(rng.randint(1, 5))
+        ]
+        books = [
+            Book.objects.create(
+                title=self.random_text(rng, 50) or "B",
+                author=rng.choice(authors),
+                price=Decimal(rng.randint(1, 10**7)) / 100,
+                description=self.random_text(rng, 300),
+                stock=rng.randint(0, 1000),
+                cover_image=rng.choice([None, "", "https://example.com/c.jpg"]),
+            )
+            for _ in range(rng.randint(1, 15))
+        ]
+        users = [
+            User.objects.create(
+                username=f"user{rng.random()}",
+                email=rng.choice(["", "u@example.com"]),
+                first_name=self.random_text(rng, 10),
+                role=rng.choice(["guest", "user", "admin"]),
+            )
+            for _ in range(rng.randint(1, 4))
+        ]
+        for user in users:
+            for book in rng.sample(books, rng.randint(0, len(books))):
+                Review.objects.create(
+                    user=user,
+                    book=book,
+                    rating=rng.randint(1, 5),
+                    comment=self.random_text(rng, 100),
+                )
+            for _ in range(rng.randint(0, 3)):
+                order = Order.objects.create(
+                    user=user,
+                    total_price=Decimal(rng.randint(0, 10**6)) / 100,
+                    status=rng.choice(["pending", "completed", "cancelled"]),
+                )
+                for book in rng.sample(books, rng.randint(0, min(4, len(books)))):
+                    OrderItem.objects.create(
+                        order=order,
+                        book=book,
+                        quantity=rng.randint(1, 5),
+                        price=book.price,
+                    )
+
+    def random_params(self, rng, serializer_class):
+        """Случайная комбинация ?fields= / ?omit= / ?expand="""
+        names = list(serializer_class().fields)
+        params = {}
+        if rng.random() < 0.4:
+            params["fields"] = ",".join(rng.sample(names, rng.randint(1, len(names))))
+        if rng.random() < 0.3:
+            params["omit"] = ",".join(rng.sample(names, rng.randint(1, len(names))))
+        if rng.random() < 0.5:
+            expandable = list(serializer_class.expandable_fields)
+            params["expand"] = ",".join(
+                rng.sample(expandable, rng.randint(0, len(expandable)))
+            )
+        return params
+
+    def assert_equivalent(self, serializer_class, queryset, params):
+        request = Request(self.factory.get("/", params))
+        context = {"request": request}
+        expected = serializer_class(
+            queryset.order_by("pk"), many=True, context=context
+        ).data
+
+        fast = FastSerializer.for_serializer(serializer_class(context=context))
+        self.assertIsNotNone(fast)
+        actual = fast.serialize(fast.values(queryset.order_by("pk")))
+
+        self.assertEqual(
+            JSONRenderer().render(actual), JSONRenderer().render(expected), params
+        )
+
+    def test_equivalence_on_random_data(self):
+        """Тест: вывод совпадает байт в байт для всех четырех сериализаторов"""
+        cases = [
+            (AuthorSerializer, Author),
+            (BookSerializer, Book),
+            (OrderSerializer, Order),
+            (ReviewSerializer, Review),
+        ]
+        for seed in self.SEEDS:
+            rng = random.Random(seed)
+            with self.subTest(seed=seed):
+                self.populate(rng)
+                for serializer_class, model in cases:
+                    for _ in range(5):
+                        params = self.random_params(rng, serializer_class)
+                        self.assert_equivalent(
+                            serializer_class, model.objects.all(), params
+                        )
+
+    def test_empty_queryset(self):
+        """Тест сериализации пустого списка"""
+        fast = FastSerializer.for_serializer(OrderSerializer())
+
+        self.assertEqual(fast.serialize(fast.values(Order.objects.none())), [])
+
+    def test_uncompilable_serializer_returns_none(self):
+        """Тест: сериализатор с вычисляемым полем не компилируется"""
+
+        class MethodSerializer(serializers.ModelSerializer):
+            upper = serializers.SerializerMethodField()
+
+            class Meta:
+                model = Book
+                fields = ["id", "upper"]
+
+            def get_upper(self, obj):
+                return obj.title.upper()
+
+        self.assertIsNone(FastSerializer.for_serializer(MethodSerializer()))
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты для измерения времени запросов (PerformanceMiddleware)
+Проверка Server-Timing, структурированного лога и выборки запросов
+"""
+
+import json
+import logging
+import time
+from decimal import Decimal
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.instrumentation import (
+    RequestTimings,
+    StructuredFormatter,
+    current_timings,
+    measure,
+)
+from api.models import Author, Book
+
+
+def parse_server_timing(header):
+    """{метрика: (длительность, описание)} из заголовка Server-Timing."""
+    metrics = {}
+    for metric in header.split(","):
+        name, *params = [part.strip() for part in metric.split(";")]
+        values = dict(param.split("=", 1) for param in params)
+        metrics[name] = (float(values["dur"]), values.get("desc"))
+    return metrics
+
+
+class MeasureTestCase(SimpleTestCase):
+    """Тесты учёта фаз"""
+
+    def test_without_timings(self):
+        """Тест: вне измеряемого запроса measure просто вызывает функцию"""
+        self.assertIsNone(current_timings())
+        self.assertEqual(measure("render", lambda value: value * 2, 21), 42)
+
+    def test_nested_calls_counted_once(self):
+        """Тест: вложенные вызовы одной фазы не суммируются повторно"""
+
+        def outer():
+            time.sleep(0.01)
+            return measure("serialize", time.sleep, 0.01)
+
+        with RequestTimings() as timings:
+            self.assertIs(current_timings(), timings)
+            measure("serialize", outer)
+        self.assertIsNone(current_timings())
+        self.assertGreaterEqual(timings.phases["serialize"], 0.02)
+        self.assertLess(timings.phases["serialize"], timings.total + 1e-9)
+
+    def test_structured_formatter(self):
+        """Тест: запись лога - JSON с полями из extra"""
+        record = logging.LogRecord(
+            "api.performance", logging.INFO, __file__, 1, "request", (), None
+        )
+        record.fields = {"db_queries": 3}
+        data = json.loads(StructuredFormatter().format(record))
+        self.assertEqual(data["message"], "request")
+        self.assertEqual(data["db_queries"], 3)
+
+
+class PerformanceMiddlewareTestCase(TestCase):
+    """Тесты PerformanceMiddleware"""
+
+    def setUp(self):
+        author = Author.objects.create(name="Тестовый Автор")
+        for number in range(3):
+            Book.objects.create(
+                title=f"Книга {number}", author=author, price=Decimal("10.00")
+            )
+        self.client = APIClient()
+
+    @override_settings(PERFORMANCE_SAMPLE_RATE=1.0)
+    def test_server_timing_and_log(self):
+        """Тест: фазы запроса в Server-Timing и в полях лога"""
+        with self.assertLogs("api.performance", logging.INFO) as logs:
+            response = self.client.get("/api/books/")
+        self.assertEqual(response.status_code, 200)
+
+        metrics = parse_server_timing(response["Server-Timing"])
+        self.assertEqual(set(metrics), {"db", "serialize", "render", "total"})
+        self.assertEqual(metrics["db"][1], '"2 queries"')
+        self.assertGreater(metrics["serialize"][0], 0)
+        self.assertGreater(metrics["render"][0], 0)
+        self.assertGreaterEqual(metrics["total"][0], metrics["db"][0])
+
+        fields = logs.records[0].fields
+        self.assertEqual(fields["view"], "book-list")
+        self.assertEqual(fields["status"], 200)
+        self.assertEqual(fields["db_queries"], 2)
+        for name in ("total_ms", "db_ms", "serialize_ms", "render_ms"):
+            self.assertIn(name, fields)
+
+    @override_settings(PERFORMANCE_SAMPLE_RATE=1.0, PERFORMANCE_SERVER_TIMING=False)
+    def test_header_can_be_disabled(self):
+        """Тест: без PERFORMANCE_SERVER_TIMING пишется только лог"""
+        with self.assertLogs("api.performance", logging.INFO):
+            response = self.client.get("/api/books/")
+        self.assertNotIn("Server-Timing", response)
+
+    @override_settings(PERFORMANCE_SAMPLE_RATE=0)
+    def test_sampling_off(self):
+        """Тест: при нулевой доле запросы не измеряются"""
+        with self.assertNoLogs("api.performance", logging.INFO):
+            response = self.client.get("/api/books/")
+        self.assertNotIn("Server-Timing", response)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты для нагрузочного теста (loadtest)
+Проверка гистограммы задержек и прогона сценария покупателя
+"""
+
+import json
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TransactionTestCase
+
+from api.bench import histogram
+from api.models import Author, Book, Order, User
+
+
+class HistogramTestCase(SimpleTestCase):
+    """Тесты гистограммы задержек"""
+
+    def test_buckets(self):
+        """Тест: замеры попадают в корзины по верхней границе"""
+        buckets = histogram([0.001, 0.005, 0.007, 0.2], [5, 10, 100])
+        self.assertEqual(
+            buckets,
+            [
+                {"le_ms": 5, "count": 2},
+                {"le_ms": 10, "count": 1},
+                {"le_ms": 100, "count": 0},
+                {"le_ms": None, "count": 1},
+            ],
+        )
+
+
+class LoadtestCommandTestCase(TransactionTestCase):
+    """Тесты команды loadtest (сервер в потоке видит данные теста)"""
+
+    def setUp(self):
+        author = Author.objects.create(name="Тестовый Автор")
+        Book.objects.bulk_create(
+            [
+                Book(
+                    title=f"Тайна {number}",
+                    author=author,
+                    price=Decimal("100.00"),
+                    stock=1000,
+                )
+                for number in range(5)
+            ]
+        )
+
+    def test_shopper_flow(self):
+        """Тест: один покупатель проходит сценарий без ошибок"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "report.json")
+            call_command(
+                "loadtest",
+                users=1,
+                duration=0.5,
+                register_ratio=0.5,
+                output=path,
+                stdout=StringIO(),
+            )
+            with open(path, encoding="utf-8") as report_file:
+                report = json.load(report_file)
+
+        self.assertGreater(report["sessions"], 0)
+        self.assertEqual(report["errors"], 0)
+        for step in ("browse", "book-detail", "add-to-cart", "checkout", "orders"):
+            self.assertIn(step, report["steps"])
+        self.assertEqual(Order.objects.count(), report["steps"]["checkout"]["requests"])
+        self.assertTrue(User.objects.filter(username="loadtest_0").exists())
+
+    def test_requires_books(self):
+        """Тест: без книг в наличии команда завершается ошибкой"""
+        Book.objects.update(stock=0)
+        with self.assertRaises(CommandError):
+            call_command("loadtest", users=1, duration=0.1, stdout=StringIO())
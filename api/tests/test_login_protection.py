@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты для защиты входа: пул хэширования паролей (api.hashing),
+token bucket по IP и имени пользователя (api.throttling) и команда
+bench_login
+"""
+
+import json
+import os
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, make_password
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+
+from api.hashing import PasswordHashingBusy, PooledPBKDF2PasswordHasher, run_hashing
+from api.throttling import check_throttle_cache
+
+User = get_user_model()
+
+
+class PasswordHashingTestCase(SimpleTestCase):
+    """Тесты пула хэширования паролей"""
+
+    def test_pooled_hasher(self):
+        """Тест: хэш считается в пуле, формат совпадает с PBKDF2 Django"""
+        threads = []
+        encode = PBKDF2PasswordHasher.encode
+
+        def record_thread(*args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return encode(*args, **kwargs)
+
+        with mock.patch.object(PBKDF2PasswordHasher, "encode", record_thread):
+            encoded = make_password("secret-12345")
+        self.assertTrue(threads[0].startswith("password-hash"))
+        self.assertTrue(PBKDF2PasswordHasher().verify("secret-12345", encoded))
+
+    @override_settings(PASSWORD_HASH_WORKERS=0)
+    def test_inline(self):
+        """Тест: PASSWORD_HASH_WORKERS=0 считает хэш в потоке запроса"""
+        self.assertIs(run_hashing(threading.current_thread), threading.current_thread())
+
+    @override_settings(
+        PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE=0, PASSWORD_HASH_TIMEOUT=0
+    )
+    def test_busy(self):
+        """Тест: без места в пуле и очереди хэширование отклоняется"""
+        release = threading.Event()
+        started = threading.Event()
+
+        def occupy():
+            started.set()
+            release.wait(5)
+
+        worker = threading.Thread(target=run_hashing, args=(occupy,))
+        worker.start()
+        started.wait(5)
+        try:
+            with self.assertRaises(PasswordHashingBusy) as error:
+                run_hashing(lambda: None)
+            self.assertEqual(error.exception.wait, 1)
+        finally:
+            release.set()
+            worker.join()
+        self.assertEqual(run_hashing(lambda: 42), 42)
+
+
+class HashingBusyResponseTestCase(TestCase):
+    """Тесты ответа 503, когда пул хэширования занят"""
+
+    def setUp(self):
+        User.objects.create_user(username="reader", password="pass12345", is_staff=True)
+        patcher = mock.patch.object(
+            PooledPBKDF2PasswordHasher,
+            "encode",
+            side_effect=PasswordHashingBusy(2),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_api_login(self):
+        """Тест: вход в API получает JSON 503 с Retry-After"""
+        response = self.client.post(
+            "/api/login/",
+            {"username": "reader", "password": "pass12345"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "2")
+        self.assertIn("перегружен", response.json()["detail"])
+
+    def test_admin_login(self):
+        """Тест: вход в админку получает 503, а не 500"""
+        response = self.client.post(
+            "/admin/login/", {"username": "reader", "password": "pass12345"}
+        )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "2")
+
+
+@override_settings(
+    LOGIN_THROTTLE_ENABLED=True,
+    LOGIN_THROTTLE_BUCKETS={
+        "ip": {"capacity": 3, "per_minute": 60},
+        "username": {"capacity": 2, "per_minute": 60},
+    },
+)
+class LoginThrottleTestCase(TestCase):
+    """Тесты token bucket входа и регистрации"""
+
+    def setUp(self):
+        caches["default"].clear()
+        self.addCleanup(caches["default"].clear)
+        User.objects.create_user(username="reader", password="pass12345")
+        # Ведро пополняется на жетон в секунду, а PBKDF2 под нагрузкой набора
+        # тестов занимает заметную её часть: время стоит, пока тест не сдвинет
+        patcher = mock.patch("api.throttling.time.time", return_value=1000.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def login(self, username="reader", password="wrong", address="10.0.0.1"):
+        return self.client.post(
+            "/api/login/",
+            {"username": username, "password": password},
+            content_type="application/json",
+            REMOTE_ADDR=address,
+        )
+
+    def test_ip_bucket(self):
+        """Тест: после ёмкости ведра IP получает 429 без хэширования"""
+        with mock.patch.object(
+            PooledPBKDF2PasswordHasher, "encode", return_value="x"
+        ) as encode:
+            for username in ("a", "b", "c"):
+                self.assertEqual(self.login(username).status_code, 400)
+            hashes = encode.call_count
+            response = self.login("d")
+            self.assertEqual(encode.call_count, hashes)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(self.login("d", address="10.0.0.2").status_code, 400)
+
+    def test_username_bucket(self):
+        """Тест: подбор пароля к одному имени с разных адресов"""
+        for number in range(2):
+            self.assertEqual(self.login(address=f"10.0.1.{number}").status_code, 400)
+        self.assertEqual(self.login(address="10.0.1.9").status_code, 429)
+        self.assertEqual(self.login("READER ", address="10.0.1.9").status_code, 429)
+        self.assertEqual(self.login("other", address="10.0.1.9").status_code, 400)
+
+    def test_refill(self):
+        """Тест: ведро пополняется со временем"""
+        with mock.patch("api.throttling.time.time", return_value=1000.0):
+            for _ in range(2):
+                self.login()
+            self.assertEqual(self.login().status_code, 429)
+        with mock.patch("api.throttling.time.time", return_value=1001.5):
+            response = self.login(password="pass12345")
+        self.assertEqual(response.status_code, 200)
+
+    def test_register(self):
+        """Тест: регистрация ограничивается по IP"""
+        for number in range(4):
+            response = self.client.post(
+                "/api/register/",
+                {
+                    "username": f"new{number}",
+                    "password": "pass12345",
+                    "password_confirm": "pass12345",
+                },
+                content_type="application/json",
+                REMOTE_ADDR="10.0.2.1",
+            )
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(User.objects.filter(username__startswith="new").count(), 3)
+
+    def test_forwarded_for_ignored(self):
+        """Тест: смена X-Forwarded-For не даёт нового ведра IP"""
+        for number in range(3):
+            response = self.client.post(
+                "/api/login/",
+                {"username": f"user{number}", "password": "wrong"},
+                content_type="application/json",
+                REMOTE_ADDR="10.0.3.1",
+                HTTP_X_FORWARDED_FOR=f"192.0.2.{number}",
+            )
+            self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            "/api/login/",
+            {"username": "user9", "password": "wrong"},
+            content_type="application/json",
+            REMOTE_ADDR="10.0.3.1",
+            HTTP_X_FORWARDED_FOR="192.0.2.9",
+        )
+        self.assertEqual(response.status_code, 429)
+
+    def test_trusted_proxy(self):
+        """Тест: за доверенным прокси IP берётся из X-Forwarded-For"""
+        rest_framework = {**settings.REST_FRAMEWORK, "NUM_PROXIES": 1}
+        with override_settings(REST_FRAMEWORK=rest_framework):
+            for _ in range(3):
+                self.login(address="10.0.4.1")
+            forwarded = "198.51.100.1, 192.0.2.1"
+            self.assertEqual(
+                self.client.post(
+                    "/api/login/",
+                    {"username": "other", "password": "wrong"},
+                    content_type="application/json",
+                    REMOTE_ADDR="10.0.4.1",
+                    HTTP_X_FORWARDED_FOR=forwarded,
+                ).status_code,
+                400,
+            )
+
+
+class ThrottleCacheCheckTestCase(SimpleTestCase):
+    """Тесты проверки кэша вёдер при запуске"""
+
+    def test_process_cache_rejected(self):
+        """Тест: кэш процесса без DEBUG не запускается"""
+        with override_settings(LOGIN_THROTTLE_ENABLED=True):
+            with self.assertRaises(ImproperlyConfigured):
+                check_throttle_cache()
+            with override_settings(DEBUG=True):
+                check_throttle_cache()
+        check_throttle_cache()
+
+    def test_shared_cache(self):
+        """Тест: общий кэш проходит проверку"""
+        shared = {
+            "default": {
+                "BACKEND": "django.core.cache.backends.redis.RedisCache",
+                "LOCATION": "redis://127.0.0.1:6379/0",
+            }
+        }
+        with override_settings(LOGIN_THROTTLE_ENABLED=True, CACHES=shared):
+            check_throttle_cache()
+
+
+class BenchLoginCommandTestCase(TransactionTestCase):
+    """Тесты команды bench_login"""
+
+    def test_run(self):
+        """Тест: отчёты режимов и сценариев, пользователи удаляются"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        output = os.path.join(directory.name, "login.json")
+        self.addCleanup(caches["default"].clear)
+        with mock.patch.object(PooledPBKDF2PasswordHasher, "iterations", 1000):
+            call_command(
+                "bench_login",
+                "--threads=2",
+                "--requests=2",
+                "--attackers=1",
+                "--attack-rate=20",
+                f"--output={output}",
+                stdout=StringIO(),
+            )
+        with open(output, encoding="utf-8") as file:
+            reports = json.load(file)
+        self.assertEqual(
+            set(reports),
+            {"inline/normal", "inline/attack", "protected/normal", "protected/attack"},
+        )
+        self.assertEqual(reports["inline/normal"]["status"], {"200": 4})
+        self.assertTrue(reports["inline/attack"]["attack"])
+        self.assertFalse(User.objects.exists())
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты для диагностики памяти (api.memory)
+Проверка эндпоинта /api/debug/memory/, снимков tracemalloc, учёта RSS по
+маршрутам и отключения журнала SQL вне отладочного контекста
+"""
+
+import tracemalloc
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api import memory
+from api.models import Author, Book, User
+
+# Объекты, которые тест держит в памяти между снимками
+_retained = []
+
+
+class QueryLogGuardTestCase(TestCase):
+    """Тесты отключения журнала connection.queries"""
+
+    def tearDown(self):
+        connection_created.disconnect(dispatch_uid="query_log_guard")
+        memory._guard_installed = False
+        connection.queries_log = type(connection.queries_log)(
+            maxlen=connection.queries_limit
+        )
+
+    def test_debug_context(self):
+        """Тест: runserver и shell - отладочные процессы, gunicorn - нет"""
+        self.assertTrue(memory.is_debug_context(["manage.py", "runserver"]))
+        self.assertTrue(memory.is_debug_context(["/app/manage.py", "shell"]))
+        self.assertFalse(memory.is_debug_context(["manage.py", "process_order_queue"]))
+        self.assertFalse(memory.is_debug_context(["/usr/bin/gunicorn", "app"]))
+
+    @override_settings(DEBUG=True, QUERY_LOG_ALLOWED=False)
+    def test_guard_disables_query_log(self):
+        """Тест: при DEBUG в воркере журнал SQL не накапливается"""
+        argv = ["/usr/bin/gunicorn", "bookstore.wsgi"]
+        with mock.patch.object(memory.sys, "argv", argv):
+            with self.assertLogs("api.memory", "INFO"):
+                self.assertTrue(memory.install_query_log_guard())
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        self.assertEqual(len(connection.queries_log), 0)
+        self.assertEqual(connection.queries_log.maxlen, 0)
+
+    @override_settings(DEBUG=True, QUERY_LOG_ALLOWED=True)
+    def test_guard_can_be_disabled(self):
+        """Тест: QUERY_LOG_ALLOWED оставляет журнал включённым"""
+        self.assertFalse(memory.install_query_log_guard())
+
+    @override_settings(DEBUG=False)
+    def test_no_guard_without_debug(self):
+        """Тест: без DEBUG журнал и так не ведётся"""
+        self.assertFalse(memory.install_query_log_guard())
+
+
+class MemoryDiagnosticsTestCase(TestCase):
+    """Тесты эндпоинта диагностики памяти"""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username="admin", password="pass12345", role="admin"
+        )
+        self.customer = User.objects.create_user(
+            username="customer", password="pass12345"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+        memory.REQUEST_STATS.clear()
+
+    def tearDown(self):
+        if tracemalloc.is_tracing():
+            memory.stop_tracing()
+        _retained.clear()
+
+    def test_admin_only(self):
+        """Тест: обычному пользователю диагностика недоступна"""
+        self.client.force_authenticate(user=self.customer)
+        response = self.client.get("/api/debug/memory/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_report_without_tracing(self):
+        """Тест: без tracemalloc отдаются RSS и состояние журнала SQL"""
+        response = self.client.get("/api/debug/memory/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreater(response.data["rss_bytes"], 0)
+        self.assertGreaterEqual(response.data["peak_rss_bytes"], 0)
+        self.assertIsNone(response.data["tracemalloc"])
+        self.assertIn("logged_queries", response.data["query_log"])
+
+    def test_snapshot_diff(self):
+        """Тест: разница снимков показывает место накопления памяти"""
+        response = self.client.post(
+            "/api/debug/memory/", {"action": "start", "frames": 3}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data["tracemalloc"]["diff"])
+        self.assertEqual(response.data["tracemalloc"]["frames"], 3)
+
+        _retained.append([bytearray(1024) for _ in range(2000)])
+
+        response = self.client.get("/api/debug/memory/?limit=5")
+        diff = response.data["tracemalloc"]["diff"]
+        self.assertLessEqual(len(diff), 5)
+        self.assertGreaterEqual(diff[0]["size_diff"], 2000 * 1024)
+        self.assertIn("api/tests/test_memory.py:", diff[0]["traceback"][0])
+        self.assertTrue(response.data["tracemalloc"]["top"])
+
+        response = self.client.post(
+            "/api/debug/memory/", {"action": "stop"}, format="json"
+        )
+        self.assertIsNone(response.data["tracemalloc"])
+
+    def test_invalid_parameters(self):
+        """Тест: неизвестные action и group_by отклоняются"""
+        response = self.client.post(
+            "/api/debug/memory/", {"action": "explode"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get("/api/debug/memory/?group_by=module")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_start_frames(self):
+        """Тест: frames от 1 до 100, без него - MEMORY_TRACEMALLOC_FRAMES"""
+        for frames in (0, 101, "many"):
+            response = self.client.post(
+                "/api/debug/memory/",
+                {"action": "start", "frames": frames},
+                format="json",
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data["error"], "frames - число от 1 до 100")
+        self.assertFalse(tracemalloc.is_tracing())
+
+        response = self.client.post(
+            "/api/debug/memory/", {"action": "start"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["tracemalloc"]["frames"], settings.MEMORY_TRACEMALLOC_FRAMES
+        )
+
+    @override_settings(MEMORY_DIAGNOSTICS=True)
+    def test_request_stats(self):
+        """Тест: MemoryMiddleware учитывает запросы по маршрутам"""
+        author = Author.objects.create(name="Тестовый Автор")
+        Book.objects.create(title="Книга", author=author, price=Decimal("10.00"))
+        client = APIClient()
+        client.force_authenticate(user=self.admin)
+        client.post("/api/debug/memory/", {"action": "start"}, format="json")
+        for _ in range(3):
+            client.get("/api/books/")
+        response = client.get("/api/debug/memory/")
+
+        routes = {row["route"]: row for row in response.data["requests"]}
+        books = routes["/api/books/"]
+        self.assertEqual(books["requests"], 3)
+        self.assertGreater(books["traced_peak_max"], 0)
+        for name in ("rss_growth_total", "rss_growth_max", "peak_raised"):
+            self.assertIn(name, books)
+
+        # Сам запрос сброса учитывается уже после сброса
+        client.post("/api/debug/memory/", {"action": "reset"}, format="json")
+        routes = [row["route"] for row in memory.REQUEST_STATS.report()]
+        self.assertEqual(routes, ["/api/debug/memory/"])
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты для метрик Prometheus (api.metrics)
+Проверка mmap-хранилища, суммирования по процессам и эндпоинта /metrics
+"""
+
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api import metrics
+from api.metrics import (
+    MmapStore,
+    clear_metrics_dir,
+    collect,
+    mark_process_dead,
+    read_entries,
+    remove_dead_files,
+)
+from api.models import Author, Book
+
+
+class MetricsDirMixin:
+    """Временный METRICS_DIR на время теста."""
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            METRICS_ENABLED=True, METRICS_DIR=self.directory, METRICS_TOKEN="secret"
+        )
+        self.settings_override.enable()
+
+    def tearDown(self):
+        clear_metrics_dir()
+        self.settings_override.disable()
+        shutil.rmtree(self.directory, ignore_errors=True)
+        super().tearDown()
+
+    def other_process_store(self, pid):
+        """Файл метрик другого процесса (pid в имени файла)."""
+        return MmapStore(os.path.join(self.directory, f"metrics_{pid}.db"))
+
+
+class MmapStoreTestCase(MetricsDirMixin, SimpleTestCase):
+    """Тесты mmap-хранилища"""
+
+    def test_values_survive_reopen(self):
+        """Тест: значения и смещения читаются из файла заново"""
+        path = os.path.join(self.directory, "metrics_1.db")
+        store = MmapStore(path)
+        store.add("a", 1.5)
+        store.add("ключ", 2)
+        store.add("a", 1)
+        store.close()
+
+        store = MmapStore(path)
+        store.add("a", 1)
+        with open(path, "rb") as file:
+            entries = {key: value for key, value, _ in read_entries(file.read())}
+        store.close()
+        self.assertEqual(entries, {"a": 3.5, "ключ": 2.0})
+
+    def test_file_grows(self):
+        """Тест: файл увеличивается, когда записи не помещаются"""
+        store = MmapStore(os.path.join(self.directory, "metrics_1.db"))
+        for number in range(5000):
+            store.add(f"metric_{number:05d}_" + "x" * 20, number)
+        self.assertGreater(len(store.mmap), metrics.INITIAL_FILE_SIZE)
+        entries = read_entries(store.mmap)
+        store.close()
+        self.assertEqual(len(entries), 5000)
+        self.assertEqual(entries[-1][1], 4999.0)
+
+    def test_collect_sums_processes(self):
+        """Тест: счётчики суммируются по процессам, gauge - только живые"""
+        metrics.REQUESTS.inc(("/api/books/", "GET", "200"))
+        metrics.IN_FLIGHT.inc()
+        # Процесс с таким pid не существует: его gauge не учитывается
+        dead = self.other_process_store(2**22 + 1)
+        dead.add(metrics.REQUESTS.key("", ("/api/books/", "GET", "200")), 2)
+        dead.add(metrics.IN_FLIGHT.key("", ()), 5)
+        dead.close()
+
+        samples = collect()
+        labels = (("route", "/api/books/"), ("method", "GET"), ("status", "200"))
+        self.assertEqual(samples[("bookstore_http_requests_total", labels)], 3)
+        self.assertEqual(samples[("bookstore_http_requests_in_flight", ())], 1)
+
+    def test_mark_process_dead(self):
+        """Тест: счётчики завершившегося процесса переносятся в архив"""
+        labels = ("/api/books/", "GET", "200")
+        for _ in range(2):
+            dead = self.other_process_store(2**22 + 1)
+            dead.add(metrics.REQUESTS.key("", labels), 2)
+            dead.add(metrics.IN_FLIGHT.key("", ()), 1)
+            dead.close()
+            mark_process_dead(2**22 + 1)
+
+        self.assertEqual(os.listdir(self.directory), [f"archive_{os.getpid()}.db"])
+        samples = collect()
+        pairs = (("route", "/api/books/"), ("method", "GET"), ("status", "200"))
+        self.assertEqual(samples[("bookstore_http_requests_total", pairs)], 4)
+        self.assertNotIn(("bookstore_http_requests_in_flight", ()), samples)
+
+    def test_remove_dead_files(self):
+        """Тест: при запуске удаляются файлы процессов прошлого запуска"""
+        metrics.REQUESTS.inc(("/api/books/", "GET", "200"))
+        self.other_process_store(2**22 + 1).close()
+        MmapStore(os.path.join(self.directory, "archive_4194305.db")).close()
+
+        remove_dead_files()
+
+        self.assertEqual(os.listdir(self.directory), [f"metrics_{os.getpid()}.db"])
+
+    def test_histogram_is_cumulative(self):
+        """Тест: корзины гистограммы выводятся накопленными суммами"""
+        for value in (0.001, 0.02, 0.02, 20):
+            metrics.REQUEST_DURATION.observe(value, ("/api/books/", "GET"))
+        text = metrics.render_metrics()
+        prefix = 'bookstore_http_request_duration_seconds_bucket{route="/api/books/"'
+        self.assertIn(prefix + ',method="GET",le="0.005"} 1', text)
+        self.assertIn(prefix + ',method="GET",le="0.025"} 3', text)
+        self.assertIn(prefix + ',method="GET",le="10"} 3', text)
+        self.assertIn(prefix + ',method="GET",le="+Inf"} 4', text)
+        self.assertIn(
+            'bookstore_http_request_duration_seconds_count{route="/api/books/",'
+            'method="GET"} 4',
+            text,
+        )
+
+
+class MetricsEndpointTestCase(MetricsDirMixin, TestCase):
+    """Тесты MetricsMiddleware и эндпоинта /metrics"""
+
+    def setUp(self):
+        super().setUp()
+        author = Author.objects.create(name="Тестовый Автор")
+        Book.objects.create(title="Книга", author=author, price=Decimal("10.00"))
+        self.client = APIClient()
+
+    def get_metrics(self):
+        return self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret")
+
+    def test_request_metrics(self):
+        """Тест: запросы API учитываются по маршруту-шаблону"""
+        book = Book.objects.get()
+        self.client.get("/api/books/")
+        self.client.get(f"/api/books/{book.id}/")
+        response = self.get_metrics()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        text = response.content.decode()
+        self.assertIn(
+            'bookstore_http_requests_total{route="/api/books/",method="GET",'
+            'status="200"} 1',
+            text,
+        )
+        self.assertIn('route="/api/books/<int:pk>/"', text)
+        self.assertIn(
+            'bookstore_db_queries_total{route="/api/books/",method="GET"} 2', text
+        )
+        # Запрос к /metrics сам находится в обработке
+        self.assertIn("bookstore_http_requests_in_flight 1", text)
+        self.assertIn("# TYPE bookstore_cache_requests_total counter", text)
+
+    def test_unknown_method(self):
+        """Тест: произвольный метод учитывается как OTHER"""
+        self.client.generic("BREW", "/api/books/")
+        self.client.generic("PROPFIND", "/api/books/")
+        text = self.get_metrics().content.decode()
+
+        self.assertIn(
+            'bookstore_http_requests_total{route="/api/books/",method="OTHER",'
+            'status="405"} 2',
+            text,
+        )
+        self.assertNotIn("BREW", text)
+
+    def test_cache_hit_ratio(self):
+        """Тест: обращения к кэшу сжатия учитываются как hit / miss"""
+        for number in range(30):
+            Book.objects.create(
+                title=f"Книга {number}",
+                author=Author.objects.get(),
+                price=Decimal("10.00"),
+            )
+        for _ in range(2):
+            self.client.get("/api/books/", HTTP_ACCEPT_ENCODING="gzip")
+        text = self.get_metrics().content.decode()
+        self.assertIn(
+            'bookstore_cache_requests_total{cache="compression",result="hit"} 1', text
+        )
+        self.assertIn(
+            'bookstore_cache_requests_total{cache="compression",result="miss"} 1',
+            text,
+        )
+
+    def test_token(self):
+        """Тест: с METRICS_TOKEN эндпоинт требует токен"""
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong")
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.get_metrics().status_code, 200)
+
+    @override_settings(METRICS_TOKEN="")
+    def test_token_required_without_debug(self):
+        """Тест: без токена эндпоинт открыт только с DEBUG"""
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get("/metrics").status_code, 200)
@@ -13,6 +13,7 @@ from django.test import TestCase
 from django.utils import timezone
 
 from api.models import Author, Book, Order, OrderItem, Review, User
+from api.services import recalculate_totals
 
 
 class BaseModelTestCase(TestCase):
@@ -276,6 +277,59 @@ class OrderModelTestCase(TestCase):
         self.assertEqual(total, Decimal("1500.00"))
         self.assertEqual(order.total_price, Decimal("1500.00"))
 
+    def test_order_calculate_total_queries(self):
+        """Проверка: сумма считается агрегатом и пишется одним UPDATE"""
+        order = Order.objects.create(user=self.user)
+        OrderItem.objects.create(
+            order=order, book=self.book, quantity=3, price=Decimal("500.00")
+        )
+
+        with self.assertNumQueries(2):
+            total = order.calculate_total()
+
+        self.assertEqual(total, Decimal("1500.00"))
+        order.refresh_from_db()
+        self.assertEqual(order.total_price, Decimal("1500.00"))
+
+    def test_order_calculate_total_empty(self):
+        """Проверка: сумма заказа без позиций равна нулю"""
+        order = Order.objects.create(user=self.user, total_price=Decimal("10.00"))
+        self.assertEqual(order.calculate_total(), Decimal("0.00"))
+
+    def test_recalculate_totals(self):
+        """Проверка пересчета сумм всех заказов одним UPDATE"""
+        orders = [Order.objects.create(user=self.user) for _ in range(3)]
+        for quantity, order in enumerate(orders[1:], start=1):
+            OrderItem.objects.create(
+                order=order, book=self.book, quantity=quantity, price=Decimal("7.50")
+            )
+        Order.objects.filter(id=orders[0].id).update(total_price=Decimal("99.00"))
+
+        with self.assertNumQueries(1):
+            fixed = recalculate_totals()
+
+        self.assertEqual(fixed, 3)
+        totals = [Order.objects.get(id=order.id).total_price for order in orders]
+        self.assertEqual(totals, [Decimal("0.00"), Decimal("7.50"), Decimal("15.00")])
+        # Повторный пересчет ничего не меняет
+        self.assertEqual(recalculate_totals(Order.objects.all()), 0)
+
+    def test_recalculate_totals_queryset(self):
+        """Проверка пересчета только выбранных заказов"""
+        first = Order.objects.create(user=self.user)
+        second = Order.objects.create(user=self.user, status="completed")
+        for order in (first, second):
+            OrderItem.objects.create(
+                order=order, book=self.book, quantity=1, price=Decimal("500.00")
+            )
+
+        recalculate_totals(Order.objects.filter(status="completed"))
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.total_price, Decimal("0.00"))
+        self.assertEqual(second.total_price, Decimal("500.00"))
+
     def test_order_str_method(self):
         """Проверка строкового представления заказа"""
         order = Order.objects.create(user=self.user)
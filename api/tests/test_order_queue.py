@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты для асинхронного приёма заказов
+Проверка постановки заявок в очередь, пакетной обработки воркером,
+опроса статуса заявки и возврата зависших заявок
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from api.models import Author, Book, Order, OrderTicket
+from api.services import (
+    check_lines,
+    claim_order_tickets,
+    drain_order_queue,
+    enable_stock_sharding,
+    enqueue_order,
+    process_order_tickets,
+    requeue_stale_order_tickets,
+    reserve_stock,
+)
+
+User = get_user_model()
+
+
+class OrderQueueServiceTestCase(TestCase):
+    """Тесты пакетной обработки заявок"""
+
+    def setUp(self):
+        """Подготовка данных"""
+        self.alice = User.objects.create_user(username="alice", password="testpass123")
+        self.bob = User.objects.create_user(username="bob", password="testpass123")
+        self.author = Author.objects.create(name="Test Author")
+        self.book = Book.objects.create(
+            title="Promo Book", author=self.author, price=Decimal("100.00"), stock=3
+        )
+        self.other = Book.objects.create(
+            title="Other Book", author=self.author, price=Decimal("40.00"), stock=10
+        )
+
+    def test_claim_marks_processing(self):
+        """Тест: воркер забирает самые старые заявки"""
+        first = enqueue_order(self.alice, {self.book.id: 1})
+        enqueue_order(self.bob, {self.book.id: 1})
+
+        claimed = claim_order_tickets(batch_size=1)
+
+        self.assertEqual([t.id for t in claimed], [first.id])
+        first.refresh_from_db()
+        self.assertEqual(first.status, "processing")
+        self.assertEqual(claim_order_tickets(batch_size=10)[0].user, self.bob)
+
+    def test_batch_groups_stock_updates(self):
+        """Тест: заявки оформляются по порядку, пока хватает товара"""
+        tickets = [
+            enqueue_order(self.alice, {self.book.id: 2, self.other.id: 1}),
+            enqueue_order(self.bob, {self.book.id: 2}),
+            enqueue_order(self.bob, {self.book.id: 1}),
+        ]
+
+        process_order_tickets(claim_order_tickets())
+
+        statuses = [OrderTicket.objects.get(id=t.id).status for t in tickets]
+        self.assertEqual(statuses, ["done", "failed", "done"])
+        self.book.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.book.stock, 0)
+        self.assertEqual(self.other.stock, 9)
+        order = OrderTicket.objects.get(id=tickets[0].id).order
+        self.assertEqual(order.total_price, Decimal("240.00"))
+        self.assertEqual(order.items.count(), 2)
+        failed = OrderTicket.objects.get(id=tickets[1].id)
+        self.assertIn("Недостаточно товара", failed.error)
+
+    def test_batch_query_count_does_not_grow(self):
+        """Тест: число запросов на пачку не зависит от числа заявок"""
+        for _ in range(2):
+            enqueue_order(self.alice, {self.other.id: 1})
+        tickets = claim_order_tickets()
+        with self.assertNumQueries(9):
+            process_order_tickets(tickets)
+
+        for _ in range(6):
+            enqueue_order(self.bob, {self.other.id: 1})
+        tickets = claim_order_tickets()
+        with self.assertNumQueries(9):
+            process_order_tickets(tickets)
+
+    def test_unknown_book_fails_ticket(self):
+        """Тест: заявка на несуществующую книгу отклоняется"""
+        ticket = enqueue_order(self.alice, {999999: 1})
+
+        process_order_tickets(claim_order_tickets())
+
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.status, "failed")
+        self.assertFalse(Order.objects.exists())
+
+    def test_reservation_is_consumed(self):
+        """Тест: заявка пользователя с резервом потребляет резерв"""
+        reserve_stock(self.alice, self.book.id, 3)
+        ticket = enqueue_order(self.alice, {self.book.id: 3})
+
+        process_order_tickets(claim_order_tickets())
+
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.status, "done")
+        self.assertFalse(self.alice.reservations.exists())
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.stock, 0)
+
+    def test_sharded_book(self):
+        """Тест: заявка на шардированную книгу списывает товар с шардов"""
+        enable_stock_sharding(self.book.id, 2)
+        ticket = enqueue_order(self.alice, {self.book.id: 2})
+
+        process_order_tickets(claim_order_tickets())
+
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.status, "done")
+        self.assertEqual(
+            sum(self.book.stock_shards.values_list("quantity", flat=True)), 1
+        )
+
+    def test_requeue_stale(self):
+        """Тест: зависшие в обработке заявки возвращаются в очередь"""
+        ticket = enqueue_order(self.alice, {self.book.id: 1})
+        claim_order_tickets()
+        OrderTicket.objects.filter(id=ticket.id).update(
+            updated_at=timezone.now() - timedelta(minutes=10)
+        )
+
+        self.assertEqual(requeue_stale_order_tickets(timedelta(minutes=5)), 1)
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.status, "queued")
+
+    def test_unexpected_error_fails_only_its_ticket(self):
+        """Тест: неожиданная ошибка отклоняет только свою заявку"""
+        good = enqueue_order(self.alice, {self.other.id: 1})
+        poison = enqueue_order(self.bob, {self.book.id: 1})
+
+        def check(lines, books):
+            if self.book.id in lines:
+                raise RuntimeError("boom")
+            return check_lines(lines, books)
+
+        with mock.patch("api.services.check_lines", side_effect=check), (
+            self.assertLogs("api.services", "ERROR")
+        ):
+            self.assertEqual(drain_order_queue(), 2)
+
+        good.refresh_from_db()
+        poison.refresh_from_db()
+        self.assertEqual(good.status, "done")
+        self.assertEqual(good.order.items.get().book, self.other)
+        self.assertEqual(poison.status, "failed")
+        self.assertIsNone(poison.order)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.stock, 3)
+
+    def test_command(self):
+        """Тест: команда process_order_queue обрабатывает очередь"""
+        enqueue_order(self.alice, {self.book.id: 1})
+        enqueue_order(self.bob, {self.book.id: 1})
+        out = StringIO()
+
+        call_command("process_order_queue", "--batch-size", "1", stdout=out)
+
+        self.assertIn("Обработано заявок: 2", out.getvalue())
+        self.assertEqual(Order.objects.count(), 2)
+
+
+@override_settings(ORDER_INTAKE_ASYNC=True, ORDER_INTAKE_POLL_INTERVAL=0.01)
+class OrderIntakeAPITestCase(APITestCase):
+    """Тесты API асинхронного приёма заказов"""
+
+    def setUp(self):
+        """Подготовка данных"""
+        self.user = User.objects.create_user(username="buyer", password="testpass123")
+        self.author = Author.objects.create(name="Test Author")
+        self.book = Book.objects.create(
+            title="Promo Book", author=self.author, price=Decimal("100.00"), stock=3
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_create_order_returns_ticket(self):
+        """Тест: create-order ставит заявку в очередь и отвечает 202"""
+        response = self.client.post(
+            "/api/create-order/",
+            {"items": [{"book_id": self.book.id, "quantity": 2}]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], "queued")
+        self.assertIn(response.data["ticket"], response["Location"])
+        self.assertFalse(Order.objects.exists())
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.stock, 3)
+
+    def test_invalid_payload_rejected(self):
+        """Тест: некорректный заказ отклоняется сразу, без заявки"""
+        response = self.client.post("/api/create-order/", {"items": []}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(OrderTicket.objects.exists())
+
+    def test_ticket_status_after_processing(self):
+        """Тест: после обработки заявка содержит заказ"""
+        response = self.client.post(
+            "/api/create-order/",
+            {"items": [{"book_id": self.book.id, "quantity": 2}]},
+            format="json",
+        )
+        call_command("process_order_queue", stdout=StringIO())
+
+        response = self.client.get(response["Location"], {"wait": 5})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["status"], "done")
+        self.assertEqual(response.data["order"]["total_price"], "200.00")
+
+    def test_long_poll_times_out(self):
+        """Тест: ?wait= возвращает текущий статус по истечении ожидания"""
+        ticket = enqueue_order(self.user, {self.book.id: 1})
+
+        response = self.client.get(
+            f"/api/order-tickets/{ticket.ticket}/", {"wait": 0.05}
+        )
+
+        self.assertEqual(response.data["status"], "queued")
+        self.assertIsNone(response.data["order"])
+
+    def test_foreign_ticket_not_found(self):
+        """Тест: чужая заявка недоступна"""
+        other = User.objects.create_user(username="other", password="testpass123")
+        ticket = enqueue_order(other, {self.book.id: 1})
+
+        response = self.client.get(f"/api/order-tickets/{ticket.ticket}/")
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
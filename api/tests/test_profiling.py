@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты для профилирования запросов (api.profiling)
+Проверка доступа, форматов pstats / collapsed stacks, скачивания из админки
+и непрерывного сэмплирования
+"""
+
+import marshal
+import threading
+import time
+from decimal import Decimal
+
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api import profiling
+from api.models import Author, Book, RequestProfile, User
+
+
+def busy_wait(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class StackSamplerTestCase(SimpleTestCase):
+    """Тесты сэмплера стеков"""
+
+    def test_collapsed_stacks(self):
+        """Тест: стеки потока собираются в формате collapsed stacks"""
+        sampler = profiling.StackSampler(0.001, {threading.get_ident()})
+        sampler.start()
+        busy_wait(0.1)
+        sampler.stop()
+
+        self.assertGreater(sampler.samples, 0)
+        text = profiling.collapsed_text(sampler.stacks)
+        stack, count = text.splitlines()[0].rsplit(" ", 1)
+        self.assertGreater(int(count), 0)
+        self.assertIn("busy_wait (", stack.split(";")[-1])
+        self.assertIn("test_collapsed_stacks (", stack)
+        summary = profiling.stacks_summary(sampler.stacks)
+        self.assertIn("busy_wait", summary)
+
+    def test_requested_mode(self):
+        """Тест: режим берётся из заголовка или параметра ?_profile"""
+        factory = RequestFactory()
+        self.assertIsNone(profiling.requested_mode(factory.get("/api/books/")))
+        self.assertEqual(
+            profiling.requested_mode(factory.get("/api/books/?_profile=1")),
+            "cprofile",
+        )
+        request = factory.get("/api/books/", HTTP_X_PROFILE="stacks")
+        self.assertEqual(profiling.requested_mode(request), "stacks")
+        request = factory.get("/api/books/?_profile=other")
+        self.assertIsNone(profiling.requested_mode(request))
+
+
+class ProfilingMiddlewareTestCase(TestCase):
+    """Тесты профилирования по запросу администратора"""
+
+    def setUp(self):
+        author = Author.objects.create(name="Тестовый Автор")
+        Book.objects.create(title="Книга", author=author, price=Decimal("10.00"))
+        self.admin = User.objects.create_user(
+            username="admin", password="pass12345", role="admin", is_staff=True
+        )
+        self.customer = User.objects.create_user(
+            username="customer", password="pass12345"
+        )
+        self.client = APIClient()
+
+    def authenticate(self, user):
+        token = RefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_cprofile(self):
+        """Тест: ?_profile=1 от администратора сохраняет данные pstats"""
+        self.authenticate(self.admin)
+        response = self.client.get("/api/books/?_profile=1")
+        self.assertEqual(response.status_code, 200)
+
+        profile = RequestProfile.objects.get(id=response["X-Profile-Id"])
+        self.assertEqual(profile.kind, "cprofile")
+        self.assertEqual(profile.user, self.admin)
+        self.assertEqual(profile.view_name, "book-list")
+        self.assertEqual(profile.path, "/api/books/?_profile=1")
+        self.assertEqual(profile.status_code, 200)
+        self.assertGreater(profile.samples, 0)
+        self.assertIn("cumulative", profile.summary)
+        stats = marshal.loads(bytes(profile.data))
+        functions = {function for _, _, function in stats}
+        self.assertIn("list", functions)
+
+    def test_stacks_by_header(self):
+        """Тест: X-Profile: stacks сохраняет collapsed stacks запроса"""
+        self.authenticate(self.admin)
+        with override_settings(PROFILING_STACK_INTERVAL=0.0005):
+            response = self.client.get("/api/books/", HTTP_X_PROFILE="stacks")
+        profile = RequestProfile.objects.get(id=response["X-Profile-Id"])
+        self.assertEqual(profile.kind, "stacks")
+        for line in bytes(profile.data).decode().splitlines():
+            self.assertRegex(line, r"^\S.* \d+$")
+
+    def test_not_admin(self):
+        """Тест: для других пользователей и анонимов параметр игнорируется"""
+        response = self.client.get("/api/books/?_profile=1")
+        self.assertEqual(response.status_code, 200)
+        self.authenticate(self.customer)
+        response = self.client.get("/api/books/?_profile=1")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Profile-Id", response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_invalid_token(self):
+        """Тест: неверный токен не включает профилирование"""
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer invalid")
+        response = self.client.get("/api/books/?_profile=1")
+        self.assertNotIn("X-Profile-Id", response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_admin_download(self):
+        """Тест: профиль скачивается со страницы админки"""
+        self.authenticate(self.admin)
+        response = self.client.get("/api/books/?_profile=1")
+        profile_id = response["X-Profile-Id"]
+
+        self.client.credentials()
+        self.client.force_login(self.admin)
+        self.admin.is_superuser = True
+        self.admin.save()
+        listing = self.client.get("/admin/api/requestprofile/")
+        self.assertEqual(listing.status_code, 200)
+        self.assertContains(listing, f"profile-{profile_id}.prof")
+
+        download = self.client.get(f"/admin/api/requestprofile/{profile_id}/download/")
+        self.assertEqual(download.status_code, 200)
+        self.assertIn("profile-", download["Content-Disposition"])
+        self.assertEqual(
+            download.content, bytes(RequestProfile.objects.get(id=profile_id).data)
+        )
+
+
+@override_settings(
+    PROFILING_SAMPLING=True,
+    PROFILING_SAMPLING_INTERVAL=0.001,
+    PROFILING_SAMPLING_WINDOW=3600,
+)
+class ContinuousSamplingTestCase(TestCase):
+    """Тесты непрерывного сэмплирования"""
+
+    def tearDown(self):
+        profiling.stop_continuous_sampler()
+        super().tearDown()
+
+    def test_window_saved(self):
+        """Тест: стеки потоков-запросов сохраняются окном sampling"""
+        sampler = profiling.get_continuous_sampler()
+        self.assertIs(profiling.get_continuous_sampler(), sampler)
+        sampler.enter()
+        busy_wait(0.1)
+        sampler.exit()
+        busy_wait(0.02)
+
+        profile = sampler.flush()
+        self.assertEqual(profile.kind, "sampling")
+        self.assertGreater(profile.samples, 0)
+        self.assertIn("busy_wait", bytes(profile.data).decode())
+        # Без запросов в обработке пустое окно не сохраняется
+        self.assertIsNone(sampler.flush())
+
+    def test_middleware_registers_thread(self):
+        """Тест: ProfilingMiddleware добавляет поток на время запроса"""
+        sampler = profiling.get_continuous_sampler()
+        response = self.client.get("/api/books/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sampler.threads, set())
@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты бюджетов SQL-запросов представлений API (api.query_budget)
+Каждый эндпоинт выполняется на базе с 1 и со 100 строками в каждой таблице:
+число запросов не должно превышать объявленный бюджет ни в одном случае
+"""
+
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import ResolverMatch, URLPattern, resolve, reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api import views
+from api.management.commands.bench_endpoints import SCENARIOS, Command, Scenario
+from api.middleware import QueryBudgetMiddleware
+from api.models import (
+    Author,
+    Book,
+    CartItem,
+    Order,
+    OrderItem,
+    Review,
+    StockReservation,
+    User,
+)
+from api.query_budget import QueryRecorder, get_query_budget, query_budget
+from api.urls import urlpatterns
+
+PAGE_SIZES = (1, 100)
+
+# Изменяющие запросы, которых нет среди сценариев bench_endpoints
+WRITE_SCENARIOS = [
+    Scenario(
+        "user-create",
+        "user-list",
+        lambda c: reverse("user-list"),
+        method="post",
+        data={"username": "budget_new", "password": "budget-password-123"},
+        user="admin",
+    ),
+    Scenario(
+        "user-update",
+        "user-detail",
+        lambda c: reverse("user-detail", args=[c.user.id]),
+        method="patch",
+        data={"first_name": "Бюджет"},
+    ),
+    Scenario(
+        "user-delete",
+        "user-detail",
+        lambda c: reverse("user-detail", args=[c.user.id]),
+        method="delete",
+    ),
+    Scenario(
+        "author-create",
+        "author-list",
+        lambda c: reverse("author-list"),
+        method="post",
+        data={"name": "Новый автор"},
+    ),
+    Scenario(
+        "author-update",
+        "author-detail",
+        lambda c: reverse("author-detail", args=[c.author.id]),
+        method="put",
+        data={"name": "Переименованный автор"},
+    ),
+    Scenario(
+        "author-delete",
+        "author-detail",
+        lambda c: reverse("author-detail", args=[c.author.id]),
+        method="delete",
+    ),
+    Scenario(
+        "book-create",
+        "book-list",
+        lambda c: reverse("book-list"),
+        method="post",
+        data=lambda c: {"title": "Новая книга", "author_id": c.author.id, "price": 10},
+    ),
+    Scenario(
+        "book-update",
+        "book-detail",
+        lambda c: reverse("book-detail", args=[c.book.id]),
+        method="patch",
+        data={"price": "99.00"},
+    ),
+    Scenario(
+        "book-delete",
+        "book-detail",
+        lambda c: reverse("book-detail", args=[c.book.id]),
+        method="delete",
+    ),
+    Scenario(
+        "order-create",
+        "order-list",
+        lambda c: reverse("order-list"),
+        method="post",
+        data={"status": "pending"},
+    ),
+    Scenario(
+        "order-update",
+        "order-detail",
+        lambda c: reverse("order-detail", args=[c.order.id]),
+        method="patch",
+        data={"status": "completed"},
+    ),
+    Scenario(
+        "order-delete",
+        "order-detail",
+        lambda c: reverse("order-detail", args=[c.order.id]),
+        method="delete",
+    ),
+    Scenario(
+        "review-create",
+        "review-list",
+        lambda c: reverse("review-list"),
+        method="post",
+        data=lambda c: {"book_id": c.book.id, "rating": 4, "comment": "Неплохо"},
+    ),
+    Scenario(
+        "review-update",
+        "review-detail",
+        lambda c: reverse("review-detail", args=[c.review.id]),
+        method="patch",
+        data={"rating": 3},
+        user="admin",
+    ),
+    Scenario(
+        "review-delete",
+        "review-detail",
+        lambda c: reverse("review-detail", args=[c.review.id]),
+        method="delete",
+        user="admin",
+    ),
+    Scenario("cart-clear", "cart", lambda c: reverse("cart"), method="delete"),
+    Scenario(
+        "memory-reset",
+        "memory-diagnostics",
+        lambda c: reverse("memory-diagnostics"),
+        method="post",
+        data={"action": "reset"},
+        user="admin",
+    ),
+    Scenario(
+        "cart-item-delete",
+        "cart-item-detail",
+        lambda c: reverse("cart-item-detail", args=[c.book.id]),
+        method="delete",
+    ),
+]
+
+
+def api_view_patterns():
+    """Маршруты api/urls.py, ведущие в api/views.py."""
+    return [
+        pattern
+        for pattern in urlpatterns
+        if isinstance(pattern, URLPattern)
+        and pattern.callback.__module__ == views.__name__
+    ]
+
+
+def allowed_methods(view):
+    methods = view.cls().allowed_methods
+    return sorted(set(methods) - {"OPTIONS", "HEAD"})
+
+
+def seed(size):
+    """size строк в каждой таблице, которую читают эндпоинты."""
+    authors = Author.objects.bulk_create(
+        [Author(name=f"Автор {number}", bio="Биография") for number in range(size)]
+    )
+    books = Book.objects.bulk_create(
+        [
+            Book(
+                title=f"Тайна {number}",
+                author=author,
+                price=Decimal("100.00"),
+                stock=10**6,
+            )
+            for number, author in enumerate(authors)
+        ]
+    )
+    reviewers = User.objects.bulk_create(
+        [User(username=f"reviewer_{number}") for number in range(size)]
+    )
+    Review.objects.bulk_create(
+        [
+            Review(user=reviewer, book=book, rating=5, comment="Отлично")
+            for reviewer, book in zip(reviewers, books)
+        ]
+    )
+
+    context = Command().build_context()
+    orders = Order.objects.bulk_create(
+        [
+            Order(user=context.user, total_price=Decimal("200.00"))
+            for _ in range(size)
+        ]
+    )
+    # Заказы списка - по одной позиции, заказ context.order - size позиций
+    OrderItem.objects.bulk_create(
+        [
+            OrderItem(order=order, book=book, quantity=2, price=book.price)
+            for order, book in zip(orders, books)
+        ]
+        + [
+            OrderItem(order=context.order, book=book, quantity=1, price=book.price)
+            for book in books[1:]
+        ]
+    )
+    CartItem.objects.bulk_create(
+        [CartItem(user=context.user, book=book, quantity=1) for book in books]
+    )
+    expires_at = timezone.now() + timedelta(minutes=15)
+    StockReservation.objects.bulk_create(
+        [
+            StockReservation(
+                user=context.user,
+                book=book,
+                quantity=1,
+                price=book.price,
+                expires_at=expires_at,
+            )
+            for book in books[1:]
+        ]
+    )
+    return context
+
+
+class QueryBudgetDeclarationTestCase(SimpleTestCase):
+    """Тесты объявления бюджетов"""
+
+    def test_every_view_declares_budgets(self):
+        """Тест: у каждого представления есть бюджет на каждый метод"""
+        for pattern in api_view_patterns():
+            for method in allowed_methods(pattern.callback):
+                with self.subTest(view=pattern.name, method=method):
+                    self.assertIsNotNone(
+                        get_query_budget(pattern.callback, method),
+                        f"{pattern.name} {method}: не объявлен query_budgets",
+                    )
+
+    def test_every_budget_is_exercised(self):
+        """Тест: каждый объявленный бюджет проверяется сценарием"""
+        # PUT и PATCH выполняются одним кодом, достаточно сценария для одного
+        same = {"PUT": "PATCH"}
+        covered = {
+            (scenario.url_name, same.get(method, method))
+            for scenario in SCENARIOS + WRITE_SCENARIOS
+            for method in [scenario.method.upper()]
+        }
+        for pattern in api_view_patterns():
+            for method in allowed_methods(pattern.callback):
+                with self.subTest(view=pattern.name, method=method):
+                    self.assertIn((pattern.name, same.get(method, method)), covered)
+
+    def test_function_view_budget(self):
+        """Тест: декоратор query_budget и HEAD как GET"""
+
+        @query_budget(GET=2)
+        def view(request):
+            return HttpResponse()
+
+        self.assertEqual(get_query_budget(view, "GET"), 2)
+        self.assertEqual(get_query_budget(view, "HEAD"), 2)
+        self.assertIsNone(get_query_budget(view, "POST"))
+
+
+class QueryBudgetTestCase(TestCase):
+    """Тесты соблюдения бюджетов на страницах из 1 и 100 строк"""
+
+    def run_scenarios(self, context):
+        client = APIClient(HTTP_HOST="localhost")
+        headers = {
+            role: {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+            for role, token in context.tokens.items()
+        }
+        headers[None] = {}
+        for scenario in SCENARIOS + WRITE_SCENARIOS:
+            path = scenario.path(context)
+            budget = get_query_budget(resolve(path).func, scenario.method.upper())
+            if budget is None:
+                continue
+            # Каждый сценарий видит одни и те же исходные данные
+            with transaction.atomic():
+                if scenario.prepare is not None:
+                    scenario.prepare(context)
+                with CaptureQueriesContext(connection) as queries:
+                    response = scenario.send(client, context, headers[scenario.user])
+                transaction.set_rollback(True)
+            yield scenario, budget, response, queries
+
+    def test_budgets(self):
+        """Тест: число запросов не превышает бюджет при 1 и 100 строках"""
+        for size in PAGE_SIZES:
+            with transaction.atomic():
+                context = seed(size)
+                for scenario, budget, response, queries in self.run_scenarios(
+                    context
+                ):
+                    with self.subTest(scenario=scenario.name, size=size):
+                        self.assertLess(response.status_code, 400)
+                        self.assertLessEqual(
+                            len(queries),
+                            budget,
+                            "\n".join(query["sql"] for query in queries),
+                        )
+                transaction.set_rollback(True)
+
+
+@override_settings(QUERY_BUDGET_CHECK=True)
+class QueryBudgetMiddlewareTestCase(TestCase):
+    """Тесты middleware, сообщающего о превышении бюджета"""
+
+    def setUp(self):
+        author = Author.objects.create(name="Тестовый Автор")
+        for number in range(3):
+            Book.objects.create(
+                title=f"Книга {number}", author=author, price=Decimal("10.00")
+            )
+
+    def make_middleware(self, budget):
+        @query_budget(GET=budget)
+        def view(request):
+            for book in Book.objects.all():
+                book.author.name
+            return HttpResponse()
+
+        request = RequestFactory().get("/api/budget/")
+        middleware = QueryBudgetMiddleware(lambda request: view(request))
+        request.resolver_match = ResolverMatch(view, (), {})
+        return middleware, request
+
+    def test_logs_duplicated_sql(self):
+        """Тест: превышение бюджета пишется в лог вместе с повторами SQL"""
+        middleware, request = self.make_middleware(budget=2)
+        with self.assertLogs("api.query_budget", logging.WARNING) as logs:
+            middleware(request)
+        self.assertIn("4 SQL-запросов при бюджете 2", logs.output[0])
+        self.assertIn("x3:", logs.output[0])
+
+    def test_within_budget_is_silent(self):
+        """Тест: запрос в пределах бюджета не пишется в лог"""
+        middleware, request = self.make_middleware(budget=4)
+        with self.assertNoLogs("api.query_budget", logging.WARNING):
+            middleware(request)
+
+    def test_recorder_duplicates(self):
+        """Тест: QueryRecorder группирует одинаковые шаблоны SQL"""
+        with QueryRecorder() as recorder:
+            for book in Book.objects.all():
+                book.author.name
+        self.assertEqual(len(recorder.queries), 4)
+        self.assertEqual(recorder.duplicates()[0][0], 3)
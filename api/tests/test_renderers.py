@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты для быстрых JSON-рендерера и парсера
+Проверка совместимости вывода со стандартными JSONRenderer / JSONParser
+"""
+
+import io
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.models import Author, Book
+from api.renderers import FastJSONParser, FastJSONRenderer
+from api.serializers import BookSerializer
+
+
+class FastJSONRendererTestCase(TestCase):
+    """Тесты для FastJSONRenderer"""
+
+    def test_serializer_output_matches_standard_renderer(self):
+        """Тест: вывод совпадает со стандартным рендерером байт в байт"""
+        author = Author.objects.create(name="Лев Толстой", bio="Русский писатель")
+        book = Book.objects.create(
+            title="Война и мир",
+            author=author,
+            price=Decimal("500.00"),
+            description="Эпический роман с разделителем строк",
+            stock=10,
+        )
+        data = BookSerializer(book).data
+
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_native_decimal_and_datetime(self):
+        """Тест кодирования Decimal и datetime без сериализатора"""
+        data = {
+            "price": Decimal("12.50"),
+            "created_at": datetime(2024, 1, 2, 3, 4, 5, 600000, tzinfo=timezone.utc),
+        }
+
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_indent_falls_back_to_standard_renderer(self):
+        """Тест форматированного вывода (indent)"""
+        data = {"a": [1, 2]}
+        rendered = FastJSONRenderer().render(data, "application/json; indent=4")
+
+        self.assertEqual(rendered, JSONRenderer().render(data, "application/json; indent=4"))
+
+    def test_none_renders_empty(self):
+        """Тест: None рендерится в пустое тело"""
+        self.assertEqual(FastJSONRenderer().render(None), b"")
+
+
+class FastJSONParserTestCase(TestCase):
+    """Тесты для FastJSONParser"""
+
+    def test_parse_matches_standard_parser(self):
+        """Тест: результат разбора совпадает со стандартным парсером"""
+        payload = '{"items": [{"book_id": 1, "quantity": 2}], "name": "Пушкин"}'.encode()
+
+        self.assertEqual(
+            FastJSONParser().parse(io.BytesIO(payload)),
+            JSONParser().parse(io.BytesIO(payload)),
+        )
+
+    def test_invalid_json_raises_parse_error(self):
+        """Тест: некорректный JSON приводит к ParseError"""
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(io.BytesIO(b"{invalid"))
+
+    def test_utf8_alias_uses_fast_path(self):
+        """Тест: charset=utf8 разбирается быстрым путём"""
+        with mock.patch.object(JSONParser, "parse") as standard:
+            data = FastJSONParser().parse(
+                io.BytesIO(b'{"a": 1}'), parser_context={"encoding": "utf8"}
+            )
+        self.assertEqual(data, {"a": 1})
+        standard.assert_not_called()
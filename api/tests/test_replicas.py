@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты для чтения с реплик БД (api.db_router, ReplicaMiddleware)
+Две базы SQLite: default и replica с разными данными, поэтому по ответу
+видно, откуда он прочитан. TransactionTestCase: внутри транзакции теста
+маршрутизатор читал бы из default
+"""
+
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+from openpyxl import load_workbook
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api import db_router
+from api.models import Author, Book, Order
+
+User = get_user_model()
+
+
+@override_settings(REPLICA_DATABASES=["replica"])
+class ReplicaTestCase(TransactionTestCase):
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        db_router.clear_lag_checks()
+        caches["default"].clear()
+        self.users = [
+            User.objects.create_user(username=name, password="pass12345", role=role)
+            for name, role in (("writer", "user"), ("admin", "admin"))
+        ]
+        for database, title in (("default", "Основная"), ("replica", "Реплика")):
+            author = Author.objects.using(database).create(pk=1, name="Автор")
+            Book.objects.using(database).create(
+                pk=1, title=title, author=author, price=Decimal("10.00")
+            )
+
+    def auth(self, user):
+        token = RefreshToken.for_user(user).access_token
+        return {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+
+    def titles(self, client=None, **headers):
+        response = (client or self.client).get("/api/books/", **headers)
+        self.assertEqual(response.status_code, 200)
+        return [book["title"] for book in response.json()["results"]]
+
+
+class ReplicaMiddlewareTestCase(ReplicaTestCase):
+    """Тесты ReplicaMiddleware"""
+
+    def test_catalog_reads_replica(self):
+        """Тест: GET-запросы каталога читают с реплики"""
+        self.assertEqual(self.titles(), ["Реплика"])
+        self.assertEqual(self.client.get("/api/books/1/").json()["title"], "Реплика")
+        response = self.client.get("/api/authors/1/", **self.auth(self.users[0]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_read_your_writes(self):
+        """Тест: после записи клиент и пользователь читают из default"""
+        response = self.client.post(
+            "/api/books/",
+            {"title": "Новая", "author_id": 1, "price": "5.00"},
+            content_type="application/json",
+            **self.auth(self.users[0]),
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertIn("replica_pin", response.cookies)
+        self.assertEqual(self.titles(), ["Основная", "Новая"])
+
+        # Тот же пользователь без cookie, другой пользователь и аноним
+        client = self.client_class()
+        self.assertEqual(len(self.titles(client, **self.auth(self.users[0]))), 2)
+        self.assertEqual(self.titles(client, **self.auth(self.users[1])), ["Реплика"])
+        self.assertEqual(self.titles(client), ["Реплика"])
+
+        caches["default"].clear()
+        self.assertEqual(self.titles(client, **self.auth(self.users[0])), ["Реплика"])
+
+    def test_lagging_replica(self):
+        """Тест: отстающая или недоступная реплика заменяется default"""
+        with mock.patch.object(db_router, "replica_lag", return_value=30.0) as lag:
+            self.assertEqual(self.titles(), ["Основная"])
+            self.assertEqual(self.titles(), ["Основная"])
+        # Отставание проверяется раз в REPLICA_LAG_CHECK_INTERVAL
+        lag.assert_called_once_with("replica")
+
+        db_router.clear_lag_checks()
+        with mock.patch.object(db_router, "replica_lag", return_value=None):
+            self.assertEqual(self.titles(), ["Основная"])
+        db_router.clear_lag_checks()
+        with mock.patch.object(db_router, "replica_lag", return_value=1.0):
+            self.assertEqual(self.titles(), ["Реплика"])
+
+    def test_export(self):
+        """Тест: экспорт читает с реплики"""
+        response = self.client.get(
+            "/api/export/?model=book&fields=title", **self.auth(self.users[1])
+        )
+        self.assertEqual(response.status_code, 200)
+        sheet = load_workbook(BytesIO(response.content)).active
+        self.assertEqual(sheet["A2"].value, "Реплика")
+
+    def test_other_routes_use_default(self):
+        """Тест: заказы и другие маршруты читают из default"""
+        Order.objects.create(user=self.users[0], total_price=Decimal("10.00"))
+        response = self.client.get("/api/orders/", **self.auth(self.users[0]))
+        self.assertEqual(response.json()["count"], 1)
+
+    async def test_async_chain(self):
+        """Тест: чтение с реплики в асинхронной цепочке (ASGI)"""
+        response = await self.async_client.get("/api/books/")
+        self.assertEqual(response.json()["results"][0]["title"], "Реплика")
+
+
+class ReplicaRouterTestCase(ReplicaTestCase):
+    """Тесты ReplicaRouter и read_from_replica"""
+
+    def test_read_from_replica(self):
+        """Тест: чтение с реплики в блоке, запись и пользователи - default"""
+        self.assertEqual(Book.objects.get().title, "Основная")
+        with db_router.read_from_replica():
+            book = Book.objects.get()
+            self.assertEqual(book.title, "Реплика")
+            self.assertEqual(book.author.name, "Автор")
+            self.assertEqual(User.objects.count(), 2)
+            with transaction.atomic():
+                self.assertEqual(Book.objects.get().title, "Основная")
+            book.save()
+        self.assertEqual(Book.objects.get().title, "Реплика")
+        self.assertEqual(Book.objects.using("replica").count(), 1)
+
+    def test_replica_lag(self):
+        """Тест: отставание SQLite не проверяется"""
+        self.assertEqual(db_router.replica_lag("replica"), 0.0)
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_without_replicas(self):
+        """Тест: без реплик всё читается из default"""
+        with db_router.read_from_replica():
+            self.assertEqual(Book.objects.get().title, "Основная")
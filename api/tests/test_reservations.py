@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты для резервов товара
+Проверка резервирования, снятия, сборщика истёкших резервов и потребления
+резервов при оформлении заказа
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from api.models import Author, Book, Order, StockReservation
+from api.services import (
+    OrderError,
+    place_order,
+    release_expired_reservations,
+    reserve_stock,
+)
+
+User = get_user_model()
+
+
+class ReservationServiceTestCase(TestCase):
+    """Тесты функций резервирования"""
+
+    def setUp(self):
+        """Подготовка данных"""
+        self.user = User.objects.create_user(username="buyer", password="testpass123")
+        self.author = Author.objects.create(name="Test Author")
+        self.book = Book.objects.create(
+            title="Hot Book", author=self.author, price=Decimal("300.00"), stock=5
+        )
+
+    def stock(self):
+        self.book.refresh_from_db()
+        return self.book.stock
+
+    def test_reserve_decrements_stock(self):
+        """Тест: резерв сразу списывает товар со склада"""
+        reservation = reserve_stock(self.user, self.book.id, 2)
+
+        self.assertEqual(self.stock(), 3)
+        self.assertEqual(reservation.price, Decimal("300.00"))
+        self.assertGreater(reservation.expires_at, timezone.now())
+
+    def test_reserve_again_replaces_quantity(self):
+        """Тест: повторный резерв меняет количество, разница идет на склад"""
+        reserve_stock(self.user, self.book.id, 4)
+        reserve_stock(self.user, self.book.id, 1)
+
+        self.assertEqual(self.stock(), 4)
+        self.assertEqual(StockReservation.objects.get().quantity, 1)
+
+    def test_reserve_insufficient_stock(self):
+        """Тест: нельзя зарезервировать больше, чем есть на складе"""
+        with self.assertRaises(OrderError):
+            reserve_stock(self.user, self.book.id, 6)
+        self.assertEqual(self.stock(), 5)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_order_consumes_reservation(self):
+        """Тест: заказ потребляет резерв без повторного списания"""
+        reserve_stock(self.user, self.book.id, 2)
+        order = place_order(self.user, {self.book.id: 2})
+
+        self.assertEqual(order.total_price, Decimal("600.00"))
+        self.assertEqual(self.stock(), 3)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_reserved_book_not_rechecked(self):
+        """Тест: полностью зарезервированная книга не блокируется и не читается"""
+        reserve_stock(self.user, self.book.id, 2)
+
+        # SAVEPOINT, резервы, DELETE резервов, заказ, элементы, RELEASE;
+        # ни SELECT книг, ни UPDATE остатков
+        with self.assertNumQueries(6):
+            place_order(self.user, {self.book.id: 2})
+
+    def test_order_larger_than_reservation(self):
+        """Тест: недостающее количество списывается со склада"""
+        reserve_stock(self.user, self.book.id, 2)
+        place_order(self.user, {self.book.id: 4})
+
+        self.assertEqual(self.stock(), 1)
+
+    def test_order_smaller_than_reservation_returns_rest(self):
+        """Тест: излишек резерва возвращается на склад"""
+        reserve_stock(self.user, self.book.id, 4)
+        place_order(self.user, {self.book.id: 1})
+
+        self.assertEqual(self.stock(), 4)
+
+    def test_expired_reservation_not_consumed(self):
+        """Тест: истекший резерв не используется при заказе"""
+        reserve_stock(self.user, self.book.id, 5, ttl=timedelta(seconds=-1))
+
+        with self.assertRaises(OrderError):
+            place_order(self.user, {self.book.id: 1})
+
+    def test_sweeper_releases_expired_in_batches(self):
+        """Тест: сборщик возвращает товар истекших резервов пачками"""
+        users = [
+            User.objects.create_user(username=f"user{i}", password="testpass123")
+            for i in range(3)
+        ]
+        for user in users:
+            reserve_stock(user, self.book.id, 1, ttl=timedelta(seconds=-1))
+        reserve_stock(self.user, self.book.id, 1)
+
+        released = release_expired_reservations(batch_size=2)
+
+        self.assertEqual(released, 3)
+        self.assertEqual(self.stock(), 4)
+        self.assertEqual(StockReservation.objects.count(), 1)
+
+    def test_sweeper_command(self):
+        """Тест management-команды release_reservations"""
+        reserve_stock(self.user, self.book.id, 2, ttl=timedelta(seconds=-1))
+        call_command("release_reservations", stdout=StringIO())
+
+        self.assertEqual(self.stock(), 5)
+
+
+class ReservationAPITestCase(APITestCase):
+    """Тесты API резервов"""
+
+    def setUp(self):
+        """Подготовка данных"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="buyer", password="testpass123")
+        self.client.force_authenticate(user=self.user)
+        author = Author.objects.create(name="Test Author")
+        self.book = Book.objects.create(
+            title="Hot Book", author=author, price=Decimal("300.00"), stock=5
+        )
+
+    def test_reserve_and_release(self):
+        """Тест резервирования и снятия резерва через API"""
+        response = self.client.post(
+            "/api/reservations/", {"book_id": self.book.id, "quantity": 2}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["quantity"], 2)
+
+        response = self.client.get("/api/reservations/")
+        self.assertEqual(len(response.data), 1)
+
+        response = self.client.delete(f"/api/reservations/{self.book.id}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.stock, 5)
+
+    def test_cart_reserve_then_create_order(self):
+        """Тест: резерв корзины и оформление заказа по резерву"""
+        self.client.post(
+            "/api/cart/items/", {"book_id": self.book.id, "quantity": 3}, format="json"
+        )
+        response = self.client.post("/api/cart/reserve/")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # Другой покупатель уже не может купить зарезервированный товар
+        other = User.objects.create_user(username="other", password="testpass123")
+        with self.assertRaises(OrderError):
+            place_order(other, {self.book.id: 3})
+
+        response = self.client.post("/api/cart/checkout/")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 1)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.stock, 2)
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты для промышленного запуска
+Проверка прогрева приложения (api.warmup), конфигурации gunicorn и
+сравнения серверов (bench_serve, bench_slow_clients)
+"""
+
+import os
+import runpy
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from api.management.commands.bench_serve import comparison_rows, server_command
+from api.management.commands.bench_slow_clients import request_bytes, response_status
+from api.models import Author, Book
+from api.warmup import warm_up
+
+
+GUNICORN_ENVIRONMENT = ("WEB_CONCURRENCY", "GUNICORN_THREADS", "GUNICORN_BIND", "PORT")
+
+
+def load_gunicorn_config(**environ):
+    """Переменные gunicorn.conf.py при заданном окружении."""
+    with mock.patch.dict(os.environ, environ):
+        for name in set(GUNICORN_ENVIRONMENT) - set(environ):
+            os.environ.pop(name, None)
+        return runpy.run_path(os.path.join(str(settings.BASE_DIR), "gunicorn.conf.py"))
+
+
+class WarmUpTestCase(TestCase):
+    """Тесты прогрева приложения"""
+
+    def setUp(self):
+        author = Author.objects.create(name="Тестовый Автор")
+        for number in range(30):
+            Book.objects.create(
+                title=f"Книга {number}", author=author, price=Decimal("10.00")
+            )
+        caches[settings.COMPRESSION_CACHE_ALIAS].clear()
+
+    def test_paths_requested(self):
+        """Тест: все пути прогрева проходят через приложение"""
+        results = warm_up(paths=["/api/books/?ordering=price", "/api/missing/"])
+        self.assertEqual(
+            [(path, status) for path, status, _ in results],
+            [("/api/books/?ordering=price", 200), ("/api/missing/", 404)],
+        )
+
+    @override_settings(WARMUP_PATHS=["/api/books/"])
+    def test_compression_cache_filled(self):
+        """Тест: прогрев заполняет кэш сжатых страниц каталога"""
+        with mock.patch("api.middleware.metrics.record_cache") as record_cache:
+            warm_up()
+            self.client.get("/api/books/", HTTP_ACCEPT_ENCODING="gzip")
+        hits = [call.args[1] for call in record_cache.call_args_list]
+        self.assertEqual(hits, [False, True])
+
+    def test_errors_do_not_stop_startup(self):
+        """Тест: ошибка приложения при прогреве не прерывает запуск"""
+
+        def broken(environ, start_response):
+            raise RuntimeError("база недоступна")
+
+        with self.assertLogs("api.warmup", "ERROR"):
+            results = warm_up(broken, paths=["/api/books/"])
+        self.assertEqual(results[0][1], None)
+
+
+class GunicornConfigTestCase(SimpleTestCase):
+    """Тесты gunicorn.conf.py"""
+
+    def test_defaults(self):
+        """Тест: предзагрузка, воркеры по числу CPU и перезапуск воркеров"""
+        config = load_gunicorn_config()
+        self.assertTrue(config["preload_app"])
+        self.assertEqual(config["workers"], 2 * config["cpu_count"]() + 1)
+        self.assertEqual(config["worker_class"], "gthread")
+        self.assertGreater(config["max_requests"], 0)
+        self.assertGreater(config["max_requests_jitter"], 0)
+        self.assertEqual(config["bind"], "0.0.0.0:8000")
+
+    def test_environment(self):
+        """Тест: размеры берутся из окружения"""
+        config = load_gunicorn_config(
+            WEB_CONCURRENCY="3", GUNICORN_THREADS="1", PORT="9000"
+        )
+        self.assertEqual(config["workers"], 3)
+        self.assertEqual(config["worker_class"], "sync")
+        self.assertEqual(config["bind"], "0.0.0.0:9000")
+
+
+class BenchServeTestCase(SimpleTestCase):
+    """Тесты вспомогательных функций bench_serve"""
+
+    def test_server_command(self):
+        """Тест: командные строки серверов"""
+        runserver = server_command("runserver", 8100)
+        self.assertEqual(runserver[-3:], ["runserver", "--noreload", "127.0.0.1:8100"])
+        gunicorn = server_command("gunicorn", 8100, workers=4, threads=2)
+        self.assertIn("gunicorn.conf.py", gunicorn[4])
+        self.assertEqual(
+            gunicorn[-5:], ["--workers", "4", "--threads", "2", "bookstore.wsgi"]
+        )
+        uvicorn = server_command("uvicorn", 8100, workers=2)
+        self.assertEqual(uvicorn[1:3], ["-m", "uvicorn"])
+        self.assertEqual(
+            uvicorn[-3:], ["--workers", "2", "bookstore.asgi:application"]
+        )
+
+    def test_slow_client_request(self):
+        """Тест: запрос медленного клиента и разбор кода ответа"""
+        request = request_bytes("/api/books/", ("Accept: application/json",))
+        self.assertTrue(request.startswith(b"GET /api/books/ HTTP/1.1\r\n"))
+        self.assertTrue(request.endswith(b"Accept: application/json\r\n\r\n"))
+        self.assertEqual(response_status(b"HTTP/1.1 200 OK\r\n"), 200)
+        self.assertIsNone(response_status(b""))
+
+    def test_comparison_rows(self):
+        """Тест: строки сравнения включают общие показатели и шаги"""
+
+        def report(rps, p99):
+            latency = {"p50_ms": 1.0, "p90_ms": 2.0, "p99_ms": p99}
+            return {
+                "rps": rps,
+                "error_rate": 0.0,
+                "latency": latency,
+                "steps": {"browse": dict(latency)},
+            }
+
+        rows = dict(
+            comparison_rows(
+                {"runserver": report(10.0, 50.0), "gunicorn": report(40.0, 20.0)}
+            )
+        )
+        self.assertEqual(rows["запросов в сек"], {"runserver": 10.0, "gunicorn": 40.0})
+        self.assertEqual(rows["p99 мс browse"], {"runserver": 50.0, "gunicorn": 20.0})
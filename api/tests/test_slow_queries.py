@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты для журнала медленных запросов (api.slow_queries)
+Проверка шаблонов SQL, места вызова, EXPLAIN и отчёта SlowQuery
+"""
+
+import logging
+from decimal import Decimal
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api import slow_queries
+from api.models import Author, Book, SlowQuery, User
+from api.slow_queries import SlowQueryLog, fingerprint
+
+
+class FingerprintTestCase(SimpleTestCase):
+    """Тесты нормализации SQL"""
+
+    def test_literals_and_params(self):
+        """Тест: литералы и параметры заменяются на '?'"""
+        self.assertEqual(
+            fingerprint(
+                'SELECT "api_book"."id" FROM "api_book" WHERE "title" = \'it\'\'s\''
+                " AND \"price\" > 10.5 AND \"author_id\" = %s LIMIT 21"
+            ),
+            'SELECT "api_book"."id" FROM "api_book" WHERE "title" = ?'
+            ' AND "price" > ? AND "author_id" = ? LIMIT ?',
+        )
+
+    def test_lists_collapsed(self):
+        """Тест: списки IN и строки VALUES любой длины дают один шаблон"""
+        short = fingerprint('SELECT * FROM "t" WHERE "id" IN (%s, %s)')
+        long = fingerprint('SELECT * FROM "t" WHERE "id" IN (%s, %s, %s, %s)')
+        self.assertEqual(short, long)
+        self.assertEqual(short, 'SELECT * FROM "t" WHERE "id" IN (...)')
+        self.assertEqual(
+            fingerprint('INSERT INTO "t" ("a", "b") VALUES (%s, %s), (%s, %s)'),
+            'INSERT INTO "t" ("a", "b") VALUES (...)',
+        )
+
+    def test_identifiers_kept(self):
+        """Тест: цифры в идентификаторах не заменяются"""
+        sql = 'SELECT "T2"."id", col1 FROM "api_book" T2'
+        self.assertEqual(fingerprint(sql), sql)
+
+
+class SlowQueryLogTestCase(TestCase):
+    """Тесты execute_wrapper и EXPLAIN"""
+
+    def setUp(self):
+        author = Author.objects.create(name="Тестовый Автор")
+        Book.objects.create(title="Книга", author=author, price=Decimal("10.00"))
+        slow_queries._plans.clear()
+
+    def test_threshold(self):
+        """Тест: запросы быстрее порога не запоминаются"""
+        with SlowQueryLog(threshold_ms=60_000) as log:
+            list(Book.objects.all())
+        self.assertEqual(log.queries, [])
+
+    def test_origin_and_plan(self):
+        """Тест: запоминаются место вызова и план, план - раз на шаблон"""
+        with SlowQueryLog(threshold_ms=0.000001) as log:
+            list(Book.objects.filter(title="Книга"))
+            list(Book.objects.filter(title="Другая"))
+        self.assertEqual(len(log.queries), 2)
+        first, second = log.queries
+        self.assertEqual(first["digest"], second["digest"])
+        self.assertIn("api/tests/test_slow_queries.py:", first["origin"])
+        self.assertIn("test_origin_and_plan", first["origin"])
+        self.assertIn("api_book", first["plan"])
+        self.assertIsNone(second["plan"])
+
+    def test_writes_and_users_masked(self):
+        """Тест: для записей и таблицы пользователей хранится только шаблон"""
+        with SlowQueryLog(threshold_ms=0.000001) as log:
+            User.objects.create_user(
+                username="secret", email="secret@example.com", password="pass12345"
+            )
+            list(User.objects.filter(email="secret@example.com"))
+            list(Book.objects.filter(title="Книга"))
+        masked = [query for query in log.queries if query["params"] is None]
+        self.assertTrue(masked)
+        for query in masked:
+            self.assertEqual(query["sql"], query["fingerprint"])
+            self.assertIsNone(query["plan"])
+            self.assertNotIn("secret", str(query))
+        self.assertIn("'Книга'", log.queries[-1]["params"])
+
+    def test_explain_only_select(self):
+        """Тест: EXPLAIN не выполняется для изменяющих запросов"""
+        self.assertEqual(
+            slow_queries.explain(connection, 'DELETE FROM "api_book"', ()), ""
+        )
+        self.assertEqual(Book.objects.count(), 1)
+
+    def test_explain_error(self):
+        """Тест: ошибка EXPLAIN не прерывает транзакцию"""
+        plan = slow_queries.explain(connection, "SELECT * FROM missing_table", ())
+        self.assertIn("EXPLAIN", plan)
+        self.assertEqual(Book.objects.count(), 1)
+
+
+@override_settings(SLOW_QUERY_THRESHOLD_MS=0.000001)
+class SlowQueryMiddlewareTestCase(TestCase):
+    """Тесты SlowQueryMiddleware и отчёта SlowQuery"""
+
+    def setUp(self):
+        author = Author.objects.create(name="Тестовый Автор")
+        for number in range(3):
+            Book.objects.create(
+                title=f"Книга {number}", author=author, price=Decimal("10.00")
+            )
+        slow_queries._plans.clear()
+        self.client = APIClient()
+
+    def test_aggregated_by_fingerprint(self):
+        """Тест: запросы суммируются по шаблону с маршрутом и планом"""
+        with self.assertLogs("api.slow_queries", logging.WARNING) as logs:
+            self.client.get("/api/books/?search=один")
+            self.client.get("/api/books/?search=два")
+
+        fields = logs.records[0].fields
+        self.assertEqual(fields["view"], "book-list")
+        for name in ("digest", "fingerprint", "sql", "duration_ms", "origin"):
+            self.assertIn(name, fields)
+
+        search = SlowQuery.objects.get(
+            fingerprint__contains="LIKE", fingerprint__startswith="SELECT"
+        )
+        self.assertEqual(search.calls, 2)
+        self.assertEqual(search.view_name, "book-list")
+        self.assertGreaterEqual(search.total_ms, search.max_ms)
+        self.assertNotIn("один", search.fingerprint)
+        self.assertIn("два", search.example_sql)
+        self.assertTrue(search.plan)
+        self.assertIn("api/views.py:", search.origin)
+        self.assertNotIn("api/middleware.py", search.origin)
+
+    def test_admin_report(self):
+        """Тест: отчёт о медленных запросах открывается в админке"""
+        admin = User.objects.create_user(
+            username="admin",
+            password="pass12345",
+            role="admin",
+            is_staff=True,
+            is_superuser=True,
+        )
+        with self.assertLogs("api.slow_queries", logging.WARNING):
+            self.client.get("/api/books/")
+            self.client.force_login(admin)
+            response = self.client.get("/admin/api/slowquery/")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "api_book")
+        query = SlowQuery.objects.filter(view_name="book-list").first()
+        with self.assertLogs("api.slow_queries", logging.WARNING):
+            response = self.client.get(f"/admin/api/slowquery/{query.id}/change/")
+        self.assertContains(response, "<pre>")
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты для снимков базы (команда snapshot)
+Проверка сохранения, восстановления и проверки совместимости снимка
+"""
+
+import json
+import os
+import tempfile
+import zipfile
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TransactionTestCase
+
+from api.models import Author, Book
+from api.snapshots import (
+    MANIFEST_NAME,
+    SnapshotError,
+    restore_snapshot,
+    save_snapshot,
+)
+
+
+class SnapshotTestCase(TransactionTestCase):
+    """Тесты сохранения и восстановления снимка"""
+
+    def setUp(self):
+        """Подготовка данных"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "snapshot.zip")
+        author = Author.objects.create(name="Test Author")
+        for index in range(3):
+            Book.objects.create(
+                title=f"Book {index}",
+                author=author,
+                price=Decimal("100.00"),
+                stock=index,
+            )
+
+    def test_save_and_restore(self):
+        """Тест: восстановление возвращает данные на момент снимка"""
+        manifest = save_snapshot(self.path)
+        books = {entry["table"]: entry["rows"] for entry in manifest["tables"]}
+        self.assertEqual(books["api_book"], 3)
+
+        Book.objects.filter(stock=0).delete()
+        Book.objects.update(title="Changed")
+        restore_snapshot(self.path)
+
+        self.assertEqual(
+            sorted(Book.objects.values_list("title", flat=True)),
+            ["Book 0", "Book 1", "Book 2"],
+        )
+        # Счетчик id продолжается после восстановленных строк
+        self.assertGreater(
+            Author.objects.create(name="New").id, Author.objects.first().id
+        )
+
+    def test_restore_rejects_other_schema(self):
+        """Тест: снимок с другими миграциями не восстанавливается без force"""
+        save_snapshot(self.path)
+        with zipfile.ZipFile(self.path) as archive:
+            manifest = json.loads(archive.read(MANIFEST_NAME))
+            payload = {
+                name: archive.read(name)
+                for name in archive.namelist()
+                if name != MANIFEST_NAME
+            }
+        manifest["migrations"].append("9999_future")
+        with zipfile.ZipFile(self.path, "w") as archive:
+            for name, data in payload.items():
+                archive.writestr(name, data)
+            archive.writestr(MANIFEST_NAME, json.dumps(manifest))
+
+        with self.assertRaises(SnapshotError):
+            restore_snapshot(self.path)
+        restore_snapshot(self.path, force=True)
+        self.assertEqual(Book.objects.count(), 3)
+
+    def test_other_tables_untouched(self):
+        """Тест: таблицы вне api не меняются при восстановлении"""
+        save_snapshot(self.path)
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE TABLE outside_note (id integer PRIMARY KEY)")
+            self.addCleanup(self.drop_table, "outside_note")
+            cursor.execute("INSERT INTO outside_note (id) VALUES (7)")
+        Book.objects.all().delete()
+
+        restore_snapshot(self.path)
+
+        self.assertEqual(Book.objects.count(), 3)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT id FROM outside_note")
+            self.assertEqual(cursor.fetchall(), [(7,)])
+
+    def test_referencing_table_with_rows(self):
+        """Тест: снимок не восстанавливается, пока на api ссылаются строки"""
+        save_snapshot(self.path)
+        author = Author.objects.get()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TABLE outside_ref (id integer PRIMARY KEY, "
+                "author_id integer REFERENCES api_author (id))"
+            )
+            self.addCleanup(self.drop_table, "outside_ref")
+            cursor.execute("INSERT INTO outside_ref VALUES (1, %s)", [author.id])
+        Book.objects.all().delete()
+
+        with self.assertRaisesMessage(SnapshotError, "outside_ref"):
+            restore_snapshot(self.path)
+        self.assertEqual(Book.objects.count(), 0)
+
+    def drop_table(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE {table}")
+
+    def test_command(self):
+        """Тест: команда snapshot save / restore"""
+        out = StringIO()
+        call_command("snapshot", "save", self.path, stdout=out)
+        Book.objects.all().delete()
+        call_command("snapshot", "restore", self.path, stdout=out)
+
+        self.assertEqual(Book.objects.count(), 3)
+        self.assertIn("Восстановлено", out.getvalue())
+
+    def test_command_missing_file(self):
+        """Тест: восстановление из несуществующего файла"""
+        with self.assertRaises(CommandError):
+            call_command("snapshot", "restore", self.path + ".missing")
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты для шардированных остатков
+Проверка включения и выключения шардов, списания при заказе и резерве,
+возврата товара и ребалансировки
+"""
+
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from api.models import Author, Book, Order, StockShard
+from api.services import (
+    OrderError,
+    disable_stock_sharding,
+    enable_stock_sharding,
+    place_order,
+    rebalance_stock_shards,
+    release_reservation,
+    reserve_stock,
+    take_from_shards,
+)
+
+User = get_user_model()
+
+
+class StockShardTestCase(TestCase):
+    """Тесты шардированных остатков"""
+
+    def setUp(self):
+        """Подготовка данных"""
+        self.user = User.objects.create_user(username="buyer", password="testpass123")
+        self.author = Author.objects.create(name="Test Author")
+        self.book = Book.objects.create(
+            title="Flash Sale", author=self.author, price=Decimal("100.00"), stock=10
+        )
+        enable_stock_sharding(self.book.id, 4)
+
+    def shards(self):
+        return list(
+            StockShard.objects.filter(book=self.book)
+            .order_by("index")
+            .values_list("quantity", flat=True)
+        )
+
+    def test_enable_splits_stock(self):
+        """Тест: остаток делится между шардами почти поровну"""
+        self.book.refresh_from_db()
+
+        self.assertTrue(self.book.stock_sharded)
+        self.assertEqual(self.shards(), [3, 3, 2, 2])
+
+    def test_order_takes_from_shards(self):
+        """Тест: заказ списывает товар с шардов, не трогая Book.stock"""
+        order = place_order(self.user, {self.book.id: 3})
+
+        self.assertEqual(order.total_price, Decimal("300.00"))
+        self.assertEqual(sum(self.shards()), 7)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.stock, 10)
+
+    def test_order_collects_units_from_several_shards(self):
+        """Тест: если одного шарда мало, товар собирается с нескольких"""
+        place_order(self.user, {self.book.id: 9})
+
+        self.assertEqual(sum(self.shards()), 1)
+
+    def test_order_insufficient_stock(self):
+        """Тест: заказ больше суммы шардов отклоняется без изменений"""
+        with self.assertRaises(OrderError):
+            place_order(self.user, {self.book.id: 11})
+
+        self.assertEqual(sum(self.shards()), 10)
+        self.assertFalse(Order.objects.exists())
+
+    def test_take_from_shards_returns_false(self):
+        """Тест: take_from_shards сообщает о нехватке"""
+        self.assertFalse(take_from_shards(self.book.id, 11))
+        self.assertTrue(take_from_shards(self.book.id, 10))
+        self.assertEqual(sum(self.shards()), 0)
+
+    def test_reserve_and_release(self):
+        """Тест: резерв берёт товар с шардов, снятие возвращает его в шард 0"""
+        reserve_stock(self.user, self.book.id, 4)
+        self.assertEqual(sum(self.shards()), 6)
+
+        release_reservation(self.user, self.book.id)
+        self.assertEqual(sum(self.shards()), 10)
+
+    def test_reserved_order_does_not_touch_shards(self):
+        """Тест: заказ по резерву не списывает товар повторно"""
+        reserve_stock(self.user, self.book.id, 2)
+        place_order(self.user, {self.book.id: 2})
+
+        self.assertEqual(sum(self.shards()), 8)
+
+    def test_rebalance_evens_shards_and_refreshes_stock(self):
+        """Тест: ребалансировка выравнивает шарды и обновляет Book.stock"""
+        place_order(self.user, {self.book.id: 5})
+
+        totals = rebalance_stock_shards()
+
+        self.assertEqual(totals, {self.book.id: 5})
+        self.assertEqual(self.shards(), [2, 1, 1, 1])
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.stock, 5)
+
+    def test_disable_collects_shards(self):
+        """Тест: выключение шардов возвращает сумму в Book.stock"""
+        place_order(self.user, {self.book.id: 4})
+
+        book = disable_stock_sharding(self.book.id)
+
+        self.assertFalse(book.stock_sharded)
+        self.assertEqual(book.stock, 6)
+        self.assertFalse(StockShard.objects.exists())
+
+    def test_mixed_order(self):
+        """Тест: заказ с обычной и шардированной книгой"""
+        plain = Book.objects.create(
+            title="Plain", author=self.author, price=Decimal("50.00"), stock=2
+        )
+
+        order = place_order(self.user, {self.book.id: 1, plain.id: 2})
+
+        self.assertEqual(order.total_price, Decimal("200.00"))
+        plain.refresh_from_db()
+        self.assertEqual(plain.stock, 0)
+        self.assertEqual(sum(self.shards()), 9)
+
+    def test_command(self):
+        """Тест: команда stock_shards"""
+        out = StringIO()
+        call_command("stock_shards", "disable", str(self.book.id), stdout=out)
+        call_command(
+            "stock_shards", "enable", str(self.book.id), "--shards", "2", stdout=out
+        )
+        call_command("stock_shards", "rebalance", stdout=out)
+
+        self.assertEqual(self.shards(), [5, 5])
+        self.assertIn("Ребалансировано книг: 1", out.getvalue())
+
+    def test_flag_not_in_api(self):
+        """Тест: внутренний флаг шардирования не отдаётся API"""
+        response = self.client.get(f"/api/books/{self.book.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("stock_sharded", response.json())
+        self.assertEqual(response.json()["title"], "Flash Sale")
+
+        response = self.client.get("/api/books/", {"omit": "stock_sharded"})
+        self.assertEqual(response.status_code, 400)
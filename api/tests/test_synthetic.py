@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты для генератора синтетических данных (populate_db --scale)
+Проверка детерминированности, целостности связей и команды
+"""
+
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Count
+from django.test import TestCase
+
+from api.models import Author, Book, Order, OrderItem, Review, User
+from api.services import recalculate_totals
+from api.synthetic import book_rows, generate, scaled_counts
+
+COUNTS = {"authors": 5, "books": 40, "users": 10, "orders": 30, "reviews": 120}
+
+
+class SyntheticDataTestCase(TestCase):
+    """Тесты генерации синтетических данных"""
+
+    def test_scaled_counts(self):
+        """Тест: объёмы масштабируются и переопределяются"""
+        counts = scaled_counts(0.001, {"reviews": 7, "orders": None})
+
+        self.assertEqual(counts["books"], 1000)
+        self.assertEqual(counts["orders"], 5000)
+        self.assertEqual(counts["reviews"], 7)
+
+    def test_rows_are_deterministic(self):
+        """Тест: одинаковый seed дает одинаковые строки, другой - другие"""
+        first = list(book_rows(7, 1, 20, 1, 3))
+
+        self.assertEqual(first, list(book_rows(7, 1, 20, 1, 3)))
+        self.assertNotEqual(first, list(book_rows(8, 1, 20, 1, 3)))
+
+    def test_generate(self):
+        """Тест: строки связаны корректно, суммы заказов сходятся"""
+        stats = generate(COUNTS, seed=1, chunk_size=16)
+
+        self.assertEqual(stats["books"][0], 40)
+        self.assertEqual(Book.objects.count(), 40)
+        self.assertEqual(Review.objects.count(), 120)
+        self.assertEqual(OrderItem.objects.count(), stats["items"][0])
+        self.assertFalse(
+            Review.objects.values("user", "book")
+            .annotate(total=Count("id"))
+            .filter(total__gt=1)
+            .exists()
+        )
+        # Суммы заказов уже совпадают с позициями
+        self.assertEqual(recalculate_totals(), 0)
+        self.assertTrue(User.objects.first().check_password("password123"))
+
+    def test_generate_appends_and_keeps_sequences(self):
+        """Тест: повторная генерация дописывает строки, id не конфликтуют"""
+        generate(COUNTS, seed=1)
+        generate(COUNTS, seed=1)
+
+        self.assertEqual(Author.objects.count(), 10)
+        self.assertEqual(Order.objects.count(), 60)
+        author = Author.objects.create(name="После генерации")
+        self.assertGreater(author.id, 10)
+
+    def test_command(self):
+        """Тест: populate_db --scale выводит скорость вставки"""
+        out = StringIO()
+        call_command(
+            "populate_db",
+            "--scale",
+            "0",
+            "--authors",
+            "2",
+            "--books",
+            "3",
+            stdout=out,
+        )
+
+        self.assertEqual(Book.objects.count(), 3)
+        self.assertIn("строк/с", out.getvalue())
+
+    def test_command_validates_counts(self):
+        """Тест: отзывов не может быть больше пар пользователь-книга"""
+        with self.assertRaises(CommandError):
+            call_command(
+                "populate_db",
+                "--scale",
+                "0",
+                "--authors",
+                "1",
+                "--books",
+                "1",
+                "--users",
+                "1",
+                "--reviews",
+                "2",
+                stdout=StringIO(),
+            )
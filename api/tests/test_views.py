@@ -513,3 +513,116 @@ class HTTPStatusCodesTestCase(TestCase):
         """Тест 200 OK для детальной страницы"""
         response = self.client.get(f"/api/books/{self.book.id}/")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class SparseFieldsetAPITestCase(APITestCase):
+    """Тесты параметров ?fields=, ?omit= и ?expand="""
+
+    def setUp(self):
+        """Подготовка данных"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.author = Author.objects.create(name="Test Author", bio="Test bio")
+        self.book = Book.objects.create(
+            title="Test Book",
+            author=self.author,
+            price=Decimal("500.00"),
+            description="Test description",
+            stock=10,
+        )
+        Review.objects.create(user=self.user, book=self.book, rating=5)
+
+    def test_fields_whitelist(self):
+        """Тест выбора полей через ?fields="""
+        response = self.client.get("/api/books/", {"fields": "id,title,price"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        book = response.data["results"][0]
+        self.assertEqual(set(book), {"id", "title", "price"})
+
+    def test_omit_fields(self):
+        """Тест исключения полей через ?omit="""
+        response = self.client.get(
+            f"/api/books/{self.book.id}/", {"omit": "description,created_at"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("description", response.data)
+        self.assertNotIn("created_at", response.data)
+        self.assertEqual(response.data["title"], "Test Book")
+
+    def test_expand_collapses_nested_objects_to_ids(self):
+        """Тест: невыбранные в ?expand= вложенные объекты отдаются как id"""
+        response = self.client.get("/api/reviews/", {"expand": "user"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        review = response.data["results"][0]
+        self.assertEqual(review["book"], self.book.id)
+        self.assertEqual(review["user"]["username"], "testuser")
+
+    def test_nested_objects_expanded_by_default(self):
+        """Тест: без ?expand= вложенные объекты разворачиваются, как раньше"""
+        response = self.client.get("/api/reviews/")
+
+        review = response.data["results"][0]
+        self.assertEqual(review["book"]["author"]["name"], "Test Author")
+
+    def test_unknown_fields_rejected(self):
+        """Тест: неизвестные поля в ?fields=, ?omit= и ?expand= - 400 с их списком"""
+        for params, invalid in (
+            ({"fields": "nope"}, {"fields": "nope"}),
+            ({"fields": "rating,book.title"}, {"fields": "book.title"}),
+            ({"omit": "nope"}, {"omit": "nope"}),
+            ({"expand": "nope,user"}, {"expand": "nope"}),
+            ({"fields": "x", "expand": "rating"}, {"fields": "x", "expand": "rating"}),
+        ):
+            with self.subTest(params=params):
+                response = self.client.get("/api/reviews/", params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertEqual(
+                    response.data,
+                    {
+                        param: [f"Неизвестные поля: {names}"]
+                        for param, names in invalid.items()
+                    },
+                )
+
+    def test_empty_params_ignored(self):
+        """Тест: пустые ?fields= и ?expand= не учитываются"""
+        response = self.client.get("/api/reviews/", {"fields": "", "expand": ""})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        review = response.data["results"][0]
+        self.assertEqual(review["rating"], 5)
+        self.assertEqual(review["book"]["author"]["name"], "Test Author")
+
+    def test_list_query_count_does_not_grow_with_rows(self):
+        """Тест: вложенные объекты загружаются без N+1 запросов"""
+        for i in range(10):
+            Book.objects.create(
+                title=f"Book {i}",
+                author=Author.objects.create(name=f"Author {i}"),
+                price=Decimal("100.00"),
+                stock=5,
+            )
+
+        # count + страница с select_related
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/books/")
+        self.assertEqual(len(response.data["results"]), 11)
+
+    def test_fields_ignored_for_write(self):
+        """Тест: параметры полей не влияют на создание объектов"""
+        self.client.force_authenticate(user=self.user)
+        data = {
+            "title": "New Book",
+            "author_id": self.author.id,
+            "price": "300.00",
+            "stock": 5,
+        }
+        response = self.client.post("/api/books/?fields=id", data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["title"], "New Book")
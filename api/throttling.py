@@ -0,0 +1,106 @@
+"""
+Ограничение частоты входа и регистрации (token bucket).
+
+Каждый ключ (IP клиента или имя пользователя) получает ведро на capacity
+попыток, которое пополняется на per_minute попыток в минуту
+(LOGIN_THROTTLE_BUCKETS). Попытка без жетона получает 429 с Retry-After
+ещё до проверки пароля, поэтому подбор паролей не тратит процессор на
+PBKDF2 (api.hashing). Вход ограничивается по IP и по имени пользователя
+(подбор пароля к одной учётной записи с разных адресов), регистрация - по
+IP.
+
+Ведро хранится в кэше LOGIN_THROTTLE_CACHE_ALIAS как (жетоны, время);
+с несколькими воркерами нужен общий кэш. Чтение и запись не атомарны:
+одновременные попытки могут получить пару лишних жетонов, для защиты от
+подбора это неважно. Без DEBUG кэш процесса не допускается
+(check_throttle_cache).
+
+IP определяется по NUM_PROXIES настроек DRF: при 0 это REMOTE_ADDR, иначе
+адрес из X-Forwarded-For, добавленный последним доверенным прокси. Без
+NUM_PROXIES DRF взял бы заголовок целиком, и клиент получал бы новое ведро,
+меняя X-Forwarded-For.
+"""
+
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.throttling import BaseThrottle
+
+from . import metrics
+from .authentication import PROCESS_LOCAL_CACHES
+
+
+def check_throttle_cache():
+    """
+    ImproperlyConfigured, если вёдра живут в кэше процесса: каждый воркер
+    gunicorn давал бы свою ёмкость. С DEBUG (runserver) кэш процесса допустим.
+    """
+    if not settings.LOGIN_THROTTLE_ENABLED or settings.DEBUG:
+        return
+    alias = settings.LOGIN_THROTTLE_CACHE_ALIAS
+    backend = settings.CACHES[alias]["BACKEND"]
+    if backend in PROCESS_LOCAL_CACHES:
+        raise ImproperlyConfigured(
+            f"LOGIN_THROTTLE_ENABLED требует общего для воркеров кэша "
+            f"LOGIN_THROTTLE_CACHE_ALIAS, а кэш {alias!r} - {backend}"
+        )
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Token bucket в кэше; параметры - LOGIN_THROTTLE_BUCKETS[scope]."""
+
+    scope = None
+
+    def get_key(self, request):
+        """Ключ ведра запроса или None, если запрос не ограничивается."""
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        if not settings.LOGIN_THROTTLE_ENABLED:
+            return True
+        key = self.get_key(request)
+        if key is None:
+            return True
+        bucket = settings.LOGIN_THROTTLE_BUCKETS[self.scope]
+        capacity, rate = bucket["capacity"], bucket["per_minute"] / 60
+
+        cache = caches[settings.LOGIN_THROTTLE_CACHE_ALIAS]
+        cache_key = f"throttle:{self.scope}:{key}"
+        now = time.time()
+        tokens, updated = cache.get(cache_key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        if tokens < 1:
+            self.wait_seconds = (1 - tokens) / rate
+            metrics.record_auth_rejected(f"throttle_{self.scope}")
+            return False
+        # Полное ведро не отличается от отсутствующего
+        cache.set(cache_key, (tokens - 1, now), math.ceil(capacity / rate))
+        return True
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class LoginIPThrottle(TokenBucketThrottle):
+    scope = "ip"
+
+    def get_key(self, request):
+        return self.get_ident(request)
+
+
+class LoginUsernameThrottle(TokenBucketThrottle):
+    scope = "username"
+
+    def get_key(self, request):
+        try:
+            username = request.data.get("username")
+        except AttributeError:
+            return None
+        if not isinstance(username, str) or not username.strip():
+            return None
+        # В ключе кэша не может быть произвольных символов имени
+        return hashlib.sha256(username.strip().lower().encode()).hexdigest()[:32]
@@ -4,6 +4,7 @@ from drf_yasg.views import get_schema_view
 from rest_framework import permissions
 
 from . import views
+from .async_views import catalog_detail_view, catalog_list_view
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -21,18 +22,53 @@ schema_view = get_schema_view(
 urlpatterns = [
     path("users/", views.UserListCreateView.as_view(), name="user-list"),
     path("users/<int:pk>/", views.UserDetailView.as_view(), name="user-detail"),
-    path("authors/", views.AuthorListCreateView.as_view(), name="author-list"),
+    path(
+        "authors/",
+        catalog_list_view(views.AuthorListCreateView),
+        name="author-list",
+    ),
     path("authors/<int:pk>/", views.AuthorDetailView.as_view(), name="author-detail"),
-    path("books/", views.BookListCreateView.as_view(), name="book-list"),
-    path("books/<int:pk>/", views.BookDetailView.as_view(), name="book-detail"),
+    path("books/", catalog_list_view(views.BookListCreateView), name="book-list"),
+    path(
+        "books/<int:pk>/",
+        catalog_detail_view(views.BookDetailView),
+        name="book-detail",
+    ),
     path("orders/", views.OrderListCreateView.as_view(), name="order-list"),
     path("orders/<int:pk>/", views.OrderDetailView.as_view(), name="order-detail"),
     path("register/", views.register_view, name="register"),
     path("login/", views.login_view, name="login"),
     path("create-order/", views.create_order, name="create-order"),
-    path("reviews/", views.ReviewListCreateView.as_view(), name="review-list"),
+    path(
+        "order-tickets/<uuid:ticket>/",
+        views.order_ticket_view,
+        name="order-ticket",
+    ),
+    path("cart/", views.cart_view, name="cart"),
+    path("cart/items/", views.cart_items_view, name="cart-items"),
+    path(
+        "cart/items/<int:book_id>/", views.cart_item_view, name="cart-item-detail"
+    ),
+    path("cart/checkout/", views.cart_checkout, name="cart-checkout"),
+    path("cart/reserve/", views.cart_reserve, name="cart-reserve"),
+    path(
+        "reservations/",
+        views.StockReservationListCreateView.as_view(),
+        name="reservation-list",
+    ),
+    path(
+        "reservations/<int:book_id>/",
+        views.reservation_release,
+        name="reservation-release",
+    ),
+    path(
+        "reviews/",
+        catalog_list_view(views.ReviewListCreateView),
+        name="review-list",
+    ),
     path("reviews/<int:pk>/", views.ReviewDetailView.as_view(), name="review-detail"),
     path("export/", views.export_data, name="export"),
+    path("debug/memory/", views.memory_diagnostics, name="memory-diagnostics"),
     path("schema/", schema_view.with_ui("swagger", cache_timeout=0), name="schema"),
     path(
         "schema/swagger-ui/",
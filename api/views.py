@@ -1,38 +1,133 @@
+import hmac
+import time
+
+from django.conf import settings
 from django.contrib.auth import authenticate
+from django.db.models import prefetch_related_objects
 from django.http import HttpResponse
+from django.urls import reverse
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from openpyxl import Workbook
 from rest_framework import filters, generics, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 
+from . import memory
+from .authentication import RefreshToken
+from .fast_serializers import FastSerializer
+from .metrics import render_metrics
 from .filters import BookFilter
-from .models import Author, Book, Order, OrderItem, Review, User
+from .models import (
+    Author,
+    Book,
+    CartItem,
+    Order,
+    OrderItem,
+    OrderTicket,
+    Review,
+    StockReservation,
+    User,
+)
+from .query_budget import query_budget
 from .serializers import (
     AuthorSerializer,
     BookSerializer,
+    CartItemSerializer,
+    CartSerializer,
     LoginSerializer,
     OrderItemSerializer,
     OrderSerializer,
+    OrderTicketSerializer,
     RegisterSerializer,
     ReviewSerializer,
+    StockReservationSerializer,
     UserSerializer,
 )
+from .services import (
+    OrderError,
+    add_to_cart,
+    checkout_cart,
+    enqueue_order,
+    get_cart,
+    normalize_lines,
+    place_order,
+    release_reservation,
+    reserve_cart,
+    reserve_stock,
+    set_cart_quantity,
+)
+from .throttling import LoginIPThrottle, LoginUsernameThrottle
+
+
+class SparseFieldsetViewMixin:
+    """
+    Сужает queryset представления под поля, выбранные через
+    ?fields= / ?omit= / ?expand= (см. SparseFieldsetMixin).
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request is None or self.request.method != "GET":
+            return queryset
+        return self.optimize_queryset(queryset)
+
+    def optimize_queryset(self, queryset):
+        serializer = self.get_serializer()
+        if hasattr(serializer, "optimize_queryset"):
+            queryset = serializer.optimize_queryset(queryset)
+        return queryset
+
+    def update(self, request, *args, **kwargs):
+        """
+        Как UpdateModelMixin.update, но ответ строится по объекту, заново
+        выбранному с optimize_queryset: вложенные объекты подгружаются
+        пачкой, а не запросом на каждую строку.
+        """
+        partial = kwargs.pop("partial", False)
+        instance = self.get_object()
+        serializer = self.get_serializer(instance, data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        self.perform_update(serializer)
+        instance = self.optimize_queryset(self.get_queryset()).get(pk=instance.pk)
+        return Response(self.get_serializer(instance).data)
+
+
+class FastListMixin:
+    """
+    Отдаёт GET-список через FastSerializer (строки values() без создания
+    моделей). Если сериализатор не компилируется или быстрый путь отключён
+    настройкой FAST_LIST_SERIALIZATION, используется обычный list() DRF.
+    """
 
+    def list(self, request, *args, **kwargs):
+        fast = None
+        if getattr(settings, "FAST_LIST_SERIALIZATION", True):
+            fast = FastSerializer.for_serializer(self.get_serializer())
+        if fast is None:
+            return super().list(request, *args, **kwargs)
 
+        queryset = fast.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(fast.serialize(page))
+        return Response(fast.serialize(queryset))
+
+
+@query_budget(POST=2)
 @swagger_auto_schema(
     method="post",
     request_body=RegisterSerializer,
-    responses={201: UserSerializer(), 400: "Bad Request"},
+    responses={201: UserSerializer(), 400: "Bad Request", 429: "Too Many Requests"},
     operation_description="Регистрация нового пользователя",
     security=[],
 )
 @api_view(["POST"])
 @permission_classes([AllowAny])
+@throttle_classes([LoginIPThrottle])
 def register_view(request):
     serializer = RegisterSerializer(data=request.data)
     if serializer.is_valid():
@@ -50,15 +145,17 @@ def register_view(request):
 
 
 # Авторизация пользователя
+@query_budget(POST=1)
 @swagger_auto_schema(
     method="post",
     request_body=LoginSerializer,
-    responses={200: UserSerializer(), 400: "Bad Request"},
+    responses={200: UserSerializer(), 400: "Bad Request", 429: "Too Many Requests"},
     operation_description="Авторизация пользователя",
     security=[],
 )
 @api_view(["POST"])
 @permission_classes([AllowAny])
+@throttle_classes([LoginIPThrottle, LoginUsernameThrottle])
 def login_view(request):
     """
     Авторизация пользователя в системе.
@@ -85,6 +182,7 @@ class UserListCreateView(generics.ListCreateAPIView):
     Администраторы видят всех пользователей, обычные пользователи - только себя.
     """
 
+    query_budgets = {"GET": 3, "POST": 3}
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
@@ -101,6 +199,7 @@ class UserDetailView(generics.RetrieveUpdateDestroyAPIView):
     Администраторы могут работать с любым пользователем, обычные - только со своим профилем.
     """
 
+    query_budgets = {"GET": 2, "PUT": 3, "PATCH": 3, "DELETE": 16}
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
@@ -112,12 +211,15 @@ class UserDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 
 # CRUD для авторов
-class AuthorListCreateView(generics.ListCreateAPIView):
+class AuthorListCreateView(
+    FastListMixin, SparseFieldsetViewMixin, generics.ListCreateAPIView
+):
     """
     API для получения списка авторов и создания нового автора.
     Просмотр доступен всем (включая гостей), создание - только авторизованным.
     """
 
+    query_budgets = {"GET": 3, "POST": 2}
     queryset = Author.objects.all()
     serializer_class = AuthorSerializer
     permission_classes = [AllowAny]  # Разрешить гостевой просмотр
@@ -128,25 +230,29 @@ class AuthorListCreateView(generics.ListCreateAPIView):
         return [AllowAny()]
 
 
-class AuthorDetailView(generics.RetrieveUpdateDestroyAPIView):
+class AuthorDetailView(SparseFieldsetViewMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     API для получения, обновления и удаления автора.
     Требуется авторизация.
     """
 
+    query_budgets = {"GET": 2, "PUT": 4, "PATCH": 4, "DELETE": 10}
     queryset = Author.objects.all()
     serializer_class = AuthorSerializer
     permission_classes = [IsAuthenticated]
 
 
 # CRUD для книг с фильтрацией и поиском
-class BookListCreateView(generics.ListCreateAPIView):
+class BookListCreateView(
+    FastListMixin, SparseFieldsetViewMixin, generics.ListCreateAPIView
+):
     """
     API для получения списка книг и создания новой книги.
     Поддерживает фильтрацию по автору и цене, поиск по названию/описанию/автору, сортировку.
     Просмотр доступен всем, создание - только авторизованным.
     """
 
+    query_budgets = {"GET": 4, "POST": 3}
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [AllowAny]  # Разрешить гостевой просмотр
@@ -169,12 +275,13 @@ class BookListCreateView(generics.ListCreateAPIView):
         return [AllowAny()]
 
 
-class BookDetailView(generics.RetrieveUpdateDestroyAPIView):
+class BookDetailView(SparseFieldsetViewMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     API для получения, обновления и удаления книги.
     Требуется авторизация для изменения и удаления.
     """
 
+    query_budgets = {"GET": 2, "PUT": 4, "PATCH": 4, "DELETE": 8}
     queryset = Book.objects.all()
     serializer_class = BookSerializer
 
@@ -185,12 +292,15 @@ class BookDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 
 # CRUD для заказов
-class OrderListCreateView(generics.ListCreateAPIView):
+class OrderListCreateView(
+    FastListMixin, SparseFieldsetViewMixin, generics.ListCreateAPIView
+):
     """
     API для получения списка заказов и создания нового заказа.
     Администраторы видят все заказы, пользователи - только свои.
     """
 
+    query_budgets = {"GET": 4, "POST": 3}
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
@@ -206,12 +316,13 @@ class OrderListCreateView(generics.ListCreateAPIView):
         serializer.save(user=self.request.user)
 
 
-class OrderDetailView(generics.RetrieveUpdateDestroyAPIView):
+class OrderDetailView(SparseFieldsetViewMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     API для получения, обновления и удаления заказа.
     Администраторы могут работать с любым заказом, пользователи - только со своими.
     """
 
+    query_budgets = {"GET": 5, "PUT": 7, "PATCH": 7, "DELETE": 5}
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
 
@@ -221,7 +332,14 @@ class OrderDetailView(generics.RetrieveUpdateDestroyAPIView):
         return Order.objects.filter(user=self.request.user)
 
 
+def order_created_response(order):
+    """Ответ 201 с новым заказом: элементы, книги и авторы - тремя запросами."""
+    prefetch_related_objects([order], "items__book__author")
+    return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
+
+
 # Создание заказа с элементами
+@query_budget(POST=11)
 @swagger_auto_schema(
     method="post",
     request_body=openapi.Schema(
@@ -239,8 +357,15 @@ class OrderDetailView(generics.RetrieveUpdateDestroyAPIView):
             )
         },
     ),
-    responses={201: OrderSerializer(), 400: "Bad Request"},
-    operation_description="Создание заказа с элементами",
+    responses={
+        201: OrderSerializer(),
+        202: OrderTicketSerializer(),
+        400: "Bad Request",
+    },
+    operation_description=(
+        "Создание заказа с элементами. В асинхронном режиме (ORDER_INTAKE_ASYNC) "
+        "заказ ставится в очередь и возвращается заявка со статусом 202"
+    ),
     security=[{"Bearer": []}],
 )
 @api_view(["POST"])
@@ -250,63 +375,280 @@ def create_order(request):
     Создание заказа с элементами.
     Принимает список товаров (book_id, quantity), проверяет наличие на складе,
     создает заказ и элементы заказа, обновляет количество товара на складе.
+    В асинхронном режиме только проверяет формат и ставит заявку в очередь.
+    """
+    try:
+        lines = normalize_lines(request.data.get("items", []))
+        if settings.ORDER_INTAKE_ASYNC:
+            ticket = enqueue_order(request.user, lines)
+        else:
+            order = place_order(request.user, lines)
+    except OrderError as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if settings.ORDER_INTAKE_ASYNC:
+        return Response(
+            OrderTicketSerializer(ticket).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={"Location": reverse("order-ticket", args=[ticket.ticket])},
+        )
+    return order_created_response(order)
+
+
+# Статус заявки на заказ (бюджет - без ?wait: опрос перечитывает заявку)
+@query_budget(GET=2)
+@swagger_auto_schema(
+    method="get",
+    manual_parameters=[
+        openapi.Parameter(
+            "wait",
+            openapi.IN_QUERY,
+            description="Ждать завершения обработки до N секунд, не больше "
+            "ORDER_INTAKE_MAX_WAIT (long-polling)",
+            type=openapi.TYPE_NUMBER,
+        )
+    ],
+    responses={200: OrderTicketSerializer(), 404: "Not Found"},
+    operation_description="Статус заявки на заказ из очереди приёма",
+    security=[{"Bearer": []}],
+)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def order_ticket_view(request, ticket):
+    """
+    Статус заявки на заказ. С ?wait=N ответ задерживается, пока заявка
+    не будет оформлена или отклонена, но не дольше N секунд и не дольше
+    ORDER_INTAKE_MAX_WAIT: всё это время поток воркера занят.
     """
-    items_data = request.data.get("items", [])
-    if not items_data:
+    try:
+        ticket = OrderTicket.objects.get(ticket=ticket, user=request.user)
+    except OrderTicket.DoesNotExist:
         return Response(
-            {"error": "Не указаны товары"}, status=status.HTTP_400_BAD_REQUEST
+            {"error": "Заявка не найдена"}, status=status.HTTP_404_NOT_FOUND
         )
 
-    total_price = 0
-    order_items = []
+    try:
+        wait = float(request.query_params.get("wait", 0))
+    except ValueError:
+        wait = 0
+    deadline = time.monotonic() + min(max(wait, 0), settings.ORDER_INTAKE_MAX_WAIT)
+    while ticket.status in ("queued", "processing") and time.monotonic() < deadline:
+        time.sleep(settings.ORDER_INTAKE_POLL_INTERVAL)
+        ticket.refresh_from_db(fields=["status", "order", "error"])
+
+    return Response(OrderTicketSerializer(ticket).data)
+
 
-    for item in items_data:
-        book_id = item.get("book_id")
-        quantity = item.get("quantity", 1)
+def cart_response(user, response_status=status.HTTP_200_OK):
+    """Ответ с актуальным содержимым корзины (один запрос к БД)."""
+    return Response(CartSerializer(get_cart(user)).data, status=response_status)
+
+
+# Корзина на сервере
+@query_budget(GET=2, DELETE=3)
+@swagger_auto_schema(
+    method="get",
+    responses={200: CartSerializer()},
+    operation_description="Корзина пользователя с актуальными ценами и наличием",
+    security=[{"Bearer": []}],
+)
+@swagger_auto_schema(
+    method="delete",
+    responses={200: CartSerializer()},
+    operation_description="Очистка корзины",
+    security=[{"Bearer": []}],
+)
+@api_view(["GET", "DELETE"])
+@permission_classes([IsAuthenticated])
+def cart_view(request):
+    """
+    Корзина пользователя.
+    Цены и наличие всех строк проверяются одним запросом; проблемы
+    с наличием возвращаются в поле errors.
+    """
+    if request.method == "DELETE":
+        CartItem.objects.filter(user=request.user).delete()
+    return cart_response(request.user)
+
+
+@query_budget(POST=5)
+@swagger_auto_schema(
+    method="post",
+    request_body=CartItemSerializer,
+    responses={201: CartSerializer(), 400: "Bad Request"},
+    operation_description="Добавление книги в корзину",
+    security=[{"Bearer": []}],
+)
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def cart_items_view(request):
+    """
+    Добавление книги в корзину (book_id, quantity).
+    Если книга уже в корзине, количество увеличивается.
+    """
+    serializer = CartItemSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    add_to_cart(
+        request.user,
+        serializer.validated_data["book_id"],
+        serializer.validated_data.get("quantity", 1),
+    )
+    return cart_response(request.user, status.HTTP_201_CREATED)
+
+
+@query_budget(PUT=3, PATCH=3, DELETE=3)
+@swagger_auto_schema(
+    methods=["put", "patch"],
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={"quantity": openapi.Schema(type=openapi.TYPE_INTEGER)},
+    ),
+    responses={200: CartSerializer(), 400: "Bad Request", 404: "Not Found"},
+    operation_description="Изменение количества книги в корзине (0 - удалить)",
+    security=[{"Bearer": []}],
+)
+@swagger_auto_schema(
+    method="delete",
+    responses={200: CartSerializer(), 404: "Not Found"},
+    operation_description="Удаление книги из корзины",
+    security=[{"Bearer": []}],
+)
+@api_view(["PUT", "PATCH", "DELETE"])
+@permission_classes([IsAuthenticated])
+def cart_item_view(request, book_id):
+    """
+    Изменение количества или удаление книги из корзины.
+    """
+    if request.method == "DELETE":
+        quantity = 0
+    else:
         try:
-            book = Book.objects.get(id=book_id)
-            if book.stock < quantity:
-                return Response(
-                    {"error": f"Недостаточно товара {book.title}"},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            price = book.price * quantity
-            total_price += price
-            order_items.append(
-                {"book": book, "quantity": quantity, "price": book.price}
-            )
-        except Book.DoesNotExist:
+            quantity = int(request.data.get("quantity"))
+        except (TypeError, ValueError):
+            quantity = -1
+        if quantity < 0:
             return Response(
-                {"error": f"Книга с id {book_id} не найдена"},
+                {"error": "Количество не может быть отрицательным"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-    order = Order.objects.create(user=request.user, total_price=total_price)
-    for item in order_items:
-        OrderItem.objects.create(
-            order=order,
-            book=item["book"],
-            quantity=item["quantity"],
-            price=item["price"],
+    if not set_cart_quantity(request.user, book_id, quantity):
+        return Response(
+            {"error": "Книги нет в корзине"}, status=status.HTTP_404_NOT_FOUND
         )
-        item["book"].stock -= item["quantity"]
-        item["book"].save()
+    return cart_response(request.user)
 
-    # Calculate total price using the model method
 
+@query_budget(POST=16)
+@swagger_auto_schema(
+    method="post",
+    responses={201: OrderSerializer(), 400: "Bad Request"},
+    operation_description="Оформление заказа из корзины",
+    security=[{"Bearer": []}],
+)
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def cart_checkout(request):
+    """
+    Оформление заказа из корзины.
+    Проверка наличия, создание заказа и списание остатков выполняются
+    одной транзакцией; после успешного оформления корзина очищается.
+    """
+    try:
+        order = checkout_cart(request.user)
+    except OrderError as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return order_created_response(order)
+
+
+@query_budget(POST=9)
+@swagger_auto_schema(
+    method="post",
+    responses={201: StockReservationSerializer(many=True), 400: "Bad Request"},
+    operation_description="Резервирование всех книг корзины",
+    security=[{"Bearer": []}],
+)
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def cart_reserve(request):
+    """
+    Резервирует все строки корзины на время RESERVATION_TTL.
+    Если какой-либо книги не хватает, ни одна строка не резервируется.
+    """
+    try:
+        reservations = reserve_cart(request.user)
+    except OrderError as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(
+        StockReservationSerializer(reservations, many=True).data,
+        status=status.HTTP_201_CREATED,
+    )
 
-    serializer = OrderSerializer(order)
-    return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+# Резервы товара
+class StockReservationListCreateView(generics.ListCreateAPIView):
+    """
+    API для получения действующих резервов пользователя и резервирования книги.
+    Резерв сразу списывает товар со склада; create_order потребляет резервы
+    без повторной проверки наличия.
+    """
+
+    query_budgets = {"GET": 2, "POST": 8}
+    serializer_class = StockReservationSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = None
+
+    def get_queryset(self):
+        return StockReservation.objects.filter(
+            user=self.request.user, expires_at__gt=timezone.now()
+        ).select_related("book")
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            reservation = reserve_stock(
+                request.user,
+                serializer.validated_data["book_id"],
+                serializer.validated_data["quantity"],
+            )
+        except OrderError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            self.get_serializer(reservation).data, status=status.HTTP_201_CREATED
+        )
+
+
+@query_budget(DELETE=7)
+@swagger_auto_schema(
+    method="delete",
+    responses={204: "No Content", 404: "Not Found"},
+    operation_description="Снятие резерва книги",
+    security=[{"Bearer": []}],
+)
+@api_view(["DELETE"])
+@permission_classes([IsAuthenticated])
+def reservation_release(request, book_id):
+    """
+    Снимает резерв книги и возвращает товар на склад.
+    """
+    if not release_reservation(request.user, book_id):
+        return Response({"error": "Резерв не найден"}, status=status.HTTP_404_NOT_FOUND)
+    return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 # CRUD для отзывов
-class ReviewListCreateView(generics.ListCreateAPIView):
+class ReviewListCreateView(
+    FastListMixin, SparseFieldsetViewMixin, generics.ListCreateAPIView
+):
     """
     API для получения списка отзывов и создания нового отзыва.
     Поддерживает фильтрацию по книге (параметр book).
     Просмотр доступен всем, создание - только авторизованным.
     """
 
+    query_budgets = {"GET": 4, "POST": 5}
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
@@ -322,12 +664,13 @@ class ReviewListCreateView(generics.ListCreateAPIView):
         serializer.save(user=self.request.user)
 
 
-class ReviewDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ReviewDetailView(SparseFieldsetViewMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     API для получения, обновления и удаления отзыва.
     Администраторы могут работать с любым отзывом, пользователи - только со своими.
     """
 
+    query_budgets = {"GET": 2, "PUT": 5, "PATCH": 5, "DELETE": 3}
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
 
@@ -345,6 +688,7 @@ class ReviewDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 
 # Экспорт данных в XLSX для администратора
+@query_budget(GET=2)
 @swagger_auto_schema(
     method="get",
     manual_parameters=[
@@ -404,19 +748,17 @@ def export_data(request):
     model = models_dict[model_name]
     queryset = model.objects.all()
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = model_name
+    # Режим write_only: строки пишутся в файл сразу, а не держатся в памяти
+    # ячейками; объекты читаются из БД порциями
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(model_name)
 
     # Заголовки
-    for col_num, field in enumerate(fields, 1):
-        ws.cell(row=1, column=col_num, value=field)
+    ws.append(fields)
 
     # Данные
-    for row_num, obj in enumerate(queryset, 2):
-        for col_num, field in enumerate(fields, 1):
-            value = getattr(obj, field, "")
-            ws.cell(row=row_num, column=col_num, value=str(value))
+    for obj in queryset.iterator(chunk_size=2000):
+        ws.append([str(getattr(obj, field, "")) for field in fields])
 
     # Сохраняем в байтовый поток
     from io import BytesIO
@@ -430,3 +772,118 @@ def export_data(request):
     )
     response["Content-Disposition"] = f"attachment; filename={model_name}.xlsx"
     return response
+
+
+# Диагностика памяти процесса для администратора
+@query_budget(GET=1, POST=1)
+@swagger_auto_schema(
+    method="get",
+    manual_parameters=[
+        openapi.Parameter(
+            "limit",
+            openapi.IN_QUERY,
+            description="Число мест выделения и маршрутов в ответе (по умолчанию 20)",
+            type=openapi.TYPE_INTEGER,
+        ),
+        openapi.Parameter(
+            "group_by",
+            openapi.IN_QUERY,
+            description="Группировка выделений: lineno, filename или traceback",
+            type=openapi.TYPE_STRING,
+        ),
+    ],
+    responses={200: "Memory report", 403: "Forbidden"},
+    operation_description=(
+        "RSS процесса, снимок tracemalloc с разницей относительно предыдущего "
+        "вызова и рост памяти по маршрутам (только для администраторов)"
+    ),
+    security=[{"Bearer": []}],
+)
+@swagger_auto_schema(
+    method="post",
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        required=["action"],
+        properties={
+            "action": openapi.Schema(
+                type=openapi.TYPE_STRING, enum=["start", "stop", "reset"]
+            ),
+            "frames": openapi.Schema(type=openapi.TYPE_INTEGER),
+        },
+    ),
+    responses={200: "Memory report", 400: "Bad Request", 403: "Forbidden"},
+    operation_description=(
+        "Запуск и остановка tracemalloc, сброс статистики по маршрутам "
+        "(только для администраторов)"
+    ),
+    security=[{"Bearer": []}],
+)
+@api_view(["GET", "POST"])
+@permission_classes([IsAuthenticated])
+def memory_diagnostics(request):
+    """
+    Диагностика памяти процесса, обработавшего запрос (api.memory).
+    GET делает снимок tracemalloc и сравнивает его с предыдущим снимком;
+    POST action=start (frames), stop или reset.
+    """
+    if request.user.role != "admin":
+        return Response({"error": "Доступ запрещен"}, status=status.HTTP_403_FORBIDDEN)
+
+    if request.method == "POST":
+        action = request.data.get("action")
+        if action == "start":
+            # Без frames - MEMORY_TRACEMALLOC_FRAMES
+            frames = request.data.get("frames")
+            if frames in (None, ""):
+                frames = None
+            else:
+                try:
+                    frames = int(frames)
+                except (TypeError, ValueError):
+                    frames = 0
+                if not 1 <= frames <= 100:
+                    return Response(
+                        {"error": "frames - число от 1 до 100"},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+            memory.start_tracing(frames)
+        elif action == "stop":
+            memory.stop_tracing()
+        elif action == "reset":
+            memory.REQUEST_STATS.clear()
+        else:
+            return Response(
+                {"error": "action - start, stop или reset"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+    try:
+        limit = min(max(int(request.query_params.get("limit", 20)), 1), 200)
+    except ValueError:
+        limit = 20
+    group_by = request.query_params.get("group_by", "lineno")
+    if group_by not in memory.GROUP_BY:
+        return Response(
+            {"error": "group_by - lineno, filename или traceback"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return Response(memory.memory_report(limit, group_by))
+
+
+# Метрики Prometheus (сумма по всем процессам сервера)
+def metrics_view(request):
+    """
+    Метрики в текстовом формате Prometheus. Если задан METRICS_TOKEN,
+    нужен заголовок Authorization: Bearer <токен>; без DEBUG токен
+    обязателен, иначе эндпоинт закрыт.
+    """
+    token = settings.METRICS_TOKEN
+    if not token and not settings.DEBUG:
+        return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+    if token and not hmac.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+    return HttpResponse(
+        render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
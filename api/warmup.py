@@ -0,0 +1,76 @@
+"""
+Прогрев приложения перед приёмом трафика.
+
+gunicorn (gunicorn.conf.py, preload_app) загружает приложение в мастер-
+процессе и вызывает warm_up() до открытия сокетов: запросы WARMUP_PATHS
+проходят через весь стек middleware, импортируют лениво загружаемые модули,
+строят поля сериализаторов, схему URL и заполняют кэш сжатия. Воркеры
+получают всё это после fork без копирования (copy-on-write).
+
+prepare_fork() закрывает подключения к БД мастера и его пулы подключений
+(их нельзя делить между процессами) и замораживает объекты для сборщика
+мусора: gc не обходит их в воркерах и не трогает страницы памяти, общие с
+мастером.
+"""
+
+import gc
+import io
+import logging
+import time
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+
+from .db_pool.pool import close_pools
+
+logger = logging.getLogger("api.warmup")
+
+
+def warm_up(application=None, paths=None):
+    """
+    GET-запросы paths (по умолчанию WARMUP_PATHS) к WSGI-приложению.
+    Возвращает [(путь, статус, мс)]; ошибки пишутся в лог и не мешают запуску.
+    """
+    application = application or get_wsgi_application()
+    results = []
+    for url in settings.WARMUP_PATHS if paths is None else paths:
+        path, _, query = url.partition("?")
+        environ = {
+            "PATH_INFO": path,
+            "QUERY_STRING": query,
+            "HTTP_HOST": "localhost",
+            "HTTP_ACCEPT_ENCODING": "gzip",
+            "wsgi.input": io.BytesIO(),
+            "wsgi.errors": io.StringIO(),
+        }
+        setup_testing_defaults(environ)
+        statuses = []
+
+        def start_response(status, headers, exc_info=None):
+            statuses.append(int(status.split(" ", 1)[0]))
+
+        start = time.perf_counter()
+        try:
+            response = application(environ, start_response)
+            try:
+                for _ in response:
+                    pass
+            finally:
+                if hasattr(response, "close"):
+                    response.close()
+        except Exception:
+            logger.exception("Прогрев %s не удался", url)
+            statuses.append(None)
+        duration = (time.perf_counter() - start) * 1e3
+        results.append((url, statuses[-1], duration))
+    return results
+
+
+def prepare_fork():
+    """Подготовка мастер-процесса к fork воркеров."""
+    connections.close_all()
+    close_pools()
+    gc.collect()
+    gc.freeze()
@@ -1,14 +1,16 @@
+from datetime import timedelta
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 import os
+import tempfile
 
 SECRET_KEY = os.environ.get(
     "SECRET_KEY", "django-insecure-@)%p*unis172@3kz99if*^#dr3dhl%0vlor=8=k7=!8kq4)c0l"
 )
 
-DEBUG = True
+DEBUG = os.environ.get("DEBUG", "1") == "1"
 
 ALLOWED_HOSTS = ["localhost", "127.0.0.1", "0.0.0.0"]
 
@@ -30,7 +32,11 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = "api.User"
 
 MIDDLEWARE = [
+    "api.middleware.MetricsMiddleware",
+    "api.middleware.PerformanceMiddleware",
+    "api.middleware.MemoryMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "api.middleware.CompressionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -38,6 +44,11 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "api.middleware.HashingBusyMiddleware",
+    "api.middleware.ReplicaMiddleware",
+    "api.middleware.ProfilingMiddleware",
+    "api.middleware.SlowQueryMiddleware",
+    "api.middleware.QueryBudgetMiddleware",
 ]
 
 ROOT_URLCONF = "bookstore.urls"
@@ -61,16 +72,77 @@ WSGI_APPLICATION = "bookstore.wsgi.application"
 
 import os
 
+# Подключения к PostgreSQL. Без пула подключение потока живёт DB_CONN_MAX_AGE
+# секунд (0 - новое на каждый запрос) и перед повторным использованием
+# проверяется (DB_CONN_HEALTH_CHECKS). DB_POOL=1 - пул подключений процесса
+# (api.db_pool): не больше DB_POOL_MAX_SIZE подключений на воркер, ожидание
+# свободного до DB_POOL_TIMEOUT с; подключение возвращается в пул в конце
+# запроса. Под ASGI нужен пул: потоки sync_to_async живут один запрос
+DB_POOL = os.environ.get("DB_POOL", "0") == "1"
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": "api.db_pool" if DB_POOL else "django.db.backends.postgresql",
         "NAME": os.environ.get("DB_NAME", "bookstore"),
         "USER": os.environ.get("DB_USER", "postgres"),
         "PASSWORD": os.environ.get("DB_PASSWORD", "password"),
         "HOST": os.environ.get("DB_HOST", "db"),
         "PORT": os.environ.get("DB_PORT", "5432"),
+        "CONN_MAX_AGE": 0 if DB_POOL else int(os.environ.get("DB_CONN_MAX_AGE", "60")),
+        "CONN_HEALTH_CHECKS": os.environ.get("DB_CONN_HEALTH_CHECKS", "1") == "1",
+        "OPTIONS": {
+            "connect_timeout": int(os.environ.get("DB_CONNECT_TIMEOUT", "5")),
+        },
     }
 }
+if DB_POOL:
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", "0")),
+        # По умолчанию - по числу потоков воркера gunicorn (gunicorn.conf.py)
+        "max_size": int(
+            os.environ.get("DB_POOL_MAX_SIZE", os.environ.get("GUNICORN_THREADS", "4"))
+        ),
+        "timeout": float(os.environ.get("DB_POOL_TIMEOUT", "10")),
+        "max_idle": float(os.environ.get("DB_POOL_MAX_IDLE", "300")),
+        "max_lifetime": float(os.environ.get("DB_POOL_MAX_LIFETIME", "3600")),
+        "check_interval": float(os.environ.get("DB_POOL_CHECK_INTERVAL", "30")),
+    }
+
+# Реплики для чтения (api.db_router): DB_REPLICAS="хост[:порт],..." добавляет
+# базы replica_1, replica_2... GET-запросы маршрутов REPLICA_READ_ROUTES читают
+# с реплики, отстающей не больше REPLICA_MAX_LAG секунд (отставание
+# проверяется раз в REPLICA_LAG_CHECK_INTERVAL секунд), иначе - из default.
+# После записи клиент REPLICA_STICKY_SECONDS секунд читает из default: cookie
+# REPLICA_PIN_COOKIE и отметка в кэше REPLICA_PIN_CACHE_ALIAS (с несколькими
+# воркерами - общий кэш). Окно больше допустимого отставания
+REPLICA_DATABASES = []
+for number, address in enumerate(
+    filter(None, os.environ.get("DB_REPLICAS", "").split(",")), start=1
+):
+    host, _, port = address.strip().partition(":")
+    DATABASES[f"replica_{number}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port or DATABASES["default"]["PORT"],
+        "OPTIONS": dict(DATABASES["default"]["OPTIONS"]),
+        "TEST": {"MIRROR": "default"},
+    }
+    REPLICA_DATABASES.append(f"replica_{number}")
+DATABASE_ROUTERS = ["api.db_router.ReplicaRouter"]
+REPLICA_READ_ROUTES = [
+    "book-list",
+    "book-detail",
+    "author-list",
+    "author-detail",
+    "review-list",
+    "review-detail",
+    "export",
+]
+REPLICA_MAX_LAG = float(os.environ.get("REPLICA_MAX_LAG", "5"))
+REPLICA_LAG_CHECK_INTERVAL = float(os.environ.get("REPLICA_LAG_CHECK_INTERVAL", "2"))
+REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", "10"))
+REPLICA_PIN_COOKIE = "replica_pin"
+REPLICA_PIN_CACHE_ALIAS = "default"
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -87,6 +159,39 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# PBKDF2 считается в пуле хэширования процесса (api.hashing); остальные -
+# стандартные хэшеры Django для старых форматов паролей
+PASSWORD_HASHERS = [
+    "api.hashing.PooledPBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+# Потоки пула (0 - хэш в потоке запроса), места в очереди и ожидание места, с
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", "1"))
+PASSWORD_HASH_QUEUE = int(os.environ.get("PASSWORD_HASH_QUEUE", "2"))
+PASSWORD_HASH_TIMEOUT = float(os.environ.get("PASSWORD_HASH_TIMEOUT", "2"))
+
+# Token bucket входа и регистрации (api.throttling): ёмкость ведра и
+# пополнение в минуту; по IP - вход и регистрация, по имени - вход
+LOGIN_THROTTLE_ENABLED = os.environ.get("LOGIN_THROTTLE_ENABLED", "1") == "1"
+LOGIN_THROTTLE_BUCKETS = {
+    "ip": {
+        "capacity": int(os.environ.get("LOGIN_THROTTLE_IP_CAPACITY", "10")),
+        "per_minute": float(os.environ.get("LOGIN_THROTTLE_IP_PER_MINUTE", "10")),
+    },
+    "username": {
+        "capacity": int(os.environ.get("LOGIN_THROTTLE_USERNAME_CAPACITY", "5")),
+        "per_minute": float(
+            os.environ.get("LOGIN_THROTTLE_USERNAME_PER_MINUTE", "2")
+        ),
+    },
+}
+# Кэш вёдер; с несколькими воркерами - общий (без DEBUG кэш процесса,
+# LocMemCache, при включённом ограничении не запускается)
+LOGIN_THROTTLE_CACHE_ALIAS = "default"
+
 LANGUAGE_CODE = "en-us"
 
 TIME_ZONE = "UTC"
@@ -95,20 +200,157 @@ USE_I18N = True
 
 USE_TZ = True
 
+# Пользователь из claims JWT без запроса к БД (api.authentication)
+JWT_STATELESS_AUTH = os.environ.get("JWT_STATELESS_AUTH", "0") == "1"
+# Кэш поколений токенов (счётчик в БД читается через него); с несколькими
+# воркерами - общий (без DEBUG кэш процесса, LocMemCache, с
+# JWT_STATELESS_AUTH не запускается)
+JWT_DENYLIST_CACHE_ALIAS = "default"
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "api.authentication.StatelessJWTAuthentication"
+        if JWT_STATELESS_AUTH
+        else "rest_framework_simplejwt.authentication.JWTAuthentication",
+    ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "api.renderers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
     ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 100,
     "PAGE_SIZE_QUERY_PARAM": "page_size",
     "MAX_PAGE_SIZE": 1000,
+    # Число доверенных прокси перед приложением: IP клиента для ограничения
+    # входа берётся из X-Forwarded-For только за ними. При 0 - REMOTE_ADDR,
+    # заголовок клиента не учитывается
+    "NUM_PROXIES": int(os.environ.get("NUM_PROXIES", "0")),
 }
 
+# Быстрый путь сериализации GET-списков (api.fast_serializers)
+FAST_LIST_SERIALIZATION = True
+
+# Асинхронные представления каталога (api.async_views) для запуска под ASGI:
+# uvicorn bookstore.asgi:application. Под WSGI не включать: каждый запрос
+# к асинхронному представлению выполнялся бы через async_to_sync
+ASYNC_CATALOG_VIEWS = os.environ.get("ASYNC_CATALOG_VIEWS", "0") == "1"
+
+# Время жизни резерва товара при оформлении заказа (api.services.reserve_stock)
+RESERVATION_TTL = timedelta(minutes=15)
+
+# Асинхронный приём заказов: create-order ставит заявку в очередь и отвечает
+# 202, заявки оформляет команда process_order_queue
+ORDER_INTAKE_ASYNC = os.environ.get("ORDER_INTAKE_ASYNC", "0") == "1"
+# Максимальный ?wait= при опросе заявки, с: ожидание занимает поток воркера
+ORDER_INTAKE_MAX_WAIT = 3
+ORDER_INTAKE_POLL_INTERVAL = 0.2
+
+# Журнал запросов, превысивших бюджет SQL (api.middleware.QueryBudgetMiddleware);
+# по умолчанию включён в режиме разработки
+QUERY_BUDGET_CHECK = os.environ.get("QUERY_BUDGET_CHECK", "1" if DEBUG else "0") == "1"
+
+# Измерение времени запросов по фазам (api.middleware.PerformanceMiddleware):
+# доля измеряемых запросов (0 - middleware отключён) и заголовок Server-Timing
+PERFORMANCE_SAMPLE_RATE = float(os.environ.get("PERFORMANCE_SAMPLE_RATE", "0"))
+PERFORMANCE_SERVER_TIMING = True
+
+# Метрики Prometheus на /metrics (api.metrics): каждый процесс пишет свой
+# mmap-файл в METRICS_DIR, эндпоинт суммирует файлы всех воркеров.
+# METRICS_TOKEN - если задан, /metrics требует "Authorization: Bearer <токен>";
+# без DEBUG /metrics без токена закрыт
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+METRICS_DIR = os.environ.get(
+    "METRICS_DIR", os.path.join(tempfile.gettempdir(), "bookstore-metrics")
+)
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# Профилирование запросов (api.profiling): администратор добавляет
+# ?_profile=1 (cProfile) или ?_profile=stacks (сэмплирование стеков с
+# интервалом PROFILING_STACK_INTERVAL, с). PROFILING_SAMPLING включает
+# непрерывное сэмплирование всех запросов с сохранением окна раз в
+# PROFILING_SAMPLING_WINDOW секунд
+PROFILING_STACK_INTERVAL = 0.001
+PROFILING_SAMPLING = os.environ.get("PROFILING_SAMPLING", "0") == "1"
+PROFILING_SAMPLING_INTERVAL = float(
+    os.environ.get("PROFILING_SAMPLING_INTERVAL", "0.01")
+)
+PROFILING_SAMPLING_WINDOW = float(os.environ.get("PROFILING_SAMPLING_WINDOW", "60"))
+
+# Диагностика памяти (api.memory): MEMORY_DIAGNOSTICS включает замер RSS
+# каждого запроса, снимки tracemalloc хранят MEMORY_TRACEMALLOC_FRAMES кадров.
+# При DEBUG вне runserver / shell журнал connection.queries отключается,
+# если не задан QUERY_LOG_ALLOWED
+MEMORY_DIAGNOSTICS = os.environ.get("MEMORY_DIAGNOSTICS", "0") == "1"
+MEMORY_TRACEMALLOC_FRAMES = 5
+QUERY_LOG_ALLOWED = os.environ.get("QUERY_LOG_ALLOWED", "0") == "1"
+
+# Прогрев приложения в мастер-процессе gunicorn до приёма трафика (api.warmup)
+WARMUP_PATHS = [
+    "/api/books/",
+    "/api/books/?ordering=price",
+    "/api/authors/",
+    "/api/reviews/",
+]
+
+# Журнал медленных SQL-запросов (api.slow_queries): порог в мс (0 - журнал
+# отключён) и план EXPLAIN без выполнения для каждого нового шаблона
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", "500"))
+SLOW_QUERY_EXPLAIN = True
+# Таблицы, для запросов к которым сохраняется только шаблон SQL
+SLOW_QUERY_MASKED_TABLES = ["api_user", "django_session"]
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "structured": {"()": "api.instrumentation.StructuredFormatter"},
+    },
+    "handlers": {
+        "structured": {"class": "logging.StreamHandler", "formatter": "structured"},
+    },
+    "loggers": {
+        "api.performance": {
+            "handlers": ["structured"],
+            "level": "INFO",
+            "propagate": False,
+        },
+        "api.slow_queries": {
+            "handlers": ["structured"],
+            "level": "WARNING",
+            "propagate": False,
+        },
+    },
+}
+
+# Сжатие JSON-ответов API (api.middleware.CompressionMiddleware)
+COMPRESSION_PATH_PREFIX = "/api/"
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+COMPRESSION_ZSTD_LEVEL = 3
+COMPRESSION_CACHE_ALIAS = "default"
+COMPRESSION_CACHE_TIMEOUT = 300
+
 STATIC_URL = "static/"
 # STATICFILES_DIRS = [BASE_DIR / "static"]  # Not needed for this project
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# Общий кэш воркеров: вёдра ограничения входа, отметки отзыва JWT, привязка
+# клиента к default после записи. Без REDIS_URL - LocMemCache процесса
+REDIS_URL = os.environ.get("REDIS_URL", "")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 CORS_ALLOWED_ORIGINS = [
@@ -120,8 +362,6 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
-from datetime import timedelta
-
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(hours=1),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
@@ -145,7 +385,29 @@ SWAGGER_SETTINGS = {
 }
 
 if 'test' in os.sys.argv:
-    DATABASES['default'] = {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': ':memory:',
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        },
+        # Вторая база для тестов чтения с реплик (api/tests/test_replicas.py);
+        # тесты включают её сами через REPLICA_DATABASES
+        'replica': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        },
+    }
+    REPLICA_DATABASES = []
+    # Тесты очищают кэш, общий Redis им не нужен
+    CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
     }
+    # Бюджеты проверяет api/tests/test_query_budgets.py, журнал не нужен
+    QUERY_BUDGET_CHECK = False
+    # Тесты метрик включают их сами, с временным METRICS_DIR
+    METRICS_ENABLED = False
+    # Тесты журнала медленных запросов задают порог сами
+    SLOW_QUERY_THRESHOLD_MS = 0
+    # Тесты входят много раз с одного адреса; api/tests/test_login_protection.py
+    # включает ограничение сам
+    LOGIN_THROTTLE_ENABLED = False
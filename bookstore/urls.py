@@ -18,10 +18,13 @@ from django.contrib import admin
 from django.urls import path, include
 from django.views.generic import TemplateView, RedirectView
 
+from api.views import metrics_view
+
 urlpatterns = [
     path('', TemplateView.as_view(template_name='index.html'), name='index'),
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    path('metrics', metrics_view, name='metrics'),
     path('swagger/', RedirectView.as_view(url='/api/schema/swagger-ui/'), name='swagger-redirect'),
     path('redoc/', RedirectView.as_view(url='/api/schema/redoc/'), name='redoc-redirect'),
 ]
@@ -9,8 +9,17 @@ https://docs.djangoproject.com/en/6.0/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
+from whitenoise import WhiteNoise
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bookstore.settings')
 
 application = get_wsgi_application()
+# Статику админки и Swagger из STATIC_ROOT (collectstatic) отдаёт WhiteNoise:
+# без DEBUG её не раздаёт Django, а перед gunicorn нет nginx. Обёртка на уровне
+# WSGI, а не middleware, поэтому ASGI-цепочка не получает синхронного звена.
+# Без collectstatic (разработка, тесты) каталога нет, статику отдаёт runserver
+application = WhiteNoise(application)
+if os.path.isdir(settings.STATIC_ROOT):
+    application.add_files(settings.STATIC_ROOT, prefix=settings.STATIC_URL)
@@ -1,7 +1,7 @@
 const API_BASE = "http://localhost:8000/api";
 let currentUser = null;
 let token = localStorage.getItem("token");
-let cart = JSON.parse(localStorage.getItem("cart")) || [];
+let cart = { items: [], total_quantity: 0, total_price: "0.00", errors: [] };
 let currentBook = null;
 let currentPage = 1;
 let currentFilters = {};
@@ -14,6 +14,7 @@ async function initializeApp() {
   if (token) {
     try {
       await loadUserData();
+      await loadCart();
     } catch (error) {
       console.error("Ошибка загрузки данных пользователя:", error);
       logout();
@@ -85,6 +86,7 @@ async function handleLogin(event) {
 
       closeModal("login-modal");
       updateUIForLoggedInUser();
+      await loadCart();
       showToast("Вход выполнен успешно!", "success");
       showPage("books");
     } else {
@@ -131,6 +133,7 @@ async function handleRegister(event) {
 
       closeModal("register-modal");
       updateUIForLoggedInUser();
+      await loadCart();
       showToast("Регистрация успешна!", "success");
       showPage("books");
     } else {
@@ -147,6 +150,7 @@ function logout() {
   token = null;
   currentUser = null;
   localStorage.removeItem("token");
+  setCart({ items: [], total_quantity: 0, total_price: "0.00", errors: [] });
   updateUIForGuest();
   showToast("Вы вышли из системы", "info");
   showPage("books");
@@ -642,45 +646,58 @@ function handleSearchKeyup(event) {
   }
 }
 
-function addToCart(bookId) {
+function setCart(data) {
+  cart = data;
+  updateCartCount();
+}
+
+async function loadCart() {
+  if (!token) return;
+  const response = await fetchAPI("/cart/", "GET", null, true);
+  if (response.ok) {
+    setCart(await response.json());
+  }
+}
+
+async function addToCart(bookId) {
   if (!token) {
     showToast("Войдите в систему для добавления в корзину", "warning");
     showLoginModal();
     return;
   }
 
-  const existingItem = cart.find((item) => item.book_id === bookId);
-
-  if (existingItem) {
-    existingItem.quantity += 1;
-    showToast("Количество увеличено", "success");
-  } else {
-    cart.push({
-      book_id: bookId,
-      quantity: 1,
-      book: currentBook,
-    });
-    showToast("Добавлено в корзину!", "success");
+  try {
+    const response = await fetchAPI(
+      "/cart/items/",
+      "POST",
+      { book_id: bookId, quantity: 1 },
+      true,
+    );
+    if (response.ok) {
+      setCart(await response.json());
+      showToast("Добавлено в корзину!", "success");
+    } else {
+      showToast("Не удалось добавить в корзину", "error");
+    }
+  } catch (error) {
+    showToast("Ошибка соединения", "error");
   }
-
-  localStorage.setItem("cart", JSON.stringify(cart));
-  updateCartCount();
 }
 
 function updateCartCount() {
-  const count = cart.reduce((sum, item) => sum + item.quantity, 0);
-  document.getElementById("cart-count").textContent = count;
+  document.getElementById("cart-count").textContent = cart.total_quantity;
 }
 
-function showCart() {
+async function showCart() {
   showPage("cart");
+  await loadCart();
   renderCart();
 }
 
-async function renderCart() {
+function renderCart() {
   const cartContent = document.getElementById("cart-content");
 
-  if (cart.length === 0) {
+  if (cart.items.length === 0) {
     cartContent.innerHTML = `
             <div class="cart-empty">
                 <i class="fas fa-shopping-cart"></i>
@@ -693,59 +710,44 @@ async function renderCart() {
     return;
   }
 
-  const bookDetails = await Promise.all(
-    cart.map(async (item) => {
-      if (!item.book || !item.book.title) {
-        try {
-          const response = await fetchAPI(`/books/${item.book_id}/`);
-          if (response.ok) {
-            const book = await response.json();
-            item.book = book;
-            return book;
-          }
-        } catch (error) {
-          console.error("Ошибка загрузки книги:", error);
-        }
-      }
-      return item.book;
-    }),
-  );
-
-  let totalPrice = 0;
   let html = '<div class="cart-items">';
 
-  cart.forEach((item, index) => {
-    const book = item.book || {};
-    const itemTotal = (book.price || 0) * item.quantity;
-    totalPrice += itemTotal;
+  cart.items.forEach((item) => {
+    const book = item.book;
+    const itemTotal = (parseFloat(book.price) * item.quantity).toFixed(2);
 
     const cartImageHtml = book.cover_image
       ? `<img src="${escapeHtml(book.cover_image)}" alt="${escapeHtml(book.title)}" style="width: 100%; height: 100%; object-fit: cover; border-radius: 5px;">`
       : `<i class="fas fa-book"></i>`;
 
+    const stockWarning = item.available
+      ? ""
+      : `<p class="cart-item-author">Недостаточно на складе (осталось ${book.stock})</p>`;
+
     html += `
             <div class="cart-item">
                 <div class="cart-item-image">
                     ${cartImageHtml}
                 </div>
                 <div class="cart-item-info">
-                    <h4>${escapeHtml(book.title || "Загрузка...")}</h4>
-                    <p class="cart-item-author">${escapeHtml(book.author?.name || "")}</p>
-                    <p class="cart-item-price-single">${book.price || 0} ₽</p>
+                    <h4>${escapeHtml(book.title)}</h4>
+                    <p class="cart-item-author">${escapeHtml(book.author_name || "")}</p>
+                    <p class="cart-item-price-single">${book.price} ₽</p>
+                    ${stockWarning}
                 </div>
                 <div class="cart-item-quantity">
-                    <button class="quantity-btn" onclick="changeQuantity(${index}, -1)">
+                    <button class="quantity-btn" onclick="changeQuantity(${item.book_id}, ${item.quantity - 1})">
                         <i class="fas fa-minus"></i>
                     </button>
                     <span class="quantity-value">${item.quantity}</span>
-                    <button class="quantity-btn" onclick="changeQuantity(${index}, 1)">
+                    <button class="quantity-btn" onclick="changeQuantity(${item.book_id}, ${item.quantity + 1})">
                         <i class="fas fa-plus"></i>
                     </button>
                 </div>
                 <div class="cart-item-price">
                     ${itemTotal} ₽
                 </div>
-                <button class="cart-item-remove" onclick="removeFromCart(${index})">
+                <button class="cart-item-remove" onclick="removeFromCart(${item.book_id})">
                     <i class="fas fa-trash"></i>
                 </button>
             </div>
@@ -759,15 +761,15 @@ async function renderCart() {
             <h3>Итого</h3>
             <div class="summary-row">
                 <span>Товаров:</span>
-                <span>${cart.reduce((sum, item) => sum + item.quantity, 0)} шт.</span>
+                <span>${cart.total_quantity} шт.</span>
             </div>
             <div class="summary-row">
                 <span>Сумма:</span>
-                <span>${totalPrice} ₽</span>
+                <span>${cart.total_price} ₽</span>
             </div>
             <div class="summary-total">
                 <span>Итого:</span>
-                <span>${totalPrice} ₽</span>
+                <span>${cart.total_price} ₽</span>
             </div>
             <button class="btn btn-primary checkout-btn" onclick="createOrder()">
                 <i class="fas fa-check"></i> Оформить заказ
@@ -778,24 +780,34 @@ async function renderCart() {
   cartContent.innerHTML = html;
 }
 
-function changeQuantity(index, delta) {
-  cart[index].quantity += delta;
-
-  if (cart[index].quantity <= 0) {
-    cart.splice(index, 1);
+async function changeQuantity(bookId, quantity) {
+  try {
+    const response = await fetchAPI(
+      `/cart/items/${bookId}/`,
+      "PATCH",
+      { quantity: Math.max(quantity, 0) },
+      true,
+    );
+    if (response.ok) {
+      setCart(await response.json());
+      renderCart();
+    }
+  } catch (error) {
+    showToast("Ошибка соединения", "error");
   }
-
-  localStorage.setItem("cart", JSON.stringify(cart));
-  updateCartCount();
-  renderCart();
 }
 
-function removeFromCart(index) {
-  cart.splice(index, 1);
-  localStorage.setItem("cart", JSON.stringify(cart));
-  updateCartCount();
-  renderCart();
-  showToast("Товар удален из корзины", "info");
+async function removeFromCart(bookId) {
+  try {
+    const response = await fetchAPI(`/cart/items/${bookId}/`, "DELETE", null, true);
+    if (response.ok) {
+      setCart(await response.json());
+      renderCart();
+      showToast("Товар удален из корзины", "info");
+    }
+  } catch (error) {
+    showToast("Ошибка соединения", "error");
+  }
 }
 
 async function createOrder() {
@@ -805,23 +817,16 @@ async function createOrder() {
     return;
   }
 
-  if (cart.length === 0) {
+  if (cart.items.length === 0) {
     showToast("Корзина пуста", "warning");
     return;
   }
 
-  const items = cart.map((item) => ({
-    book_id: item.book_id,
-    quantity: item.quantity,
-  }));
-
   try {
-    const response = await fetchAPI("/create-order/", "POST", { items }, true);
+    const response = await fetchAPI("/cart/checkout/", "POST", {}, true);
 
     if (response.ok) {
-      cart = [];
-      localStorage.setItem("cart", JSON.stringify(cart));
-      updateCartCount();
+      setCart({ items: [], total_quantity: 0, total_price: "0.00", errors: [] });
       showToast("Заказ успешно оформлен!", "success");
       showPage("orders");
     } else {
@@ -830,6 +835,8 @@ async function createOrder() {
         "Ошибка: " + (error.error || "Не удалось оформить заказ"),
         "error",
       );
+      await loadCart();
+      renderCart();
     }
   } catch (error) {
     showToast("Ошибка соединения", "error");
@@ -0,0 +1,72 @@
+"""
+Конфигурация gunicorn для промышленного запуска:
+
+    gunicorn -c gunicorn.conf.py bookstore.wsgi
+
+- preload_app: приложение загружается и прогревается (api.warmup) в мастере
+  до открытия сокетов, воркеры делят импортированные модули через
+  copy-on-write;
+- воркеры gthread: WEB_CONCURRENCY процессов (по умолчанию 2 * CPU + 1) по
+  GUNICORN_THREADS потоков;
+- max_requests: воркер перезапускается после GUNICORN_MAX_REQUESTS запросов
+  (с разбросом, чтобы воркеры не перезапускались одновременно) - рост
+  памяти ограничен; счётчики метрик завершившегося воркера переносятся
+  в архив мастера (api.metrics.mark_process_dead).
+"""
+
+import os
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "bookstore.settings")
+
+
+def cpu_count():
+    """Число CPU, доступных процессу (с учётом affinity контейнера)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+bind = os.environ.get("GUNICORN_BIND", f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+workers = int(os.environ.get("WEB_CONCURRENCY", 2 * cpu_count() + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+worker_class = "gthread" if threads > 1 else "sync"
+
+preload_app = True
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = max_requests // 10
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = 30
+keepalive = 5
+backlog = 2048
+
+# Файлы heartbeat воркеров - в памяти, а не на диске контейнера
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    """Мастер до открытия сокетов: прогрев и подготовка к fork."""
+    from api.metrics import clear_metrics_dir
+    from api.warmup import prepare_fork, warm_up
+
+    if server.cfg.preload_app:
+        for path, status, duration in warm_up(server.app.wsgi()):
+            server.log.info("Прогрев %s: %s за %.1f мс", path, status, duration)
+    # Метрики прошлого запуска и запросов прогрева не учитываются
+    clear_metrics_dir()
+    prepare_fork()
+
+
+def child_exit(server, worker):
+    """Мастер после завершения воркера: его метрики переносятся в архив."""
+    from django.conf import settings
+
+    from api.metrics import mark_process_dead
+
+    if settings.METRICS_ENABLED:
+        mark_process_dead(worker.pid)